@@ -401,8 +401,8 @@ async def list_product_stock(
     
     response_items = []
     for stock, sku, product in items:
-        # Get category
-        cat = await db.get(Category, product.category_id) if product.category_id else None
+        # Category is loaded with the product
+        cat = product.category
         
         # Use SKU quantities (catalog) as source of truth
         actual_quantity = sku.quantity or 0
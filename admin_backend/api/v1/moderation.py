@@ -66,13 +66,15 @@ async def list_comments(
     result = await db.execute(query)
     comments = result.scalars().all()
     
-    # Add reports count
+    # Reports count for the whole page in one query
+    reports_counts = dict((await db.execute(
+        select(Report.comment_id, func.count())
+        .where(Report.comment_id.in_([c.id for c in comments]))
+        .group_by(Report.comment_id)
+    )).all()) if comments else {}
+    
     items = []
     for comment in comments:
-        reports_count = await db.scalar(
-            select(func.count()).where(Report.comment_id == comment.id)
-        ) or 0
-        
         item = schemas.CommentModerationResponse(
             id=comment.id,
             content=comment.content,
@@ -87,7 +89,7 @@ async def list_comments(
             article_id=comment.article_id,
             product_id=comment.product_id,
             likes_count=comment.likes_count,
-            reports_count=reports_count,
+            reports_count=reports_counts.get(comment.id, 0),
             created_at=comment.created_at
         )
         items.append(item)
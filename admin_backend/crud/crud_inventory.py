@@ -315,10 +315,13 @@ class CRUDProductStock:
         Takes actual quantities from SKU table (catalog), not from ProductStock.
         ProductStock is used only for warehouse settings (min_quantity, etc).
         """
-        # Build query from SKU (source of truth for quantities)
+        # Build query from SKU (source of truth for quantities); ProductStock
+        # settings and categories come in the same round trip, not per SKU
         query = (
-            select(SKU, Product)
+            select(SKU, Product, ProductStock)
             .join(Product, SKU.product_id == Product.id)
+            .outerjoin(ProductStock, ProductStock.sku_id == SKU.id)
+            .options(selectinload(Product.category))
             .where(SKU.is_active == True)
         )
         
@@ -337,15 +340,9 @@ class CRUDProductStock:
         result = await db.execute(query)
         all_skus = result.all()
         
-        # For each SKU, get or create ProductStock settings (for min_quantity)
+        # ProductStock settings (for min_quantity) per SKU
         items_with_stock = []
-        for sku, product in all_skus:
-            # Get ProductStock if exists (for warehouse settings)
-            stock_result = await db.execute(
-                select(ProductStock).where(ProductStock.sku_id == sku.id)
-            )
-            stock = stock_result.scalar_one_or_none()
-            
+        for sku, product, stock in all_skus:
             # If no ProductStock, create minimal object with defaults
             if not stock:
                 stock = ProductStock(
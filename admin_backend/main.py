@@ -7,6 +7,9 @@ import logging
 import os
 import mimetypes
 from backend.core.config import settings
+from backend.core.loop_monitor import loop_monitor, router as loop_monitor_router
+from backend.core.query_profiler import QueryProfilerMiddleware
+from backend.core.metrics import MetricsMiddleware, router as metrics_router
 from admin_backend.api.v1 import auth, users, catalog, orders, dashboard, blog, moderation, promo_codes, inventory, refunds, finance
 
 # Добавляем MIME type для WebP
@@ -19,6 +22,9 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+app.add_middleware(QueryProfilerMiddleware, expose_headers=settings.DEBUG)
+app.add_middleware(MetricsMiddleware, app_name="admin_backend")
+
 # CORS: на проде обрабатывается в Nginx.
 # Для локальной отладки без Nginx — когда установлена ENABLE_CORS=true
 if os.environ.get("ENABLE_CORS", "").lower() in ("true", "1", "yes"):
@@ -58,6 +64,8 @@ app.include_router(promo_codes.router, prefix="/api/v1/promo-codes", tags=["prom
 app.include_router(inventory.router, prefix="/api/v1/inventory", tags=["inventory"])
 app.include_router(refunds.router, prefix="/api/v1/refunds", tags=["refunds"])
 app.include_router(finance.router, prefix="/api/v1/finance", tags=["finance"])
+app.include_router(loop_monitor_router)
+app.include_router(metrics_router)
 
 # Serve uploaded files
 UPLOAD_DIR = "/app/uploads"
@@ -65,6 +73,15 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 
+@app.on_event("startup")
+async def startup():
+    loop_monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await loop_monitor.stop()
+
 
 @app.get("/")
 async def root():
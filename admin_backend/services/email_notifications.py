@@ -6,7 +6,7 @@ import logging
 from typing import Optional
 from backend.core.config import settings
 from backend.models.order import Order, OrderStatus
-from backend.utils.email import send_email_sync
+from backend.utils.email_outbox import enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -60,8 +60,8 @@ def send_order_status_notification(
             tracking_number=tracking_number or order.tracking_number or "не указан"
         )
         
-        send_email_sync(email_to=email, subject=subject, body=message)
-        logger.info(f"Sent {new_status.value} notification for order {order.id}")
+        enqueue_email(email_to=email, subject=subject, body=message)
+        logger.info(f"Queued {new_status.value} notification for order {order.id}")
         return True
     except Exception as e:
         logger.error(f"Failed to send order notification: {e}")
@@ -80,8 +80,8 @@ def send_tracking_notification(order: Order, tracking_number: str) -> bool:
         subject = f"Трек-номер для заказа #{order.id}"
         body = f"Ваш заказ отправлен. Трек-номер: {tracking_number}"
         
-        send_email_sync(email_to=email, subject=subject, body=body)
-        logger.info(f"Sent tracking notification for order {order.id}")
+        enqueue_email(email_to=email, subject=subject, body=body)
+        logger.info(f"Queued tracking notification for order {order.id}")
         return True
     except Exception as e:
         logger.error(f"Failed to send tracking notification: {e}")
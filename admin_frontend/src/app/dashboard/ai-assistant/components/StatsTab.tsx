@@ -7,7 +7,7 @@ import {
 } from '@mantine/core';
 import {
   IconMessages, IconMessageForward, IconUsers, IconClock,
-  IconCoins, IconCalendarEvent, IconShieldCheck, IconArchive,
+  IconCoins, IconCalendarEvent, IconShieldCheck, IconArchive, IconBolt,
 } from '@tabler/icons-react';
 import { notifications } from '@mantine/notifications';
 import { getAssistantStats } from '@/lib/ai-api';
@@ -25,6 +25,9 @@ interface Stats {
   escalations_today: number;
   unique_users: number;
   manager_escalations: number;
+  answer_cache_hits: number;
+  answer_cache_misses: number;
+  answer_cache_hit_rate: number | null;
 }
 
 function StatCard({ icon: Icon, label, value, color }: {
@@ -96,6 +99,14 @@ export function StatsTab() {
         <StatCard icon={IconCoins} label="Токены использовано" value={stats ? fmtTokens(stats.total_tokens_used) : '—'} color="yellow" />
         <StatCard icon={IconUsers} label="Уникальных пользователей" value={stats?.unique_users ?? '—'} color="grape" />
         <StatCard icon={IconUsers} label="Всего эскалаций" value={stats?.manager_escalations ?? '—'} color="red" />
+        <StatCard
+          icon={IconBolt}
+          label="Ответы из кеша"
+          value={stats?.answer_cache_hit_rate != null
+            ? `${Math.round(stats.answer_cache_hit_rate * 100)}% (${stats.answer_cache_hits})`
+            : '—'}
+          color="lime"
+        />
       </SimpleGrid>
 
       <Text fw={600} mb="sm">Сегодня</Text>
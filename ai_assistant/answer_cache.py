@@ -0,0 +1,152 @@
+"""
+Cache of assistant answers to repeated questions.
+
+Only the first question of a conversation goes through the cache: later
+turns depend on the dialogue so far. An entry is keyed by
+
+- a fingerprint of the normalized question (case, punctuation and "ё"
+  ignored),
+- a namespace: the RAG table signature, the settings that shape the answer
+  (model, temperature, max_tokens, system prompt, RAG search settings) and
+  a generation counter. Changing any of them, or bumping the generation
+  from the admin API, makes old entries unreachable; they expire by TTL.
+
+Entries are raw model output. The output filter still runs on every hit,
+so banned phrase changes apply to cached answers too.
+
+With answer_cache_similarity > 0, a question without an exact entry is
+compared to the other cached questions of its namespace (hashed n-gram
+vectors, see rag_vectors.py). The closest one at or above the threshold
+is used.
+
+Redis errors never fail a chat turn: the cache just misses.
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from ai_assistant.rag_vectors import HashingVectorizer, normalize
+from backend.core import cache
+
+logger = logging.getLogger("ai_assistant")
+
+GENERATION_KEY = "ai_assistant:answers:generation"
+HITS_KEY = "ai_assistant:answers:hits"
+MISSES_KEY = "ai_assistant:answers:misses"
+
+# Near-duplicate candidates kept per namespace; exact matches are unlimited
+MAX_QUESTIONS = 1000
+
+_vectorizer = HashingVectorizer(1024)
+
+
+def _answer_key(namespace: str, fingerprint: str) -> str:
+    return f"ai_assistant:answers:{namespace}:{fingerprint}"
+
+
+@lru_cache(maxsize=4096)
+def _question_vector(question: str) -> np.ndarray:
+    return _vectorizer.transform(question)
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    question: str
+    fingerprint: str
+    namespace: str
+    ttl: int
+    similarity: float
+
+    @property
+    def answer_key(self) -> str:
+        return _answer_key(self.namespace, self.fingerprint)
+
+    @property
+    def questions_key(self) -> str:
+        return f"ai_assistant:answers:{self.namespace}:questions"
+
+
+async def make_key(
+    question: str,
+    config: dict,
+    rag_version: str,
+    ttl: int,
+    similarity: float = 0.0,
+) -> Optional[AnswerKey]:
+    """Key for `question` under the given answer-shaping `config`, or None if not cacheable."""
+    normalized = " ".join(normalize(question))
+    if not normalized:
+        return None
+    try:
+        generation = await cache.redis_client.get(GENERATION_KEY) or "0"
+    except Exception as e:
+        logger.warning(f"Answer cache unavailable: {e}")
+        return None
+    scope = json.dumps([generation, rag_version, config], sort_keys=True, ensure_ascii=False, default=str)
+    return AnswerKey(
+        question=normalized,
+        fingerprint=hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:20],
+        namespace=hashlib.sha1(scope.encode("utf-8")).hexdigest()[:12],
+        ttl=ttl,
+        similarity=similarity,
+    )
+
+
+async def _nearest(key: AnswerKey) -> Optional[str]:
+    """Fingerprint of the most similar cached question, if close enough."""
+    questions = await cache.redis_client.hgetall(key.questions_key)
+    if not questions:
+        return None
+    fingerprints = list(questions)
+    matrix = np.stack([_question_vector(questions[fp]) for fp in fingerprints])
+    scores = matrix @ _question_vector(key.question)
+    best = int(np.argmax(scores))
+    return fingerprints[best] if scores[best] >= key.similarity else None
+
+
+async def lookup(key: AnswerKey) -> Optional[str]:
+    """Cached answer for the key's question, counting the hit or miss."""
+    try:
+        raw = await cache.redis_client.get(key.answer_key)
+        if raw is None and key.similarity > 0:
+            fingerprint = await _nearest(key)
+            if fingerprint:
+                raw = await cache.redis_client.get(_answer_key(key.namespace, fingerprint))
+                if raw is None:
+                    await cache.redis_client.hdel(key.questions_key, fingerprint)
+        await cache.redis_client.incr(MISSES_KEY if raw is None else HITS_KEY)
+        return json.loads(raw)["answer"] if raw is not None else None
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return None
+
+
+async def store(key: AnswerKey, answer: str):
+    try:
+        value = json.dumps({"question": key.question, "answer": answer}, ensure_ascii=False)
+        await cache.redis_client.set(key.answer_key, value, ex=key.ttl)
+        if await cache.redis_client.hlen(key.questions_key) < MAX_QUESTIONS:
+            await cache.redis_client.hset(key.questions_key, key.fingerprint, key.question)
+        await cache.redis_client.expire(key.questions_key, key.ttl)
+    except Exception as e:
+        logger.warning(f"Answer cache store failed: {e}")
+
+
+async def invalidate():
+    """Drop every cached answer (in all processes)."""
+    await cache.redis_client.incr(GENERATION_KEY)
+
+
+async def counters() -> tuple[int, int]:
+    """(hits, misses) since the counters were created."""
+    try:
+        hits, misses = await cache.redis_client.mget(HITS_KEY, MISSES_KEY)
+    except Exception as e:
+        logger.warning(f"Answer cache counters unavailable: {e}")
+        return 0, 0
+    return int(hits or 0), int(misses or 0)
@@ -3,10 +3,11 @@ Admin API endpoints for AI Assistant management.
 All endpoints require admin authentication.
 """
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, func
+from sqlalchemy import select
 
 from backend.db.session import get_db
 from backend.models.user import User
@@ -19,13 +20,18 @@ from ai_assistant.models.assistant import (
 )
 from ai_assistant.schemas import (
     SettingOut, SettingUpdate, SettingBulkUpdate,
-    RAGDocumentCreate, RAGDocumentUpdate, RAGDocumentOut,
+    RAGDocumentCreate, RAGDocumentUpdate, RAGDocumentOut, RAGImportResult,
     BannedPhraseCreate, BannedPhraseUpdate, BannedPhraseOut,
     ConversationListItem, ConversationDetail, MessageOut,
-    AssistantStats, ManagerMessageCreate,
+    AssistantStats, AssistantDailyStats, ManagerMessageCreate,
     TelegramLinkCreate, TelegramLinkUpdate, TelegramLinkOut,
 )
+from ai_assistant import answer_cache, chat_export, conversation_events, message_archive, rag_ingest
 from ai_assistant.services import SettingsService, ChatService, TelegramService
+from ai_assistant.phrase_filter import banned_phrase_cache
+from ai_assistant.rag_chunks import write_chunks
+from ai_assistant.rag_index import rag_index_sync
+import io
 import logging
 import os
 import uuid
@@ -95,27 +101,8 @@ async def list_conversations(
         date_from=date_from, date_to=date_to, skip=skip, limit=limit,
     )
     
-    items = []
-    for conv in conversations:
-        # Get user info
-        user_email = None
-        user_username = None
-        if conv.user_id:
-            user = await db.get(User, conv.user_id)
-            if user:
-                user_email = user.email
-                user_username = user.username
-        
-        # Get last message
-        last_msg_result = await db.execute(
-            select(AIMessage.content)
-            .where(AIMessage.conversation_id == conv.id)
-            .order_by(desc(AIMessage.created_at))
-            .limit(1)
-        )
-        last_message = last_msg_result.scalar()
-        
-        items.append(ConversationListItem(
+    items = [
+        ConversationListItem(
             id=conv.id,
             user_id=conv.user_id,
             user_email=user_email,
@@ -124,10 +111,13 @@ async def list_conversations(
             status=conv.status.value if hasattr(conv.status, 'value') else conv.status,
             title=conv.title,
             message_count=conv.message_count,
-            last_message=last_message[:200] if last_message else None,
+            last_message=conv.last_message_preview,
+            last_message_at=conv.last_message_at,
             created_at=conv.created_at,
             updated_at=conv.updated_at,
-        ))
+        )
+        for conv, user_email, user_username in conversations
+    ]
     
     return {"items": items, "total": total}
 
@@ -143,13 +133,8 @@ async def get_conversation(
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Get messages
-    result = await db.execute(
-        select(AIMessage)
-        .where(AIMessage.conversation_id == conversation_id)
-        .order_by(AIMessage.created_at)
-    )
-    messages_db = list(result.scalars().all())
+    # Get messages (archived ones included)
+    messages_db = await message_archive.conversation_messages(db, conv)
     
     # Get user info
     user_email = None
@@ -199,6 +184,7 @@ async def get_conversation(
         manager_name=manager_name,
         manager_avatar_url=manager_avatar_url,
         total_tokens_used=conv.total_tokens_used,
+        summary=conv.summary,
     )
 
 
@@ -224,6 +210,8 @@ async def switch_to_manager(
     )
     db.add(system_msg)
     await db.commit()
+    await db.refresh(system_msg)
+    await conversation_events.publish(db, conv, system_msg)
     
     return {"status": "ok", "conversation_status": "manager_connected"}
 
@@ -249,6 +237,8 @@ async def switch_to_ai(
     )
     db.add(system_msg)
     await db.commit()
+    await db.refresh(system_msg)
+    await conversation_events.publish(db, conv, system_msg)
     
     return {"status": "ok", "conversation_status": "active"}
 
@@ -331,6 +321,8 @@ async def close_conversation(
     conv.closed_at = datetime.utcnow()
     conv.message_count += 1
     await db.commit()
+    await db.refresh(close_msg)
+    await conversation_events.publish(db, conv, close_msg)
     
     return {"status": "ok"}
 
@@ -378,6 +370,7 @@ async def send_manager_message(
     conv.message_count += 1
     await db.commit()
     await db.refresh(msg)
+    await conversation_events.publish(db, conv, msg)
     
     return MessageOut(
         id=msg.id,
@@ -387,6 +380,48 @@ async def send_manager_message(
     )
 
 
+# ==================== EXPORT ====================
+
+def _export_response(rows, fields, format: str, name: str) -> StreamingResponse:
+    filename = f"{name}-{datetime.now(timezone.utc):%Y%m%d-%H%M}.{format}"
+    return StreamingResponse(
+        chat_export.encode(rows, fields, format),
+        media_type=chat_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export/conversations")
+async def export_conversations(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    status: Optional[AIConversationStatus] = None,
+    date_from: Optional[datetime] = Query(None, description="Conversations created at or after"),
+    date_to: Optional[datetime] = Query(None, description="Conversations created at or before"),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin),
+):
+    """Stream conversations as CSV or JSONL, read through a server-side cursor."""
+    rows = chat_export.conversation_rows(db, status=status, date_from=date_from, date_to=date_to)
+    return _export_response(rows, chat_export.CONVERSATION_FIELDS, format, "conversations")
+
+
+@router.get("/export/messages")
+async def export_messages(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    status: Optional[AIConversationStatus] = Query(None, description="Status of the conversation"),
+    date_from: Optional[datetime] = Query(None, description="Messages created at or after"),
+    date_to: Optional[datetime] = Query(None, description="Messages created at or before"),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Stream messages as CSV or JSONL, archived conversations included, in
+    constant memory (see ai_assistant/chat_export.py).
+    """
+    rows = chat_export.message_rows(db, status=status, date_from=date_from, date_to=date_to)
+    return _export_response(rows, chat_export.MESSAGE_FIELDS, format, "messages")
+
+
 # ==================== RAG DOCUMENTS ====================
 
 @router.get("/rag", response_model=list[RAGDocumentOut])
@@ -424,8 +459,11 @@ async def create_rag_document(
         created_by=admin.id,
     )
     db.add(doc)
+    await db.flush()
+    await write_chunks(db, doc)
     await db.commit()
     await db.refresh(doc)
+    await rag_index_sync.document_saved(db, doc)
     return doc
 
 
@@ -444,8 +482,11 @@ async def update_rag_document(
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(doc, field, value)
     
+    if "content" in data.model_fields_set:
+        await write_chunks(db, doc)
     await db.commit()
     await db.refresh(doc)
+    await rag_index_sync.document_saved(db, doc)
     return doc
 
 
@@ -462,9 +503,47 @@ async def delete_rag_document(
     
     await db.delete(doc)
     await db.commit()
+    await rag_index_sync.document_deleted(db, doc_id)
     return {"status": "ok"}
 
 
+@router.post("/rag/import", response_model=RAGImportResult)
+async def import_rag_documents(
+    file: UploadFile = File(...),
+    update_existing: bool = Query(True, description="Update documents whose title already exists"),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Bulk import of RAG documents from a JSONL file (one document per line)
+    or a Markdown file (one document), see ai_assistant/rag_ingest.py.
+    Unchanged and duplicate documents are skipped; only written documents
+    are reindexed. A file that stops being UTF-8 midway returns the report
+    of what was imported before that point.
+    """
+    name = file.filename or ""
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix not in rag_ingest.JSONL_SUFFIXES + rag_ingest.MARKDOWN_SUFFIXES:
+        raise HTTPException(status_code=422, detail="Unsupported format. Use .jsonl or .md")
+    
+    try:
+        if suffix in rag_ingest.JSONL_SUFFIXES:
+            # Read line by line from the spooled upload (in a worker thread), not loaded whole
+            documents = rag_ingest.read_jsonl(io.TextIOWrapper(file.file, encoding="utf-8"), name)
+        else:
+            documents = [rag_ingest.read_markdown((await file.read()).decode("utf-8"), name)]
+        report = await rag_ingest.ingest(
+            db, documents, created_by=admin.id, update_existing=update_existing, index_sync=rag_index_sync,
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=422, detail="File must be UTF-8")
+    logger.info(
+        f"RAG import {name}: {report.created} created, {report.updated} updated, "
+        f"{report.unchanged} unchanged, {report.duplicates} duplicates, {report.invalid} invalid"
+    )
+    return RAGImportResult(**vars(report))
+
+
 # ==================== BANNED PHRASES ====================
 
 @router.get("/banned-phrases", response_model=list[BannedPhraseOut])
@@ -503,6 +582,7 @@ async def create_banned_phrase(
     db.add(phrase)
     await db.commit()
     await db.refresh(phrase)
+    await banned_phrase_cache.bump()
     return phrase
 
 
@@ -523,6 +603,7 @@ async def update_banned_phrase(
     
     await db.commit()
     await db.refresh(phrase)
+    await banned_phrase_cache.bump()
     return phrase
 
 
@@ -539,6 +620,7 @@ async def delete_banned_phrase(
     
     await db.delete(phrase)
     await db.commit()
+    await banned_phrase_cache.bump()
     return {"status": "ok"}
 
 
@@ -553,6 +635,30 @@ async def get_stats(
     return await ChatService.get_stats(db)
 
 
+@router.get("/stats/daily", response_model=list[AssistantDailyStats])
+async def get_daily_stats(
+    date_from: Optional[date] = Query(None, description="First day (UTC), 30 days ago by default"),
+    date_to: Optional[date] = Query(None, description="Last day (UTC), today by default"),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin),
+):
+    """Per-day statistics for a date range; days without activity are omitted."""
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    return await ChatService.get_daily_stats(db, date_from, date_to)
+
+
+@router.delete("/answer-cache")
+async def clear_answer_cache(
+    admin: User = Depends(get_current_admin),
+):
+    """Drop all cached answers, e.g. after prices or delivery terms changed outside the knowledge base."""
+    await answer_cache.invalidate()
+    return {"status": "ok"}
+
+
 @router.post("/telegram/test")
 async def test_telegram(
     db: AsyncSession = Depends(get_db),
@@ -2,10 +2,11 @@
 User-facing AI Assistant API endpoints.
 Chat endpoints for the frontend widget.
 """
+import json
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from backend.db.session import get_db
 from backend.models.user import User
@@ -16,6 +17,7 @@ from ai_assistant.schemas import (
     ConversationCreate, ConversationOut, MessageCreate, MessageOut,
     ConversationDetail, SettingOut,
 )
+from ai_assistant import conversation_events, message_archive
 from ai_assistant.services import ChatService, SettingsService, TelegramService
 
 import logging
@@ -64,6 +66,107 @@ async def _get_user_optional(
         return None
 
 
+def _message_out(m: AIMessage) -> MessageOut:
+    return MessageOut(
+        id=m.id,
+        role=m.role.value if hasattr(m.role, 'value') else m.role,
+        content=m.content,
+        tokens_used=m.tokens_used,
+        response_time_ms=m.response_time_ms,
+        first_token_ms=m.first_token_ms,
+        was_filtered=m.was_filtered,
+        created_at=m.created_at,
+    )
+
+
+async def _check_can_send(
+    db: AsyncSession,
+    request: Request,
+    conversation_id: int,
+    x_session_id: Optional[str],
+) -> tuple[AIConversation, Optional[User]]:
+    """Checks shared by the plain and streaming send endpoints."""
+    enabled = await SettingsService.get_typed(db, "assistant_enabled")
+    if not enabled:
+        raise HTTPException(status_code=503, detail="AI assistant is currently disabled")
+    
+    # Verify conversation ownership
+    conv = await db.get(AIConversation, conversation_id)
+    if not conv:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    user = await _get_user_optional(request, db)
+    
+    # Verify ownership
+    if conv.user_id and user and conv.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not your conversation")
+    if conv.session_id and x_session_id and conv.session_id != x_session_id:
+        raise HTTPException(status_code=403, detail="Not your conversation")
+    
+    # Block messages to closed conversations
+    if conv.status == AIConversationStatus.CLOSED:
+        raise HTTPException(status_code=400, detail="Диалог завершён. Начните новый чат.")
+    
+    # Upgrade guest conversation to authenticated user
+    if not conv.user_id and user:
+        conv.user_id = user.id
+        await db.flush()
+    
+    # Rate limit check
+    is_limited, limit_msg = await ChatService.check_rate_limit(
+        db,
+        user_id=user.id if user else None,
+        session_id=x_session_id,
+    )
+    if is_limited:
+        raise HTTPException(status_code=429, detail=limit_msg)
+    
+    return conv, user
+
+
+def _sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _get_own_conversation(
+    db: AsyncSession,
+    request: Request,
+    conversation_id: int,
+    x_session_id: Optional[str],
+) -> AIConversation:
+    conv = await db.get(AIConversation, conversation_id)
+    if not conv:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    user = await _get_user_optional(request, db)
+    
+    if conv.user_id and user and conv.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not your conversation")
+    if conv.session_id and x_session_id and conv.session_id != x_session_id:
+        raise HTTPException(status_code=403, detail="Not your conversation")
+    return conv
+
+
+async def _notify_new_message(
+    db: AsyncSession,
+    conv: AIConversation,
+    user: Optional[User],
+    x_session_id: Optional[str],
+    content: str,
+):
+    """Telegram notifications for a message in an existing conversation."""
+    try:
+        user_display = (user.username or user.email if user else None) or f"Гость ({x_session_id[:10] if x_session_id else '?'})"
+        await TelegramService.notify_new_message(db, conv.id, user_display, content)
+        # Check for escalation
+        await db.refresh(conv)
+        if conv.status == AIConversationStatus.MANAGER_REQUESTED:
+            await TelegramService.notify_manager_request(db, conv.id, user_display, content)
+    except Exception as e:
+        logger.warning(f"Telegram notification error: {e}")
+
+
 # ---------- Public endpoints ----------
 
 @router.get("/config")
@@ -139,15 +242,7 @@ async def create_conversation(
     await db.refresh(conv, ["messages"])
     
     messages = [
-        MessageOut(
-            id=m.id,
-            role=m.role.value if hasattr(m.role, 'value') else m.role,
-            content=m.content,
-            tokens_used=m.tokens_used,
-            response_time_ms=m.response_time_ms,
-            was_filtered=m.was_filtered,
-            created_at=m.created_at,
-        )
+        _message_out(m)
         for m in conv.messages
     ]
     
@@ -175,40 +270,7 @@ async def send_message(
     x_session_id: Optional[str] = Header(None, alias="X-Session-ID"),
 ):
     """Send a message in an existing conversation."""
-    enabled = await SettingsService.get_typed(db, "assistant_enabled")
-    if not enabled:
-        raise HTTPException(status_code=503, detail="AI assistant is currently disabled")
-    
-    # Verify conversation ownership
-    conv = await db.get(AIConversation, conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    user = await _get_user_optional(request, db)
-    
-    # Verify ownership
-    if conv.user_id and user and conv.user_id != user.id:
-        raise HTTPException(status_code=403, detail="Not your conversation")
-    if conv.session_id and x_session_id and conv.session_id != x_session_id:
-        raise HTTPException(status_code=403, detail="Not your conversation")
-    
-    # Block messages to closed conversations
-    if conv.status == AIConversationStatus.CLOSED:
-        raise HTTPException(status_code=400, detail="Диалог завершён. Начните новый чат.")
-    
-    # Upgrade guest conversation to authenticated user
-    if not conv.user_id and user:
-        conv.user_id = user.id
-        await db.flush()
-    
-    # Rate limit check
-    is_limited, limit_msg = await ChatService.check_rate_limit(
-        db,
-        user_id=user.id if user else None,
-        session_id=x_session_id,
-    )
-    if is_limited:
-        raise HTTPException(status_code=429, detail=limit_msg)
+    conv, user = await _check_can_send(db, request, conversation_id, x_session_id)
     
     user_msg, ai_msg = await ChatService.send_message(
         db,
@@ -218,27 +280,48 @@ async def send_message(
         session_id=x_session_id,
     )
     
-    # Telegram notifications
-    try:
-        user_display = (user.username or user.email if user else None) or f"Гость ({x_session_id[:10] if x_session_id else '?'})"
-        await TelegramService.notify_new_message(db, conversation_id, user_display, data.content)
-        # Check for escalation
-        await db.refresh(conv)
-        if conv.status == AIConversationStatus.MANAGER_REQUESTED:
-            await TelegramService.notify_manager_request(db, conversation_id, user_display, data.content)
-    except Exception as e:
-        logger.warning(f"Telegram notification error: {e}")
+    await _notify_new_message(db, conv, user, x_session_id, data.content)
     
     # Return AI response if available, else user msg
-    response = ai_msg or user_msg
-    return MessageOut(
-        id=response.id,
-        role=response.role.value if hasattr(response.role, 'value') else response.role,
-        content=response.content,
-        tokens_used=response.tokens_used,
-        response_time_ms=response.response_time_ms,
-        was_filtered=response.was_filtered,
-        created_at=response.created_at,
+    return _message_out(ai_msg or user_msg)
+
+
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def send_message_stream(
+    conversation_id: int,
+    data: MessageCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    x_session_id: Optional[str] = Header(None, alias="X-Session-ID"),
+):
+    """
+    Send a message and receive the reply as Server-Sent Events:
+    `message` (the saved user message), `delta` ({"text": ...}) pieces of
+    the reply, then `done` (the saved reply, as in the non-streaming
+    endpoint) or `error`.
+    """
+    conv, user = await _check_can_send(db, request, conversation_id, x_session_id)
+    
+    async def events():
+        last = None
+        try:
+            async for event, payload in ChatService.stream_message(db, conversation_id, data.content):
+                if event == "delta":
+                    yield _sse("delta", {"text": payload})
+                    continue
+                if payload is not None:
+                    last = payload
+                yield _sse(event, _message_out(last).model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"Streaming reply failed for conversation {conversation_id}: {e}")
+            yield _sse("error", {"detail": "Не удалось получить ответ. Попробуйте ещё раз."})
+            return
+        await _notify_new_message(db, conv, user, x_session_id, data.content)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -250,36 +333,13 @@ async def get_conversation(
     x_session_id: Optional[str] = Header(None, alias="X-Session-ID"),
 ):
     """Get conversation with all messages."""
-    conv = await db.get(AIConversation, conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    user = await _get_user_optional(request, db)
-    
-    # Verify ownership
-    if conv.user_id and user and conv.user_id != user.id:
-        raise HTTPException(status_code=403, detail="Not your conversation")
-    if conv.session_id and x_session_id and conv.session_id != x_session_id:
-        raise HTTPException(status_code=403, detail="Not your conversation")
+    conv = await _get_own_conversation(db, request, conversation_id, x_session_id)
     
     # Load messages
-    result = await db.execute(
-        select(AIMessage)
-        .where(AIMessage.conversation_id == conversation_id)
-        .order_by(AIMessage.created_at)
-    )
-    messages_db = list(result.scalars().all())
+    messages_db = await message_archive.conversation_messages(db, conv)
     
     messages = [
-        MessageOut(
-            id=m.id,
-            role=m.role.value if hasattr(m.role, 'value') else m.role,
-            content=m.content,
-            tokens_used=m.tokens_used,
-            response_time_ms=m.response_time_ms,
-            was_filtered=m.was_filtered,
-            created_at=m.created_at,
-        )
+        _message_out(m)
         for m in messages_db
     ]
     
@@ -313,49 +373,90 @@ async def get_conversation(
 async def get_messages(
     conversation_id: int,
     request: Request,
+    since_id: Optional[int] = Query(None, description="Only messages with a greater id"),
     db: AsyncSession = Depends(get_db),
     x_session_id: Optional[str] = Header(None, alias="X-Session-ID"),
 ):
-    """Get all messages for a conversation (polling endpoint)."""
-    conv = await db.get(AIConversation, conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    user = await _get_user_optional(request, db)
+    """
+    Get messages for a conversation: all of them, or only those after
+    `since_id`. Fallback for clients that can't keep /events open.
+    """
+    conv = await _get_own_conversation(db, request, conversation_id, x_session_id)
     
-    if conv.user_id and user and conv.user_id != user.id:
-        raise HTTPException(status_code=403, detail="Not your conversation")
-    if conv.session_id and x_session_id and conv.session_id != x_session_id:
-        raise HTTPException(status_code=403, detail="Not your conversation")
-    
-    result = await db.execute(
-        select(AIMessage)
-        .where(AIMessage.conversation_id == conversation_id)
-        .order_by(AIMessage.created_at)
-    )
-    messages_db = list(result.scalars().all())
-    
-    # Get manager info if manager is connected
-    manager_name = None
-    manager_avatar_url = None
-    if conv.manager_id:
-        manager = await db.get(User, conv.manager_id)
-        if manager:
-            manager_name = manager.username or manager.firstname or "Менеджер"
-            manager_avatar_url = manager.avatar_url
+    messages_db = await message_archive.conversation_messages(db, conv, since_id)
     
     return {
         "conversation_id": conversation_id,
-        "status": conv.status.value if hasattr(conv.status, 'value') else conv.status,
-        "manager_name": manager_name,
-        "manager_avatar_url": manager_avatar_url,
-        "messages": [
-            {
-                "id": m.id,
-                "role": m.role.value if hasattr(m.role, 'value') else m.role,
-                "content": m.content,
-                "created_at": m.created_at.isoformat(),
-            }
-            for m in messages_db
-        ],
+        **await conversation_events.status_payload(db, conv),
+        "messages": [conversation_events.message_payload(m) for m in messages_db],
     }
+
+
+@router.get("/conversations/{conversation_id}/events")
+async def conversation_updates(
+    conversation_id: int,
+    request: Request,
+    since_id: Optional[int] = Query(None, description="Last message id the client already has"),
+    db: AsyncSession = Depends(get_db),
+    x_session_id: Optional[str] = Header(None, alias="X-Session-ID"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events with conversation updates: `status` (status and
+    manager), `message` (new messages after `since_id`, event id = message
+    id). Sends `: keep-alive` comments while idle.
+    """
+    conv = await _get_own_conversation(db, request, conversation_id, x_session_id)
+    if last_event_id and last_event_id.isdigit():
+        since_id = max(since_id or 0, int(last_event_id))
+    
+    # Subscribe before reading the backlog so nothing committed in between is lost
+    updates = conversation_events.subscribe(conversation_id)
+    try:
+        await updates.__anext__()
+    except Exception as e:
+        logger.warning(f"Conversation events unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Push updates unavailable, use /messages?since_id=")
+    
+    backlog = [
+        conversation_events.message_payload(m)
+        for m in await message_archive.conversation_messages(db, conv, since_id)
+    ]
+    status = await conversation_events.status_payload(db, conv)
+    # The stream only needs Redis: give the connection back to the pool
+    await db.close()
+    
+    async def events():
+        last_id = since_id or 0
+        
+        def message_events(messages: list[dict]):
+            nonlocal last_id
+            for m in messages:
+                if m["id"] > last_id:
+                    last_id = m["id"]
+                    yield _sse("message", m, event_id=m["id"])
+        
+        try:
+            yield _sse("status", status)
+            for event in message_events(backlog):
+                yield event
+            async for update in updates:
+                if await request.is_disconnected():
+                    break
+                if update is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                messages = update.pop("messages", [])
+                yield _sse("status", update)
+                for event in message_events(messages):
+                    yield event
+        except Exception as e:
+            logger.warning(f"Conversation {conversation_id} event stream ended: {e}")
+        finally:
+            await updates.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
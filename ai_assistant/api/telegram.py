@@ -0,0 +1,42 @@
+"""
+Telegram Bot API webhook for the manager bot.
+The leader process registers it with setWebhook (see TelegramBot in services.py).
+"""
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db.session import get_db
+from ai_assistant.services import SettingsService, TelegramBot, telegram_bot
+
+import logging
+
+logger = logging.getLogger("ai_assistant")
+
+router = APIRouter()
+
+
+@router.post("/webhook")
+async def telegram_webhook(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None, alias="X-Telegram-Bot-Api-Secret-Token"),
+):
+    """
+    Receive a bot update. Answers right away; the update is handled in the
+    background so Telegram doesn't time out and redeliver it.
+    """
+    snapshot = await SettingsService.snapshot(db)
+    bot_token = snapshot.get("telegram_bot_token")
+    if not snapshot.get_typed("telegram_enabled") or not bot_token:
+        raise HTTPException(status_code=404, detail="Telegram bot is disabled")
+
+    expected = TelegramBot.webhook_secret(bot_token)
+    if not x_telegram_bot_api_secret_token or not hmac.compare_digest(x_telegram_bot_api_secret_token, expected):
+        logger.warning(f"[TG BOT] Webhook call with invalid secret from {request.client.host if request.client else '?'}")
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    update = await request.json()
+    await telegram_bot.dispatch(update, bot_token)
+    return {"ok": True}
@@ -0,0 +1,179 @@
+"""
+Streaming export of conversations and messages (CSV or JSONL) for
+quality review.
+
+Rows are read through a server-side cursor (AsyncSession.stream with
+yield_per) as plain column tuples, never ORM objects, and encoded as they
+arrive. The response is sent in chunks of FLUSH_ROWS rows, so memory stays
+bounded by FETCH_ROWS whatever the date range.
+
+Messages come in two parts, each ordered by conversation:
+
+- conversations archived by message_archive, read one archive row at a
+  time (ARCHIVE_FETCH_ROWS per fetch) and unpacked one by one;
+- messages still in ai_message. The created_at bounds also limit the
+  partitions that are read.
+
+Filters: conversation status, and a created_at range. The range applies to
+conversations in the conversation export and to messages in the message
+export.
+
+    GET /api/v1/admin/assistant/export/conversations?format=csv|jsonl
+    GET /api/v1/admin/assistant/export/messages?format=csv|jsonl
+"""
+import csv
+import enum
+import io
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, Sequence
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_assistant.message_archive import unpack
+from ai_assistant.models.assistant import (
+    AIConversation,
+    AIConversationArchive,
+    AIConversationStatus,
+    AIMessage,
+)
+
+FETCH_ROWS = 1000
+ARCHIVE_FETCH_ROWS = 20  # Each archive row holds a whole conversation
+FLUSH_ROWS = 500
+
+CONVERSATION_FIELDS = (
+    "id", "user_id", "user_email", "session_id", "status", "title", "message_count",
+    "total_tokens_used", "manager_id", "created_at", "updated_at", "closed_at", "archived_at",
+)
+MESSAGE_FIELDS = (
+    "conversation_id", "id", "role", "content", "tokens_used", "response_time_ms",
+    "model_used", "was_filtered", "created_at",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+
+# ---------- Rows ----------
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def conversation_rows(
+    db: AsyncSession,
+    status: Optional[AIConversationStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> AsyncIterator[dict]:
+    """Conversations created in the range, with the user's email, by id."""
+    from backend.models.user import User
+
+    query = (
+        select(
+            *(getattr(AIConversation, name) for name in CONVERSATION_FIELDS if name != "user_email"),
+            User.email.label("user_email"),
+        )
+        .outerjoin(User, User.id == AIConversation.user_id)
+        .order_by(AIConversation.id)
+    )
+    if status:
+        query = query.where(AIConversation.status == status)
+    if date_from:
+        query = query.where(AIConversation.created_at >= date_from)
+    if date_to:
+        query = query.where(AIConversation.created_at <= date_to)
+    result = await db.stream(query.execution_options(yield_per=FETCH_ROWS))
+    async for row in result:
+        yield row._asdict()
+
+
+async def message_rows(
+    db: AsyncSession,
+    status: Optional[AIConversationStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> AsyncIterator[dict]:
+    """Messages created in the range: archived conversations first, then ai_message."""
+    archived = (
+        select(AIConversationArchive.conversation_id, AIConversationArchive.messages)
+        .join(AIConversation, AIConversation.id == AIConversationArchive.conversation_id)
+        .order_by(AIConversationArchive.conversation_id)
+    )
+    if status:
+        archived = archived.where(AIConversation.status == status)
+    if date_from:
+        # Archived conversations are closed; nothing was archived after closing
+        archived = archived.where(or_(AIConversation.closed_at.is_(None), AIConversation.closed_at >= date_from))
+    if date_to:
+        archived = archived.where(AIConversation.created_at <= date_to)
+    result = await db.stream(archived.execution_options(yield_per=ARCHIVE_FETCH_ROWS))
+    async for conversation_id, data in result:
+        for m in unpack(conversation_id, data):
+            created_at = _utc(m.created_at)
+            if (date_from and created_at < _utc(date_from)) or (date_to and created_at > _utc(date_to)):
+                continue
+            yield {name: getattr(m, name) for name in MESSAGE_FIELDS}
+
+    live = (
+        select(*(getattr(AIMessage, name) for name in MESSAGE_FIELDS))
+        .order_by(AIMessage.conversation_id, AIMessage.created_at, AIMessage.id)
+    )
+    if status:
+        live = live.join(AIConversation, AIConversation.id == AIMessage.conversation_id).where(
+            AIConversation.status == status
+        )
+    if date_from:
+        live = live.where(AIMessage.created_at >= date_from)
+    if date_to:
+        live = live.where(AIMessage.created_at <= date_to)
+    result = await db.stream(live.execution_options(yield_per=FETCH_ROWS))
+    async for row in result:
+        yield row._asdict()
+
+
+# ---------- Encoding ----------
+
+def _value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def encode_csv(rows: AsyncIterator[dict], fields: Sequence[str]) -> AsyncIterator[str]:
+    """CSV with a header row; the BOM lets Excel detect UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(fields)
+    count = 0
+    async for row in rows:
+        writer.writerow([_value(row[name]) for name in fields])
+        count += 1
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def encode_jsonl(rows: AsyncIterator[dict], fields: Sequence[str]) -> AsyncIterator[str]:
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps({name: _value(row[name]) for name in fields}, ensure_ascii=False) + "\n")
+        if len(lines) >= FLUSH_ROWS:
+            yield "".join(lines)
+            lines.clear()
+    if lines:
+        yield "".join(lines)
+
+
+def encode(rows: AsyncIterator[dict], fields: Sequence[str], format: str) -> AsyncIterator[str]:
+    return encode_csv(rows, fields) if format == "csv" else encode_jsonl(rows, fields)
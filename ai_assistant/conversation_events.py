@@ -0,0 +1,99 @@
+"""
+Push channel for conversation updates.
+
+Whoever changes a conversation from outside the user's own request (manager
+replies and mode switches from the admin API or the Telegram bot) publishes
+the new messages and status on `ai_assistant:conversation:<id>` after
+committing. GET /chat/conversations/{id}/events relays that channel to the
+widget as Server-Sent Events. An open stream holds no database connection,
+only a Redis subscription.
+
+Nothing is stored in Redis: a client that was disconnected catches up with
+`since_id` (the last message id it has) and the database.
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_assistant.models.assistant import AIConversation, AIMessage
+from backend.core import cache
+from backend.models.user import User
+
+logger = logging.getLogger("ai_assistant")
+
+KEEPALIVE_SECONDS = 15.0
+
+
+def channel(conversation_id: int) -> str:
+    return f"ai_assistant:conversation:{conversation_id}"
+
+
+def message_payload(m: AIMessage) -> dict:
+    """Same shape as the items of GET /chat/conversations/{id}/messages."""
+    return {
+        "id": m.id,
+        "role": m.role.value if hasattr(m.role, 'value') else m.role,
+        "content": m.content,
+        "created_at": m.created_at.isoformat() if m.created_at else None,
+    }
+
+
+async def status_payload(db: AsyncSession, conv: AIConversation) -> dict:
+    manager_name = None
+    manager_avatar_url = None
+    if conv.manager_id:
+        manager = await db.get(User, conv.manager_id)
+        if manager:
+            manager_name = manager.username or manager.firstname or "Менеджер"
+            manager_avatar_url = manager.avatar_url
+    return {
+        "status": conv.status.value if hasattr(conv.status, 'value') else conv.status,
+        "manager_name": manager_name,
+        "manager_avatar_url": manager_avatar_url,
+    }
+
+
+async def publish(db: AsyncSession, conv: AIConversation, *messages: AIMessage):
+    """
+    Announce committed changes of `conv` to the widgets listening on it.
+    Messages must already have their ids and created_at (refresh them).
+    """
+    try:
+        payload = await status_payload(db, conv)
+        payload["messages"] = [message_payload(m) for m in messages]
+        await cache.redis_client.publish(channel(conv.id), json.dumps(payload, ensure_ascii=False))
+    except Exception as e:
+        # Listeners catch up with since_id when they reconnect
+        logger.warning(f"Conversation {conv.id} update not published: {e}")
+
+
+async def subscribe(conversation_id: int) -> AsyncIterator[Optional[dict]]:
+    """
+    Updates published for one conversation. Yields None after
+    KEEPALIVE_SECONDS of silence so the caller can send a keep-alive and
+    notice disconnected clients. Raises if Redis is unavailable.
+    """
+    pubsub = cache.redis_client.pubsub()
+    try:
+        await pubsub.subscribe(channel(conversation_id))
+        yield None  # Subscribed: anything committed from now on is delivered
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    pubsub.get_message(ignore_subscribe_messages=True, timeout=KEEPALIVE_SECONDS),
+                    timeout=KEEPALIVE_SECONDS + 5,
+                )
+            except asyncio.TimeoutError:
+                message = None
+            if message is None:
+                yield None
+            elif message.get("type") == "message":
+                yield json.loads(message["data"])
+    finally:
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
@@ -0,0 +1,146 @@
+"""
+Coordination of concurrent messages to one conversation, across workers.
+
+- Model turns of a conversation run one at a time under a Redis lock.
+  Every turn answers all user messages saved before it started. A message
+  that was saved while another turn was generating waits for the lock,
+  then finds it was already answered (see reply_for) or starts the next
+  turn. Messages sent back to back therefore cost one model call,
+  not one each.
+- An identical resubmission (double click, client retry) doesn't create a
+  second user message. It waits for the first request and returns that
+  request's result (see Submission).
+
+If Redis is unavailable, messages are processed independently, as before.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from backend.core import cache
+
+logger = logging.getLogger("ai_assistant")
+
+# Longer than the OpenAI client timeout (60 s): a turn never outlives its lock
+LOCK_SECONDS = 90
+# Resubmissions this soon after the original finished still get its result
+RESUBMIT_WINDOW_SECONDS = 3
+POLL_SECONDS = 0.05
+
+
+def _key(conversation_id: int, name: str) -> str:
+    return f"ai_assistant:conversation:{conversation_id}:{name}"
+
+
+@asynccontextmanager
+async def generation_lock(conversation_id: int) -> AsyncIterator[bool]:
+    """
+    Serialize model turns of one conversation. Yields whether the lock is
+    held; without it (Redis down, wait timed out) the turn runs anyway.
+    """
+    acquired = False
+    lock = None
+    try:
+        lock = cache.redis_client.lock(
+            _key(conversation_id, "generation"),
+            timeout=LOCK_SECONDS, sleep=POLL_SECONDS, blocking_timeout=LOCK_SECONDS,
+        )
+        acquired = await lock.acquire()
+        if not acquired:
+            logger.warning(f"Conversation {conversation_id}: generation lock wait timed out")
+    except Exception as e:
+        logger.warning(f"Conversation {conversation_id}: generation lock unavailable: {e}")
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except Exception as e:
+                logger.warning(f"Conversation {conversation_id}: generation lock release failed: {e}")
+
+
+async def _turns(conversation_id: int) -> dict[int, int]:
+    """Recent turns: last user message id covered -> reply id."""
+    try:
+        turns = await cache.redis_client.hgetall(_key(conversation_id, "turns"))
+    except Exception:
+        return {}
+    return {int(user_id): int(reply_id) for user_id, reply_id in turns.items()}
+
+
+async def answered_up_to(conversation_id: int) -> int:
+    """Id of the last user message covered by a recent turn (0 if unknown)."""
+    return max(await _turns(conversation_id), default=0)
+
+
+async def reply_for(conversation_id: int, user_message_id: int) -> Optional[int]:
+    """Id of the reply of the first recent turn that covered the user message."""
+    turns = await _turns(conversation_id)
+    covering = [user_id for user_id in turns if user_id >= user_message_id]
+    return turns[min(covering)] if covering else None
+
+
+async def record_turn(conversation_id: int, answered_up_to: int, reply_id: int):
+    """Call under the generation lock, after the reply is committed."""
+    key = _key(conversation_id, "turns")
+    try:
+        await cache.redis_client.hset(key, answered_up_to, reply_id)
+        await cache.redis_client.expire(key, LOCK_SECONDS)
+    except Exception as e:
+        logger.warning(f"Conversation {conversation_id}: turn not recorded: {e}")
+
+
+class Submission:
+    """One message text sent to one conversation, claimed by the first request that sends it."""
+
+    def __init__(self, conversation_id: int, content: str):
+        digest = hashlib.sha1(content.strip().encode("utf-8")).hexdigest()[:16]
+        self.key = _key(conversation_id, f"submission:{digest}")
+        self.owned = False
+
+    async def claim(self) -> bool:
+        """True if no identical message is being processed (this request handles it)."""
+        try:
+            self.owned = bool(await cache.redis_client.set(self.key, "pending", ex=LOCK_SECONDS, nx=True))
+        except Exception:
+            self.owned = True
+        return self.owned
+
+    async def wait(self) -> Optional[tuple[int, Optional[int]]]:
+        """
+        (user_message_id, reply_id_or_None) of the identical message in
+        progress, or None if its request failed or took too long.
+        """
+        deadline = time.monotonic() + LOCK_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                value = await cache.redis_client.get(self.key)
+            except Exception:
+                return None
+            if value is None:
+                return None
+            if value != "pending":
+                user_id, _, reply_id = value.partition(":")
+                return int(user_id), int(reply_id) if reply_id else None
+            await asyncio.sleep(POLL_SECONDS)
+        return None
+
+    async def complete(self, user_message_id: int, reply_id: Optional[int]):
+        if not self.owned:
+            return
+        try:
+            await cache.redis_client.set(self.key, f"{user_message_id}:{reply_id or ''}", ex=RESUBMIT_WINDOW_SECONDS)
+        except Exception as e:
+            logger.warning(f"Submission result not shared: {e}")
+
+    async def abandon(self):
+        if not self.owned:
+            return
+        try:
+            await cache.redis_client.delete(self.key)
+        except Exception:
+            pass
@@ -0,0 +1,44 @@
+"""
+Denormalized last message of a conversation (AIConversation.last_message_preview
+and last_message_at) for the admin inbox, so listing a page of conversations
+doesn't need a "latest message" query per row.
+
+A before_flush hook copies every new AIMessage onto its conversation, so
+all places that add messages (chat, admin, Telegram bot) keep it current.
+The conversation is usually already in the session and dirty (updated_at,
+counters), so this adds columns to an UPDATE the flush issues anyway.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ai_assistant.models.assistant import AIConversation, AIMessage
+
+PREVIEW_LENGTH = 200
+
+
+def _before_flush(session: Session, flush_context, instances):
+    latest: dict[int, AIMessage] = {}
+    for obj in session.new:
+        if isinstance(obj, AIMessage) and obj.conversation_id is not None:
+            # Objects of one flush have no ids yet: the last one added wins
+            latest[obj.conversation_id] = obj
+    if not latest:
+        return
+    now = datetime.now(timezone.utc)
+    for conversation_id, message in latest.items():
+        conv = session.get(AIConversation, conversation_id)
+        if conv is None:
+            continue
+        conv.last_message_preview = (message.content or "")[:PREVIEW_LENGTH]
+        conv.last_message_at = now
+
+
+def install():
+    """Attach the flush hook to all ORM sessions (idempotent)."""
+    if not event.contains(Session, "before_flush", _before_flush):
+        event.listen(Session, "before_flush", _before_flush)
+
+
+install()
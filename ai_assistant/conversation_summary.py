@@ -0,0 +1,166 @@
+"""
+Token-budgeted conversation history with a rolling summary.
+
+The prompt gets the newest messages that fit the history_tokens budget
+(estimated with estimate_tokens, see rag_chunks.py). Older messages are
+represented by AIConversation.summary: a short model-written summary of
+every message up to summary_until_id.
+
+When a turn had to leave out messages that aren't summarized yet (over the
+token budget or the context_messages_limit count), the summary is
+refreshed in the background after the reply is saved: the oldest
+unsummarized messages are folded into it until the rest fits into half of
+both limits, so the next turns don't need another refresh right away.
+Until the refresh is done the prompt just lacks those messages.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Sequence
+
+from sqlalchemy import select, update
+
+from ai_assistant import stats_rollup
+from ai_assistant.message_archive import message_filter
+from ai_assistant.models.assistant import AIConversation, AIMessage, AIMessageRole
+from ai_assistant.rag_chunks import estimate_tokens
+from backend.core import cache
+
+logger = logging.getLogger("ai_assistant")
+
+# Role and formatting overhead of one chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_MAX_TOKENS = 400
+# Messages folded by one refresh; a longer backlog takes several turns
+FOLD_MAX_TOKENS = 4000
+LOCK_SECONDS = 120
+
+SUMMARY_PROMPT = (
+    "Ты ведёшь краткое содержание диалога консультанта чайного магазина с клиентом. "
+    "Дополни текущее краткое содержание новыми сообщениями. Сохрани то, что важно для "
+    "продолжения разговора: вопросы и предпочтения клиента, что ему уже посоветовали, "
+    "номера заказов, договорённости. Пиши кратко, в третьем лице, не больше 150 слов."
+)
+
+_tasks: set[asyncio.Task] = set()
+
+
+def message_tokens(message: AIMessage) -> int:
+    return estimate_tokens(message.content or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit(messages: Sequence[AIMessage], budget: int, keep_last: int = 1) -> tuple[list[AIMessage], list[AIMessage]]:
+    """
+    Split chronological `messages` into (older ones left out, newest ones
+    within `budget` tokens). The last `keep_last` messages are always kept.
+    """
+    used = 0
+    start = len(messages)
+    while start > 0:
+        tokens = message_tokens(messages[start - 1])
+        if used + tokens > budget and len(messages) - start >= keep_last:
+            break
+        used += tokens
+        start -= 1
+    return list(messages[:start]), list(messages[start:])
+
+
+def prompt_message(conv: AIConversation) -> dict:
+    return {"role": "system", "content": f"Краткое содержание начала диалога:\n{conv.summary}"}
+
+
+@dataclass(frozen=True)
+class SummaryModel:
+    """Model settings of the turn that requested the refresh."""
+    base_url: str
+    api_key: str
+    model: str
+
+
+def _transcript(summary: str, messages: Sequence[AIMessage]) -> str:
+    lines = [f"Текущее краткое содержание:\n{summary or '(пусто)'}", "", "Новые сообщения:"]
+    for m in messages:
+        lines.append(f"{'Клиент' if m.role == AIMessageRole.USER else 'Консультант'}: {m.content}")
+    return "\n".join(lines)
+
+
+async def refresh(conversation_id: int, budget: int, max_messages: int, llm: SummaryModel):
+    """Fold the oldest unsummarized messages into the summary (one process at a time)."""
+    from backend.db.session import AsyncSessionLocal
+    from ai_assistant.services import OpenAIClient
+
+    lock_key = f"ai_assistant:conversation:{conversation_id}:summary"
+    try:
+        if not await cache.redis_client.set(lock_key, "1", ex=LOCK_SECONDS, nx=True):
+            return
+    except Exception:
+        pass  # Without Redis a duplicate refresh is only wasted work
+
+    try:
+        async with AsyncSessionLocal() as db:
+            conv = await db.get(AIConversation, conversation_id)
+            if conv is None:
+                return
+            result = await db.execute(
+                select(AIMessage)
+                .where(
+                    *message_filter(db, conv),
+                    AIMessage.role.in_([AIMessageRole.USER, AIMessageRole.ASSISTANT]),
+                    AIMessage.id > (conv.summary_until_id or 0),
+                )
+                .order_by(AIMessage.id)
+            )
+            messages = list(result.scalars().all())
+            older, recent = fit(messages, budget // 2)
+            if len(recent) > max_messages // 2:
+                older = messages[:len(messages) - max_messages // 2]
+            folded = []
+            tokens = 0
+            for m in older:
+                if folded and tokens + message_tokens(m) > FOLD_MAX_TOKENS:
+                    break
+                folded.append(m)
+                tokens += message_tokens(m)
+            if not folded:
+                return
+
+            summary, tokens_used = await OpenAIClient.chat_completion(
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": _transcript(conv.summary, folded)},
+                ],
+                base_url=llm.base_url,
+                api_key=llm.api_key,
+                model=llm.model,
+                temperature=0.2,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            )
+            await db.execute(
+                update(AIConversation)
+                .where(AIConversation.id == conversation_id)
+                .values(
+                    summary=summary.strip(),
+                    summary_until_id=folded[-1].id,
+                    total_tokens_used=AIConversation.total_tokens_used + tokens_used,
+                )
+            )
+            await stats_rollup.record(db, conversation_id, tokens_used=tokens_used)
+            await db.commit()
+            logger.info(
+                f"Conversation {conversation_id}: {len(folded)} messages folded into the summary "
+                f"(up to #{folded[-1].id}, {tokens_used} tokens)"
+            )
+    except Exception as e:
+        logger.error(f"Conversation {conversation_id}: summary refresh failed: {e}")
+    finally:
+        try:
+            await cache.redis_client.delete(lock_key)
+        except Exception:
+            pass
+
+
+def schedule(conversation_id: int, budget: int, max_messages: int, llm: SummaryModel):
+    """Run refresh() in the background, after the current response."""
+    task = asyncio.create_task(refresh(conversation_id, budget, max_messages, llm))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
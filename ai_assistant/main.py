@@ -9,6 +9,11 @@ import logging
 
 from ai_assistant.api.chat import router as chat_router
 from ai_assistant.api.admin import router as admin_router
+from ai_assistant.api.telegram import router as telegram_router
+from backend.core.loop_monitor import loop_monitor, router as loop_monitor_router
+from backend.core.query_profiler import QueryProfilerMiddleware
+from backend.core.metrics import MetricsMiddleware, router as metrics_router
+from backend.core.config import settings
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +28,9 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+app.add_middleware(QueryProfilerMiddleware, expose_headers=settings.DEBUG)
+app.add_middleware(MetricsMiddleware, app_name="ai_assistant")
+
 # CORS
 if os.environ.get("ENABLE_CORS", "").lower() in ("true", "1", "yes"):
     app.add_middleware(
@@ -39,30 +47,63 @@ if os.environ.get("ENABLE_CORS", "").lower() in ("true", "1", "yes"):
 # Routes
 app.include_router(chat_router, prefix="/api/v1/chat", tags=["chat"])
 app.include_router(admin_router, prefix="/api/v1/admin/assistant", tags=["admin-assistant"])
+app.include_router(telegram_router, prefix="/api/v1/telegram", tags=["telegram"])
+app.include_router(loop_monitor_router)
+app.include_router(metrics_router)
 
 
 @app.on_event("startup")
 async def startup():
     """Initialize default settings and start Telegram bot on startup."""
+    loop_monitor.start()
+
     from backend.db.session import get_db
     async for db in get_db():
-        from ai_assistant.services import SettingsService
+        from ai_assistant.services import SettingsService, settings_cache
         await SettingsService.ensure_defaults(db)
+        await settings_cache.start()
+        from ai_assistant.phrase_filter import banned_phrase_cache
+        await banned_phrase_cache.start()
         logger.info("AI Assistant settings initialized")
+
+        from ai_assistant.rag_index import rag_index_sync
+        await rag_index_sync.load(db)
+        await rag_index_sync.start()
         break
     
-    # Start Telegram bot poller
-    from ai_assistant.services import telegram_bot_poller
-    await telegram_bot_poller.start()
-    logger.info("Telegram bot poller started")
+    from ai_assistant.telegram_outbox import telegram_outbox
+    await telegram_outbox.start()
+
+    # Message partitions and archival of old conversations (once a day, one process)
+    from ai_assistant.message_archive import message_archiver
+    await message_archiver.start()
+
+    # Start Telegram bot (webhook registration or polling on the leader process)
+    from ai_assistant.services import telegram_bot
+    await telegram_bot.start()
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """Stop Telegram bot on shutdown."""
-    from ai_assistant.services import telegram_bot_poller
-    await telegram_bot_poller.stop()
-    logger.info("Telegram bot poller stopped")
+    from ai_assistant.services import telegram_bot
+    await telegram_bot.stop()
+
+    from ai_assistant.telegram_outbox import telegram_outbox
+    await telegram_outbox.stop()
+
+    from ai_assistant.message_archive import message_archiver
+    await message_archiver.stop()
+
+    from ai_assistant.rag_index import rag_index_sync
+    await rag_index_sync.stop()
+
+    from ai_assistant.services import settings_cache
+    await settings_cache.stop()
+
+    from ai_assistant.phrase_filter import banned_phrase_cache
+    await banned_phrase_cache.stop()
+    await loop_monitor.stop()
 
 
 @app.get("/")
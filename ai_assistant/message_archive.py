@@ -0,0 +1,334 @@
+"""
+Retention of the message history: monthly partitions of ai_message and
+archival of old closed conversations.
+
+On PostgreSQL ai_message is partitioned by month of created_at (migration
+20261019f): ai_message_pYYYYMM partitions plus ai_message_default for rows
+outside them. A query only reads the partitions its created_at bounds
+allow, so message reads go through message_filter(), which bounds
+created_at by the conversation's creation time.
+
+Once a day one process (the one that sets RUN_KEY in Redis) runs
+maintenance:
+
+- creates the partitions of the current and next PARTITIONS_AHEAD months;
+- moves the messages of conversations closed more than
+  `message_archive_days` ago to ai_conversation_archive, one row per
+  conversation with the messages as zlib-compressed JSON;
+- drops monthly partitions older than that which became empty.
+
+Archived conversations stay in ai_conversation (lists, search, stats);
+conversation_messages() returns their messages from the archive, followed
+by those written after archival.
+"""
+import asyncio
+import json
+import logging
+import re
+import zlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, inspect, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_assistant import stats_rollup
+from ai_assistant.models.assistant import (
+    AIConversation,
+    AIConversationArchive,
+    AIConversationStatus,
+    AIMessage,
+    AIMessageRole,
+)
+from backend.core import cache
+
+logger = logging.getLogger("ai_assistant")
+
+RUN_KEY = "ai_assistant:message_archive:run"
+RUN_INTERVAL_SECONDS = 24 * 3600
+CHECK_SECONDS = 3600
+PARTITIONS_AHEAD = 2
+ARCHIVE_BATCH = 200
+# Messages are never older than their conversation; the margin covers
+# transactions that started (now() is fixed) before the conversation was created
+PRUNE_MARGIN = timedelta(hours=1)
+
+ARCHIVED_FIELDS = (
+    "id", "role", "content", "tokens_used", "response_time_ms", "first_token_ms",
+    "model_used", "was_filtered", "original_content", "created_at",
+)
+
+_PARTITION_RE = re.compile(r"^ai_message_p(\d{4})(\d{2})$")
+
+
+def _loaded(obj, name: str):
+    """Attribute value if already loaded, None otherwise (never a lazy load)."""
+    return inspect(obj).dict.get(name)
+
+
+# ---------- Reading ----------
+
+def message_filter(db: AsyncSession, conv: AIConversation) -> list:
+    """WHERE clauses for the messages of a conversation, with partition pruning."""
+    clauses = [AIMessage.conversation_id == conv.id]
+    created_at = _loaded(conv, "created_at")
+    if db.bind.dialect.name == "postgresql" and isinstance(created_at, datetime):
+        clauses.append(AIMessage.created_at >= created_at - PRUNE_MARGIN)
+    return clauses
+
+
+def _serialize(messages: Sequence) -> bytes:
+    rows = []
+    for m in messages:
+        row = {name: getattr(m, name) for name in ARCHIVED_FIELDS}
+        row["role"] = AIMessageRole(row["role"]).value
+        row["created_at"] = row["created_at"].isoformat() if row["created_at"] else None
+        rows.append(row)
+    return json.dumps(rows, ensure_ascii=False).encode()
+
+
+def pack(messages: Sequence) -> bytes:
+    """Compressed JSON of messages (AIMessage objects or rows with ARCHIVED_FIELDS)."""
+    return zlib.compress(_serialize(messages), 9)
+
+
+def unpack(conversation_id: int, data: bytes) -> list[AIMessage]:
+    """Archived messages as detached AIMessage objects (never added to a session)."""
+    messages = []
+    for row in json.loads(zlib.decompress(data)):
+        row["role"] = AIMessageRole(row["role"])
+        row["created_at"] = datetime.fromisoformat(row["created_at"]) if row["created_at"] else None
+        messages.append(AIMessage(conversation_id=conversation_id, **row))
+    return messages
+
+
+async def conversation_messages(
+    db: AsyncSession, conv: AIConversation, since_id: Optional[int] = None,
+) -> list[AIMessage]:
+    """All messages of a conversation (after `since_id`), oldest first, archived ones included."""
+    query = select(AIMessage).where(*message_filter(db, conv))
+    if since_id:
+        query = query.where(AIMessage.id > since_id)
+    result = await db.execute(query.order_by(AIMessage.created_at, AIMessage.id))
+    messages = list(result.scalars().all())
+    if _loaded(conv, "archived_at") is None:
+        return messages
+    data = await db.scalar(
+        select(AIConversationArchive.messages).where(AIConversationArchive.conversation_id == conv.id)
+    )
+    archived = unpack(conv.id, data) if data else []
+    if since_id:
+        archived = [m for m in archived if m.id > since_id]
+    return archived + messages
+
+
+# ---------- Partitions (PostgreSQL) ----------
+
+def _add_months(month: date, count: int) -> date:
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"ai_message_p{month:%Y%m}"
+
+
+def partition_ddl(month: date) -> str:
+    """CREATE TABLE of the partition holding messages of the month (UTC)."""
+    month = month.replace(day=1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF ai_message "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    if db.bind.dialect.name != "postgresql":
+        return False
+    return bool(await db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'ai_message')"
+    )))
+
+
+async def _partitions(db: AsyncSession) -> dict[str, date]:
+    """Monthly partitions of ai_message: name → first day of the month."""
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'ai_message'"
+    ))
+    partitions = {}
+    for (name,) in result:
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+async def ensure_partitions(db: AsyncSession, today: date, ahead: int = PARTITIONS_AHEAD) -> list[str]:
+    """Create missing partitions of this and the next `ahead` months. Returns the created ones."""
+    existing = await _partitions(db)
+    created = []
+    for offset in range(ahead + 1):
+        month = _add_months(today.replace(day=1), offset)
+        if partition_name(month) in existing:
+            continue
+        try:
+            async with db.begin_nested():
+                await db.execute(text(partition_ddl(month)))
+            created.append(partition_name(month))
+        except Exception as e:
+            # E.g. ai_message_default already has rows of that month
+            logger.error(f"[ARCHIVE] Can't create partition {partition_name(month)}: {e}")
+    await db.commit()
+    return created
+
+
+async def drop_empty_partitions(db: AsyncSession, before: date) -> list[str]:
+    """Drop monthly partitions that end before `before` and have no rows left."""
+    dropped = []
+    for name, month in sorted((await _partitions(db)).items()):
+        if _add_months(month, 1) > before:
+            continue
+        if await db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {name})")):
+            continue
+        await db.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    await db.commit()
+    return dropped
+
+
+# ---------- Archival ----------
+
+async def archive_conversations(db: AsyncSession, closed_before: datetime, limit: int = ARCHIVE_BATCH) -> int:
+    """
+    Move the messages of up to `limit` conversations closed before
+    `closed_before` to ai_conversation_archive. Returns how many
+    conversations were archived.
+    """
+    ids = list((await db.scalars(
+        select(AIConversation.id)
+        .where(
+            AIConversation.status == AIConversationStatus.CLOSED,
+            AIConversation.closed_at < closed_before,
+            AIConversation.archived_at.is_(None),
+        )
+        .order_by(AIConversation.closed_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )).all())
+    if not ids:
+        return 0
+
+    columns = [AIMessage.__table__.c[name] for name in ARCHIVED_FIELDS]
+    result = await db.execute(
+        select(AIMessage.conversation_id, *columns)
+        .where(AIMessage.conversation_id.in_(ids))
+        .order_by(AIMessage.conversation_id, AIMessage.created_at, AIMessage.id)
+    )
+    by_conversation = defaultdict(list)
+    for row in result:
+        by_conversation[row.conversation_id].append(row)
+
+    now = datetime.now(timezone.utc)
+    archives = []
+    for conversation_id in ids:
+        rows = by_conversation.get(conversation_id, [])
+        raw = _serialize(rows)
+        archives.append({
+            "conversation_id": conversation_id,
+            "message_count": len(rows),
+            "size_bytes": len(raw),
+            "messages": zlib.compress(raw, 9),
+            "archived_at": now,
+        })
+    await db.execute(insert(AIConversationArchive), archives)
+    await stats_rollup.forget_messages(db, (row for rows in by_conversation.values() for row in rows))
+    await db.execute(
+        delete(AIMessage).where(AIMessage.conversation_id.in_(ids)),
+        execution_options={"synchronize_session": False},
+    )
+    # updated_at is kept: archival mustn't move conversations up the admin list
+    await db.execute(
+        update(AIConversation)
+        .where(AIConversation.id.in_(ids))
+        .values(archived_at=now, updated_at=AIConversation.updated_at),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    return len(ids)
+
+
+class MessageArchiver:
+    """Daily maintenance task, started in every process; one of them does the work."""
+
+    def __init__(self):
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _claim(self) -> bool:
+        """True if this process should run maintenance now (at most once per RUN_INTERVAL_SECONDS)."""
+        try:
+            return bool(await cache.redis_client.set(RUN_KEY, "1", nx=True, ex=RUN_INTERVAL_SECONDS))
+        except Exception as e:
+            logger.warning(f"[ARCHIVE] Redis unavailable, maintenance skipped: {e}")
+            return False
+
+    async def _run(self):
+        while self._running:
+            try:
+                if await self._claim():
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[ARCHIVE] Maintenance failed: {e}")
+            await asyncio.sleep(CHECK_SECONDS)
+
+    async def run_once(self, now: Optional[datetime] = None) -> dict:
+        """Create partitions, archive old conversations and drop emptied partitions."""
+        from ai_assistant.services import SettingsService
+        from backend.db.session import AsyncSessionLocal
+
+        now = now or datetime.now(timezone.utc)
+        report = {"partitions_created": [], "archived": 0, "partitions_dropped": []}
+        async with AsyncSessionLocal() as db:
+            days = (await SettingsService.snapshot(db)).get_typed("message_archive_days") or 0
+            partitioned = await is_partitioned(db)
+            if partitioned:
+                report["partitions_created"] = await ensure_partitions(db, now.date())
+            if days > 0:
+                cutoff = now - timedelta(days=days)
+                while True:
+                    archived = await archive_conversations(db, cutoff)
+                    report["archived"] += archived
+                    if archived < ARCHIVE_BATCH:
+                        break
+                if partitioned:
+                    report["partitions_dropped"] = await drop_empty_partitions(db, cutoff.date())
+        logger.info(
+            f"[ARCHIVE] {report['archived']} conversations archived, "
+            f"partitions created {report['partitions_created']}, dropped {report['partitions_dropped']}"
+        )
+        return report
+
+
+message_archiver = MessageArchiver()
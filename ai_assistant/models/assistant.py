@@ -4,8 +4,8 @@ Models for chat conversations, messages, RAG documents, banned phrases, and sett
 """
 import enum
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean, DateTime, Float,
-    ForeignKey, Enum, Index, JSON
+    Column, Integer, BigInteger, String, Text, Boolean, Date, DateTime, Float,
+    ForeignKey, Enum, Index, JSON, LargeBinary
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -74,6 +74,17 @@ class AIConversation(Base):
     message_count = Column(Integer, default=0)
     total_tokens_used = Column(Integer, default=0)
     
+    # Latest message, kept up to date on insert (see conversation_preview.py)
+    last_message_preview = Column(String(200), nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Rolling summary of messages up to summary_until_id (see conversation_summary.py)
+    summary = Column(Text, nullable=True)
+    summary_until_id = Column(Integer, nullable=True)
+    
+    # Set when the messages were moved to ai_conversation_archive (see message_archive.py)
+    archived_at = Column(DateTime(timezone=True), nullable=True)
+    
     # Relationships
     messages = relationship("AIMessage", back_populates="conversation", cascade="all, delete-orphan", order_by="AIMessage.created_at")
     user = relationship("User", foreign_keys=[user_id])
@@ -82,11 +93,17 @@ class AIConversation(Base):
     __table_args__ = (
         Index("ix_ai_conversation_created", "created_at"),
         Index("ix_ai_conversation_status_updated", "status", "updated_at"),
+        Index("ix_ai_conversation_updated", "updated_at"),
+        # Admin search also has pg_trgm GIN indexes (migration 20261019e)
     )
 
 
 class AIMessage(Base):
-    """A single message in a conversation."""
+    """
+    A single message in a conversation.
+    On PostgreSQL the table is partitioned by month of created_at, with the
+    primary key (id, created_at); see message_archive.py.
+    """
     __tablename__ = "ai_message"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -101,13 +118,14 @@ class AIMessage(Base):
     # AI response metadata
     tokens_used = Column(Integer, nullable=True)
     response_time_ms = Column(Integer, nullable=True)  # Time to generate response in ms
+    first_token_ms = Column(Integer, nullable=True)  # Time to first streamed token in ms
     model_used = Column(String(100), nullable=True)
     
     # Moderation flags
     was_filtered = Column(Boolean, default=False)  # Content was filtered by banned words
     original_content = Column(Text, nullable=True)  # Original content before filtering
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     # Relationships
     conversation = relationship("AIConversation", back_populates="messages")
@@ -117,12 +135,52 @@ class AIMessage(Base):
     )
 
 
+class AIConversationArchive(Base):
+    """Messages of an archived conversation, zlib-compressed JSON (see message_archive.py)."""
+    __tablename__ = "ai_conversation_archive"
+
+    conversation_id = Column(Integer, ForeignKey("ai_conversation.id", ondelete="CASCADE"), primary_key=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    size_bytes = Column(Integer, nullable=False, default=0)  # Uncompressed JSON
+    messages = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AIStatsDaily(Base):
+    """
+    Daily rollup of assistant statistics, maintained by stats_rollup.py.
+    Each day is split into shards (by conversation id) so concurrent chats
+    don't queue on one row; readers sum the shards.
+    """
+    __tablename__ = "ai_stats_daily"
+
+    day = Column(Date, primary_key=True)  # UTC
+    shard = Column(Integer, primary_key=True)
+    
+    conversations = Column(Integer, nullable=False, default=0, server_default="0")
+    messages = Column(Integer, nullable=False, default=0, server_default="0")
+    filtered_messages = Column(Integer, nullable=False, default=0, server_default="0")
+    tokens_used = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Messages with response_time_ms and the sum of it (for the average)
+    responses = Column(Integer, nullable=False, default=0, server_default="0")
+    response_time_ms = Column(BigInteger, nullable=False, default=0, server_default="0")
+    escalations = Column(Integer, nullable=False, default=0, server_default="0")
+    new_users = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    # Net change of conversations in each status that day; the sum over all
+    # days is the current number of conversations in the status
+    status_active = Column(Integer, nullable=False, default=0, server_default="0")
+    status_manager_requested = Column(Integer, nullable=False, default=0, server_default="0")
+    status_manager_connected = Column(Integer, nullable=False, default=0, server_default="0")
+    status_closed = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 class AIRAGDocument(Base):
     """RAG knowledge base document."""
     __tablename__ = "ai_rag_document"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String(255), nullable=False)
+    title = Column(String(255), nullable=False, index=True)
     content = Column(Text, nullable=False)
     category = Column(String(100), nullable=True, index=True)  # e.g., 'tea_types', 'brewing', 'general'
     source = Column(String(255), nullable=True)  # Where this info came from
@@ -131,12 +189,29 @@ class AIRAGDocument(Base):
     
     # For search relevance
     keywords = Column(Text, nullable=True)  # Comma-separated keywords
+    # sha256 of the whitespace-normalized content (rag_chunks.content_hash), for import dedup
+    content_hash = Column(String(64), nullable=True, index=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     created_by = Column(Integer, ForeignKey("user.id", ondelete="SET NULL"), nullable=True)
 
 
+class AIRAGChunk(Base):
+    """Retrieval unit of a RAG document: an overlapping passage cut at write time."""
+    __tablename__ = "ai_rag_chunk"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("ai_rag_document.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Order within the document
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False)  # Estimated prompt tokens
+
+    __table_args__ = (
+        Index("ix_ai_rag_chunk_document_position", "document_id", "position"),
+    )
+
+
 class AIBannedPhrase(Base):
     """Banned words/phrases for content filtering."""
     __tablename__ = "ai_banned_phrase"
@@ -0,0 +1,155 @@
+"""
+Banned phrases compiled into combined regexes.
+
+All active phrases of one kind are joined into a single case-insensitive
+alternation (longest phrase first), so checking a message is one pass over
+the text instead of one pass per phrase. The compiled set is cached per
+process and rebuilt only after the admin banned-phrase endpoints change it
+(see versioned_cache.py).
+
+KeywordMatcher applies the same approach to the manager escalation
+keywords; it is compiled once per settings snapshot (settings_cache.py).
+"""
+import re
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_assistant.models.assistant import AIBannedPhrase
+from ai_assistant.versioned_cache import VersionedCache
+
+DEFAULT_REPLACEMENT = "***"
+
+
+def _alternation(phrases: Iterable[str]) -> Optional[re.Pattern]:
+    """Case-insensitive pattern matching any of the phrases, longest first."""
+    phrases = set(phrases)
+    if not phrases:
+        return None
+    return re.compile("|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)), re.IGNORECASE)
+
+
+def _compile(phrases: Iterable[AIBannedPhrase]) -> tuple[Optional[re.Pattern], dict[str, str]]:
+    """Combined pattern and lowercased phrase -> replacement."""
+    replacements: dict[str, str] = {}
+    for phrase in phrases:
+        if phrase.phrase:
+            replacements.setdefault(phrase.phrase.lower(), phrase.replacement or DEFAULT_REPLACEMENT)
+    return _alternation(replacements), replacements
+
+
+class CompiledPhrases:
+    """Immutable matcher over one set of banned phrases."""
+
+    def __init__(self, phrases: Iterable[AIBannedPhrase]):
+        phrases = list(phrases)
+        self.size = len(phrases)
+        self._input_block, _ = _compile(
+            p for p in phrases if p.apply_to_input and p.action == "block"
+        )
+        self._input_replace, self._input_replacements = _compile(
+            p for p in phrases if p.apply_to_input and p.action == "replace"
+        )
+        self._output, self._output_replacements = _compile(p for p in phrases if p.apply_to_output)
+        self._output_max_len = max(map(len, self._output_replacements), default=0)
+
+    @staticmethod
+    def _substitute(pattern: re.Pattern, replacements: dict[str, str], text: str) -> tuple[str, int]:
+        return pattern.subn(lambda m: replacements.get(m.group(0).lower(), DEFAULT_REPLACEMENT), text)
+
+    def check_input(self, text: str) -> Tuple[bool, str]:
+        """(is_blocked, filtered_text) for user input."""
+        if self._input_block is not None and self._input_block.search(text):
+            return True, text
+        if self._input_replace is not None:
+            text, _ = self._substitute(self._input_replace, self._input_replacements, text)
+        return False, text
+
+    def filter_output(self, text: str) -> Tuple[bool, str, Optional[str]]:
+        """(was_filtered, filtered_text, original_text_if_filtered) for AI output."""
+        if self._output is None:
+            return False, text, None
+        filtered, count = self._substitute(self._output, self._output_replacements, text)
+        if not count:
+            return False, text, None
+        return True, filtered, text
+
+    def output_stream(self) -> "OutputStreamFilter":
+        return OutputStreamFilter(self)
+
+
+class KeywordMatcher:
+    """Finds the first of a set of keywords (substring, any case) in one pass over the text."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._pattern = _alternation(k.lower() for k in keywords if isinstance(k, str) and k)
+
+    def search(self, text: str) -> Optional[str]:
+        """The keyword found in `text`, or None."""
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text)
+        return match.group(0) if match else None
+
+
+class OutputStreamFilter:
+    """
+    filter_output for text arriving in pieces. Text is released only once no
+    banned phrase can still start in it, i.e. up to the longest phrase length
+    minus one characters are held back (less if a match is in progress).
+    """
+
+    def __init__(self, phrases: CompiledPhrases):
+        self._pattern = phrases._output
+        self._replacements = phrases._output_replacements
+        self._hold = max(phrases._output_max_len - 1, 0)
+        self._pending = ""
+        self.original = ""
+        self.filtered = ""
+        self.was_filtered = False
+
+    def _release(self, text: str) -> str:
+        if self._pattern is not None:
+            text, count = CompiledPhrases._substitute(self._pattern, self._replacements, text)
+            self.was_filtered = self.was_filtered or bool(count)
+        self.filtered += text
+        return text
+
+    def feed(self, delta: str) -> str:
+        """Add raw text; returns the filtered text that is now safe to send."""
+        self.original += delta
+        self._pending += delta
+        if self._pattern is None:
+            return self._release(self._pop(len(self._pending)))
+        cut = len(self._pending) - self._hold
+        if cut <= 0:
+            return ""
+        for match in self._pattern.finditer(self._pending):
+            if match.start() >= cut:
+                break
+            if match.end() > cut:
+                # Replace the whole match later, together with what follows it
+                cut = match.start()
+                break
+        return self._release(self._pop(cut))
+
+    def finish(self) -> str:
+        """Flush the held-back tail."""
+        return self._release(self._pop(len(self._pending)))
+
+    def _pop(self, length: int) -> str:
+        head, self._pending = self._pending[:length], self._pending[length:]
+        return head
+
+
+class BannedPhraseCache(VersionedCache[CompiledPhrases]):
+    def __init__(self, max_age: Optional[float] = None):
+        super().__init__("banned_phrases", max_age)
+
+    async def _build(self, db: AsyncSession) -> CompiledPhrases:
+        result = await db.execute(select(AIBannedPhrase).where(AIBannedPhrase.is_active == True))
+        return CompiledPhrases(result.scalars().all())
+
+
+banned_phrase_cache = BannedPhraseCache()
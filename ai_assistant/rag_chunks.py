@@ -0,0 +1,126 @@
+"""
+Write-time chunking of RAG documents.
+
+Documents are cut into overlapping chunks of about RAG_CHUNK_TOKENS tokens
+along sentence and line boundaries, and stored in `ai_rag_chunk`. The indexes
+retrieve chunks, not whole documents, and the chat prompt gets only the best
+chunks that fit the rag_context_tokens budget.
+
+Token counts are estimates (about 3 characters per token, which is what
+OpenAI tokenizers give for Russian text and is on the safe side for Latin),
+so no tokenizer dependency is needed.
+"""
+import hashlib
+import os
+import re
+from typing import Mapping
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from ai_assistant.models.assistant import AIRAGChunk, AIRAGDocument
+
+CHUNK_TOKENS = int(os.environ.get("RAG_CHUNK_TOKENS", 200))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("RAG_CHUNK_OVERLAP_TOKENS", 40))
+
+# After sentence-ending punctuation (not list numbers like "2."),
+# or after a line break (kept on the segment)
+_SEGMENT_RE = re.compile(r"(?<=\D[.!?…])[ \t]+|(?<=\n)")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 2) // 3
+
+
+def content_hash(text: str) -> str:
+    """Fingerprint of a document text, insensitive to whitespace differences."""
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+
+def _segments(text: str, max_tokens: int) -> list[str]:
+    """Sentences and lines; longer ones are cut on word boundaries."""
+    segments = []
+    for segment in _SEGMENT_RE.split(text):
+        if not segment.strip():
+            if segment and segments:
+                segments[-1] += segment  # Blank lines stay with the paragraph above
+            continue
+        if estimate_tokens(segment) <= max_tokens:
+            segments.append(segment)
+            continue
+        words, current = segment.split(), []
+        for word in words:
+            if current and estimate_tokens(" ".join(current + [word])) > max_tokens:
+                segments.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            segments.append(" ".join(current))
+    return segments
+
+
+def _join(segments: list[str]) -> str:
+    return "".join(s if s.endswith("\n") else s + " " for s in segments).strip()
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """
+    Pack whole segments into chunks of at most `max_tokens`; each chunk
+    repeats the trailing segments (up to `overlap_tokens`) of the previous one.
+    """
+    chunks: list[str] = []
+    current: list[tuple[str, int]] = []
+    current_tokens = 0
+    for segment in _segments(text, max_tokens):
+        tokens = estimate_tokens(segment)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(_join([s for s, _ in current]))
+            overlap, overlap_size = [], 0
+            for item in reversed(current):
+                if overlap_size + item[1] > overlap_tokens:
+                    break
+                overlap.insert(0, item)
+                overlap_size += item[1]
+            current, current_tokens = overlap, overlap_size
+            while current and current_tokens + tokens > max_tokens:
+                current_tokens -= current.pop(0)[1]
+        current.append((segment, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(_join([s for s, _ in current]))
+    return chunks
+
+
+def chunk_rows(document_id: int, text: str) -> list[dict]:
+    return [
+        {"document_id": document_id, "position": position, "content": content, "token_count": estimate_tokens(content)}
+        for position, content in enumerate(chunk_text(text))
+    ]
+
+
+async def write_chunks(db: AsyncSession, doc: AIRAGDocument) -> list[AIRAGChunk]:
+    """Replace the chunks of `doc` (which must have an id) and update its content_hash. Does not commit."""
+    await db.execute(delete(AIRAGChunk).where(AIRAGChunk.document_id == doc.id))
+    chunks = [AIRAGChunk(**row) for row in chunk_rows(doc.id, doc.content)]
+    db.add_all(chunks)
+    doc.content_hash = content_hash(doc.content)
+    await db.flush()
+    return chunks
+
+
+async def replace_chunks(db: AsyncSession, contents: Mapping[int, str]) -> int:
+    """
+    write_chunks for many documents (document id -> text) with one DELETE
+    and bulk INSERTs. Returns the number of chunks. Does not commit.
+    """
+    if not contents:
+        return 0
+    await db.execute(delete(AIRAGChunk).where(AIRAGChunk.document_id.in_(list(contents))))
+    # Splitting thousands of articles is CPU work: keep it off the event loop
+    rows = await run_in_threadpool(
+        lambda: [row for document_id, text in contents.items() for row in chunk_rows(document_id, text)]
+    )
+    if rows:
+        await db.execute(insert(AIRAGChunk), rows)
+    return len(rows)
@@ -0,0 +1,482 @@
+"""
+In-memory BM25 inverted index over RAG knowledge base chunks.
+
+Indexed units are the chunks of `ai_rag_chunk` (see rag_chunks.py), each
+carrying its document's title, keywords and category. The index lives in the
+process: it is built at startup, updated incrementally by the admin RAG endpoints, and periodically re-synced
+(documents written by other workers or by `seed_rag.py` show up within
+RAG_INDEX_REFRESH_SECONDS). Search never touches the database.
+
+Text normalization: lowercase, ё → е, stop-word removal and the Snowball
+Russian stemmer, so "заваривать", "заваривание" and "заварить" meet on a
+common stem.
+
+The same sync keeps the dense index of rag_vectors.py in step;
+`hybrid_search` blends both rankings.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_assistant.models.assistant import AIRAGChunk, AIRAGDocument
+from ai_assistant.rag_chunks import write_chunks
+from ai_assistant.rag_vectors import MIN_SIMILARITY, VectorIndex
+
+logger = logging.getLogger("ai_assistant")
+
+
+# ==================== NORMALIZATION ====================
+
+_TOKEN_RE = re.compile(r"[a-zа-я0-9]+")
+
+STOP_WORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+только ее мне было вот от меня еще нет о из ему теперь когда даже ну ли если уже
+или ни быть был него до вас нибудь опять уж вам ведь там потом себя ей может они
+тут где есть надо ней для мы тебя их чем была сам без кто этот того потому этого
+какой какая какие ним здесь этом почти мой тем чтобы нее сейчас были куда зачем всех
+можно при об другой хоть после над больше тот через эти нас про всего них много
+эту моя свою этой перед чуть том такой им более между это как ли же бы
+a an the of to in on for is are and or with how what
+""".split())
+
+_VOWELS = "аеиоуыэюя"
+
+# Suffix groups of the Snowball Russian stemmer. True = must follow "а"/"я".
+_PERFECTIVE_GERUND = [("вшись", True), ("вши", True), ("в", True),
+                      ("ившись", False), ("ывшись", False), ("ивши", False), ("ывши", False), ("ив", False), ("ыв", False)]
+_ADJECTIVE = [(s, False) for s in (
+    "ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой", "ем", "им",
+    "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)]
+_PARTICIPLE = [("ем", True), ("нн", True), ("вш", True), ("ющ", True), ("щ", True),
+               ("ивш", False), ("ывш", False), ("ующ", False)]
+_REFLEXIVE = [("ся", False), ("сь", False)]
+_VERB = [(s, True) for s in (
+    "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно",
+)] + [(s, False) for s in (
+    "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им", "ым", "ен",
+    "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю",
+)]
+_NOUN = [(s, False) for s in (
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой", "ий", "й",
+    "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия",
+    "ья", "я",
+)]
+_SUPERLATIVE = [("ейше", False), ("ейш", False)]
+_DERIVATIONAL = [("ость", False), ("ост", False)]
+
+
+def _by_length(group: list) -> list:
+    return sorted(group, key=lambda item: len(item[0]), reverse=True)
+
+
+for _group in (_PERFECTIVE_GERUND, _ADJECTIVE, _PARTICIPLE, _REFLEXIVE, _VERB, _NOUN, _SUPERLATIVE, _DERIVATIONAL):
+    _group[:] = _by_length(_group)
+
+
+def _regions(word: str) -> tuple[int, int]:
+    """(RV, R2) start offsets as defined by the Snowball Russian stemmer."""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+
+    def after_vowel_consonant(start: int) -> int:
+        for i in range(start + 1, len(word)):
+            if word[i - 1] in _VOWELS and word[i] not in _VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_vowel_consonant(0)
+    return rv, after_vowel_consonant(r1)
+
+
+def _strip(word: str, region: int, group: list) -> Optional[str]:
+    """Remove the longest suffix of `group` lying inside word[region:], or None."""
+    for suffix, needs_a in group:
+        if not word.endswith(suffix):
+            continue
+        cut = len(word) - len(suffix)
+        if cut < region:
+            continue
+        if needs_a and (cut - 1 < region or word[cut - 1] not in "ая"):
+            continue
+        return word[:cut]
+    return None
+
+
+def stem_ru(word: str) -> str:
+    """Snowball Russian stemmer (words without Cyrillic vowels are returned as is)."""
+    rv, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+
+    # Step 1
+    stripped = _strip(word, rv, _PERFECTIVE_GERUND)
+    if stripped is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        stripped = _strip(word, rv, _ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip(stripped, rv, _PARTICIPLE) or stripped
+        else:
+            stripped = _strip(word, rv, _VERB)
+            if stripped is None:
+                stripped = _strip(word, rv, _NOUN)
+    if stripped is not None:
+        word = stripped
+
+    # Step 2
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Step 3
+    word = _strip(word, r2, _DERIVATIONAL) or word
+
+    # Step 4
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        stripped = _strip(word, rv, _SUPERLATIVE)
+        if stripped is not None:
+            word = stripped[:-1] if stripped.endswith("нн") else stripped
+        elif word.endswith("ь") and len(word) - 1 >= rv:
+            word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Normalized index terms of `text`."""
+    words = _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+    return [stem_ru(w) for w in words if len(w) > 1 and w not in STOP_WORDS]
+
+
+# ==================== INDEX ====================
+
+@dataclass(frozen=True)
+class IndexedChunk:
+    """Detached copy of a RAG chunk and its document's fields (safe to use outside a DB session)."""
+    id: int  # Chunk id
+    document_id: int
+    position: int
+    title: str
+    content: str
+    token_count: int
+    category: Optional[str] = None
+    keywords: Optional[str] = None
+
+    @classmethod
+    def from_models(cls, chunk: AIRAGChunk, doc: AIRAGDocument) -> "IndexedChunk":
+        return cls(
+            id=chunk.id, document_id=doc.id, position=chunk.position, title=doc.title, content=chunk.content,
+            token_count=chunk.token_count, category=doc.category, keywords=doc.keywords,
+        )
+
+
+class BM25Index:
+    """
+    Okapi BM25 over title, keywords and content. Title and keyword matches are
+    weighted higher than body matches. "Documents" here are IndexedChunks.
+    """
+
+    TITLE_WEIGHT = 3.0
+    KEYWORDS_WEIGHT = 2.0
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: dict[int, IndexedChunk] = {}
+        # term -> {doc_id: weighted term frequency}
+        self._postings: dict[str, dict[int, float]] = {}
+        self._doc_terms: dict[int, dict[str, float]] = {}
+        self._doc_length: dict[int, float] = {}
+        self._total_length = 0.0
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _weighted_terms(self, doc: IndexedChunk) -> Counter:
+        terms: Counter = Counter()
+        for term in tokenize(doc.title):
+            terms[term] += self.TITLE_WEIGHT
+        for term in tokenize(doc.keywords or ""):
+            terms[term] += self.KEYWORDS_WEIGHT
+        for term in tokenize(doc.content):
+            terms[term] += 1.0
+        return terms
+
+    def add(self, doc: IndexedChunk):
+        """Insert or replace a document."""
+        if doc.id in self.documents:
+            self.remove(doc.id)
+        terms = self._weighted_terms(doc)
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc.id] = tf
+        length = sum(terms.values())
+        self.documents[doc.id] = doc
+        self._doc_terms[doc.id] = dict(terms)
+        self._doc_length[doc.id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: int):
+        if doc_id not in self.documents:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_length.pop(doc_id)
+        del self.documents[doc_id]
+
+    def add_many(self, docs: Iterable[IndexedChunk]):
+        for doc in docs:
+            self.add(doc)
+
+    def remove_many(self, doc_ids: Iterable[int]):
+        for doc_id in doc_ids:
+            self.remove(doc_id)
+
+    def rebuild(self, docs: Iterable[IndexedChunk]):
+        self.documents.clear()
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_length.clear()
+        self._total_length = 0.0
+        for doc in docs:
+            self.add(doc)
+        self.loaded = True
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[float, IndexedChunk]]:
+        """Top `limit` documents by BM25 score (only documents matching at least one term)."""
+        n = len(self.documents)
+        if not n:
+            return []
+        avg_length = self._total_length / n or 1.0
+        scores: dict[int, float] = {}
+        for term in dict.fromkeys(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_length[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, self.documents[doc_id]) for doc_id, score in best]
+
+
+# ==================== HYBRID RANKING ====================
+
+def hybrid_search(
+    bm25: BM25Index,
+    vectors: VectorIndex,
+    query: str,
+    limit: int = 5,
+    vector_weight: float = 0.5,
+    min_similarity: float = MIN_SIMILARITY,
+) -> list[tuple[float, IndexedChunk]]:
+    """
+    Linear blend of BM25 (scaled by the best BM25 score of the query) and
+    cosine similarity. Documents with no keyword match can still rank through
+    similarity alone, but only above `min_similarity`.
+    """
+    pool = limit * 4
+    keyword = bm25.search(query, pool)
+    dense = vectors.search(query, pool, min_score=min_similarity)
+
+    top = keyword[0][0] if keyword else 0.0
+    scores: dict[int, float] = {}
+    documents: dict[int, IndexedChunk] = {}
+    for score, doc in keyword:
+        scores[doc.id] = (1 - vector_weight) * score / top
+        documents[doc.id] = doc
+    for score, doc in dense:
+        scores[doc.id] = scores.get(doc.id, 0.0) + vector_weight * score
+        documents[doc.id] = doc
+
+    best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+    return [(score, documents[doc_id]) for doc_id, score in best]
+
+
+# ==================== DB SYNC ====================
+
+class RAGIndexSync:
+    """
+    Keeps a BM25Index (and any companion indexes with the same add_many/
+    remove_many/rebuild interface) in line with the chunks of active `ai_rag_document` rows.
+
+    A cheap aggregate over documents (count, max id, max updated_at) acts as
+    the table signature; the background loop rebuilds the index only when it
+    changes. Chunks are always rewritten together with their document.
+
+    Incremental updates adopt the new signature only if it is what the
+    synced table plus this write would give (tracked as id -> updated_at of
+    every document). Otherwise another process wrote in the meantime, and the
+    index is marked stale so the next refresh rebuilds it.
+    """
+
+    def __init__(self, index: BM25Index, *companions, refresh_seconds: Optional[float] = None):
+        self.index = index
+        self.indexes = [index, *companions]
+        self.refresh_seconds = refresh_seconds or float(os.environ.get("RAG_INDEX_REFRESH_SECONDS", 60))
+        self._signature: Optional[tuple] = None
+        # document id -> updated_at of every document (active or not) as last synced
+        self._versions: dict[int, Optional[datetime]] = {}
+        # document id -> indexed chunk ids
+        self._chunk_ids: dict[int, list[int]] = {}
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> str:
+        """Identifies the indexed knowledge base; the same in every synced process."""
+        return repr(self._signature)
+
+    @property
+    def stale(self) -> bool:
+        """Loaded, but another process changed the table since (see documents_saved)."""
+        return self.index.loaded and self._signature is None
+
+    @staticmethod
+    def _signature_of(versions: dict) -> tuple:
+        """_table_signature computed from document versions."""
+        if not versions:
+            return 0, None, None
+        return len(versions), max(versions), max((v for v in versions.values() if v is not None), default=None)
+
+    @staticmethod
+    async def _document_versions(db: AsyncSession, *criteria) -> dict[int, Optional[datetime]]:
+        return dict((await db.execute(select(AIRAGDocument.id, AIRAGDocument.updated_at).where(*criteria))).all())
+
+    @staticmethod
+    async def _table_signature(db: AsyncSession) -> tuple:
+        row = (await db.execute(
+            select(func.count(AIRAGDocument.id), func.max(AIRAGDocument.id), func.max(AIRAGDocument.updated_at))
+        )).one()
+        return tuple(row)
+
+    @staticmethod
+    async def _chunks(db: AsyncSession, *criteria) -> list[IndexedChunk]:
+        result = await db.execute(
+            select(AIRAGChunk, AIRAGDocument)
+            .join(AIRAGDocument, AIRAGChunk.document_id == AIRAGDocument.id)
+            .where(AIRAGDocument.is_active == True, *criteria)
+            .order_by(AIRAGChunk.document_id, AIRAGChunk.position)
+        )
+        return [IndexedChunk.from_models(chunk, doc) for chunk, doc in result.all()]
+
+    @staticmethod
+    async def _backfill_chunks(db: AsyncSession):
+        """Chunk documents written before chunking existed (or bypassing write_chunks)."""
+        has_chunks = select(AIRAGChunk.id).where(AIRAGChunk.document_id == AIRAGDocument.id).exists()
+        missing = (await db.execute(select(AIRAGDocument).where(~has_chunks))).scalars().all()
+        if not missing:
+            return
+        for doc in missing:
+            await write_chunks(db, doc)
+        await db.commit()
+        logger.info(f"RAG chunks created for {len(missing)} documents")
+
+    async def load(self, db: AsyncSession):
+        """Rebuild the index from the chunks of all active documents."""
+        await self._backfill_chunks(db)
+        versions = await self._document_versions(db)
+        chunks = await self._chunks(db)
+        for index in self.indexes:
+            index.rebuild(chunks)
+        self._chunk_ids = {}
+        for chunk in chunks:
+            self._chunk_ids.setdefault(chunk.document_id, []).append(chunk.id)
+        self._versions = versions
+        self._signature = self._signature_of(versions)
+        logger.info(f"RAG index built: {len(self._chunk_ids)} documents, {len(chunks)} chunks")
+
+    async def refresh(self, db: AsyncSession) -> bool:
+        """Rebuild if the table changed since the last sync. Returns True if rebuilt."""
+        if self.index.loaded and await self._table_signature(db) == self._signature:
+            return False
+        await self.load(db)
+        return True
+
+    def _forget(self, doc_ids: Iterable[int]):
+        chunk_ids = [chunk_id for doc_id in doc_ids for chunk_id in self._chunk_ids.pop(doc_id, [])]
+        for index in self.indexes:
+            index.remove_many(chunk_ids)
+
+    async def document_saved(self, db: AsyncSession, doc: AIRAGDocument):
+        """Apply a committed create/update (chunks included) to the index without a rebuild."""
+        await self.documents_saved(db, [doc.id])
+
+    async def documents_saved(self, db: AsyncSession, doc_ids: Sequence[int]):
+        """document_saved for many documents, with one chunk query and one batch per index (bulk import)."""
+        self._forget(doc_ids)
+        if doc_ids:
+            chunks = await self._chunks(db, AIRAGChunk.document_id.in_(list(doc_ids)))
+            for index in self.indexes:
+                index.add_many(chunks)
+            for chunk in chunks:
+                self._chunk_ids.setdefault(chunk.document_id, []).append(chunk.id)
+            versions = await self._document_versions(db, AIRAGDocument.id.in_(list(doc_ids)))
+            for doc_id in doc_ids:
+                self._versions.pop(doc_id, None)
+            self._versions.update(versions)
+        await self._adopt_signature(db)
+
+    async def document_deleted(self, db: AsyncSession, doc_id: int):
+        self._forget([doc_id])
+        self._versions.pop(doc_id, None)
+        await self._adopt_signature(db)
+
+    async def _adopt_signature(self, db: AsyncSession):
+        """After an incremental update: keep the table signature, or mark the index stale."""
+        signature = await self._table_signature(db)
+        if self._signature is not None and signature == self._signature_of(self._versions):
+            self._signature = signature
+        else:
+            # Another process wrote too: its change is not in the index
+            self._signature = None
+
+    # ---------- Background refresh ----------
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        from backend.db.session import AsyncSessionLocal
+
+        while self._running:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.refresh(db)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"RAG index refresh error: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+
+rag_index = BM25Index()
+rag_vectors = VectorIndex()
+rag_index_sync = RAGIndexSync(rag_index, rag_vectors)
@@ -0,0 +1,332 @@
+"""
+Bulk import of RAG knowledge base documents.
+
+Sources are read as streams, one document at a time:
+
+- JSONL: one object per line with title, content and optionally category,
+  keywords (string or list), source, is_active;
+- Markdown: one document per file. An optional front matter block
+  (`---` / `key: value` lines / `---`) sets the fields, otherwise the
+  title is the first `# ` heading or the file name.
+
+Documents are matched to existing ones by title and written in batches:
+one lookup, one bulk INSERT/UPDATE and one chunk rewrite per batch.
+Documents whose title, content hash (rag_chunks.content_hash) and fields
+are unchanged are skipped, and so are new documents repeating content that
+is already in the knowledge base or earlier in the import. After each batch
+only the written documents are applied to the index (RAGIndexSync.documents_saved);
+other processes pick the change up from the table signature.
+
+Reading, validation and chunking run in a worker thread (run_in_threadpool),
+so an import through the admin API doesn't hold up the event loop. If a
+file turns out not to be UTF-8 partway through, the batches already
+written stay and the report says where reading stopped.
+
+    python -m ai_assistant.rag_ingest kb.jsonl articles/ [--batch-size 500] [--keep-existing]
+
+POST /api/v1/admin/assistant/rag/import takes the same formats.
+"""
+import argparse
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from ai_assistant.models.assistant import AIRAGDocument
+from ai_assistant.rag_chunks import content_hash, replace_chunks
+from ai_assistant.schemas import RAGDocumentCreate
+
+BATCH_SIZE = 500
+MAX_ERRORS = 20
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+_FRONT_MATTER_RE = re.compile(r"\A---[ \t]*\n(.*?)\n---[ \t]*(?:\n|\Z)", re.S)
+_HEADING_RE = re.compile(r"^#[ \t]+(.+?)[ \t#]*$", re.M)
+
+# (where, fields) pairs; fields is None for a line that couldn't be parsed
+RawDocument = tuple[str, Optional[dict]]
+
+
+@dataclass
+class IngestRecord:
+    title: str
+    content: str
+    category: Optional[str] = None
+    keywords: Optional[str] = None
+    source: Optional[str] = None
+    is_active: bool = True
+    content_hash: str = field(init=False)
+
+    def __post_init__(self):
+        self.content_hash = content_hash(self.content)
+
+    def fields(self) -> tuple:
+        return self.content_hash, self.category, self.keywords, self.source, self.is_active
+
+
+@dataclass
+class IngestReport:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    chunks: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def error(self, message: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+
+# ---------- Readers ----------
+
+def read_jsonl(lines: Iterable[str], name: str = "<jsonl>") -> Iterator[RawDocument]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            data = None
+        yield f"{name}:{number}", data if isinstance(data, dict) else None
+
+
+def read_markdown(text: str, name: str) -> RawDocument:
+    fields: dict = {}
+    front = _FRONT_MATTER_RE.match(text)
+    if front:
+        for line in front.group(1).splitlines():
+            key, sep, value = line.partition(":")
+            if sep:
+                fields[key.strip().lower()] = value.strip().strip("\"'")
+        text = text[front.end():]
+    if "is_active" in fields:
+        fields["is_active"] = fields["is_active"].lower() not in ("false", "0", "no")
+    if not fields.get("title"):
+        heading = _HEADING_RE.search(text)
+        if heading:
+            fields["title"] = heading.group(1)
+            text = text[:heading.start()] + text[heading.end():]
+        else:
+            fields["title"] = Path(name).stem
+    fields["content"] = text.strip()
+    fields.setdefault("source", name)
+    return name, fields
+
+
+def read_path(path: Path) -> Iterator[RawDocument]:
+    """Documents of a JSONL or Markdown file, or of all such files under a directory."""
+    if path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if child.is_file() and child.suffix.lower() in JSONL_SUFFIXES + MARKDOWN_SUFFIXES:
+                yield from read_path(child)
+        return
+    if path.suffix.lower() in JSONL_SUFFIXES:
+        with path.open(encoding="utf-8") as lines:
+            yield from read_jsonl(lines, str(path))
+    elif path.suffix.lower() in MARKDOWN_SUFFIXES:
+        yield read_markdown(path.read_text(encoding="utf-8"), str(path))
+    else:
+        yield str(path), None
+
+
+def to_record(fields: dict) -> IngestRecord:
+    """Validate like POST /rag; raises ValueError."""
+    fields = dict(fields)
+    if isinstance(fields.get("keywords"), list):
+        fields["keywords"] = ", ".join(str(k) for k in fields["keywords"])
+    try:
+        data = RAGDocumentCreate.model_validate(fields)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    return IngestRecord(
+        title=data.title.strip(),
+        content=data.content,
+        category=data.category or None,
+        keywords=data.keywords or None,
+        source=data.source or None,
+        is_active=bool(fields.get("is_active", True)),
+    )
+
+
+# ---------- Writing ----------
+
+async def _write_batch(
+    db: AsyncSession,
+    batch: list[IngestRecord],
+    report: IngestReport,
+    known_hashes: set[str],
+    created_by: Optional[int],
+    update_existing: bool,
+) -> list[int]:
+    """Insert/update one batch and its chunks, commit. Returns the written document ids."""
+    existing = {
+        row.title: row
+        for row in await db.execute(
+            select(
+                AIRAGDocument.id, AIRAGDocument.title, AIRAGDocument.content_hash, AIRAGDocument.category,
+                AIRAGDocument.keywords, AIRAGDocument.source, AIRAGDocument.is_active,
+            ).where(AIRAGDocument.title.in_([r.title for r in batch]))
+        )
+    }
+    known_hashes.update(await db.scalars(
+        select(AIRAGDocument.content_hash).where(AIRAGDocument.content_hash.in_([r.content_hash for r in batch]))
+    ))
+
+    new: list[IngestRecord] = []
+    changed: list[tuple[int, IngestRecord]] = []
+    for record in batch:
+        current = existing.get(record.title)
+        if current is None:
+            if record.content_hash in known_hashes:
+                report.duplicates += 1
+                continue
+            new.append(record)
+        elif not update_existing or (
+            current.content_hash, current.category, current.keywords, current.source, current.is_active
+        ) == record.fields():
+            report.unchanged += 1
+            continue
+        else:
+            changed.append((current.id, record))
+        known_hashes.add(record.content_hash)
+
+    now = datetime.now(timezone.utc)
+    contents: dict[int, str] = {}
+    if new:
+        # Titles are unique within a batch: no need for ordered RETURNING
+        # (row-by-row on some backends)
+        by_title = {r.title: r for r in new}
+        result = await db.execute(
+            insert(AIRAGDocument).returning(AIRAGDocument.id, AIRAGDocument.title),
+            [
+                {
+                    "title": r.title, "content": r.content, "category": r.category, "keywords": r.keywords,
+                    "source": r.source, "is_active": r.is_active, "content_hash": r.content_hash,
+                    "created_by": created_by,
+                }
+                for r in new
+            ],
+        )
+        contents.update((doc_id, by_title[title].content) for doc_id, title in result.all())
+        report.created += len(new)
+    if changed:
+        await db.execute(update(AIRAGDocument), [
+            {
+                "id": doc_id, "content": r.content, "category": r.category, "keywords": r.keywords,
+                "source": r.source, "is_active": r.is_active, "content_hash": r.content_hash, "updated_at": now,
+            }
+            for doc_id, r in changed
+        ])
+        contents.update((doc_id, r.content) for doc_id, r in changed)
+        report.updated += len(changed)
+    report.chunks += await replace_chunks(db, contents)
+    await db.commit()
+    return list(contents)
+
+
+def _read_batch(
+    documents: Iterator[RawDocument], report: IngestReport, titles: set[str], batch_size: int,
+) -> tuple[list[IngestRecord], bool]:
+    """
+    Read and validate up to `batch_size` new records (blocking; runs in a
+    worker thread). Returns the batch and whether the documents are exhausted.
+    """
+    batch: list[IngestRecord] = []
+    try:
+        for where, fields in documents:
+            if fields is None:
+                report.error(f"{where}: not a JSON object or unsupported file")
+                continue
+            try:
+                record = to_record(fields)
+            except ValueError as e:
+                report.error(f"{where}: {e}")
+                continue
+            if record.title in titles:
+                report.duplicates += 1
+                continue
+            titles.add(record.title)
+            batch.append(record)
+            if len(batch) >= batch_size:
+                return batch, False
+    except UnicodeDecodeError:
+        read = len(titles) + report.duplicates + report.invalid
+        if not read:
+            raise  # Nothing to report: the file is not UTF-8 at all
+        report.error(f"Not UTF-8 after {read} documents, the rest of the file was not imported")
+    return batch, True
+
+
+async def ingest(
+    db: AsyncSession,
+    documents: Iterable[RawDocument],
+    *,
+    batch_size: int = BATCH_SIZE,
+    created_by: Optional[int] = None,
+    update_existing: bool = True,
+    index_sync=None,
+) -> IngestReport:
+    """
+    Import documents in batches of `batch_size`. With update_existing=False
+    documents whose title already exists are left as they are. With an
+    `index_sync` (RAGIndexSync) the written documents are applied to its
+    index after each batch.
+    """
+    report = IngestReport()
+    known_hashes: set[str] = set()
+    titles: set[str] = set()
+    documents = iter(documents)
+    while True:
+        batch, done = await run_in_threadpool(_read_batch, documents, report, titles, batch_size)
+        if batch:
+            ids = await _write_batch(db, batch, report, known_hashes, created_by, update_existing)
+            if index_sync is not None and ids:
+                await index_sync.documents_saved(db, ids)
+        if done:
+            return report
+
+
+async def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ai_assistant.rag_ingest", description="Import RAG documents from JSONL/Markdown files.",
+    )
+    parser.add_argument("paths", nargs="+", type=Path, help="Files or directories")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--keep-existing", action="store_true", help="Don't update documents with existing titles")
+    args = parser.parse_args(argv)
+
+    from backend.db.base import Base  # noqa: F401 — registers all models including User
+    from backend.db.session import AsyncSessionLocal
+
+    def documents() -> Iterator[RawDocument]:
+        for path in args.paths:
+            yield from read_path(path)
+
+    started = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        report = await ingest(
+            db, documents(), batch_size=args.batch_size, update_existing=not args.keep_existing,
+        )
+    elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+    print(
+        f"created {report.created}, updated {report.updated}, unchanged {report.unchanged}, "
+        f"duplicates {report.duplicates}, invalid {report.invalid}, {report.chunks} chunks in {elapsed:.1f}s"
+    )
+    for error in report.errors:
+        print(f"  ! {error}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+"""
+Dense retrieval over RAG knowledge base chunks, without a model or network.
+
+Every chunk (title and keywords prepended) becomes a hashed character n-gram
+vector: the 3–5-grams of each word, plus the word itself, are counted into
+RAG_VECTOR_DIM buckets (crc32), damped with log(1 + tf) and L2-normalized. Shared sub-word fragments are enough to match word forms
+and close spellings, like "заварка"/"заваривают" or "кипяток"/"кипяточек", even
+where BM25 stems disagree.
+
+All chunk vectors live in one float32 matrix, so the top-k lookup is a
+single matrix-vector product. The matrix keeps spare rows (grown
+geometrically), so adding a document writes one row instead of copying the
+matrix, and removing one moves the last row into its place. Batches go
+through add_many/remove_many.
+
+If RAG_VECTOR_PATH is set, the matrix is written there as .npy and mapped
+read-only, so workers on one host share the page cache instead of each
+holding a copy. A rebuild writes it; an incremental batch copies it back to
+memory, applies the change and writes it again.
+
+Query terms are weighted by the squared IDF of their buckets; document
+vectors stay plain tf, so adding a document computes only its own row
+instead of re-weighting the whole matrix.
+"""
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-zа-я0-9]+")
+
+NGRAM_SIZES = (3, 4, 5)
+
+# Below this cosine, matches are shared n-grams of unrelated texts
+MIN_SIMILARITY = 0.1
+
+
+def normalize(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower().replace("ё", "е"))
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str, dim: int) -> tuple[int, ...]:
+    padded = f" {word} "
+    grams = [padded]
+    for n in NGRAM_SIZES:
+        grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return tuple(zlib.crc32(gram.encode("utf-8")) % dim for gram in grams)
+
+
+class HashingVectorizer:
+    """Text → L2-normalized float32 vector of hashed character n-gram counts."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def counts(self, text: str) -> np.ndarray:
+        buckets = [b for word in normalize(text) for b in _word_features(word, self.dim)]
+        if not buckets:
+            return np.zeros(self.dim, dtype=np.float32)
+        return np.bincount(np.asarray(buckets, dtype=np.int64), minlength=self.dim).astype(np.float32)
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.log1p(self.counts(text))
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """
+    One matrix row per document. Documents are any objects with id, title,
+    content and keywords attributes (see rag_index.IndexedChunk).
+    """
+
+    def __init__(self, dim: Optional[int] = None, path: Optional[str] = None):
+        self.dim = dim or int(os.environ.get("RAG_VECTOR_DIM", 2048))
+        self.path = path if path is not None else (os.environ.get("RAG_VECTOR_PATH") or None)
+        self.vectorizer = HashingVectorizer(self.dim)
+        self.documents: dict = {}
+        # Rows [0, _size) are in use; the rest is spare capacity
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._rows: dict[int, int] = {}  # document id -> row
+        # Document count per bucket, for query-side IDF
+        self._df = np.zeros(self.dim, dtype=np.float32)
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _embed(self, doc) -> np.ndarray:
+        return self.vectorizer.transform(f"{doc.title} {doc.keywords or ''} {doc.content}")
+
+    def add(self, doc):
+        """Insert or replace a document."""
+        self.add_many([doc])
+
+    def remove(self, doc_id: int):
+        self.remove_many([doc_id])
+
+    def add_many(self, docs: Iterable):
+        """Insert or replace documents, with one embedding batch and at most one matrix copy."""
+        docs = list({doc.id: doc for doc in docs}.values())
+        if not docs:
+            return
+        self._remove_rows([doc.id for doc in docs])
+        rows = np.vstack([self._embed(doc) for doc in docs])
+        self._reserve(len(docs))
+        start, end = self._size, self._size + len(docs)
+        self._matrix[start:end] = rows
+        self._ids[start:end] = [doc.id for doc in docs]
+        for row, doc in enumerate(docs, start):
+            self._rows[doc.id] = row
+            self.documents[doc.id] = doc
+        self._size = end
+        self._df += (rows > 0).sum(axis=0)
+        self._persist_changes()
+
+    def remove_many(self, doc_ids: Iterable[int]):
+        if self._remove_rows(doc_ids):
+            self._persist_changes()
+
+    def _remove_rows(self, doc_ids: Iterable[int]) -> bool:
+        """Remove documents by moving the last row into each freed row."""
+        doc_ids = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id in self.documents]
+        if not doc_ids:
+            return False
+        self._reserve(0)
+        for doc_id in doc_ids:
+            row, last = self._rows.pop(doc_id), self._size - 1
+            self._df -= self._matrix[row] > 0
+            if row != last:
+                moved = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._size = last
+            del self.documents[doc_id]
+        return True
+
+    def _reserve(self, extra: int):
+        """Make the matrix writable (a mapped file is read-only) with room for `extra` more rows."""
+        capacity, needed = len(self._matrix), self._size + extra
+        if needed <= capacity and self._matrix.flags.writeable:
+            return
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity, 64)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def _persist_changes(self):
+        if self.path:
+            self._matrix = self._persist(self._matrix[:self._size])
+
+    def rebuild(self, docs: Iterable):
+        docs = list(docs)
+        matrix = np.vstack([self._embed(doc) for doc in docs]) if docs else np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = np.array([doc.id for doc in docs], dtype=np.int64)
+        self._size = len(docs)
+        self._rows = {doc.id: row for row, doc in enumerate(docs)}
+        self._df = (matrix > 0).sum(axis=0).astype(np.float32)
+        self._matrix = self._persist(matrix) if self.path else matrix
+        self.documents = {doc.id: doc for doc in docs}
+        self.loaded = True
+
+    def _persist(self, matrix: np.ndarray) -> np.ndarray:
+        """Write the matrix to `path` atomically and map it back read-only."""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=matrix.shape)
+        out[:] = matrix
+        out.flush()
+        del out
+        os.replace(tmp, self.path)
+        return np.load(self.path, mmap_mode="r")
+
+    def _query_vector(self, query: str) -> np.ndarray:
+        counts = np.log1p(self.vectorizer.counts(query))
+        idf = np.log((self._size + 1) / (self._df + 1)) + 1
+        vector = counts * idf * idf
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def search(self, query: str, limit: int = 5, min_score: float = MIN_SIMILARITY) -> list[tuple[float, object]]:
+        """Top `limit` documents by cosine similarity, above `min_score`."""
+        if not self._size:
+            return []
+        query_vector = self._query_vector(query)
+        if not query_vector.any():
+            return []
+        scores = self._matrix[:self._size] @ query_vector
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (float(scores[row]), self.documents[int(self._ids[row])])
+            for row in top if scores[row] > min_score
+        ]
@@ -0,0 +1,57 @@
+"""
+Sliding-window limits on chat messages, kept in Redis.
+
+Each user (or guest session) has one sorted set per window, holding the
+timestamps of their recent messages. A single Lua call trims old entries,
+checks every window and records the new message only if all windows allow
+it, so concurrent requests can't both squeeze through under the limit.
+"""
+import time
+import uuid
+from typing import Optional
+
+from backend.core import cache
+
+WINDOWS = (("minute", 60), ("hour", 3600))
+
+# KEYS: one sorted set per window
+# ARGV: now_ms, member, then window_ms and limit for each key
+_SLIDING_WINDOW = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[1 + 2 * i])
+    local limit = tonumber(ARGV[2 + 2 * i])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        return i
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, ARGV[1 + 2 * i])
+end
+return 0
+"""
+
+
+def _key(identity: str, window: str) -> str:
+    # Hash tag keeps all windows of one identity in the same cluster slot
+    return f"ai_assistant:rate:{{{identity}}}:{window}"
+
+
+async def hit(identity: str, limits: dict[str, int]) -> Optional[str]:
+    """
+    Count one message for `identity` (e.g. "user:5") against `limits`
+    ({"minute": 5, "hour": 60}, 0 = no limit). Returns the name of the
+    exceeded window, in which case the message is not counted, or None.
+    """
+    windows = [(name, seconds, limits[name]) for name, seconds in WINDOWS if limits.get(name)]
+    if not windows:
+        return None
+    now_ms = int(time.time() * 1000)
+    args = [now_ms, f"{now_ms}:{uuid.uuid4().hex[:8]}"]
+    for _, seconds, limit in windows:
+        args += [seconds * 1000, limit]
+    keys = [_key(identity, name) for name, _, _ in windows]
+    exceeded = int(await cache.redis_client.eval(_SLIDING_WINDOW, len(keys), *keys, *args))
+    return windows[exceeded - 1][0] if exceeded else None
@@ -3,7 +3,7 @@ Pydantic schemas for AI Assistant API.
 """
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 
@@ -35,6 +35,7 @@ class MessageOut(BaseModel):
     content: str
     tokens_used: Optional[int] = None
     response_time_ms: Optional[int] = None
+    first_token_ms: Optional[int] = None
     was_filtered: bool = False
     created_at: datetime
 
@@ -70,6 +71,7 @@ class ConversationDetail(ConversationOut):
     manager_name: Optional[str] = None
     manager_avatar_url: Optional[str] = None
     total_tokens_used: int = 0
+    summary: Optional[str] = None
 
 
 class ConversationListItem(BaseModel):
@@ -82,6 +84,7 @@ class ConversationListItem(BaseModel):
     title: Optional[str] = None
     message_count: int = 0
     last_message: Optional[str] = None
+    last_message_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -143,6 +146,16 @@ class RAGDocumentOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class RAGImportResult(BaseModel):
+    created: int
+    updated: int
+    unchanged: int
+    duplicates: int
+    invalid: int
+    chunks: int
+    errors: list[str] = []
+
+
 # ---------- Admin: Banned Phrases ----------
 
 class BannedPhraseCreate(BaseModel):
@@ -190,6 +203,21 @@ class AssistantStats(BaseModel):
     messages_today: int = 0
     escalations_today: int = 0
     unique_users: int = 0
+    new_users_today: int = 0
+    answer_cache_hits: int = 0
+    answer_cache_misses: int = 0
+    answer_cache_hit_rate: Optional[float] = None
+
+
+class AssistantDailyStats(BaseModel):
+    day: date
+    conversations: int = 0
+    messages: int = 0
+    filtered_messages: int = 0
+    tokens_used: int = 0
+    avg_response_time_ms: Optional[float] = None
+    escalations: int = 0
+    new_users: int = 0
 
 
 # ---------- Admin: Manager ----------
@@ -5,8 +5,7 @@ Run: python -m ai_assistant.seed_rag
 import asyncio
 from backend.db.session import AsyncSessionLocal
 from backend.db.base import Base  # noqa: F401 — registers all models including User
-from ai_assistant.models.assistant import AIRAGDocument
-from sqlalchemy import select
+from ai_assistant.rag_ingest import ingest
 
 
 RAG_DOCUMENTS = [
@@ -220,20 +219,14 @@ RAG_DOCUMENTS = [
 
 
 async def seed_rag():
-    """Seed RAG knowledge base with default documents."""
+    """Seed RAG knowledge base with default documents (existing titles are kept)."""
     async with AsyncSessionLocal() as db:
-        for doc_data in RAG_DOCUMENTS:
-            exists = await db.scalar(
-                select(AIRAGDocument.id).where(AIRAGDocument.title == doc_data["title"])
-            )
-            if not exists:
-                doc = AIRAGDocument(**doc_data)
-                db.add(doc)
-                print(f"  + {doc_data['title']}")
-            else:
-                print(f"  = {doc_data['title']} (exists)")
-        
-        await db.commit()
+        report = await ingest(
+            db,
+            ((f"seed:{i}", doc_data) for i, doc_data in enumerate(RAG_DOCUMENTS, 1)),
+            update_existing=False,
+        )
+        print(f"  + {report.created} added, = {report.unchanged + report.duplicates} exist")
         print("RAG seed complete!")
 
 
@@ -6,22 +6,34 @@ import json
 import logging
 import re
 import asyncio
-from typing import Optional, List, Tuple
+import hashlib
+import weakref
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update, and_, or_, desc
-from datetime import datetime, timezone, timedelta
+from sqlalchemy import select, func, update, and_, or_, desc, literal_column
+from datetime import date, datetime, timezone, timedelta
 
 from ai_assistant.models.assistant import (
     AIAssistantSettings,
     AIConversation,
     AIMessage,
-    AIRAGDocument,
-    AIBannedPhrase,
     AIConversationStatus,
     AIMessageRole,
     AITelegramLink,
 )
-from ai_assistant.schemas import AssistantStats
+from ai_assistant import (
+    answer_cache, conversation_events, conversation_lock, conversation_preview, conversation_summary, message_archive,
+    rate_limit, stats_rollup,
+)
+from ai_assistant.phrase_filter import OutputStreamFilter, banned_phrase_cache
+from ai_assistant.schemas import AssistantDailyStats, AssistantStats
+from ai_assistant.settings_cache import SettingsCache, SettingsSnapshot
+from ai_assistant.telegram_outbox import telegram_outbox
+from ai_assistant.rag_chunks import estimate_tokens
+from ai_assistant.rag_index import IndexedChunk, hybrid_search, rag_index, rag_index_sync, rag_vectors
+from backend.core.metrics import track_provider
+from backend.core import cache
 
 import httpx
 
@@ -34,6 +46,7 @@ DEFAULT_SETTINGS = {
     # General
     "assistant_enabled": {"value": "true", "type": "bool", "group": "general", "desc": "Включить/выключить AI ассистента"},
     "assistant_name": {"value": "Чайный помощник", "type": "string", "group": "general", "desc": "Имя ассистента"},
+    "message_archive_days": {"value": "180", "type": "int", "group": "general", "desc": "Через сколько дней после закрытия сообщения диалога переносятся в архив (0 = не архивировать)"},
     
     # Model
     "openai_base_url": {
@@ -48,6 +61,13 @@ DEFAULT_SETTINGS = {
     "temperature": {"value": "0.7", "type": "float", "group": "model", "desc": "Температура генерации (0.0-2.0)"},
     "max_tokens": {"value": "1024", "type": "int", "group": "model", "desc": "Максимальная длина ответа в токенах"},
     "context_messages_limit": {"value": "20", "type": "int", "group": "model", "desc": "Количество предыдущих сообщений для контекста"},
+    "history_tokens": {"value": "1500", "type": "int", "group": "model", "desc": "Бюджет токенов на историю диалога в промте (старые сообщения сворачиваются в краткое содержание)"},
+    "rag_search_mode": {"value": "hybrid", "type": "string", "group": "model", "desc": "Поиск по базе знаний: bm25 (ключевые слова), vector (сходство) или hybrid"},
+    "rag_vector_weight": {"value": "0.5", "type": "float", "group": "model", "desc": "Вес векторного сходства в режиме hybrid (0.0-1.0)"},
+    "rag_context_tokens": {"value": "1200", "type": "int", "group": "model", "desc": "Бюджет токенов на фрагменты базы знаний в промте"},
+    "answer_cache_enabled": {"value": "true", "type": "bool", "group": "model", "desc": "Кешировать ответы на первый вопрос диалога"},
+    "answer_cache_ttl_seconds": {"value": "86400", "type": "int", "group": "model", "desc": "Время жизни кешированного ответа (сек)"},
+    "answer_cache_similarity": {"value": "0", "type": "float", "group": "model", "desc": "Порог сходства для почти одинаковых вопросов (0 = только точное совпадение, например 0.9)"},
     
     # System prompt
     "system_prompt": {
@@ -112,31 +132,42 @@ DEFAULT_SETTINGS = {
     # Telegram notifications
     "telegram_enabled": {"value": "false", "type": "bool", "group": "telegram", "desc": "Включить Telegram уведомления"},
     "telegram_bot_token": {"value": "", "type": "string", "group": "telegram", "desc": "Токен бота (получить у @BotFather)"},
+    "telegram_webhook_url": {
+        "value": "", "type": "string", "group": "telegram",
+        "desc": "Публичный URL вебхука бота (https://<домен>/api/v1/telegram/webhook). Пусто — long polling (для локальной разработки)"
+    },
 }
 
 
 # ==================== SETTINGS SERVICE ====================
 
+settings_cache = SettingsCache(DEFAULT_SETTINGS)
+
+
 class SettingsService:
-    """Manage AI assistant settings."""
+    """
+    Manage AI assistant settings.
+    Reads come from the per-process snapshot (see ai_assistant/settings_cache.py).
+    """
 
     @staticmethod
     async def ensure_defaults(db: AsyncSession):
         """Create default settings if they don't exist."""
-        for key, data in DEFAULT_SETTINGS.items():
-            exists = await db.scalar(
-                select(AIAssistantSettings.id).where(AIAssistantSettings.key == key)
+        existing = set((await db.execute(select(AIAssistantSettings.key))).scalars().all())
+        missing = [key for key in DEFAULT_SETTINGS if key not in existing]
+        for key in missing:
+            data = DEFAULT_SETTINGS[key]
+            setting = AIAssistantSettings(
+                key=key,
+                value=data["value"],
+                value_type=data["type"],
+                group=data["group"],
+                description=data["desc"],
             )
-            if not exists:
-                setting = AIAssistantSettings(
-                    key=key,
-                    value=data["value"],
-                    value_type=data["type"],
-                    group=data["group"],
-                    description=data["desc"],
-                )
-                db.add(setting)
+            db.add(setting)
         await db.commit()
+        if missing:
+            await settings_cache.bump()
 
     @staticmethod
     async def get_all(db: AsyncSession) -> list[AIAssistantSettings]:
@@ -154,44 +185,21 @@ class SettingsService:
         )
         return list(result.scalars().all())
 
+    @staticmethod
+    async def snapshot(db: AsyncSession) -> SettingsSnapshot:
+        return await settings_cache.get_snapshot(db)
+
     @staticmethod
     async def get(db: AsyncSession, key: str) -> Optional[str]:
-        setting = await db.scalar(
-            select(AIAssistantSettings.value).where(AIAssistantSettings.key == key)
-        )
-        if setting is None:
-            default = DEFAULT_SETTINGS.get(key)
-            return default["value"] if default else None
-        return setting
+        return (await settings_cache.get_snapshot(db)).get(key)
 
     @staticmethod
     async def get_typed(db: AsyncSession, key: str):
         """Get setting with type conversion."""
-        raw = await SettingsService.get(db, key)
-        if raw is None:
-            return None
-        default = DEFAULT_SETTINGS.get(key, {})
-        vtype = default.get("type", "string")
-        
-        # Get actual value_type from DB if exists
-        db_type = await db.scalar(
-            select(AIAssistantSettings.value_type).where(AIAssistantSettings.key == key)
-        )
-        if db_type:
-            vtype = db_type
-        
-        if vtype == "bool":
-            return raw.lower() in ("true", "1", "yes")
-        elif vtype == "int":
-            return int(raw)
-        elif vtype == "float":
-            return float(raw)
-        elif vtype == "json":
-            return json.loads(raw)
-        return raw
+        return (await settings_cache.get_snapshot(db)).get_typed(key)
 
     @staticmethod
-    async def set(db: AsyncSession, key: str, value: str):
+    async def _apply(db: AsyncSession, key: str, value: str):
         existing = await db.scalar(
             select(AIAssistantSettings).where(AIAssistantSettings.key == key)
         )
@@ -207,28 +215,28 @@ class SettingsService:
                 group=default.get("group", "general"),
                 description=default.get("desc"),
             ))
+
+    @staticmethod
+    async def set(db: AsyncSession, key: str, value: str):
+        await SettingsService._apply(db, key, value)
         await db.commit()
+        await settings_cache.bump()
 
     @staticmethod
     async def set_bulk(db: AsyncSession, settings_dict: dict[str, str]):
         for key, value in settings_dict.items():
-            await SettingsService.set(db, key, value)
+            await SettingsService._apply(db, key, value)
+        await db.commit()
+        await settings_cache.bump()
 
 
 # ==================== CONTENT FILTER ====================
 
 class ContentFilter:
-    """Filter banned words/phrases from user input and AI output."""
-
-    @staticmethod
-    async def get_banned_phrases(db: AsyncSession, for_input: bool = True) -> list[AIBannedPhrase]:
-        q = select(AIBannedPhrase).where(AIBannedPhrase.is_active == True)
-        if for_input:
-            q = q.where(AIBannedPhrase.apply_to_input == True)
-        else:
-            q = q.where(AIBannedPhrase.apply_to_output == True)
-        result = await db.execute(q)
-        return list(result.scalars().all())
+    """
+    Filter banned words/phrases from user input and AI output.
+    Phrases are compiled and cached per process (see ai_assistant/phrase_filter.py).
+    """
 
     @staticmethod
     async def check_input(db: AsyncSession, text: str) -> Tuple[bool, str]:
@@ -236,18 +244,7 @@ class ContentFilter:
         Check user input against banned phrases.
         Returns (is_blocked, filtered_text).
         """
-        phrases = await ContentFilter.get_banned_phrases(db, for_input=True)
-        lowered = text.lower()
-        
-        for phrase in phrases:
-            if phrase.phrase.lower() in lowered:
-                if phrase.action == "block":
-                    return True, text
-                elif phrase.action == "replace":
-                    pattern = re.compile(re.escape(phrase.phrase), re.IGNORECASE)
-                    text = pattern.sub(phrase.replacement or "***", text)
-        
-        return False, text
+        return (await banned_phrase_cache.get(db)).check_input(text)
 
     @staticmethod
     async def filter_output(db: AsyncSession, text: str) -> Tuple[bool, str, Optional[str]]:
@@ -255,17 +252,12 @@ class ContentFilter:
         Filter AI output.
         Returns (was_filtered, filtered_text, original_text_if_filtered).
         """
-        phrases = await ContentFilter.get_banned_phrases(db, for_input=False)
-        original = text
-        was_filtered = False
-        
-        for phrase in phrases:
-            if phrase.phrase.lower() in text.lower():
-                was_filtered = True
-                pattern = re.compile(re.escape(phrase.phrase), re.IGNORECASE)
-                text = pattern.sub(phrase.replacement or "***", text)
-        
-        return was_filtered, text, (original if was_filtered else None)
+        return (await banned_phrase_cache.get(db)).filter_output(text)
+
+    @staticmethod
+    async def output_stream(db: AsyncSession) -> OutputStreamFilter:
+        """filter_output for a reply that arrives in pieces."""
+        return (await banned_phrase_cache.get(db)).output_stream()
 
 
 # ==================== RAG SERVICE ====================
@@ -274,41 +266,64 @@ class RAGService:
     """Retrieve relevant knowledge base documents for context."""
 
     @staticmethod
-    async def search(db: AsyncSession, query: str, limit: int = 5) -> list[AIRAGDocument]:
-        """Simple keyword-based search in RAG documents."""
-        query_lower = query.lower()
-        words = query_lower.split()
-        
-        # Get all active documents
-        result = await db.execute(
-            select(AIRAGDocument).where(AIRAGDocument.is_active == True)
-        )
-        docs = list(result.scalars().all())
-        
-        # Score documents by keyword overlap
-        scored = []
-        for doc in docs:
-            score = 0
-            searchable = f"{doc.title} {doc.content} {doc.keywords or ''}".lower()
-            for word in words:
-                if len(word) > 2 and word in searchable:
-                    score += 1
-            if score > 0:
-                scored.append((score, doc))
-        
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [doc for _, doc in scored[:limit]]
+    async def search(db: AsyncSession, query: str, limit: int = 10) -> list[IndexedChunk]:
+        """
+        Best-first chunk search over the in-memory indexes (see ai_assistant/rag_index.py and
+        rag_vectors.py); the mode comes from the rag_search_mode setting.
+        The DB is only used to build the indexes if startup hasn't done it yet,
+        or to rebuild them after a write of another worker left them stale.
+        """
+        if not rag_index.loaded or rag_index_sync.stale:
+            await rag_index_sync.load(db)
+        mode = await SettingsService.get(db, "rag_search_mode") or "hybrid"
+        if mode == "bm25":
+            results = rag_index.search(query, limit)
+        elif mode == "vector":
+            results = rag_vectors.search(query, limit)
+        else:
+            weight = await SettingsService.get_typed(db, "rag_vector_weight")
+            results = hybrid_search(rag_index, rag_vectors, query, limit, 0.5 if weight is None else weight)
+        return [doc for _, doc in results]
+
+    @staticmethod
+    async def context_version(db: AsyncSession) -> str:
+        """Changes whenever the indexed knowledge base changes (see RAGIndexSync.version)."""
+        if not rag_index.loaded or rag_index_sync.stale:
+            await rag_index_sync.load(db)
+        return rag_index_sync.version
+
+    @staticmethod
+    def select_chunks(chunks: list[IndexedChunk], token_budget: int) -> list[IndexedChunk]:
+        """Take chunks in ranking order until the next one would exceed the budget."""
+        selected = []
+        seen_documents = set()
+        used = 0
+        for chunk in chunks:
+            cost = chunk.token_count
+            if chunk.document_id not in seen_documents:
+                cost += estimate_tokens(f"### {chunk.title}\n")
+            if used + cost > token_budget:
+                break
+            selected.append(chunk)
+            seen_documents.add(chunk.document_id)
+            used += cost
+        return selected
 
     @staticmethod
-    def format_context(docs: list[AIRAGDocument]) -> str:
-        """Format RAG documents as context for the prompt."""
-        if not docs:
+    def format_context(chunks: list[IndexedChunk]) -> str:
+        """Format RAG chunks as context for the prompt, grouped by document."""
+        if not chunks:
             return ""
         
+        by_document: dict[int, list[IndexedChunk]] = {}
+        for chunk in chunks:
+            by_document.setdefault(chunk.document_id, []).append(chunk)
+
         parts = ["Используй следующую информацию из базы знаний для ответа:\n"]
-        for doc in docs:
-            parts.append(f"### {doc.title}")
-            parts.append(doc.content)
+        for document_chunks in by_document.values():
+            parts.append(f"### {document_chunks[0].title}")
+            for chunk in sorted(document_chunks, key=lambda c: c.position):
+                parts.append(chunk.content)
             parts.append("")
         
         return "\n".join(parts)
@@ -346,19 +361,108 @@ class OpenAIClient:
             "max_tokens": max_tokens,
         }
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        with track_provider("openai", "chat_completion") as call:
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                response = await client.post(url, json=payload, headers=headers)
+                call.status(response.status_code)
+                response.raise_for_status()
+                data = response.json()
         
         content = data["choices"][0]["message"]["content"]
         tokens = data.get("usage", {}).get("total_tokens", 0)
         
         return content, tokens
 
+    @staticmethod
+    async def chat_completion_stream(
+        messages: list[dict],
+        base_url: str,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+    ) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        """
+        Streaming chat completion (`stream: true`, server-sent events).
+        Yields (text_delta, None) per chunk and finally ("", total_tokens)
+        if the API reports usage.
+        """
+        url = f"{base_url.rstrip('/')}/chat/completions"
+
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        }
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+
+        with track_provider("openai", "chat_completion_stream") as call:
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                async with client.stream("POST", url, json=payload, headers=headers) as response:
+                    call.status(response.status_code)
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        for choice in chunk.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                yield delta, None
+                        if chunk.get("usage"):
+                            yield "", chunk["usage"].get("total_tokens", 0)
+
 
 # ==================== CHAT SERVICE ====================
 
+def conversation_search_text():
+    """Searched text of a conversation; the trigram index is on this expression."""
+    # Literals, not bound parameters: the query has to match the index expression
+    return (
+        func.coalesce(AIConversation.title, literal_column("''"))
+        .op("||")(literal_column("' '"))
+        .op("||")(func.coalesce(AIConversation.session_id, literal_column("''")))
+    )
+
+
+OPENAI_ERROR_REPLY = "Извините, произошла ошибка при обработке запроса. Попробуйте позже или обратитесь к менеджеру."
+
+
+@dataclass
+class ChatTurn:
+    """A user message waiting for the model's reply."""
+    conversation: AIConversation
+    user_message: AIMessage
+    messages: list[dict]
+    base_url: str
+    api_key: str
+    model: str
+    temperature: float
+    max_tokens: int
+    system_prompt: Optional[str]
+    context_limit: int
+    rag_budget: int
+    history_budget: int
+    # Set for cacheable questions (see answer_cache.py)
+    cache_key: Optional[answer_cache.AnswerKey] = None
+    cached_answer: Optional[str] = None
+    # Last user message included in `messages` (see conversation_lock.py)
+    answers_up_to: int = 0
+    # History was cut to the budget (see conversation_summary.py)
+    needs_summary: bool = False
+
+
 class ChatService:
     """Main chat service orchestrating conversations."""
 
@@ -373,7 +477,8 @@ class ChatService:
         session_id: Optional[str] = None,
     ) -> Tuple[bool, str]:
         """
-        Check if rate limit exceeded for a user/session.
+        Check if rate limit exceeded for a user/session, and count the
+        message if it isn't (sliding windows in Redis, see rate_limit.py).
         Returns (is_exceeded, message).
         """
         per_minute = await SettingsService.get_typed(db, "rate_limit_per_minute") or 0
@@ -382,60 +487,66 @@ class ChatService:
         if not per_minute and not per_hour:
             return False, ""
 
+        if user_id:
+            identity = f"user:{user_id}"
+        elif session_id:
+            identity = f"session:{session_id}"
+        else:
+            return False, ""
+
+        try:
+            exceeded = await rate_limit.hit(identity, {"minute": per_minute, "hour": per_hour})
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, counting messages in DB: {e}")
+            exceeded = await ChatService._exceeded_in_db(db, user_id, session_id, per_minute, per_hour)
+
+        if not exceeded:
+            return False, ""
+
+        logger.info(f"Rate limit (per {exceeded}) hit: user_id={user_id}, session={session_id}")
+        limit_msg = await SettingsService.get(db, "rate_limit_message") or "Слишком много сообщений. Подождите."
+        return True, limit_msg
+
+    @staticmethod
+    async def _exceeded_in_db(
+        db: AsyncSession,
+        user_id: Optional[int],
+        session_id: Optional[str],
+        per_minute: int,
+        per_hour: int,
+    ) -> Optional[str]:
+        """Fallback for check_rate_limit: count the user's stored messages."""
         now = datetime.now(timezone.utc)
 
         # Build subquery for user's conversations
         if user_id:
             conv_ids_subq = select(AIConversation.id).where(AIConversation.user_id == user_id)
-        elif session_id:
-            conv_ids_subq = select(AIConversation.id).where(AIConversation.session_id == session_id)
         else:
-            return False, ""
+            conv_ids_subq = select(AIConversation.id).where(AIConversation.session_id == session_id)
 
         base_filter = [
             AIMessage.role == AIMessageRole.USER,
             AIMessage.conversation_id.in_(conv_ids_subq),
         ]
 
-        limit_msg = await SettingsService.get(db, "rate_limit_message") or "Слишком много сообщений. Подождите."
-
-        if per_minute:
-            since_minute = now - timedelta(minutes=1)
-            count = await db.scalar(
-                select(func.count(AIMessage.id)).where(
-                    *base_filter,
-                    AIMessage.created_at >= since_minute,
-                )
-            )
-            if count and count >= per_minute:
-                logger.info(f"Rate limit (per minute) hit: user_id={user_id}, session={session_id}, count={count}/{per_minute}")
-                return True, limit_msg
-
-        if per_hour:
-            since_hour = now - timedelta(hours=1)
+        for window, limit, span in (("minute", per_minute, timedelta(minutes=1)), ("hour", per_hour, timedelta(hours=1))):
+            if not limit:
+                continue
             count = await db.scalar(
                 select(func.count(AIMessage.id)).where(
                     *base_filter,
-                    AIMessage.created_at >= since_hour,
+                    AIMessage.created_at >= now - span,
                 )
             )
-            if count and count >= per_hour:
-                logger.info(f"Rate limit (per hour) hit: user_id={user_id}, session={session_id}, count={count}/{per_hour}")
-                return True, limit_msg
-
-        return False, ""
+            if count and count >= limit:
+                return window
+        return None
 
     @staticmethod
     async def check_manager_keywords(db: AsyncSession, text: str) -> bool:
-        """Check if user message contains manager-request keywords."""
-        keywords = await SettingsService.get_typed(db, "manager_keywords")
-        if not keywords:
-            return False
-        text_lower = text.lower()
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                return True
-        return False
+        """Check if user message contains manager-request keywords (matcher compiled per settings version)."""
+        snapshot = await SettingsService.snapshot(db)
+        return snapshot.manager_keywords.search(text) is not None
 
     @staticmethod
     async def get_or_create_conversation(
@@ -460,16 +571,17 @@ class ChatService:
         return conv
 
     @staticmethod
-    async def send_message(
+    async def _prepare_turn(
         db: AsyncSession,
         conversation_id: int,
         content: str,
-        user_id: Optional[int] = None,
-        session_id: Optional[str] = None,
-    ) -> Tuple[AIMessage, Optional[AIMessage]]:
+    ) -> Tuple[AIMessage, Optional[AIMessage], Optional["ChatTurn"]]:
         """
-        Process user message and generate AI response.
-        Returns (user_message, ai_response_or_none).
+        Everything in a turn up to the LLM call.
+        Returns (user_message, reply, None) when the turn is already answered
+        and committed (manager mode, blocked input, manager keywords), or
+        (user_message, None, turn) with the user message committed when the
+        model has to answer (turn.messages is filled by _build_messages).
         """
         conv = await db.get(AIConversation, conversation_id)
         if not conv:
@@ -484,11 +596,11 @@ class ChatService:
                 content=content,
             )
             db.add(user_msg)
-            conv.message_count += 1
             conv.updated_at = datetime.now(timezone.utc)
+            await ChatService._count(db, conv, 1)
             await db.commit()
             await db.refresh(user_msg)
-            return user_msg, None
+            return user_msg, None, None
         
         # Content filtering
         is_blocked, filtered_content = await ContentFilter.check_input(db, content)
@@ -508,12 +620,16 @@ class ChatService:
                 content="Извините, ваше сообщение содержит недопустимые слова. Пожалуйста, перефразируйте вопрос.",
             )
             db.add(system_msg)
-            conv.message_count += 2
             conv.updated_at = datetime.now(timezone.utc)
+            await ChatService._count(db, conv, 2)
             await db.commit()
             await db.refresh(user_msg)
             await db.refresh(system_msg)
-            return user_msg, system_msg
+            return user_msg, system_msg, None
+        
+        # Manager keywords are checked in memory before anything is written:
+        # an escalated message goes straight to the manager, no RAG or LLM
+        escalate = await ChatService.check_manager_keywords(db, content)
         
         # Save user message
         user_msg = AIMessage(
@@ -524,10 +640,8 @@ class ChatService:
             original_content=(content if filtered_content != content else None),
         )
         db.add(user_msg)
-        await db.flush()
         
-        # Check for manager keywords
-        if await ChatService.check_manager_keywords(db, content):
+        if escalate:
             conv.status = AIConversationStatus.MANAGER_REQUESTED
             
             system_msg = AIMessage(
@@ -536,17 +650,27 @@ class ChatService:
                 content="Понял, сейчас свяжу вас с менеджером. Пожалуйста, подождите немного, менеджер скоро ответит. ☕",
             )
             db.add(system_msg)
-            conv.message_count += 2
             conv.updated_at = datetime.now(timezone.utc)
             
             # Set title if first message
             if not conv.title:
                 conv.title = content[:100]
             
+            await ChatService._count(db, conv, 2)
             await db.commit()
             await db.refresh(user_msg)
             await db.refresh(system_msg)
-            return user_msg, system_msg
+            return user_msg, system_msg, None
+        
+        first_question = conv.message_count == 0
+        conv.updated_at = datetime.now(timezone.utc)
+        if not conv.title:
+            conv.title = content[:100]
+        await ChatService._count(db, conv, 1)
+        # Committed right away: a turn generating for this conversation in
+        # another request may pick the message up (see conversation_lock.py)
+        await db.commit()
+        await db.refresh(user_msg)
         
         # Get settings
         base_url = await SettingsService.get(db, "openai_base_url")
@@ -555,87 +679,408 @@ class ChatService:
         temperature = await SettingsService.get_typed(db, "temperature") or 0.7
         max_tokens = await SettingsService.get_typed(db, "max_tokens") or 1024
         context_limit = await SettingsService.get_typed(db, "context_messages_limit") or 20
+        rag_budget = await SettingsService.get_typed(db, "rag_context_tokens") or 1200
+        history_budget = await SettingsService.get_typed(db, "history_tokens") or 1500
         system_prompt = await SettingsService.get(db, "system_prompt")
         
-        # Build messages for API
-        api_messages = []
+        turn = ChatTurn(
+            conversation=conv,
+            user_message=user_msg,
+            messages=[],
+            base_url=base_url,
+            api_key=api_key,
+            model=model or "gpt-4o-mini",
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_prompt=system_prompt,
+            context_limit=context_limit,
+            rag_budget=rag_budget,
+            history_budget=history_budget,
+        )
         
-        # System prompt
-        if system_prompt:
-            api_messages.append({"role": "system", "content": system_prompt})
+        # Answer cache: only questions that don't depend on earlier dialogue
+        if first_question and await SettingsService.get_typed(db, "answer_cache_enabled"):
+            turn.cache_key = await answer_cache.make_key(
+                filtered_content,
+                config={
+                    "model": turn.model,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    "system_prompt": system_prompt,
+                    "rag_context_tokens": rag_budget,
+                    "rag_search_mode": await SettingsService.get(db, "rag_search_mode"),
+                    "rag_vector_weight": await SettingsService.get(db, "rag_vector_weight"),
+                },
+                rag_version=await RAGService.context_version(db),
+                ttl=await SettingsService.get_typed(db, "answer_cache_ttl_seconds") or 86400,
+                similarity=await SettingsService.get_typed(db, "answer_cache_similarity") or 0.0,
+            )
+            if turn.cache_key:
+                turn.cached_answer = await answer_cache.lookup(turn.cache_key)
+                if turn.cached_answer is not None:
+                    logger.info(f"Answer cache hit for '{content[:60]}'")
         
-        # RAG context
-        rag_docs = await RAGService.search(db, content)
-        rag_context = RAGService.format_context(rag_docs)
-        if rag_context:
-            api_messages.append({"role": "system", "content": rag_context})
-            logger.info(f"RAG: found {len(rag_docs)} docs for query '{content[:60]}': {[d.title for d in rag_docs]}")
-        else:
-            logger.info(f"RAG: no relevant docs found for query '{content[:60]}'")
+        return user_msg, None, turn
+
+    @staticmethod
+    async def _build_messages(db: AsyncSession, turn: "ChatTurn"):
+        """
+        Fill turn.messages from the conversation as stored now. Every user
+        message that no earlier turn has answered is answered by this one:
+        they go last, after the replies to earlier messages, and are all
+        used as the RAG query. Older messages beyond the history budget are
+        replaced by the conversation summary (see conversation_summary.py).
+        """
+        conv = turn.conversation
         
-        # Conversation history
+        # Conversation history not covered by the summary
         history_result = await db.execute(
             select(AIMessage)
             .where(
-                AIMessage.conversation_id == conversation_id,
+                *message_archive.message_filter(db, conv),
                 AIMessage.role.in_([AIMessageRole.USER, AIMessageRole.ASSISTANT]),
+                AIMessage.id > (conv.summary_until_id or 0),
             )
             .order_by(AIMessage.created_at.desc())
-            .limit(context_limit)
+            .limit(turn.context_limit)
         )
         history = list(reversed(list(history_result.scalars().all())))
+        turn.needs_summary = len(history) >= turn.context_limit
         
-        for msg in history:
-            role = "user" if msg.role == AIMessageRole.USER else "assistant"
-            api_messages.append({"role": role, "content": msg.content})
+        answered = await conversation_lock.answered_up_to(conv.id)
+        if answered:
+            # Messages sent while the previous turn was generating are older
+            # than its reply
+            pending = [m for m in history if m.role == AIMessageRole.USER and m.id > answered]
+            history = [m for m in history if m not in pending] + pending
+        else:
+            pending = []
+            for msg in reversed(history):
+                if msg.role != AIMessageRole.USER:
+                    break
+                pending.insert(0, msg)
+        query = "\n".join(m.content for m in pending) or turn.user_message.content
+        turn.answers_up_to = max((m.id for m in pending), default=turn.user_message.id)
         
-        # Generate AI response
-        start_time = time.time()
-        try:
-            response_text, tokens_used = await OpenAIClient.chat_completion(
-                messages=api_messages,
-                base_url=base_url,
-                api_key=api_key,
-                model=model or "gpt-4o-mini",
-                temperature=temperature,
-                max_tokens=max_tokens,
+        left_out, history = conversation_summary.fit(history, turn.history_budget, keep_last=max(len(pending), 1))
+        if left_out:
+            turn.needs_summary = True
+            logger.info(
+                f"History: {len(history)} messages within {turn.history_budget} tokens, "
+                f"{len(left_out)} left for the summary"
             )
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            response_text = "Извините, произошла ошибка при обработке запроса. Попробуйте позже или обратитесь к менеджеру."
-            tokens_used = 0
         
-        response_time = int((time.time() - start_time) * 1000)
+        # Build messages for API
+        api_messages = []
+        
+        # System prompt
+        if turn.system_prompt:
+            api_messages.append({"role": "system", "content": turn.system_prompt})
         
-        # Filter output
-        was_filtered, filtered_response, original_response = await ContentFilter.filter_output(db, response_text)
+        # RAG context
+        rag_chunks = RAGService.select_chunks(await RAGService.search(db, query), turn.rag_budget)
+        rag_context = RAGService.format_context(rag_chunks)
+        if rag_context:
+            api_messages.append({"role": "system", "content": rag_context})
+            logger.info(
+                f"RAG: {len(rag_chunks)} chunks, ~{sum(c.token_count for c in rag_chunks)} tokens "
+                f"for query '{query[:60]}': {list(dict.fromkeys(c.title for c in rag_chunks))}"
+            )
+        else:
+            logger.info(f"RAG: no relevant docs found for query '{query[:60]}'")
         
-        # Save AI response
+        if conv.summary:
+            api_messages.append(conversation_summary.prompt_message(conv))
+        
+        for msg in history:
+            role = "user" if msg.role == AIMessageRole.USER else "assistant"
+            api_messages.append({"role": role, "content": msg.content})
+        
+        turn.messages = api_messages
+
+    @staticmethod
+    def _schedule_summary(turn: "ChatTurn"):
+        conversation_summary.schedule(
+            turn.conversation.id,
+            turn.history_budget,
+            turn.context_limit,
+            conversation_summary.SummaryModel(base_url=turn.base_url, api_key=turn.api_key, model=turn.model),
+        )
+
+    @staticmethod
+    async def _answered_by_earlier_turn(db: AsyncSession, turn: "ChatTurn") -> Optional[AIMessage]:
+        """
+        The reply of a turn that ran while this one waited for the lock and
+        already covered this user message, if any.
+        """
+        reply_id = await conversation_lock.reply_for(turn.conversation.id, turn.user_message.id)
+        return await db.get(AIMessage, reply_id) if reply_id else None
+
+    @staticmethod
+    async def _count(db: AsyncSession, conv: AIConversation, messages: int, tokens: int = 0):
+        """
+        Add to the conversation's counters in SQL, so requests writing to the
+        same conversation concurrently don't overwrite each other's counts.
+        """
+        await db.execute(
+            update(AIConversation)
+            .where(AIConversation.id == conv.id)
+            .values(
+                message_count=AIConversation.message_count + messages,
+                total_tokens_used=AIConversation.total_tokens_used + tokens,
+            )
+        )
+
+    @staticmethod
+    async def _claim_submission(
+        db: AsyncSession,
+        conversation_id: int,
+        content: str,
+    ) -> Tuple[conversation_lock.Submission, Optional[Tuple[AIMessage, Optional[AIMessage]]]]:
+        """
+        (submission, None) if this request has to process `content`, or
+        (submission, (user_message, reply)) saved by an identical request that
+        was already in progress.
+        """
+        submission = conversation_lock.Submission(conversation_id, content)
+        while not await submission.claim():
+            result = await submission.wait()
+            if result is not None:
+                user_id, reply_id = result
+                user_msg = await db.get(AIMessage, user_id)
+                reply = await db.get(AIMessage, reply_id) if reply_id else None
+                if user_msg is not None:
+                    logger.info(f"Conversation {conversation_id}: resubmitted message attached to #{user_id}")
+                    return submission, (user_msg, reply)
+            # The original request failed: process the message here
+        return submission, None
+
+    @staticmethod
+    async def _add_reply(
+        db: AsyncSession,
+        turn: "ChatTurn",
+        content: str,
+        tokens_used: int,
+        response_time_ms: int,
+        was_filtered: bool,
+        original_content: Optional[str],
+        first_token_ms: Optional[int] = None,
+    ) -> AIMessage:
         ai_msg = AIMessage(
-            conversation_id=conversation_id,
+            conversation_id=turn.conversation.id,
             role=AIMessageRole.ASSISTANT,
-            content=filtered_response,
+            content=content,
             tokens_used=tokens_used,
-            response_time_ms=response_time,
-            model_used=model,
+            response_time_ms=response_time_ms,
+            first_token_ms=first_token_ms,
+            model_used=turn.model,
             was_filtered=was_filtered,
-            original_content=original_response,
+            original_content=original_content,
         )
         db.add(ai_msg)
         
-        # Update conversation
-        conv.message_count += 2
-        conv.total_tokens_used += tokens_used
+        conv = turn.conversation
         conv.updated_at = datetime.now(timezone.utc)
-        if not conv.title:
-            conv.title = content[:100]
+        await ChatService._count(db, conv, 1, tokens_used)
+        return ai_msg
+
+    @staticmethod
+    async def send_message(
+        db: AsyncSession,
+        conversation_id: int,
+        content: str,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None,
+    ) -> Tuple[AIMessage, Optional[AIMessage]]:
+        """
+        Process user message and generate AI response.
+        Returns (user_message, ai_response_or_none).
+        """
+        submission, submitted = await ChatService._claim_submission(db, conversation_id, content)
+        if submitted is not None:
+            return submitted
+        try:
+            user_msg, ai_msg = await ChatService._send_message(db, conversation_id, content)
+        except BaseException:
+            await submission.abandon()
+            raise
+        await submission.complete(user_msg.id, ai_msg.id if ai_msg else None)
+        return user_msg, ai_msg
+
+    @staticmethod
+    async def _send_message(
+        db: AsyncSession,
+        conversation_id: int,
+        content: str,
+    ) -> Tuple[AIMessage, Optional[AIMessage]]:
+        user_msg, reply, turn = await ChatService._prepare_turn(db, conversation_id, content)
+        if turn is None:
+            return user_msg, reply
         
-        await db.commit()
-        await db.refresh(user_msg)
-        await db.refresh(ai_msg)
+        async with conversation_lock.generation_lock(conversation_id):
+            earlier = await ChatService._answered_by_earlier_turn(db, turn)
+            if earlier is not None:
+                return user_msg, earlier
+            
+            # Generate AI response
+            start_time = time.time()
+            try:
+                if turn.cached_answer is not None:
+                    response_text, tokens_used = turn.cached_answer, 0
+                else:
+                    await ChatService._build_messages(db, turn)
+                    response_text, tokens_used = await OpenAIClient.chat_completion(
+                        messages=turn.messages,
+                        base_url=turn.base_url,
+                        api_key=turn.api_key,
+                        model=turn.model,
+                        temperature=turn.temperature,
+                        max_tokens=turn.max_tokens,
+                    )
+                    if turn.cache_key:
+                        await answer_cache.store(turn.cache_key, response_text)
+            except Exception as e:
+                logger.error(f"OpenAI API error: {e}")
+                response_text = OPENAI_ERROR_REPLY
+                tokens_used = 0
+            
+            response_time = int((time.time() - start_time) * 1000)
+            
+            # Filter output
+            was_filtered, filtered_response, original_response = await ContentFilter.filter_output(db, response_text)
+            
+            ai_msg = await ChatService._add_reply(
+                db, turn, filtered_response, tokens_used, response_time, was_filtered, original_response,
+            )
+            
+            await db.commit()
+            await db.refresh(ai_msg)
+            await conversation_lock.record_turn(conversation_id, turn.answers_up_to or user_msg.id, ai_msg.id)
+        if turn.needs_summary:
+            ChatService._schedule_summary(turn)
         
         return user_msg, ai_msg
 
+    @staticmethod
+    async def _cached_stream(answer: str) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        yield answer, 0
+
+    @staticmethod
+    async def stream_message(
+        db: AsyncSession,
+        conversation_id: int,
+        content: str,
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Streaming variant of send_message. Yields (event, data):
+        ("message", user_message) once the user message is committed,
+        ("delta", text) for each piece of the reply that passed the output
+        filter, and finally ("done", ai_response_or_none). The reply is saved
+        when the model stream ends. A reply that already exists (identical
+        resubmission, message answered by a turn that was in progress) comes
+        as a single delta.
+        """
+        submission, submitted = await ChatService._claim_submission(db, conversation_id, content)
+        if submitted is not None:
+            user_msg, reply = submitted
+            yield "message", user_msg
+            if reply is not None:
+                yield "delta", reply.content
+            yield "done", reply
+            return
+        events = ChatService._stream_message(db, conversation_id, content)
+        user_msg = reply = None
+        try:
+            async for event, data in events:
+                if event == "message":
+                    user_msg = data
+                elif event == "done":
+                    reply = data
+                yield event, data
+        except BaseException:
+            await submission.abandon()
+            raise
+        finally:
+            # Releases the generation lock right away if the client went away
+            await events.aclose()
+        await submission.complete(user_msg.id, reply.id if reply else None)
+
+    @staticmethod
+    async def _stream_message(
+        db: AsyncSession,
+        conversation_id: int,
+        content: str,
+    ) -> AsyncIterator[Tuple[str, object]]:
+        user_msg, reply, turn = await ChatService._prepare_turn(db, conversation_id, content)
+        yield "message", user_msg
+        if turn is None:
+            if reply is not None:
+                yield "delta", reply.content
+            yield "done", reply
+            return
+        
+        async with conversation_lock.generation_lock(conversation_id):
+            earlier = await ChatService._answered_by_earlier_turn(db, turn)
+            if earlier is not None:
+                yield "delta", earlier.content
+                yield "done", earlier
+                return
+            
+            output = await ContentFilter.output_stream(db)
+            tokens_used = 0
+            first_token_ms = None
+            start_time = time.time()
+            if turn.cached_answer is not None:
+                replies = ChatService._cached_stream(turn.cached_answer)
+            else:
+                await ChatService._build_messages(db, turn)
+                replies = OpenAIClient.chat_completion_stream(
+                    messages=turn.messages,
+                    base_url=turn.base_url,
+                    api_key=turn.api_key,
+                    model=turn.model,
+                    temperature=turn.temperature,
+                    max_tokens=turn.max_tokens,
+                )
+            failed = False
+            try:
+                async for delta, tokens in replies:
+                    if tokens is not None:
+                        tokens_used = tokens
+                    if not delta:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = int((time.time() - start_time) * 1000)
+                    text = output.feed(delta)
+                    if text:
+                        yield "delta", text
+            except Exception as e:
+                logger.error(f"OpenAI API streaming error: {e}")
+                failed = True
+                if not output.original:
+                    text = output.feed(OPENAI_ERROR_REPLY)
+                    if text:
+                        yield "delta", text
+            
+            text = output.finish()
+            if text:
+                yield "delta", text
+            response_time = int((time.time() - start_time) * 1000)
+            if turn.cache_key and turn.cached_answer is None and not failed:
+                await answer_cache.store(turn.cache_key, output.original)
+            
+            ai_msg = await ChatService._add_reply(
+                db, turn, output.filtered, tokens_used, response_time,
+                output.was_filtered, output.original if output.was_filtered else None,
+                first_token_ms=first_token_ms,
+            )
+            await db.commit()
+            await db.refresh(ai_msg)
+            await conversation_lock.record_turn(conversation_id, turn.answers_up_to or user_msg.id, ai_msg.id)
+        if turn.needs_summary:
+            ChatService._schedule_summary(turn)
+        yield "done", ai_msg
+
     @staticmethod
     async def get_conversations(
         db: AsyncSession,
@@ -646,10 +1091,12 @@ class ChatService:
         date_to: Optional[datetime] = None,
         skip: int = 0,
         limit: int = 50,
-    ) -> Tuple[list[AIConversation], int]:
-        """Get conversations list with filtering."""
-        q = select(AIConversation)
-        count_q = select(func.count(AIConversation.id))
+    ) -> Tuple[list[Tuple[AIConversation, Optional[str], Optional[str]]], int]:
+        """
+        Get conversations list with filtering: (conversation, user email,
+        user username) rows and the total count, in two queries.
+        """
+        from backend.models.user import User as UserModel
         
         filters = []
         if status:
@@ -665,20 +1112,24 @@ class ChatService:
         if date_to:
             filters.append(AIConversation.created_at <= date_to)
         if search:
-            # Search in title, session_id, and linked user name/email
-            from backend.models.user import User as UserModel
-            user_ids_subq = select(UserModel.id).where(
-                or_(
-                    UserModel.username.ilike(f"%{search}%"),
-                    UserModel.email.ilike(f"%{search}%"),
-                )
+            # Search in title, session_id, and linked user name/email. All
+            # ilike patterns are served by pg_trgm indexes; users go through a
+            # semi-join so the OR below is over indexed columns only and no
+            # matching user is dropped.
+            pattern = f"%{search}%"
+            matching_users = select(UserModel.id).where(
+                or_(UserModel.username.ilike(pattern), UserModel.email.ilike(pattern))
             )
             filters.append(or_(
-                AIConversation.title.ilike(f"%{search}%"),
-                AIConversation.session_id.ilike(f"%{search}%"),
-                AIConversation.user_id.in_(user_ids_subq),
+                conversation_search_text().ilike(pattern),
+                AIConversation.user_id.in_(matching_users),
             ))
         
+        count_q = select(func.count(AIConversation.id))
+        q = (
+            select(AIConversation, UserModel.email, UserModel.username)
+            .outerjoin(UserModel, UserModel.id == AIConversation.user_id)
+        )
         if filters:
             q = q.where(and_(*filters))
             count_q = count_q.where(and_(*filters))
@@ -688,99 +1139,62 @@ class ChatService:
         result = await db.execute(
             q.order_by(desc(AIConversation.updated_at)).offset(skip).limit(limit)
         )
-        conversations = list(result.scalars().all())
+        rows = [tuple(row) for row in result.all()]
         
-        return conversations, total
+        return rows, total
 
     @staticmethod
     async def get_stats(db: AsyncSession) -> AssistantStats:
-        """Get assistant usage statistics."""
-        now = datetime.now(timezone.utc)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        total_convs = await db.scalar(select(func.count(AIConversation.id))) or 0
-        active_convs = await db.scalar(
-            select(func.count(AIConversation.id))
-            .where(AIConversation.status == AIConversationStatus.ACTIVE)
-        ) or 0
-        
-        # Total escalations: conversations that ever had manager involvement
-        manager_escalations = await db.scalar(
-            select(func.count(AIConversation.id))
-            .where(or_(
-                AIConversation.manager_id.isnot(None),
-                AIConversation.status.in_([
-                    AIConversationStatus.MANAGER_REQUESTED,
-                    AIConversationStatus.MANAGER_CONNECTED,
-                ]),
-            ))
-        ) or 0
-        
-        closed_convs = await db.scalar(
-            select(func.count(AIConversation.id))
-            .where(AIConversation.status == AIConversationStatus.CLOSED)
-        ) or 0
-        
-        total_messages = await db.scalar(select(func.count(AIMessage.id))) or 0
+        """
+        Get assistant usage statistics from the daily rollups (stats_rollup.py):
+        two aggregate reads however many messages there are.
+        """
+        today = datetime.now(timezone.utc).date()
+        total = await stats_rollup.totals(db)
+        day = await stats_rollup.totals(db, today, today)
         
-        filtered_messages = await db.scalar(
-            select(func.count(AIMessage.id))
-            .where(AIMessage.was_filtered == True)
-        ) or 0
+        cache_hits, cache_misses = await answer_cache.counters()
+        cache_lookups = cache_hits + cache_misses
         
-        avg_response = await db.scalar(
-            select(func.avg(AIMessage.response_time_ms))
-            .where(AIMessage.response_time_ms.isnot(None))
+        return AssistantStats(
+            total_conversations=total["conversations"],
+            active_conversations=total["status_active"],
+            manager_escalations=total["escalations"],
+            closed_conversations=total["status_closed"],
+            total_messages=total["messages"],
+            filtered_messages=total["filtered_messages"],
+            avg_response_time_ms=(
+                round(total["response_time_ms"] / total["responses"], 1) if total["responses"] else None
+            ),
+            total_tokens_used=total["tokens_used"],
+            conversations_today=day["conversations"],
+            messages_today=day["messages"],
+            escalations_today=day["escalations"],
+            unique_users=total["new_users"],  # Each user is counted once, on their first conversation
+            new_users_today=day["new_users"],
+            answer_cache_hits=cache_hits,
+            answer_cache_misses=cache_misses,
+            answer_cache_hit_rate=round(cache_hits / cache_lookups, 3) if cache_lookups else None,
         )
-        
-        total_tokens = await db.scalar(
-            select(func.sum(AIConversation.total_tokens_used))
-        ) or 0
-        
-        convs_today = await db.scalar(
-            select(func.count(AIConversation.id))
-            .where(AIConversation.created_at >= today_start)
-        ) or 0
-        
-        msgs_today = await db.scalar(
-            select(func.count(AIMessage.id))
-            .where(AIMessage.created_at >= today_start)
-        ) or 0
-        
-        # Escalations today
-        escalations_today = await db.scalar(
-            select(func.count(AIConversation.id))
-            .where(
-                AIConversation.updated_at >= today_start,
-                or_(
-                    AIConversation.manager_id.isnot(None),
-                    AIConversation.status.in_([
-                        AIConversationStatus.MANAGER_REQUESTED,
-                        AIConversationStatus.MANAGER_CONNECTED,
-                    ]),
+
+    @staticmethod
+    async def get_daily_stats(db: AsyncSession, date_from: date, date_to: date) -> list[AssistantDailyStats]:
+        """Per-day statistics for a date range (UTC days)."""
+        return [
+            AssistantDailyStats(
+                day=row["day"],
+                conversations=row["conversations"],
+                messages=row["messages"],
+                filtered_messages=row["filtered_messages"],
+                tokens_used=row["tokens_used"],
+                avg_response_time_ms=(
+                    round(row["response_time_ms"] / row["responses"], 1) if row["responses"] else None
                 ),
+                escalations=row["escalations"],
+                new_users=row["new_users"],
             )
-        ) or 0
-        
-        unique_users = await db.scalar(
-            select(func.count(func.distinct(AIConversation.user_id)))
-            .where(AIConversation.user_id.isnot(None))
-        ) or 0
-        
-        return AssistantStats(
-            total_conversations=total_convs,
-            active_conversations=active_convs,
-            manager_escalations=manager_escalations,
-            closed_conversations=closed_convs,
-            total_messages=total_messages,
-            filtered_messages=filtered_messages,
-            avg_response_time_ms=round(avg_response, 1) if avg_response else None,
-            total_tokens_used=total_tokens,
-            conversations_today=convs_today,
-            messages_today=msgs_today,
-            escalations_today=escalations_today,
-            unique_users=unique_users,
-        )
+            for row in await stats_rollup.daily(db, date_from, date_to)
+        ]
 
 
 # ==================== TELEGRAM SERVICE ====================
@@ -807,7 +1221,9 @@ class TelegramService:
             payload["reply_markup"] = json.dumps(reply_markup)
         try:
             async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(url, json=payload)
+                with track_provider("telegram", "sendMessage") as call:
+                    response = await client.post(url, json=payload)
+                    call.status(response.status_code)
                 if response.status_code == 200:
                     data = response.json()
                     msg_id = data.get("result", {}).get("message_id")
@@ -835,18 +1251,37 @@ class TelegramService:
         result = await db.execute(q)
         return list(result.scalars().all())
 
+    @staticmethod
+    async def _notifications_enabled(db: AsyncSession) -> bool:
+        snapshot = await SettingsService.snapshot(db)
+        return bool(snapshot.get_typed("telegram_enabled") and snapshot.get("telegram_bot_token"))
+
+    # Notifications are queued and sent by the dispatcher (see telegram_outbox.py)
+
     @staticmethod
     async def notify_new_conversation(db: AsyncSession, conv_id: int, user_name: str, first_message: str):
         """Notify all subscribed admins about a new conversation."""
-        enabled = await SettingsService.get_typed(db, "telegram_enabled")
-        if not enabled:
-            return
-        bot_token = await SettingsService.get(db, "telegram_bot_token")
-        if not bot_token:
-            return
+        if await TelegramService._notifications_enabled(db):
+            await telegram_outbox.enqueue("new_conversation", conv_id, user_name, first_message)
+
+    @staticmethod
+    async def notify_manager_request(db: AsyncSession, conv_id: int, user_name: str, message: str):
+        """Notify all subscribed admins about a manager escalation request, including full history."""
+        if await TelegramService._notifications_enabled(db):
+            await telegram_outbox.enqueue("manager_request", conv_id, user_name, message)
+
+    @staticmethod
+    async def notify_new_message(db: AsyncSession, conv_id: int, user_name: str, message: str):
+        """Notify subscribed admins about a new user message (bursts are sent as one digest)."""
+        if await TelegramService._notifications_enabled(db):
+            await telegram_outbox.enqueue_message(conv_id, user_name, message)
+
+    @staticmethod
+    async def new_conversation_messages(
+        db: AsyncSession, conv_id: int, user_name: str, first_message: str,
+    ) -> list[tuple[str, str]]:
+        """(chat_id, text) to send about a new conversation."""
         links = await TelegramService._get_active_links(db, "new_conversation")
-        if not links:
-            return
 
         text = (
             f"🆕 <b>Новый диалог #{conv_id}</b>\n"
@@ -854,21 +1289,16 @@ class TelegramService:
             f"💬 {_escape_html(first_message[:200])}\n\n"
             f"<i>Ответьте на это сообщение, чтобы написать клиенту.</i>"
         )
-        for link in links:
-            await TelegramService._send_message(bot_token, link.telegram_chat_id, text)
+        return [(link.telegram_chat_id, text) for link in links]
 
     @staticmethod
-    async def notify_manager_request(db: AsyncSession, conv_id: int, user_name: str, message: str):
-        """Notify all subscribed admins about a manager escalation request, including full history."""
-        enabled = await SettingsService.get_typed(db, "telegram_enabled")
-        if not enabled:
-            return
-        bot_token = await SettingsService.get(db, "telegram_bot_token")
-        if not bot_token:
-            return
+    async def manager_request_messages(
+        db: AsyncSession, conv_id: int, user_name: str, message: str,
+    ) -> list[tuple[str, str]]:
+        """(chat_id, text) to send about a manager escalation request."""
         links = await TelegramService._get_active_links(db, "manager_request")
         if not links:
-            return
+            return []
 
         # Main alert (used as the reply target for manager responses)
         alert_text = (
@@ -906,20 +1336,28 @@ class TelegramService:
 
         history_text = "\n".join(history_lines) if len(history_msgs) > 0 else None
 
+        sends = []
         for link in links:
-            await TelegramService._send_message(bot_token, link.telegram_chat_id, alert_text)
+            sends.append((link.telegram_chat_id, alert_text))
             if history_text:
-                await TelegramService._send_message(bot_token, link.telegram_chat_id, history_text)
+                sends.append((link.telegram_chat_id, history_text))
+        return sends
 
     @staticmethod
-    async def notify_new_message(db: AsyncSession, conv_id: int, user_name: str, message: str):
-        """Notify subscribed admins about a new user message."""
-        enabled = await SettingsService.get_typed(db, "telegram_enabled")
-        if not enabled:
-            return
-        bot_token = await SettingsService.get(db, "telegram_bot_token")
-        if not bot_token:
-            return
+    async def new_message_messages(
+        db: AsyncSession, conv_id: int, user_name: str, messages: list[str],
+    ) -> list[tuple[str, str]]:
+        """(chat_id, text) to send about new user messages of one conversation."""
+        if len(messages) == 1:
+            header = f"💬 <b>Сообщение в диалоге #{conv_id}</b>"
+        else:
+            header = f"💬 <b>Сообщения в диалоге #{conv_id} ({len(messages)})</b>"
+        text = (
+            f"{header}\n"
+            f"👤 {_escape_html(user_name)}\n"
+            + "".join(f"📝 {_escape_html(m[:300])}\n" for m in messages)
+            + f"\n<i>Ответьте на это сообщение, чтобы ответить клиенту.</i>"
+        )
 
         # Check if conversation has an assigned manager — if so, only notify that manager
         conv = await db.get(AIConversation, conv_id)
@@ -931,28 +1369,11 @@ class TelegramService:
                 )
             )
             if manager_link:
-                text = (
-                    f"💬 <b>Сообщение в диалоге #{conv_id}</b>\n"
-                    f"👤 {_escape_html(user_name)}\n"
-                    f"📝 {_escape_html(message[:300])}\n\n"
-                    f"<i>Ответьте на это сообщение, чтобы ответить клиенту.</i>"
-                )
-                await TelegramService._send_message(bot_token, manager_link.telegram_chat_id, text)
-                return
+                return [(manager_link.telegram_chat_id, text)]
 
         # No assigned manager — notify all subscribers
         links = await TelegramService._get_active_links(db, "new_message")
-        if not links:
-            return
-
-        text = (
-            f"💬 <b>Сообщение в диалоге #{conv_id}</b>\n"
-            f"👤 {_escape_html(user_name)}\n"
-            f"📝 {_escape_html(message[:300])}\n\n"
-            f"<i>Ответьте на это сообщение, чтобы ответить клиенту.</i>"
-        )
-        for link in links:
-            await TelegramService._send_message(bot_token, link.telegram_chat_id, text)
+        return [(link.telegram_chat_id, text) for link in links]
 
     @staticmethod
     async def notify_manager_reply_to_user(db: AsyncSession, conv_id: int, user_name: str, reply_text: str):
@@ -995,16 +1416,16 @@ class TelegramService:
         return False, "Не удалось отправить. Проверьте chat_id."
 
 
-# ==================== TELEGRAM BOT POLLER ====================
+# ==================== TELEGRAM BOT ====================
 
 def _escape_html(text: str) -> str:
     """Escape HTML special characters for Telegram."""
     return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
 
-class TelegramBotPoller:
+class TelegramBot:
     """
-    Long-polling Telegram bot that processes incoming messages.
+    Telegram bot that processes incoming messages.
     Supports commands for managing conversations directly from Telegram:
     - Reply to notification → forward as manager message
     - /chats → list active conversations with action hints
@@ -1012,26 +1433,51 @@ class TelegramBotPoller:
     - /ai<N> → switch conversation to AI mode
     - /close<N> → close conversation
     - /help → full command reference
+
+    Updates come through the webhook (POST /api/v1/telegram/webhook) when
+    telegram_webhook_url is set, or by long polling otherwise (local
+    development). Only one process, the leader, registers the webhook or
+    polls: it holds the Redis lock LEADER_KEY. Webhook calls may reach any
+    process. Updates are handled concurrently, in order within a chat, and
+    each update_id only once.
     """
 
     # Pattern: /cmd or /cmd_N or /cmdN  (e.g. /h42, /h_42, /close_42, /close42)
     _CMD_RE = re.compile(r"^/([a-z]+)[_]?(\d+)?$", re.IGNORECASE)
 
+    LEADER_KEY = "ai_assistant:telegram:leader"
+    LEADER_SECONDS = 60
+    POLL_TIMEOUT = 25
+    IDLE_SECONDS = 10
+    MAX_CONCURRENT_UPDATES = 8
+
     def __init__(self):
         self._running = False
         self._offset = 0
         self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._leader = None  # Redis lock, while this process is the leader
+        self._webhook: Optional[tuple[str, str]] = None  # (bot_token, url) registered, url "" if deleted
+        self._chat_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_UPDATES)
+        self._updates: set[asyncio.Task] = set()
+
+    @staticmethod
+    def webhook_secret(bot_token: str) -> str:
+        """secret_token for setWebhook; Telegram sends it back in X-Telegram-Bot-Api-Secret-Token."""
+        return hashlib.sha256(f"webhook:{bot_token}".encode()).hexdigest()
 
     async def start(self):
-        """Start the polling loop as a background task."""
+        """Start the leader loop (webhook registration or polling) as a background task."""
         if self._running:
             return
         self._running = True
-        self._task = asyncio.create_task(self._poll_loop())
-        logger.info("[TG BOT] Polling started")
+        self._client = httpx.AsyncClient(timeout=self.POLL_TIMEOUT + 15)
+        self._task = asyncio.create_task(self._run())
+        logger.info("[TG BOT] Started")
 
     async def stop(self):
-        """Stop the polling loop."""
+        """Stop the loop, finish the updates in progress and give up leadership."""
         self._running = False
         if self._task:
             self._task.cancel()
@@ -1039,49 +1485,110 @@ class TelegramBotPoller:
                 await self._task
             except asyncio.CancelledError:
                 pass
-        logger.info("[TG BOT] Polling stopped")
+            self._task = None
+        if self._updates:
+            await asyncio.wait(list(self._updates), timeout=10)
+        if self._leader is not None:
+            try:
+                await self._leader.release()
+            except Exception:
+                pass
+            self._leader = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+        logger.info("[TG BOT] Stopped")
+
+    async def _lead(self) -> bool:
+        """Become or stay the leader. True while this process is the leader."""
+        try:
+            if self._leader is not None:
+                await self._leader.reacquire()
+                return True
+            lock = cache.redis_client.lock(self.LEADER_KEY, timeout=self.LEADER_SECONDS)
+            if await lock.acquire(blocking=False):
+                self._leader = lock
+                self._webhook = None
+                logger.info("[TG BOT] This process is the leader")
+                return True
+        except Exception as e:
+            if self._leader is not None:
+                logger.warning(f"[TG BOT] Leadership lost: {e}")
+            self._leader = None
+        return False
 
-    async def _poll_loop(self):
-        """Main polling loop."""
+    async def _settings(self) -> tuple[Optional[str], str]:
+        """(bot_token or None if the bot is off, webhook_url) from the settings snapshot."""
+        from backend.db.session import AsyncSessionLocal
+
+        # The snapshot is cached in the process: no query unless it was invalidated
+        async with AsyncSessionLocal() as db:
+            snapshot = await SettingsService.snapshot(db)
+        if not snapshot.get_typed("telegram_enabled"):
+            return None, ""
+        return snapshot.get("telegram_bot_token") or None, snapshot.get("telegram_webhook_url") or ""
+
+    async def _run(self):
+        """Leader loop."""
         while self._running:
             try:
-                await self._poll_once()
+                if not await self._lead():
+                    await asyncio.sleep(self.IDLE_SECONDS)
+                    continue
+                bot_token, webhook_url = await self._settings()
+                if not bot_token:
+                    await asyncio.sleep(self.IDLE_SECONDS)
+                    continue
+                await self._set_webhook(bot_token, webhook_url)
+                if webhook_url:
+                    await asyncio.sleep(self.IDLE_SECONDS)
+                else:
+                    await self._poll_once(bot_token)
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"[TG BOT] Poll error: {e}")
+                logger.error(f"[TG BOT] Error: {e}")
                 await asyncio.sleep(5)
 
-    async def _poll_once(self):
-        """One iteration of polling."""
-        from backend.db.session import AsyncSessionLocal as async_session_factory
-        
-        # Get bot token from DB
-        async with async_session_factory() as db:
-            enabled = await SettingsService.get_typed(db, "telegram_enabled")
-            if not enabled:
-                await asyncio.sleep(10)
-                return
-            bot_token = await SettingsService.get(db, "telegram_bot_token")
-            if not bot_token:
-                await asyncio.sleep(10)
-                return
+    async def _set_webhook(self, bot_token: str, url: str):
+        """Register the webhook, or delete it for polling, once per change."""
+        if self._webhook == (bot_token, url):
+            return
+        if url:
+            method = "setWebhook"
+            payload = {
+                "url": url,
+                "secret_token": self.webhook_secret(bot_token),
+                "allowed_updates": ["message"],
+            }
+        else:
+            method = "deleteWebhook"
+            payload = {}
+        with track_provider("telegram", method) as call:
+            response = await self._client.post(f"https://api.telegram.org/bot{bot_token}/{method}", json=payload)
+            call.status(response.status_code)
+        if response.status_code != 200:
+            logger.warning(f"[TG BOT] {method} failed: {response.status_code} {response.text}")
+            await asyncio.sleep(self.IDLE_SECONDS)
+            return
+        self._webhook = (bot_token, url)
+        logger.info(f"[TG BOT] {'Webhook set to ' + url if url else 'Webhook removed, polling'}")
 
-        # Long poll for updates
+    async def _poll_once(self, bot_token: str):
+        """One long poll for updates."""
         url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
         params = {
             "offset": self._offset,
-            "timeout": 30,
+            "timeout": self.POLL_TIMEOUT,
             "allowed_updates": json.dumps(["message"]),
         }
         try:
-            async with httpx.AsyncClient(timeout=40.0) as client:
-                response = await client.get(url, params=params)
-                if response.status_code != 200:
-                    logger.warning(f"[TG BOT] getUpdates failed: {response.status_code}")
-                    await asyncio.sleep(5)
-                    return
-                data = response.json()
+            response = await self._client.get(url, params=params)
+            if response.status_code != 200:
+                logger.warning(f"[TG BOT] getUpdates failed: {response.status_code}")
+                await asyncio.sleep(5)
+                return
+            data = response.json()
         except httpx.ReadTimeout:
             return  # Normal for long polling
         except Exception as e:
@@ -1089,13 +1596,56 @@ class TelegramBotPoller:
             await asyncio.sleep(5)
             return
 
-        updates = data.get("result", [])
-        if not updates:
-            return
-
-        for update in updates:
+        for update in data.get("result", []):
             self._offset = update["update_id"] + 1
-            await self._handle_update(update, bot_token)
+            await self.dispatch(update, bot_token)
+
+    async def dispatch(self, update: dict, bot_token: str):
+        """
+        Start handling an update in the background, unless it was already received.
+
+        The update_id key is claimed before handling so a redelivery while the
+        update is in flight is dropped; it is released again if handling fails,
+        so Telegram's next delivery is handled.
+        """
+        update_id = update.get("update_id")
+        try:
+            if update_id is not None and not await cache.redis_client.set(
+                self._update_key(update_id), "1", ex=86400, nx=True,
+            ):
+                return
+        except Exception as e:
+            logger.warning(f"[TG BOT] Update dedup unavailable: {e}")
+        task = asyncio.create_task(self._handle_in_order(update, bot_token))
+        self._updates.add(task)
+        task.add_done_callback(self._updates.discard)
+
+    async def _handle_in_order(self, update: dict, bot_token: str):
+        chat_id = str((update.get("message") or {}).get("chat", {}).get("id", ""))
+        # Held by this task, so the lock stays in the dictionary while in use
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        try:
+            async with lock, self._semaphore:
+                await self._handle_update(update, bot_token)
+        except asyncio.CancelledError:
+            await self._forget_update(update.get("update_id"))
+            raise
+        except Exception as e:
+            logger.error(f"[TG BOT] Error handling update {update.get('update_id')}: {e}")
+            await self._forget_update(update.get("update_id"))
+
+    @staticmethod
+    def _update_key(update_id: int) -> str:
+        return f"ai_assistant:telegram:update:{update_id}"
+
+    async def _forget_update(self, update_id: Optional[int]):
+        """Release the dedup key of an update that was not handled."""
+        if update_id is None:
+            return
+        try:
+            await cache.redis_client.delete(self._update_key(update_id))
+        except Exception as e:
+            logger.warning(f"[TG BOT] Could not release update {update_id}: {e}")
 
     # ---------- UPDATE ROUTING ----------
 
@@ -1286,13 +1836,8 @@ class TelegramBotPoller:
                     f"⚠️ Диалог #{conv_id} не найден.")
                 return
 
-            # Get all messages in chronological order, take last 20
-            result = await db.execute(
-                select(AIMessage)
-                .where(AIMessage.conversation_id == conv_id)
-                .order_by(AIMessage.created_at)  # ascending = oldest → newest
-            )
-            all_msgs = list(result.scalars().all())
+            # Get all messages in chronological order (archived too), take last 20
+            all_msgs = await message_archive.conversation_messages(db, conv)
             messages = all_msgs[-20:]  # last 20 in chronological order
 
             if not messages:
@@ -1392,6 +1937,8 @@ class TelegramBotPoller:
             db.add(system_msg)
             conv.message_count += 1
             await db.commit()
+            await db.refresh(system_msg)
+            await conversation_events.publish(db, conv, system_msg)
 
             await TelegramService._send_message(bot_token, chat_id,
                 f"🤖 Диалог #{conv_id} переключён на ИИ-ассистента.\n"
@@ -1435,6 +1982,8 @@ class TelegramBotPoller:
             conv.message_count += 1
             conv.updated_at = datetime.now(timezone.utc)
             await db.commit()
+            await db.refresh(close_msg)
+            await conversation_events.publish(db, conv, close_msg)
 
             await TelegramService._send_message(bot_token, chat_id,
                 f"🔒 Диалог #{conv_id} закрыт.\n"
@@ -1474,6 +2023,7 @@ class TelegramBotPoller:
                 return
 
             # Switch to manager mode if not already
+            system_msg = None
             if conv.status != AIConversationStatus.MANAGER_CONNECTED:
                 conv.status = AIConversationStatus.MANAGER_CONNECTED
                 conv.manager_id = link.admin_user_id
@@ -1498,6 +2048,10 @@ class TelegramBotPoller:
             conv.updated_at = datetime.now(timezone.utc)
             
             await db.commit()
+            new_messages = [m for m in (system_msg, msg) if m is not None]
+            for m in new_messages:
+                await db.refresh(m)
+            await conversation_events.publish(db, conv, *new_messages)
 
             # Confirmation
             from backend.models.user import User
@@ -1537,7 +2091,7 @@ class TelegramBotPoller:
 
 
 # Singleton poller instance
-telegram_bot_poller = TelegramBotPoller()
+telegram_bot = TelegramBot()
 
 
 # Singleton-like instances
@@ -0,0 +1,87 @@
+"""
+Per-process snapshot of AI assistant settings.
+
+The whole `ai_assistant_settings` table is loaded with one query into an
+immutable, already typed snapshot, and every SettingsService.get/get_typed
+reads from it, so a chat turn runs no settings queries. Invalidation after
+SettingsService.set/set_bulk goes through Redis (see versioned_cache.py).
+Values derived from settings (the manager keyword matcher) are built once
+per snapshot.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_assistant.models.assistant import AIAssistantSettings
+from ai_assistant.phrase_filter import KeywordMatcher
+from ai_assistant.versioned_cache import VersionedCache
+
+logger = logging.getLogger("ai_assistant")
+
+
+def convert(raw: Optional[str], value_type: str) -> Any:
+    if raw is None:
+        return None
+    if value_type == "bool":
+        return raw.lower() in ("true", "1", "yes")
+    elif value_type == "int":
+        return int(raw)
+    elif value_type == "float":
+        return float(raw)
+    elif value_type == "json":
+        return json.loads(raw)
+    return raw
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    raw: Mapping[str, Optional[str]]
+    typed: Mapping[str, Any]
+
+    def get(self, key: str) -> Optional[str]:
+        return self.raw.get(key)
+
+    def get_typed(self, key: str) -> Any:
+        return self.typed.get(key)
+
+    @cached_property
+    def manager_keywords(self) -> KeywordMatcher:
+        """`manager_keywords` compiled once per snapshot, i.e. per settings version."""
+        keywords = self.typed.get("manager_keywords")
+        return KeywordMatcher(keywords if isinstance(keywords, list) else ())
+
+
+class SettingsCache(VersionedCache[SettingsSnapshot]):
+    def __init__(self, defaults: dict, max_age: Optional[float] = None):
+        super().__init__("settings", max_age)
+        self.defaults = defaults
+
+    async def get_snapshot(self, db: AsyncSession) -> SettingsSnapshot:
+        return await self.get(db)
+
+    async def _build(self, db: AsyncSession) -> SettingsSnapshot:
+        rows = (await db.execute(select(AIAssistantSettings))).scalars().all()
+
+        raw = {key: data["value"] for key, data in self.defaults.items()}
+        types = {key: data["type"] for key, data in self.defaults.items()}
+        for row in rows:
+            if row.value is not None:
+                raw[row.key] = row.value
+            if row.value_type:
+                types[row.key] = row.value_type
+
+        typed = {}
+        for key, value in raw.items():
+            try:
+                typed[key] = convert(value, types.get(key, "string"))
+            except ValueError:
+                logger.warning(f"Invalid {types.get(key)} setting {key}={value!r}, using default")
+                default = self.defaults.get(key)
+                typed[key] = convert(default["value"], default["type"]) if default else None
+        return SettingsSnapshot(raw=MappingProxyType(raw), typed=MappingProxyType(typed))
@@ -0,0 +1,230 @@
+"""
+Incrementally maintained assistant statistics (ai_stats_daily).
+
+Counters are written in the same transaction as the change they count, so
+GET /admin/assistant/stats sums a few rollup rows instead of scanning
+ai_message and ai_conversation:
+
+- an after_flush hook on every ORM session counts inserted conversations
+  and messages (with the tokens of replies), conversation status changes
+  (as net per-status deltas), escalations to a manager and new registered
+  users;
+- tokens not tied to a message (summary refresh) are added with record().
+
+Rows are keyed by (UTC day, shard); the shard comes from the conversation
+id, so concurrent chats increment different rows.
+
+Deleting a conversation takes it out of the day it was created on (with its
+tokens, its escalation and, if it was the user's last conversation, the new
+user), and its messages out of the days they were written on; status
+counters are net deltas and change today. Messages moved to the archive by
+message_archive are subtracted with forget_messages(), so the counters
+always describe the rows that exist.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event, exists, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ai_assistant.models.assistant import (
+    AIConversation,
+    AIConversationStatus,
+    AIMessage,
+    AIStatsDaily,
+)
+
+SHARDS = 8
+
+COUNTERS = (
+    "conversations", "messages", "filtered_messages", "tokens_used", "responses", "response_time_ms",
+    "escalations", "new_users",
+    "status_active", "status_manager_requested", "status_manager_connected", "status_closed",
+)
+
+ESCALATED_STATUSES = (AIConversationStatus.MANAGER_REQUESTED, AIConversationStatus.MANAGER_CONNECTED)
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _shard(conversation_id: int) -> int:
+    return conversation_id % SHARDS
+
+
+def _day(value: Optional[datetime]) -> date:
+    if value is None:
+        return _today()
+    return (value.astimezone(timezone.utc) if value.tzinfo else value).date()
+
+
+def _status_column(status) -> str:
+    return f"status_{AIConversationStatus(status).value}"
+
+
+def upsert_statement(dialect: str, day: date, shard: int, deltas: dict):
+    """INSERT of the deltas, or adding them to the existing row."""
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(AIStatsDaily).values(day=day, shard=shard, **deltas)
+    return stmt.on_conflict_do_update(
+        index_elements=[AIStatsDaily.day, AIStatsDaily.shard],
+        set_={name: getattr(AIStatsDaily, name) + stmt.excluded[name] for name in deltas},
+    )
+
+
+async def record(db: AsyncSession, conversation_id: int, **deltas):
+    """Add to today's counters from async code, within the caller's transaction."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if deltas:
+        await db.execute(upsert_statement(db.bind.dialect.name, _today(), _shard(conversation_id), deltas))
+
+
+def _count_message(deltas: dict, message, sign: int = 1):
+    deltas["messages"] += sign
+    if message.was_filtered:
+        deltas["filtered_messages"] += sign
+    if message.response_time_ms is not None:
+        deltas["responses"] += sign
+        deltas["response_time_ms"] += sign * message.response_time_ms
+
+
+async def forget_messages(db: AsyncSession, messages):
+    """
+    Subtract messages removed with a bulk statement (archival) from the days
+    they were written on. `messages` need conversation_id, was_filtered,
+    response_time_ms and created_at; their tokens stay with the conversation.
+    """
+    days: dict[tuple, dict] = defaultdict(lambda: defaultdict(int))
+    for message in messages:
+        _count_message(days[_day(message.created_at), _shard(message.conversation_id)], message, -1)
+    for (day, shard), deltas in days.items():
+        await db.execute(upsert_statement(db.bind.dialect.name, day, shard, deltas))
+
+
+# ---------- Flush hook ----------
+
+def _old(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+def _escalated(status, manager_id) -> bool:
+    return manager_id is not None or status in ESCALATED_STATUSES
+
+
+def _loaded(obj, name):
+    """A loaded column of a deleted object, without a lazy load (None if expired)."""
+    return inspect(obj).dict.get(name)
+
+
+def _collect(session: Session) -> dict[tuple, dict]:
+    """Counter deltas per (day, shard) for the objects of this flush."""
+    today = _today()
+    days: dict[tuple, dict] = defaultdict(lambda: defaultdict(int))
+    for obj in session.new:
+        if isinstance(obj, AIMessage):
+            deltas = days[today, _shard(obj.conversation_id)]
+            _count_message(deltas, obj)
+            if obj.tokens_used:
+                deltas["tokens_used"] += obj.tokens_used
+        elif isinstance(obj, AIConversation):
+            deltas = days[today, _shard(obj.id)]
+            status = obj.status or AIConversationStatus.ACTIVE
+            deltas["conversations"] += 1
+            deltas[_status_column(status)] += 1
+            if _escalated(status, obj.manager_id):
+                deltas["escalations"] += 1
+            if obj.user_id is not None and not session.connection().scalar(
+                select(exists().where(AIConversation.user_id == obj.user_id, AIConversation.id != obj.id))
+            ):
+                deltas["new_users"] += 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, AIConversation):
+            continue
+        state = inspect(obj)
+        if not (state.attrs.status.history.has_changes() or state.attrs.manager_id.history.has_changes()):
+            continue
+        old_status = _old(state, "status")
+        deltas = days[today, _shard(obj.id)]
+        if old_status is not None and old_status != obj.status:
+            deltas[_status_column(old_status)] -= 1
+            deltas[_status_column(obj.status)] += 1
+        if not _escalated(old_status, _old(state, "manager_id")) and _escalated(obj.status, obj.manager_id):
+            deltas["escalations"] += 1
+
+    first_deleted: dict[int, tuple] = {}  # user_id -> (day, shard) of their earliest deleted conversation
+    for obj in session.deleted:
+        if isinstance(obj, AIMessage):
+            _count_message(days[_day(_loaded(obj, "created_at")), _shard(obj.conversation_id)], obj, -1)
+        elif isinstance(obj, AIConversation):
+            state = inspect(obj)
+            status = _old(state, "status") or obj.status
+            key = (_day(_loaded(obj, "created_at")), _shard(obj.id))
+            days[today, key[1]][_status_column(status)] -= 1
+            deltas = days[key]
+            deltas["conversations"] -= 1
+            deltas["tokens_used"] -= _loaded(obj, "total_tokens_used") or 0
+            if _escalated(status, _old(state, "manager_id")):
+                deltas["escalations"] -= 1
+            user_id = _loaded(obj, "user_id")
+            if user_id is not None and (user_id not in first_deleted or key < first_deleted[user_id]):
+                first_deleted[user_id] = key
+    for user_id, key in first_deleted.items():
+        # The rows are already deleted in this transaction
+        if not session.connection().scalar(select(exists().where(AIConversation.user_id == user_id))):
+            days[key]["new_users"] -= 1
+    return days
+
+
+def _after_flush(session: Session, flush_context):
+    days = _collect(session)
+    if not days:
+        return
+    connection = session.connection()
+    for (day, shard), deltas in days.items():
+        deltas = {name: value for name, value in deltas.items() if value}
+        if deltas:
+            connection.execute(upsert_statement(connection.dialect.name, day, shard, deltas))
+
+
+def install():
+    """Attach the flush hook to all ORM sessions (idempotent)."""
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+install()
+
+
+# ---------- Reading ----------
+
+def _sums():
+    return [func.coalesce(func.sum(getattr(AIStatsDaily, name)), 0).label(name) for name in COUNTERS]
+
+
+async def totals(db: AsyncSession, day_from: Optional[date] = None, day_to: Optional[date] = None) -> dict:
+    """Counters summed over all shards of the days in the range (all time by default)."""
+    query = select(*_sums())
+    if day_from is not None:
+        query = query.where(AIStatsDaily.day >= day_from)
+    if day_to is not None:
+        query = query.where(AIStatsDaily.day <= day_to)
+    return dict((await db.execute(query)).one()._mapping)
+
+
+async def daily(db: AsyncSession, day_from: date, day_to: date) -> list[dict]:
+    """Counters per day in the range, days without activity omitted."""
+    result = await db.execute(
+        select(AIStatsDaily.day, *_sums())
+        .where(AIStatsDaily.day >= day_from, AIStatsDaily.day <= day_to)
+        .group_by(AIStatsDaily.day)
+        .order_by(AIStatsDaily.day)
+    )
+    return [dict(row._mapping) for row in result]
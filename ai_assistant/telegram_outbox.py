@@ -0,0 +1,406 @@
+"""
+Queue of Telegram notifications to managers, sent off the chat request path.
+
+Chat endpoints only push an event ("new conversation #5 from X") onto the
+Redis list `ai_assistant:telegram:outbox`. A dispatcher task in every
+ai_assistant process pops events, turns them into messages for the
+subscribed chats (TelegramService.*_messages) and sends them:
+
+- one worker per chat: messages to a chat keep their order, different
+  chats are sent concurrently (at most MAX_CONCURRENT_SENDS requests);
+- rate limits shared by all processes: GLOBAL_PER_SECOND messages per
+  bot, CHAT_PER_SECOND per chat (Redis counters per second);
+- 429 responses are retried after the `retry_after` Telegram asks for,
+  other failures are rescheduled with exponential backoff and dropped after
+  MAX_ATTEMPTS;
+- new user messages are collected per conversation for DIGEST_SECONDS and
+  sent as one digest. A `SET NX` marker per conversation says a digest is
+  scheduled; it is cleared when the digest is taken and expires on its
+  own, so a lost digest job doesn't silence the conversation.
+
+Events are taken with LMOVE into a processing list of the process and
+removed from it once all their messages are sent, dropped or rescheduled.
+Each process keeps a liveness key; the events of a process whose key
+expired (crash, SIGKILL) are moved back to the outbox by the others, and
+at startup.
+
+Delayed jobs (digests, retries) wait in the sorted set
+`ai_assistant:telegram:scheduled` (score = due time). If Redis is
+unavailable, events are queued in process memory instead.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+import httpx
+
+from backend.core import cache
+from backend.core.metrics import track_provider
+
+logger = logging.getLogger("ai_assistant")
+
+OUTBOX_KEY = "ai_assistant:telegram:outbox"
+SCHEDULED_KEY = "ai_assistant:telegram:scheduled"
+# Set of dispatcher ids, each with a processing list and a liveness key
+DISPATCHERS_KEY = "ai_assistant:telegram:dispatchers"
+RATE_KEY_PREFIX = "ai_assistant:telegram:rate"
+
+# Telegram allows about 30 messages per second per bot and 1 per second per chat
+GLOBAL_PER_SECOND = 25
+CHAT_PER_SECOND = 1
+MAX_CONCURRENT_SENDS = 8
+# Events taken from Redis only while fewer messages than this wait in memory
+MAX_IN_FLIGHT = 200
+BATCH_SIZE = 50
+POLL_SECONDS = 0.5
+DIGEST_SECONDS = 5
+DIGEST_MAX_MESSAGES = 10
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5
+CHAT_IDLE_SECONDS = 30
+# A dispatcher silent for this long is considered dead and its events are requeued
+ALIVE_SECONDS = 30
+# Longer than a digest waits in the queue; after that a new one may be scheduled
+DIGEST_MARKER_SECONDS = 60
+
+
+def _digest_key(conversation_id: int) -> str:
+    return f"ai_assistant:telegram:digest:{conversation_id}"
+
+
+def _digest_marker_key(conversation_id: int) -> str:
+    return f"ai_assistant:telegram:digest:{conversation_id}:scheduled"
+
+
+def _processing_key(dispatcher_id: str) -> str:
+    return f"ai_assistant:telegram:processing:{dispatcher_id}"
+
+
+def _alive_key(dispatcher_id: str) -> str:
+    return f"ai_assistant:telegram:alive:{dispatcher_id}"
+
+
+class _Event:
+    """An event taken from the outbox, acknowledged when its last message is handled."""
+
+    def __init__(self, raw: Optional[str]):
+        self.raw = raw  # None for events kept in process memory
+        self.pending = 1  # Held while the event is being routed
+
+
+class TelegramOutbox:
+    def __init__(self):
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._bot_token: Optional[str] = None
+        self._chats: dict[str, asyncio.Queue] = {}
+        self._workers: set[asyncio.Task] = set()
+        self._in_flight = 0
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+        # Events that could not be pushed to Redis
+        self._local: deque = deque()
+        self._id = uuid.uuid4().hex
+        self._processing = _processing_key(self._id)
+        self._beat_at = 0.0
+
+    # ---------- Enqueueing (request path) ----------
+
+    async def _push(self, job: dict):
+        try:
+            await cache.redis_client.rpush(OUTBOX_KEY, json.dumps(job, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"[TG] Outbox unavailable, keeping notification in memory: {e}")
+            self._local.append(job)
+
+    async def _schedule(self, job: dict, delay: float):
+        try:
+            await cache.redis_client.zadd(
+                SCHEDULED_KEY, {json.dumps(job, ensure_ascii=False): time.time() + delay},
+            )
+        except Exception as e:
+            logger.warning(f"[TG] Scheduling failed, sending now: {e}")
+            self._local.append(job)
+
+    async def enqueue(self, kind: str, conv_id: int, user_name: str, message: str):
+        """Queue a new_conversation or manager_request notification."""
+        await self._push({"kind": kind, "conv_id": conv_id, "user_name": user_name, "message": message})
+
+    async def enqueue_message(self, conv_id: int, user_name: str, message: str):
+        """Queue a new user message; messages of one conversation are sent as a digest."""
+        entry = json.dumps({"user_name": user_name, "message": message}, ensure_ascii=False)
+        try:
+            key = _digest_key(conv_id)
+            await cache.redis_client.rpush(key, entry)
+            await cache.redis_client.expire(key, 3600)
+            first = await cache.redis_client.set(_digest_marker_key(conv_id), "1", ex=DIGEST_MARKER_SECONDS, nx=True)
+        except Exception as e:
+            logger.warning(f"[TG] Outbox unavailable, keeping notification in memory: {e}")
+            self._local.append({"kind": "new_message", "conv_id": conv_id, "user_name": user_name, "messages": [message]})
+            return
+        if first:
+            # First message of a burst: the digest goes out DIGEST_SECONDS later
+            await self._schedule({"kind": "digest", "conv_id": conv_id}, DIGEST_SECONDS)
+
+    # ---------- Dispatcher ----------
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._client = httpx.AsyncClient(timeout=10.0)
+        try:
+            await self._heartbeat()
+        except Exception as e:
+            logger.warning(f"[TG] Outbox recovery skipped: {e}")
+        self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for worker in list(self._workers):
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        # Unsent messages go back to the queue for another process
+        for queue in self._chats.values():
+            while not queue.empty():
+                send, event = queue.get_nowait()
+                await self._push(send)
+                await self._done(event)
+        self._chats.clear()
+        self._in_flight = 0
+        try:
+            # Events whose messages were being sent: at least once rather than never
+            await self._requeue(self._id)
+            await cache.redis_client.delete(_alive_key(self._id))
+        except Exception as e:
+            logger.warning(f"[TG] Could not requeue unfinished notifications: {e}")
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _dispatch_loop(self):
+        from backend.db.session import AsyncSessionLocal
+
+        while self._running:
+            try:
+                await self._heartbeat()
+                async with AsyncSessionLocal() as db:
+                    taken = await self.dispatch(db)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[TG] Dispatcher error: {e}")
+                taken = 0
+            if not taken:
+                await asyncio.sleep(POLL_SECONDS)
+
+    async def _promote_due(self):
+        """Move scheduled jobs whose time has come to the outbox."""
+        due = await cache.redis_client.zrangebyscore(SCHEDULED_KEY, 0, time.time())
+        for raw in due:
+            # zrem keeps two processes from promoting the same job
+            if await cache.redis_client.zrem(SCHEDULED_KEY, raw):
+                await cache.redis_client.rpush(OUTBOX_KEY, raw)
+
+    async def _heartbeat(self):
+        """Refresh this dispatcher's liveness key and requeue the events of dead ones."""
+        now = time.monotonic()
+        if now - self._beat_at < ALIVE_SECONDS / 3:
+            return
+        await cache.redis_client.set(_alive_key(self._id), "1", ex=ALIVE_SECONDS)
+        await cache.redis_client.sadd(DISPATCHERS_KEY, self._id)
+        self._beat_at = now
+        for dispatcher_id in await cache.redis_client.smembers(DISPATCHERS_KEY):
+            if dispatcher_id != self._id and not await cache.redis_client.exists(_alive_key(dispatcher_id)):
+                await self._requeue(dispatcher_id)
+
+    async def _requeue(self, dispatcher_id: str):
+        """Move the unacknowledged events of a dispatcher back to the front of the outbox."""
+        moved = 0
+        # Right to left: the events keep their order at the front of the queue
+        while await cache.redis_client.lmove(_processing_key(dispatcher_id), OUTBOX_KEY, "RIGHT", "LEFT") is not None:
+            moved += 1
+        await cache.redis_client.srem(DISPATCHERS_KEY, dispatcher_id)
+        if moved:
+            logger.warning(f"[TG] {moved} unfinished notifications requeued")
+
+    async def _take(self, limit: int) -> list[tuple[_Event, dict]]:
+        jobs = []
+        while self._local and len(jobs) < limit:
+            jobs.append((_Event(None), self._local.popleft()))
+        try:
+            await self._promote_due()
+            while len(jobs) < limit:
+                raw = await cache.redis_client.lmove(OUTBOX_KEY, self._processing, "LEFT", "RIGHT")
+                if raw is None:
+                    break
+                jobs.append((_Event(raw), json.loads(raw)))
+        except Exception as e:
+            logger.warning(f"[TG] Outbox unavailable: {e}")
+        return jobs
+
+    async def _done(self, event: _Event):
+        """One message (or the routing) of the event is handled; acknowledge after the last."""
+        event.pending -= 1
+        if event.pending or event.raw is None:
+            return
+        try:
+            await cache.redis_client.lrem(self._processing, 1, event.raw)
+        except Exception as e:
+            logger.warning(f"[TG] Could not acknowledge notification: {e}")
+
+    async def dispatch(self, db) -> int:
+        """Take queued events and hand their messages to the chat workers. Returns events taken."""
+        from ai_assistant.services import SettingsService
+
+        if self._in_flight >= MAX_IN_FLIGHT:
+            return 0
+        jobs = await self._take(min(BATCH_SIZE, MAX_IN_FLIGHT - self._in_flight))
+        if not jobs:
+            return 0
+        snapshot = await SettingsService.snapshot(db)
+        self._bot_token = snapshot.get("telegram_bot_token")
+        if not snapshot.get_typed("telegram_enabled") or not self._bot_token:
+            logger.info(f"[TG] Notifications disabled, dropped {len(jobs)} queued events")
+            for event, _ in jobs:
+                await self._done(event)
+            return len(jobs)
+        for event, job in jobs:
+            try:
+                if job["kind"] == "send":
+                    # Retry of a message that failed (keeps its attempt count)
+                    self._route(job, event)
+                else:
+                    for chat_id, text in await self._render(db, job):
+                        self._route({"kind": "send", "chat_id": chat_id, "text": text}, event)
+            except Exception as e:
+                logger.error(f"[TG] Failed to prepare {job.get('kind')} notification: {e}")
+            await self._done(event)
+        return len(jobs)
+
+    async def _render(self, db, job: dict) -> list[tuple[str, str]]:
+        from ai_assistant.services import TelegramService
+
+        kind = job["kind"]
+        if kind == "new_conversation":
+            return await TelegramService.new_conversation_messages(db, job["conv_id"], job["user_name"], job["message"])
+        if kind == "manager_request":
+            return await TelegramService.manager_request_messages(db, job["conv_id"], job["user_name"], job["message"])
+        if kind == "new_message":
+            return await TelegramService.new_message_messages(db, job["conv_id"], job["user_name"], job["messages"])
+        if kind == "digest":
+            key, marker = _digest_key(job["conv_id"]), _digest_marker_key(job["conv_id"])
+            # Cleared before taking: a message arriving from now on schedules the next digest
+            await cache.redis_client.delete(marker)
+            entries = [json.loads(raw) for raw in await cache.redis_client.lpop(key, DIGEST_MAX_MESSAGES) or []]
+            if await cache.redis_client.llen(key) and await cache.redis_client.set(
+                marker, "1", ex=DIGEST_MARKER_SECONDS, nx=True,
+            ):
+                # Longer burst: the rest goes into the next digest
+                await self._schedule(job, DIGEST_SECONDS)
+            if not entries:
+                return []
+            return await TelegramService.new_message_messages(
+                db, job["conv_id"], entries[-1]["user_name"], [e["message"] for e in entries],
+            )
+        logger.warning(f"[TG] Unknown notification kind {kind!r}")
+        return []
+
+    def _route(self, send: dict, event: _Event):
+        queue = self._chats.get(send["chat_id"])
+        if queue is None:
+            queue = self._chats[send["chat_id"]] = asyncio.Queue()
+            worker = asyncio.create_task(self._chat_worker(send["chat_id"], queue))
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+        queue.put_nowait((send, event))
+        event.pending += 1
+        self._in_flight += 1
+
+    async def _chat_worker(self, chat_id: str, queue: asyncio.Queue):
+        while True:
+            try:
+                send, event = await asyncio.wait_for(queue.get(), CHAT_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    del self._chats[chat_id]
+                    return
+                continue
+            try:
+                async with self._semaphore:
+                    await self._deliver(send)
+            except Exception as e:
+                logger.error(f"[TG] Error sending message to chat {chat_id}: {e}")
+            finally:
+                self._in_flight -= 1
+            # Sent, dropped or rescheduled; a cancelled send stays unacknowledged and is requeued
+            await self._done(event)
+
+    # ---------- Sending ----------
+
+    async def _wait_for_slot(self, scope: str, limit: int):
+        """Fixed one-second windows shared through Redis; no limit if Redis is down."""
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f"{RATE_KEY_PREFIX}:{scope}:{window}"
+            try:
+                count = await cache.redis_client.incr(key)
+                if count == 1:
+                    await cache.redis_client.expire(key, 2)
+            except Exception:
+                return
+            if count <= limit:
+                return
+            await asyncio.sleep(window + 1 - now)
+
+    async def _deliver(self, send: dict):
+        chat_id = send["chat_id"]
+        url = f"https://api.telegram.org/bot{self._bot_token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": send["text"], "parse_mode": "HTML"}
+        attempts = send.get("attempts", 0)
+        while True:
+            attempts += 1
+            await self._wait_for_slot("global", GLOBAL_PER_SECOND)
+            await self._wait_for_slot(f"chat:{chat_id}", CHAT_PER_SECOND)
+            try:
+                with track_provider("telegram", "sendMessage") as call:
+                    response = await self._client.post(url, json=payload)
+                    call.status(response.status_code)
+            except httpx.HTTPError as e:
+                error = str(e)
+            else:
+                if response.status_code == 200:
+                    logger.info(f"[TG] Message sent to chat {chat_id}")
+                    return
+                if response.status_code == 429 and attempts < MAX_ATTEMPTS:
+                    retry_after = (response.json().get("parameters") or {}).get("retry_after", 1)
+                    logger.warning(f"[TG] Rate limited in chat {chat_id}, retrying in {retry_after}s")
+                    await asyncio.sleep(retry_after)
+                    continue
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    # Chat not found, bot blocked, bad markup: retrying won't help
+                    logger.warning(f"[TG] Failed to send: {response.status_code} {response.text}")
+                    return
+                error = f"{response.status_code} {response.text}"
+            break
+        if attempts >= MAX_ATTEMPTS:
+            logger.error(f"[TG] Message to chat {chat_id} dropped after {attempts} attempts: {error}")
+            return
+        delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        logger.warning(f"[TG] Sending to chat {chat_id} failed (attempt {attempts}), retry in {delay}s: {error}")
+        await self._schedule({**send, "attempts": attempts}, delay)
+
+
+telegram_outbox = TelegramOutbox()
@@ -0,0 +1,132 @@
+"""
+Per-process caches of small, rarely changed tables, invalidated through Redis.
+
+A VersionedCache holds one value built from the database (settings snapshot,
+compiled banned phrases, ...). Writers call bump() after committing. It
+increments `ai_assistant:<name>:version` in Redis and publishes the new
+version on the `ai_assistant:<name>` channel. Every process listens on that
+channel and drops its value when it sees a newer version; the next read
+rebuilds it.
+
+While the listener is not connected (Redis down, or a process that never
+called start(), such as scripts and tests), values expire after
+AI_CACHE_MAX_AGE_SECONDS instead.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Generic, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core import cache
+
+logger = logging.getLogger("ai_assistant")
+
+T = TypeVar("T")
+
+
+class VersionedCache(Generic[T]):
+    def __init__(self, name: str, max_age: Optional[float] = None):
+        self.name = name
+        self.version_key = f"ai_assistant:{name}:version"
+        self.channel = f"ai_assistant:{name}"
+        self.max_age = max_age or float(os.environ.get("AI_CACHE_MAX_AGE_SECONDS", 60))
+        self._value: Optional[T] = None
+        self._version = 0
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._listening = False
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def _build(self, db: AsyncSession) -> T:
+        raise NotImplementedError
+
+    def _fresh(self) -> bool:
+        if self._value is None:
+            return False
+        return self._listening or time.monotonic() - self._loaded_at < self.max_age
+
+    async def get(self, db: AsyncSession) -> T:
+        if self._fresh():
+            return self._value
+        async with self._lock:
+            if not self._fresh():
+                # Version first: a change committed in between is re-announced and rebuilt
+                version = await self._current_version()
+                self._value = await self._build(db)
+                self._version = version
+                self._loaded_at = time.monotonic()
+            return self._value
+
+    async def _current_version(self) -> int:
+        try:
+            return int(await cache.redis_client.get(self.version_key) or 0)
+        except Exception as e:
+            logger.warning(f"{self.name} cache version unavailable: {e}")
+            return 0
+
+    def invalidate(self):
+        self._value = None
+
+    async def bump(self):
+        """Call after committing a change: rebuild here, announce to other processes."""
+        self.invalidate()
+        try:
+            version = await cache.redis_client.incr(self.version_key)
+            await cache.redis_client.publish(self.channel, version)
+        except Exception as e:
+            logger.warning(f"{self.name} change not broadcast: {e}")
+
+    # ---------- Change listener ----------
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_message(self, data):
+        try:
+            version = int(data)
+        except (TypeError, ValueError):
+            return
+        if self._value is not None and version > self._version:
+            self.invalidate()
+
+    async def _listen(self):
+        while self._running:
+            pubsub = None
+            try:
+                pubsub = cache.redis_client.pubsub()
+                await pubsub.subscribe(self.channel)
+                # Changes made while nobody was listening
+                self.invalidate()
+                self._listening = True
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._on_message(message.get("data"))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"{self.name} cache listener error: {e}")
+            finally:
+                self._listening = False
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(5)
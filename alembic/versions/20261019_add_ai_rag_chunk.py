@@ -0,0 +1,34 @@
+"""add ai_rag_chunk table
+
+Revision ID: 20261019a
+Revises: 20260227b
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019a'
+down_revision = '20260227b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing documents are chunked by the assistant on its next index load
+    op.create_table(
+        "ai_rag_chunk",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("ai_rag_document.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("token_count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_ai_rag_chunk_id", "ai_rag_chunk", ["id"])
+    op.create_index("ix_ai_rag_chunk_document_position", "ai_rag_chunk", ["document_id", "position"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_rag_chunk_document_position", table_name="ai_rag_chunk")
+    op.drop_index("ix_ai_rag_chunk_id", table_name="ai_rag_chunk")
+    op.drop_table("ai_rag_chunk")
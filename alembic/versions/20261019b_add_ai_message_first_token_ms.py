@@ -0,0 +1,22 @@
+"""add ai_message.first_token_ms
+
+Revision ID: 20261019b
+Revises: 20261019a
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019b'
+down_revision = '20261019a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ai_message", sa.Column("first_token_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("ai_message", "first_token_ms")
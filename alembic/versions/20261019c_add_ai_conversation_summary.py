@@ -0,0 +1,24 @@
+"""add ai_conversation.summary
+
+Revision ID: 20261019c
+Revises: 20261019b
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019c'
+down_revision = '20261019b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ai_conversation", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column("ai_conversation", sa.Column("summary_until_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("ai_conversation", "summary_until_id")
+    op.drop_column("ai_conversation", "summary")
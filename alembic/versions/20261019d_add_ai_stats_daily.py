@@ -0,0 +1,84 @@
+"""add ai_stats_daily rollup table
+
+Revision ID: 20261019d
+Revises: 20261019c
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019d'
+down_revision = '20261019c'
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    "conversations", "messages", "filtered_messages", "responses", "escalations", "new_users",
+    "status_active", "status_manager_requested", "status_manager_connected", "status_closed",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ai_stats_daily",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("shard", sa.Integer(), primary_key=True),
+        *[sa.Column(name, sa.Integer(), nullable=False, server_default="0") for name in COUNTERS],
+        sa.Column("tokens_used", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("response_time_ms", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+
+    # Backfill from existing rows into shard 0. Current statuses are counted
+    # on the day the conversation was created, escalations on its last
+    # update (what the old live queries reported).
+    op.execute("""
+        INSERT INTO ai_stats_daily (
+            day, shard, conversations, tokens_used,
+            status_active, status_manager_requested, status_manager_connected, status_closed
+        )
+        SELECT (created_at AT TIME ZONE 'UTC')::date, 0, count(*), coalesce(sum(total_tokens_used), 0),
+               count(*) FILTER (WHERE status = 'active'),
+               count(*) FILTER (WHERE status = 'manager_requested'),
+               count(*) FILTER (WHERE status = 'manager_connected'),
+               count(*) FILTER (WHERE status = 'closed')
+        FROM ai_conversation
+        GROUP BY 1
+    """)
+    op.execute("""
+        INSERT INTO ai_stats_daily (day, shard, escalations)
+        SELECT (updated_at AT TIME ZONE 'UTC')::date, 0, count(*)
+        FROM ai_conversation
+        WHERE manager_id IS NOT NULL OR status IN ('manager_requested', 'manager_connected')
+        GROUP BY 1
+        ON CONFLICT (day, shard) DO UPDATE SET escalations = EXCLUDED.escalations
+    """)
+    op.execute("""
+        INSERT INTO ai_stats_daily (day, shard, new_users)
+        SELECT first_day, 0, count(*)
+        FROM (
+            SELECT user_id, min((created_at AT TIME ZONE 'UTC')::date) AS first_day
+            FROM ai_conversation
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+        ) first_conversations
+        GROUP BY first_day
+        ON CONFLICT (day, shard) DO UPDATE SET new_users = EXCLUDED.new_users
+    """)
+    op.execute("""
+        INSERT INTO ai_stats_daily (day, shard, messages, filtered_messages, responses, response_time_ms)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, 0, count(*),
+               count(*) FILTER (WHERE was_filtered),
+               count(response_time_ms), coalesce(sum(response_time_ms), 0)
+        FROM ai_message
+        GROUP BY 1
+        ON CONFLICT (day, shard) DO UPDATE SET
+            messages = EXCLUDED.messages,
+            filtered_messages = EXCLUDED.filtered_messages,
+            responses = EXCLUDED.responses,
+            response_time_ms = EXCLUDED.response_time_ms
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("ai_stats_daily")
@@ -0,0 +1,49 @@
+"""add ai_conversation.last_message_preview and trigram search indexes
+
+Revision ID: 20261019e
+Revises: 20261019d
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019e'
+down_revision = '20261019d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ai_conversation", sa.Column("last_message_preview", sa.String(200), nullable=True))
+    op.add_column("ai_conversation", sa.Column("last_message_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute("""
+        UPDATE ai_conversation c
+        SET last_message_preview = left(m.content, 200), last_message_at = m.created_at
+        FROM (
+            SELECT DISTINCT ON (conversation_id) conversation_id, content, created_at
+            FROM ai_message
+            ORDER BY conversation_id, created_at DESC, id DESC
+        ) m
+        WHERE m.conversation_id = c.id
+    """)
+    op.create_index("ix_ai_conversation_updated", "ai_conversation", ["updated_at"])
+
+    # Admin inbox search (ILIKE '%...%'), see ChatService.get_conversations.
+    # The conversation expression must match conversation_search_text().
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_ai_conversation_search_trgm ON ai_conversation
+        USING gin (((coalesce(title, '') || ' ') || coalesce(session_id, '')) gin_trgm_ops)
+    """)
+    op.execute('CREATE INDEX IF NOT EXISTS ix_user_email_trgm ON "user" USING gin (email gin_trgm_ops)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_user_username_trgm ON "user" USING gin (username gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_user_username_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_user_email_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_ai_conversation_search_trgm")
+    op.drop_index("ix_ai_conversation_updated", table_name="ai_conversation")
+    op.drop_column("ai_conversation", "last_message_at")
+    op.drop_column("ai_conversation", "last_message_preview")
@@ -0,0 +1,119 @@
+"""partition ai_message by month, add ai_conversation_archive
+
+Revision ID: 20261019f
+Revises: 20261019e
+Create Date: 2026-10-19
+"""
+import json
+import zlib
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019f'
+down_revision = '20261019e'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, conversation_id, role, content, tokens_used, response_time_ms, first_token_ms, "
+    "model_used, was_filtered, original_content, created_at"
+)
+
+# ai_message; the primary key and partitioning differ between upgrade and downgrade
+TABLE = """
+    CREATE TABLE ai_message (
+        id INTEGER NOT NULL DEFAULT nextval('ai_message_id_seq'),
+        conversation_id INTEGER NOT NULL REFERENCES ai_conversation (id) ON DELETE CASCADE,
+        role ai_message_role NOT NULL,
+        content TEXT NOT NULL,
+        tokens_used INTEGER,
+        response_time_ms INTEGER,
+        first_token_ms INTEGER,
+        model_used VARCHAR(100),
+        was_filtered BOOLEAN DEFAULT false,
+        original_content TEXT,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        {primary_key}
+    ) {partitioning}
+"""
+
+# Partitions created ahead of time here; message_archive.py keeps adding them
+PARTITIONS_AHEAD = 2
+
+
+def _add_months(month: date, count: int) -> date:
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def _replace_table(primary_key: str, partitioning: str) -> None:
+    """Recreate ai_message with the given layout, keeping rows, id sequence and indexes."""
+    op.execute("ALTER TABLE ai_message RENAME TO ai_message_old")
+    op.execute("ALTER TABLE ai_message_old RENAME CONSTRAINT ai_message_pkey TO ai_message_old_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_ai_message_conv_created")
+    op.execute("DROP INDEX IF EXISTS ix_ai_message_conversation_id")
+    op.execute("DROP INDEX IF EXISTS ix_ai_message_id")
+    op.execute("ALTER SEQUENCE ai_message_id_seq OWNED BY NONE")
+    op.execute(TABLE.format(primary_key=primary_key, partitioning=partitioning))
+
+
+def _finish_table() -> None:
+    copied = COLUMNS.replace("created_at", "coalesce(created_at, now())")
+    op.execute(f"INSERT INTO ai_message ({COLUMNS}) SELECT {copied} FROM ai_message_old")
+    op.execute("DROP TABLE ai_message_old")
+    op.execute("ALTER SEQUENCE ai_message_id_seq OWNED BY ai_message.id")
+    op.create_index("ix_ai_message_conversation_id", "ai_message", ["conversation_id"])
+    op.create_index("ix_ai_message_conv_created", "ai_message", ["conversation_id", "created_at"])
+
+
+def upgrade() -> None:
+    op.add_column("ai_conversation", sa.Column("archived_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_table(
+        "ai_conversation_archive",
+        sa.Column(
+            "conversation_id", sa.Integer(),
+            sa.ForeignKey("ai_conversation.id", ondelete="CASCADE"), primary_key=True,
+        ),
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("size_bytes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("messages", sa.LargeBinary(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    # The partition key has to be part of the primary key
+    first = op.get_bind().execute(sa.text("SELECT min(created_at) FROM ai_message")).scalar()
+    _replace_table("PRIMARY KEY (id, created_at)", "PARTITION BY RANGE (created_at)")
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    month = min(first.astimezone(timezone.utc).date().replace(day=1), this_month) if first else this_month
+    while month <= _add_months(this_month, PARTITIONS_AHEAD):
+        op.execute(
+            f"CREATE TABLE ai_message_p{month:%Y%m} PARTITION OF ai_message "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+        )
+        month = _add_months(month, 1)
+    op.execute("CREATE TABLE ai_message_default PARTITION OF ai_message DEFAULT")
+    _finish_table()
+
+
+def downgrade() -> None:
+    # Archived messages go back to ai_message before the archive table is dropped
+    bind = op.get_bind()
+    restored = []
+    for conversation_id, data in bind.execute(sa.text("SELECT conversation_id, messages FROM ai_conversation_archive")):
+        restored.extend({**m, "conversation_id": conversation_id} for m in json.loads(zlib.decompress(data)))
+    if restored:
+        bind.execute(sa.text(f"""
+            INSERT INTO ai_message ({COLUMNS})
+            VALUES (
+                :id, :conversation_id, CAST(:role AS ai_message_role), :content, :tokens_used, :response_time_ms,
+                :first_token_ms, :model_used, :was_filtered, :original_content, CAST(:created_at AS TIMESTAMP WITH TIME ZONE)
+            )
+        """), restored)
+
+    _replace_table("PRIMARY KEY (id)", "")
+    _finish_table()
+    op.drop_table("ai_conversation_archive")
+    op.drop_column("ai_conversation", "archived_at")
@@ -0,0 +1,40 @@
+"""add ai_rag_document.content_hash and title index for bulk import
+
+Revision ID: 20261019g
+Revises: 20261019f
+Create Date: 2026-10-19
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '20261019g'
+down_revision = '20261019f'
+branch_labels = None
+depends_on = None
+
+
+def _content_hash(text: str) -> str:
+    # Same as ai_assistant.rag_chunks.content_hash
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+
+def upgrade() -> None:
+    op.add_column("ai_rag_document", sa.Column("content_hash", sa.String(64), nullable=True))
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, content FROM ai_rag_document")).all()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE ai_rag_document SET content_hash = :hash WHERE id = :id"),
+            [{"id": row.id, "hash": _content_hash(row.content)} for row in rows],
+        )
+    op.create_index("ix_ai_rag_document_content_hash", "ai_rag_document", ["content_hash"])
+    op.create_index("ix_ai_rag_document_title", "ai_rag_document", ["title"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_rag_document_title", table_name="ai_rag_document")
+    op.drop_index("ix_ai_rag_document_content_hash", table_name="ai_rag_document")
+    op.drop_column("ai_rag_document", "content_hash")
@@ -1,7 +1,9 @@
 import redis.asyncio as redis
 from backend.core.config import settings
+from backend.core.metrics import instrument_redis
 
 redis_client = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+instrument_redis(redis_client, "cache")
 
 async def get_counters(entity_type: str, entity_id: int):
     """
@@ -12,5 +12,9 @@ celery_app.conf.beat_schedule = {
         "task": "backend.worker.check_expired_orders",
         "schedule": 60.0,
     },
+    "drain-email-outbox": {
+        "task": "backend.worker.drain_email_outbox",
+        "schedule": 5.0,
+    },
 }
 
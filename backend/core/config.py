@@ -30,6 +30,13 @@ class Settings(BaseSettings):
     EMAILS_FROM_EMAIL: str
     EMAILS_FROM_NAME: str = "LocalTea"
 
+    # Email outbox (очередь писем в Redis, разбирается воркером)
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: int = 30
+    EMAIL_SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    EMAIL_RATE_LIMIT_PER_MINUTE: int = 60  # 0 = без ограничения
+
     # Payment (Yookassa)
     YOOKASSA_SHOP_ID: Optional[str] = None
     YOOKASSA_SECRET_KEY: Optional[str] = None
@@ -0,0 +1,269 @@
+"""
+Event loop lag monitor and blocking-call detector.
+
+Used by all FastAPI apps (backend, admin_backend, ai_assistant, honeypot),
+so it depends only on the standard library and FastAPI — no settings,
+no DB.
+
+How it works:
+- a coroutine sleeps for `interval_ms` in a loop; the overshoot of each
+  sleep is the event loop lag and goes into a histogram;
+- a watchdog thread checks when the coroutine last ticked; if the loop has
+  been stuck for longer than `threshold_ms`, it grabs the loop thread's
+  current stack (the code that is blocking right now) and attributes the
+  stall to the innermost application frame.
+
+Configuration (env):
+    LOOP_MONITOR_ENABLED       true/false (default true)
+    LOOP_MONITOR_INTERVAL_MS   tick interval (default 50)
+    LOOP_LAG_THRESHOLD_MS      stall threshold for stack capture (default 100)
+    LOOP_MONITOR_EXPOSE        expose GET /internal/loop-lag (default false)
+"""
+import asyncio
+import bisect
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+logger = logging.getLogger("loop_monitor")
+
+# Upper bounds of lag histogram buckets, ms (the last bucket is +Inf)
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Frames from these directories are library code, not blocking "call sites"
+_LIBRARY_PATHS = tuple(sorted({
+    os.path.normcase(path)
+    for path in (sysconfig.get_paths().get(key) for key in ("stdlib", "platstdlib", "purelib", "platlib"))
+    if path
+}))
+_THIS_FILE = os.path.normcase(os.path.abspath(__file__))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("true", "1", "yes")
+
+
+def _is_app_frame(filename: str) -> bool:
+    filename = os.path.normcase(os.path.abspath(filename))
+    if filename == _THIS_FILE or filename.startswith("<"):
+        return False
+    return not filename.startswith(_LIBRARY_PATHS)
+
+
+def _format_site(frame: traceback.FrameSummary) -> str:
+    try:
+        path = os.path.relpath(frame.filename)
+    except ValueError:
+        path = frame.filename
+    return f"{path}:{frame.lineno} in {frame.name}"
+
+
+class LagHistogram:
+    """Cumulative-bucket histogram of loop lag values (ms)."""
+
+    def __init__(self, buckets: tuple = LAG_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def snapshot(self) -> dict:
+        cumulative = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += count
+            cumulative.append({"le": bound, "count": running})
+        return {
+            "buckets": cumulative,
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and records where the loop was blocked."""
+
+    def __init__(
+        self,
+        interval_ms: float = 50,
+        threshold_ms: float = 100,
+        enabled: bool = True,
+        max_recent_stalls: int = 20,
+    ):
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.enabled = enabled
+
+        self.histogram = LagHistogram()
+        self.call_site_counts: Counter = Counter()
+        self.call_site_blocked_ms: Counter = Counter()
+        self.recent_stalls: deque = deque(maxlen=max_recent_stalls)
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        # Stall captured by the watchdog for the current tick, finalized on the next tick
+        self._pending_stall: Optional[dict] = None
+
+    @classmethod
+    def from_env(cls) -> "LoopLagMonitor":
+        return cls(
+            interval_ms=float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", 50)),
+            threshold_ms=float(os.environ.get("LOOP_LAG_THRESHOLD_MS", 100)),
+            enabled=_env_bool("LOOP_MONITOR_ENABLED", True),
+        )
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        """Start monitoring the running event loop. Call from app startup."""
+        if not self.enabled or self._running:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._running = True
+        self._task = loop.create_task(self._tick_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop monitor started (interval={self.interval_ms}ms, threshold={self.threshold_ms}ms)")
+
+    async def stop(self):
+        """Stop monitoring. Call from app shutdown."""
+        if not self._running:
+            return
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    # ---------- Measurement ----------
+
+    async def _tick_loop(self):
+        interval = self.interval_ms / 1000
+        while self._running:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag_ms = max(0.0, (now - started - interval) * 1000)
+            with self._lock:
+                self.histogram.observe(lag_ms)
+                self._last_tick = now
+                stall, self._pending_stall = self._pending_stall, None
+            if stall is not None:
+                self._finalize_stall(stall, lag_ms)
+
+    def _watch(self):
+        poll = max(self.threshold_ms / 4, 5) / 1000
+        while self._running:
+            time.sleep(poll)
+            with self._lock:
+                tick = self._last_tick
+                already_captured = self._pending_stall is not None
+            stalled_ms = (time.monotonic() - tick) * 1000 - self.interval_ms
+            if stalled_ms < self.threshold_ms or already_captured:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stall = self._describe_stack(frame)
+            del frame
+            with self._lock:
+                # The loop may have ticked while we were walking the stack
+                if self._last_tick == tick and self._pending_stall is None:
+                    self._pending_stall = stall
+
+    @staticmethod
+    def _describe_stack(frame) -> dict:
+        stack = traceback.extract_stack(frame)
+        call_site = None
+        for entry in reversed(stack):
+            if _is_app_frame(entry.filename):
+                call_site = _format_site(entry)
+                break
+        leaf = _format_site(stack[-1]) if stack else "?"
+        return {
+            "call_site": call_site or leaf,
+            "leaf": leaf,
+            "stack": [_format_site(entry) for entry in stack[-15:]],
+        }
+
+    def _finalize_stall(self, stall: dict, lag_ms: float):
+        stall["lag_ms"] = round(lag_ms, 1)
+        stall["at"] = time.time()
+        with self._lock:
+            self.call_site_counts[stall["call_site"]] += 1
+            self.call_site_blocked_ms[stall["call_site"]] += lag_ms
+            self.recent_stalls.append(stall)
+        logger.warning(f"Event loop blocked for {lag_ms:.0f}ms at {stall['call_site']} (leaf: {stall['leaf']})")
+
+    # ---------- Reporting ----------
+
+    def top_call_sites(self, limit: int = 10) -> list[dict]:
+        with self._lock:
+            ranked = self.call_site_blocked_ms.most_common(limit)
+            return [
+                {
+                    "call_site": site,
+                    "stalls": self.call_site_counts[site],
+                    "total_blocked_ms": round(blocked, 1),
+                }
+                for site, blocked in ranked
+            ]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histogram = self.histogram.snapshot()
+            recent = list(self.recent_stalls)
+        return {
+            "enabled": self.enabled,
+            "running": self._running,
+            "interval_ms": self.interval_ms,
+            "threshold_ms": self.threshold_ms,
+            "lag_ms": histogram,
+            "top_blocking_call_sites": self.top_call_sites(),
+            "recent_stalls": recent,
+        }
+
+
+loop_monitor = LoopLagMonitor.from_env()
+
+router = APIRouter()
+
+
+@router.get("/internal/loop-lag", include_in_schema=False)
+async def loop_lag_report():
+    """Loop lag histogram and top blocking call sites (only if LOOP_MONITOR_EXPOSE=true)."""
+    if not _env_bool("LOOP_MONITOR_EXPOSE", False):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return loop_monitor.snapshot()
@@ -0,0 +1,529 @@
+"""
+Prometheus metrics shared by all FastAPI apps (backend, admin_backend,
+ai_assistant, honeypot).
+
+Like loop_monitor, depends only on the standard library and FastAPI (engines
+and Redis clients are passed in, never imported), so the honeypot image can
+ship it as is.
+
+What is collected:
+- HTTP: request counter and latency histogram per route *template*
+  (`/api/v1/catalog/products/{slug}`, not the raw path — bounded
+  cardinality; unmatched paths go under `<unmatched>`), in-flight gauge;
+- DB pool: connection checkout wait histogram, pool size / checked-out /
+  overflow gauges (`instrument_db_pool`);
+- Redis: command latency per command name (`instrument_redis`);
+- outbound providers (YooKassa, Russian Post, SMS.ru, OpenAI, Telegram):
+  call latency and outcome (`track_provider`).
+
+Values live in process memory. With `--workers N` a scrape reaches one
+random worker, so set METRICS_MULTIPROC_DIR: every worker then flushes its
+values to `<dir>/<pid>.json` and /metrics returns the sum over all files.
+Counters and histograms of exited workers are kept (totals stay monotonic),
+gauges only count live processes.
+
+Configuration (env):
+    METRICS_EXPOSE          expose GET /metrics (default false)
+    METRICS_MULTIPROC_DIR   directory shared by the workers of one app, empty
+                            per container start (default unset: per process)
+    METRICS_FLUSH_SECONDS   how often a worker flushes its values (default 5)
+"""
+import atexit
+import functools
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers both fast Redis commands and slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def _blank(self) -> "_Metric":
+        return type(self)(self.name, self.documentation, self.labelnames)
+
+    def _snapshot(self) -> list:
+        """JSON-ready values, for METRICS_MULTIPROC_DIR."""
+        raise NotImplementedError
+
+    def _load(self, entries: list):
+        """Add values from another process's `_snapshot()`."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+    def _snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def _load(self, entries: list):
+        for key, value in entries:
+            key = tuple(key)
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _blank(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.labelnames, self.buckets)
+
+    def _snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), list(counts), self._sums[key]] for key, counts in self._counts.items()]
+
+    def _load(self, entries: list):
+        for key, counts, total in entries:
+            key = tuple(key)
+            mine = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, count in enumerate(counts):
+                mine[i] += count
+            self._sums[key] = self._sums.get(key, 0.0) + total
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        lines = []
+        for key, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {running}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {running}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Set of metrics plus callbacks refreshing gauges before a scrape.
+
+    With `multiprocess_dir` the registry also writes its values there every
+    `flush_seconds` (background thread, started by `ensure_flusher` from
+    MetricsMiddleware on the first request of a worker) and renders the sum
+    over the files of all processes.
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = None, flush_seconds: float = 5.0):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_seconds = flush_seconds
+        self._flusher_pid: Optional[int] = None
+        self._flush_lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def _collect(self):
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception:
+                # A broken collector must not take the whole scrape down
+                pass
+
+    def ensure_flusher(self):
+        """Start the flush thread of this process (once per pid, so forked workers get their own)."""
+        if not self.multiprocess_dir or self._flusher_pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                # Next round retries; a full disk must not kill the thread
+                pass
+
+    def flush(self):
+        """Write this process's values to `<multiprocess_dir>/<pid>.json`."""
+        if not self.multiprocess_dir:
+            return
+        self._collect()
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        state = {name: metric._snapshot() for name, metric in self._metrics.items()}
+        path = os.path.join(self.multiprocess_dir, f"{os.getpid()}.json")
+        # Readers must never see a half-written file; the flush thread and a
+        # scrape may write at the same time
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _merged(self) -> list[_Metric]:
+        self.flush()
+        merged = {name: metric._blank() for name, metric in self._metrics.items()}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "*.json")):
+            try:
+                pid = int(os.path.basename(path)[:-len(".json")])
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _process_alive(pid)
+            for name, entries in state.items():
+                metric = merged.get(name)
+                if metric is None or (isinstance(metric, Gauge) and not alive):
+                    continue
+                metric._load(entries)
+        return list(merged.values())
+
+    def render(self) -> str:
+        if self.multiprocess_dir:
+            metrics = self._merged()
+        else:
+            self._collect()
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, just not ours to signal
+        pass
+    return True
+
+
+registry = MetricsRegistry(
+    os.environ.get("METRICS_MULTIPROC_DIR") or None,
+    float(os.environ.get("METRICS_FLUSH_SECONDS", "5")),
+)
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status.",
+    ("app", "method", "route", "status"),
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("app", "method", "route"),
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed.", ("app",),
+)
+DB_POOL_CHECKOUT = registry.histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a DB connection from the pool.", ("pool",),
+)
+DB_POOL_CONNECTIONS = registry.gauge(
+    "db_pool_connections", "DB pool connections by state (size, checked_out, checked_in, overflow).",
+    ("pool", "state"),
+)
+REDIS_LATENCY = registry.histogram(
+    "redis_command_duration_seconds", "Redis command latency.", ("client", "command"),
+)
+PROVIDER_LATENCY = registry.histogram(
+    "provider_request_duration_seconds", "Outbound provider call latency.",
+    ("provider", "operation", "outcome"),
+)
+
+
+# ---------- HTTP ----------
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request count, latency and in-flight gauge per route template."""
+
+    def __init__(self, app, app_name: str):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry.ensure_flusher()
+        status = 500
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(app=self.app_name)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(app=self.app_name)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - started, app=self.app_name, method=method, route=route_path)
+            HTTP_REQUESTS.inc(app=self.app_name, method=method, route=route_path, status=status)
+
+
+# ---------- DB pool ----------
+
+def instrument_db_pool(engine, name: str = "main"):
+    """
+    Measure pool checkout wait and export pool occupancy for an (async) engine.
+
+    The pool class is swapped for a subclass timing `connect()`; `recreate()`
+    (engine.dispose) builds pools from `self.__class__`, so the timing survives it.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    base = type(pool)
+    if not getattr(base, "_metrics_instrumented", False):
+        pool.__class__ = _timed_pool_class(base, name)
+
+    def collect():
+        current = sync_engine.pool
+        for state, getter in (
+            ("size", "size"),
+            ("checked_out", "checkedout"),
+            ("checked_in", "checkedin"),
+            ("overflow", "overflow"),
+        ):
+            method = getattr(current, getter, None)
+            if method is not None:
+                DB_POOL_CONNECTIONS.set(method(), pool=name, state=state)
+
+    registry.add_collector(collect)
+
+
+@functools.lru_cache(maxsize=None)
+def _timed_pool_class(base: type, name: str) -> type:
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return base.connect(self)
+        finally:
+            DB_POOL_CHECKOUT.observe(time.perf_counter() - started, pool=name)
+
+    return type(f"Timed{base.__name__}", (base,), {"connect": connect, "_metrics_instrumented": True})
+
+
+# ---------- Redis ----------
+
+def instrument_redis(client, name: str):
+    """Time every command of a redis-py client (sync or asyncio) by command name."""
+    original = client.execute_command
+    if getattr(original, "_metrics_instrumented", False):
+        return client
+
+    if inspect.iscoroutinefunction(original):
+        async def execute_command(*args, **options):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **options)
+            finally:
+                REDIS_LATENCY.observe(time.perf_counter() - started, client=name, command=_command_name(args))
+    else:
+        def execute_command(*args, **options):
+            started = time.perf_counter()
+            try:
+                return original(*args, **options)
+            finally:
+                REDIS_LATENCY.observe(time.perf_counter() - started, client=name, command=_command_name(args))
+
+    execute_command._metrics_instrumented = True
+    client.execute_command = execute_command
+    return client
+
+
+def _command_name(args: tuple) -> str:
+    if not args:
+        return "UNKNOWN"
+    command = args[0]
+    if isinstance(command, bytes):
+        command = command.decode(errors="replace")
+    # "CLIENT SETNAME" and similar come as one string; keep only the verb
+    return str(command).split(" ", 1)[0].upper()
+
+
+# ---------- Outbound providers ----------
+
+class ProviderCall:
+    """Handle yielded by `track_provider`; the block reports the HTTP status through it."""
+
+    def __init__(self):
+        self.outcome = "ok"
+
+    def status(self, code: int):
+        """2xx/3xx -> "ok", otherwise "4xx" / "5xx"."""
+        self.outcome = "ok" if code < 400 else f"{code // 100}xx"
+
+
+@contextmanager
+def track_provider(provider: str, operation: str) -> Iterator[ProviderCall]:
+    """
+    Time an outbound call:
+
+        with track_provider("yookassa", "create_payment") as call:
+            response = await client.post(...)
+            call.status(response.status_code)
+
+    Providers answer errors with 4xx/5xx rather than exceptions, so the block
+    reports the status; an exception escaping it marks the call as
+    outcome="error".
+    """
+    started = time.perf_counter()
+    call = ProviderCall()
+    outcome = "error"
+    try:
+        yield call
+        outcome = call.outcome
+    finally:
+        PROVIDER_LATENCY.observe(time.perf_counter() - started, provider=provider, operation=operation, outcome=outcome)
+
+
+# ---------- Endpoint ----------
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("true", "1", "yes")
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition (only if METRICS_EXPOSE=true)."""
+    if not _env_bool("METRICS_EXPOSE", False):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
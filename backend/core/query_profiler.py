@@ -0,0 +1,193 @@
+"""
+Per-request SQL profiler and N+1 detector.
+
+SQLAlchemy cursor events (registered on the Engine class, so every engine in
+the process is covered) record each statement into the active
+`QueryProfile`:
+- query count and total DB time;
+- statement "shapes" (literals/parameters stripped), so the same query run
+  in a loop shows up as one shape with a high count — the N+1 signature.
+
+`QueryProfilerMiddleware` opens a profile per HTTP request. In debug mode the
+result is attached as response headers, otherwise it is logged as one JSON
+line (INFO when the request looks suspicious, DEBUG otherwise).
+
+Tests use `profile_queries()` / the `query_budget` marker (see tests/conftest.py)
+to fail on N+1 regressions.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("query_profiler")
+
+# Shape normalization: strings, numbers and bind params become "?", IN-lists collapse
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+|\?")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_POSTCOMPILE_RE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_WS_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize SQL so that executions differing only by parameters compare equal."""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _POSTCOMPILE_RE.sub("(?)", shape)
+    shape = _PARAM_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("IN (...)", shape)
+    return _WS_RE.sub(" ", shape).strip()[:500]
+
+
+class QueryProfile:
+    """Queries executed within one request (or one test)."""
+
+    def __init__(self, parent: Optional["QueryProfile"] = None):
+        self.parent = parent
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = 3) -> list[tuple[str, int]]:
+        """Statement shapes executed at least `threshold` times (N+1 candidates)."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def summary(self, repeat_threshold: int = 3) -> dict:
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.total_ms, 2),
+            "repeated": [
+                {"statement": shape[:200], "count": n}
+                for shape, n in self.repeated(repeat_threshold)
+            ],
+        }
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+# Profiles that see every query in the process regardless of task context (tests)
+_global_profiles: list[QueryProfile] = []
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current_profile.get()
+
+
+@contextmanager
+def profile_queries(capture_all: bool = False) -> Iterator[QueryProfile]:
+    """
+    Profile queries executed inside the block.
+
+    capture_all=True records every query in the process, not just those run
+    from the current task context — used by tests, where the app may run in
+    a different context than the test body.
+    """
+    profile = QueryProfile(parent=_current_profile.get())
+    if capture_all:
+        _global_profiles.append(profile)
+        try:
+            yield profile
+        finally:
+            _global_profiles.remove(profile)
+        return
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+# ---------- SQLAlchemy hooks ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_profiler_start")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+
+    profile = _current_profile.get()
+    while profile is not None:
+        profile.record(statement, duration_ms)
+        profile = profile.parent
+    for profile in _global_profiles:
+        profile.record(statement, duration_ms)
+
+
+def install_query_profiler():
+    """Attach profiler listeners to all engines (idempotent)."""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- ASGI middleware ----------
+
+class QueryProfilerMiddleware:
+    """
+    Opens a QueryProfile per HTTP request.
+
+    expose_headers=True (debug) adds X-DB-Query-Count / X-DB-Time-Ms /
+    X-DB-Repeated-Queries to the response; otherwise the profile is logged as
+    JSON. Requests with N+1 candidates or more than `log_threshold` queries
+    are logged at INFO, the rest at DEBUG.
+    """
+
+    def __init__(self, app, expose_headers: bool = False, log_threshold: int = 20, repeat_threshold: int = 3):
+        self.app = app
+        self.expose_headers = expose_headers
+        self.log_threshold = log_threshold
+        self.repeat_threshold = repeat_threshold
+        install_query_profiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(parent=_current_profile.get())
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.expose_headers:
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Query-Count", str(profile.count))
+                headers.append("X-DB-Time-Ms", f"{profile.total_ms:.2f}")
+                headers.append("X-DB-Repeated-Queries", str(len(profile.repeated(self.repeat_threshold))))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            self._report(scope, profile)
+
+    def _report(self, scope, profile: QueryProfile):
+        if profile.count == 0:
+            return
+        route = scope.get("route")
+        record = {
+            "method": scope.get("method"),
+            "route": getattr(route, "path", None) or scope.get("path"),
+            **profile.summary(self.repeat_threshold),
+        }
+        suspicious = bool(record["repeated"]) or profile.count >= self.log_threshold
+        logger.log(logging.INFO if suspicious else logging.DEBUG, json.dumps(record, ensure_ascii=False))
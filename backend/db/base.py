@@ -9,6 +9,6 @@ from backend.models.interactions import Comment, Like, View, Report
 from backend.models.admin import Admin2FA
 from backend.models.admin_log import AdminActionLog
 from ai_assistant.models.assistant import (
-    AIAssistantSettings, AIConversation, AIMessage, AIRAGDocument, AIBannedPhrase
+    AIAssistantSettings, AIConversation, AIMessage, AIRAGDocument, AIRAGChunk, AIBannedPhrase, AIStatsDaily, AIConversationArchive
 )
 
@@ -1,8 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from backend.core.config import settings
+from backend.core.metrics import instrument_db_pool
 
 engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+instrument_db_pool(engine)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def get_db():
@@ -9,6 +9,9 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from backend.core.limiter import limiter
 from backend.core.logger import setup_logging
+from backend.core.loop_monitor import loop_monitor, router as loop_monitor_router
+from backend.core.query_profiler import QueryProfilerMiddleware
+from backend.core.metrics import MetricsMiddleware, router as metrics_router
 from contextlib import asynccontextmanager
 import os
 import mimetypes
@@ -21,7 +24,9 @@ setup_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    loop_monitor.start()
     yield
+    await loop_monitor.stop()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -30,6 +35,8 @@ app = FastAPI(
 )
 
 app.state.limiter = limiter
+app.add_middleware(QueryProfilerMiddleware, expose_headers=settings.DEBUG)
+app.add_middleware(MetricsMiddleware, app_name="backend")
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 # Set all CORS enabled origins
@@ -43,6 +50,8 @@ if settings.ALLOWED_ORIGINS:
     )
 
 app.include_router(api_router, prefix="/api/v1")
+app.include_router(loop_monitor_router)
+app.include_router(metrics_router)
 
 # Serve uploaded files
 UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "/app/uploads")
@@ -6,6 +6,7 @@ import httpx
 from dataclasses import dataclass
 from typing import Optional, List
 from backend.core.config import settings
+from backend.core.metrics import track_provider
 
 
 @dataclass
@@ -61,12 +62,14 @@ class DeliveryService:
         
         async with httpx.AsyncClient() as client:
             try:
-                response = await client.get(
-                    self.DELIVERY_URL,
-                    params=params,
-                    headers={"Accept": "application/json"},
-                    timeout=10.0
-                )
+                with track_provider("russian_post", "delivery_time") as call:
+                    response = await client.get(
+                        self.DELIVERY_URL,
+                        params=params,
+                        headers={"Accept": "application/json"},
+                        timeout=10.0
+                    )
+                    call.status(response.status_code)
                 
                 data = response.json()
                 
@@ -111,12 +114,14 @@ class DeliveryService:
         
         async with httpx.AsyncClient() as client:
             try:
-                response = await client.get(
-                    self.TARIFF_URL,
-                    params=params,
-                    headers={"Accept": "application/json"},
-                    timeout=10.0
-                )
+                with track_provider("russian_post", "tariff") as call:
+                    response = await client.get(
+                        self.TARIFF_URL,
+                        params=params,
+                        headers={"Accept": "application/json"},
+                        timeout=10.0
+                    )
+                    call.status(response.status_code)
                 
                 data = response.json()
                 
@@ -1,7 +1,7 @@
 from typing import List, Optional, Dict, Any
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, desc
+from sqlalchemy import case, select, update, desc
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta, timezone
@@ -133,10 +133,9 @@ class OrderService:
         db.add(order)
         await db.flush() # Get ID
         
-        # 5. Process Items: Create OrderItem and Reserve Stock
-        for item_data in order_items_data:
-            # Create OrderItem
-            order_item = OrderItem(
+        # 5. Process Items: Create OrderItems and Reserve Stock
+        db.add_all([
+            OrderItem(
                 order_id=order.id,
                 sku_id=item_data["sku_id"],
                 title=item_data["title"],
@@ -144,36 +143,44 @@ class OrderService:
                 price_cents=item_data["price_cents"],
                 quantity=item_data["quantity"]
             )
-            db.add(order_item)
-            
-            # Reserve Stock (Atomic Update)
-            stmt = (
-                update(SKU)
-                .where(SKU.id == item_data["sku_id"])
-                .where(SKU.quantity >= item_data["quantity"])
-                .values(
-                    quantity=SKU.quantity - item_data["quantity"],
-                    reserved_quantity=SKU.reserved_quantity + item_data["quantity"]
-                )
+            for item_data in order_items_data
+        ])
+        
+        # Reserve Stock (Atomic Update): one statement for all SKUs, not one per item
+        quantities: Dict[int, int] = {}
+        for item_data in order_items_data:
+            quantities[item_data["sku_id"]] = quantities.get(item_data["sku_id"], 0) + item_data["quantity"]
+        wanted = case(quantities, value=SKU.id)
+        stmt = (
+            update(SKU)
+            .where(SKU.id.in_(list(quantities)))
+            .where(SKU.quantity >= wanted)
+            .values(
+                quantity=SKU.quantity - wanted,
+                reserved_quantity=SKU.reserved_quantity + wanted
             )
-            result = await db.execute(stmt)
-            if result.rowcount == 0:
-                # Rollback will happen automatically if we raise exception
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Not enough stock for product with SKU ID {item_data['sku_id']}"
-                )
-            
-            # Sync ProductStock (warehouse view)
-            product_stock_stmt = (
-                update(ProductStock)
-                .where(ProductStock.sku_id == item_data["sku_id"])
-                .values(
-                    quantity=ProductStock.quantity - item_data["quantity"],
-                    reserved=ProductStock.reserved + item_data["quantity"]
-                )
+            .returning(SKU.id)
+        )
+        reserved = set((await db.execute(stmt)).scalars())
+        missing = [sku_id for sku_id in quantities if sku_id not in reserved]
+        if missing:
+            # Rollback will happen automatically if we raise exception
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Not enough stock for product with SKU ID {missing[0]}"
+            )
+        
+        # Sync ProductStock (warehouse view)
+        stock_wanted = case(quantities, value=ProductStock.sku_id)
+        product_stock_stmt = (
+            update(ProductStock)
+            .where(ProductStock.sku_id.in_(list(quantities)))
+            .values(
+                quantity=ProductStock.quantity - stock_wanted,
+                reserved=ProductStock.reserved + stock_wanted
             )
-            await db.execute(product_stock_stmt)
+        )
+        await db.execute(product_stock_stmt)
 
         # 6. Clear Cart
         await cart_service.clear_cart(db, user_id, session_id)
@@ -5,6 +5,7 @@ from typing import Dict, Any, Optional
 from fastapi import HTTPException
 from backend.services.payment.base import PaymentService
 from backend.core.config import settings
+from backend.core.metrics import track_provider
 from backend.models.order import Order
 
 class YookassaPaymentService(PaymentService):
@@ -55,11 +56,13 @@ class YookassaPaymentService(PaymentService):
             payload["notification_url"] = settings.YOOKASSA_WEBHOOK_URL
         
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url, 
-                json=payload, 
-                headers=self._get_headers(idempotence_key)
-            )
+            with track_provider("yookassa", "create_payment") as call:
+                response = await client.post(
+                    url, 
+                    json=payload, 
+                    headers=self._get_headers(idempotence_key)
+                )
+                call.status(response.status_code)
             
             if response.status_code not in (200, 201):
                 # Log error here
@@ -77,10 +80,12 @@ class YookassaPaymentService(PaymentService):
         url = f"{self.BASE_URL}/payments/{payment_id}"
         
         async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url, 
-                headers=self._get_headers()
-            )
+            with track_provider("yookassa", "check_payment") as call:
+                response = await client.get(
+                    url, 
+                    headers=self._get_headers()
+                )
+                call.status(response.status_code)
             
             if response.status_code != 200:
                 raise HTTPException(status_code=502, detail="Payment provider error")
@@ -119,11 +124,13 @@ class YookassaPaymentService(PaymentService):
             payload["description"] = description
         
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                json=payload,
-                headers=self._get_headers(idempotence_key)
-            )
+            with track_provider("yookassa", "create_refund") as call:
+                response = await client.post(
+                    url,
+                    json=payload,
+                    headers=self._get_headers(idempotence_key)
+                )
+                call.status(response.status_code)
             
             if response.status_code not in (200, 201):
                 error_data = response.json() if response.text else {}
@@ -145,10 +152,12 @@ class YookassaPaymentService(PaymentService):
         url = f"{self.BASE_URL}/refunds/{refund_id}"
         
         async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=self._get_headers()
-            )
+            with track_provider("yookassa", "get_refund") as call:
+                response = await client.get(
+                    url,
+                    headers=self._get_headers()
+                )
+                call.status(response.status_code)
             
             if response.status_code != 200:
                 raise HTTPException(status_code=502, detail="Failed to get refund status")
@@ -161,11 +170,13 @@ class YookassaPaymentService(PaymentService):
         params = {"payment_id": payment_id}
         
         async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                params=params,
-                headers=self._get_headers()
-            )
+            with track_provider("yookassa", "list_refunds") as call:
+                response = await client.get(
+                    url,
+                    params=params,
+                    headers=self._get_headers()
+                )
+                call.status(response.status_code)
             
             if response.status_code != 200:
                 raise HTTPException(status_code=502, detail="Failed to list refunds")
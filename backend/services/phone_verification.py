@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from backend.core.config import settings
+from backend.core.metrics import track_provider
 from backend.models.user import User
 
 logger = logging.getLogger(__name__)
@@ -93,15 +94,17 @@ class PhoneVerificationService:
         
         try:
             async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(
-                    f"{self.API_BASE_URL}/callcheck/add",
-                    params={
-                        "api_id": self.api_id,
-                        "phone": normalized_phone,
-                        "json": 1
-                    }
-                )
-                response.raise_for_status()
+                with track_provider("sms_ru", "callcheck_add") as call:
+                    response = await client.get(
+                        f"{self.API_BASE_URL}/callcheck/add",
+                        params={
+                            "api_id": self.api_id,
+                            "phone": normalized_phone,
+                            "json": 1
+                        }
+                    )
+                    call.status(response.status_code)
+                    response.raise_for_status()
                 data = response.json()
                 
                 if data.get("status") != "OK":
@@ -142,15 +145,17 @@ class PhoneVerificationService:
         """
         try:
             async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(
-                    f"{self.API_BASE_URL}/callcheck/status",
-                    params={
-                        "api_id": self.api_id,
-                        "check_id": check_id,
-                        "json": 1
-                    }
-                )
-                response.raise_for_status()
+                with track_provider("sms_ru", "callcheck_status") as call:
+                    response = await client.get(
+                        f"{self.API_BASE_URL}/callcheck/status",
+                        params={
+                            "api_id": self.api_id,
+                            "check_id": check_id,
+                            "json": 1
+                        }
+                    )
+                    call.status(response.status_code)
+                    response.raise_for_status()
                 data = response.json()
                 
                 check_status = data.get("check_status")
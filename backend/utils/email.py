@@ -1,44 +1,137 @@
 import smtplib
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from backend.core.config import settings
 from jinja2 import Environment, FileSystemLoader
 import os
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Dict, Any
 
+logger = logging.getLogger(__name__)
+
+# Шаблоны лежат в backend/templates (на уровень выше backend/utils)
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+
+
+@lru_cache(maxsize=1)
+def get_template_env() -> Environment:
+    """
+    Jinja-окружение, общее для всего процесса.
+    Скомпилированные шаблоны кешируются внутри окружения, поэтому
+    каждый шаблон парсится один раз на процесс, а не на каждое письмо.
+    """
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIR), auto_reload=False)
+
+
+def render_email_template(template_name: str, subject: str = "", environment: dict = None) -> str:
+    """Рендерит HTML письма из шаблона backend/templates/<template_name>."""
+    template = get_template_env().get_template(template_name)
+
+    render_context = dict(environment or {})
+    render_context.setdefault("project_name", settings.PROJECT_NAME)
+    render_context.setdefault("current_year", datetime.now().year)
+    render_context.setdefault("subject", subject)
+
+    return template.render(**render_context)
+
+
+def build_email_message(
+    email_to: str,
+    subject: str = "",
+    body: str = "",
+    template_name: str = None,
+    environment: dict = None,
+) -> MIMEMultipart:
+    """Собирает MIME-сообщение (шаблон или готовое HTML-тело)."""
+    msg = MIMEMultipart()
+    msg["From"] = f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
+    msg["To"] = email_to
+    msg["Subject"] = subject
+
+    if template_name:
+        html_content = render_email_template(template_name, subject, environment)
+        msg.attach(MIMEText(html_content, "html"))
+    else:
+        msg.attach(MIMEText(body, "html"))
+    return msg
+
+
+class SMTPSession:
+    """
+    Переиспользуемое SMTP-соединение.
+
+    Один TLS-handshake и один LOGIN обслуживают много писем. Соединение
+    переоткрывается, если сервер его закрыл, а также после
+    `max_messages` писем (многие провайдеры ограничивают число писем
+    на одну сессию).
+    """
+
+    def __init__(self, max_messages: Optional[int] = None, timeout: float = 10):
+        self.max_messages = max_messages or settings.EMAIL_SMTP_MAX_MESSAGES_PER_CONNECTION
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP_SSL] = None
+        self._sent = 0
+
+    @property
+    def provider(self) -> str:
+        return settings.SMTP_SERVER
+
+    def _connect(self):
+        # Using SMTP_SSL for port 465
+        server = smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=self.timeout)
+        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        self._server = server
+        self._sent = 0
+
+    def _ensure_connected(self):
+        if self._server is not None and self._sent >= self.max_messages:
+            self.close()
+        if self._server is None:
+            self._connect()
+
+    def send(self, msg: MIMEMultipart):
+        """Отправляет письмо; при разрыве соединения переподключается один раз."""
+        self._ensure_connected()
+        try:
+            self._server.sendmail(settings.EMAILS_FROM_EMAIL, msg["To"], msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._connect()
+            self._server.sendmail(settings.EMAILS_FROM_EMAIL, msg["To"], msg.as_string())
+        self._sent += 1
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+        self._sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
 def send_email_sync(email_to: str, subject: str = "", body: str = "", template_name: str = None, environment: dict = None):
+    """
+    Немедленная отправка одного письма в отдельной SMTP-сессии.
+    Для потоковой отправки используйте очередь (backend/utils/email_outbox.py).
+    """
     try:
-        msg = MIMEMultipart()
-        msg["From"] = f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
-        msg["To"] = email_to
-        msg["Subject"] = subject
-
-        if template_name:
-            # Assuming templates are in backend/templates
-            # This file is in backend/utils/email.py, so we go up one level to backend, then to templates
-            template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
-            env = Environment(loader=FileSystemLoader(template_dir))
-            template = env.get_template(template_name)
-            
-            render_context = environment or {}
-            render_context.setdefault("project_name", settings.PROJECT_NAME)
-            render_context.setdefault("current_year", datetime.now().year)
-            render_context.setdefault("subject", subject)
-            
-            html_content = template.render(**render_context)
-            msg.attach(MIMEText(html_content, "html"))
-        else:
-            msg.attach(MIMEText(body, "html"))
+        msg = build_email_message(email_to, subject, body, template_name, environment)
+        with SMTPSession(max_messages=1) as session:
+            session.send(msg)
 
-        # Using SMTP_SSL for port 465
-        with smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=10) as server:
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.sendmail(settings.EMAILS_FROM_EMAIL, email_to, msg.as_string())
-            
-        print(f"Email sent to {email_to}")
+        logger.info(f"Email sent to {email_to}")
     except Exception as e:
-        print(f"Failed to send email to {email_to}: {e}")
+        logger.error(f"Failed to send email to {email_to}: {e}")
         raise e
 
 def send_test_email(email_to: str, subject: str, content: str):
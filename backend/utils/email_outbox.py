@@ -0,0 +1,271 @@
+"""
+Очередь исходящих писем (email outbox) в Redis.
+
+Письма не отправляются в момент запроса: они кладутся в список
+`email:outbox`, а периодическая задача Celery (`drain_email_outbox`)
+разбирает очередь пачками через одно переиспользуемое SMTP-соединение.
+
+- Надёжность: письмо переносится (LMOVE) в `email:outbox:processing` и
+  удаляется оттуда только после отправки или переноса в retry/dead.
+  Письма, оставшиеся там после падения воркера, возвращаются в начало
+  очереди при старте воркера и в начале каждого разбора (доставка
+  «хотя бы один раз»).
+- Повторы: при временной ошибке письмо попадает в `email:outbox:retry`
+  (sorted set, score = время следующей попытки) с экспоненциальной
+  задержкой; после EMAIL_OUTBOX_MAX_ATTEMPTS — в `email:outbox:dead`.
+  Постоянные ошибки (шаблон не собирается, адрес или письмо отклонены
+  с кодом 5xx) сразу уходят в `email:outbox:dead`.
+- Лимит отправки: счётчик в Redis на провайдера (SMTP_SERVER) и минуту,
+  общий для всех воркеров.
+- Один разборщик за раз: блокировка `email:outbox:lock` с токеном
+  владельца (redis-py Lock). Разборщик продлевает её, пока отправляет, и
+  останавливает пачку, если продлить не удалось: иначе второй воркер
+  вернул бы его письма из processing в очередь и они ушли бы дважды.
+"""
+import json
+import logging
+import smtplib
+import time
+import uuid
+from typing import Optional
+
+import redis
+from redis.exceptions import LockError
+
+from backend.core.config import settings
+from backend.core.metrics import instrument_redis
+from backend.utils.email import SMTPSession, build_email_message
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "email:outbox"
+PROCESSING_KEY = "email:outbox:processing"
+RETRY_KEY = "email:outbox:retry"
+DEAD_KEY = "email:outbox:dead"
+DRAIN_LOCK_KEY = "email:outbox:lock"
+RATE_KEY_PREFIX = "email:rate"
+
+DRAIN_LOCK_SECONDS = 300
+# Продлеваем блокировку, когда от неё осталось меньше этого: с запасом
+# на одно письмо (соединение, вход и отправка по SMTP-таймауту)
+DRAIN_LOCK_MARGIN_SECONDS = 60
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Отказ сервера, который повтор не исправит: адрес или само письмо отклонены с кодом 5xx."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    # Ошибки входа и отправителя — проблема настроек, а не письма: их повторяем
+    if isinstance(error, smtplib.SMTPDataError):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class EmailOutbox:
+    """Очередь писем поверх синхронного клиента Redis (используется в Celery)."""
+
+    def __init__(self, redis_client: Optional["redis.Redis"] = None):
+        self._redis = redis_client
+
+    @property
+    def redis(self) -> "redis.Redis":
+        if self._redis is None:
+            self._redis = instrument_redis(
+                redis.Redis.from_url(settings.REDIS_URL, decode_responses=True), "email_outbox"
+            )
+        return self._redis
+
+    # ---------- Постановка в очередь ----------
+
+    def enqueue(
+        self,
+        email_to: str,
+        subject: str = "",
+        body: str = "",
+        template_name: str = None,
+        environment: dict = None,
+    ) -> str:
+        """Кладёт письмо в очередь. Возвращает id записи."""
+        item = {
+            "id": uuid.uuid4().hex,
+            "email_to": email_to,
+            "subject": subject,
+            "body": body,
+            "template_name": template_name,
+            "environment": environment or {},
+            "attempts": 0,
+            "created_at": time.time(),
+        }
+        self.redis.rpush(OUTBOX_KEY, json.dumps(item, ensure_ascii=False, default=str))
+        return item["id"]
+
+    # ---------- Повторы ----------
+
+    def _retry_delay(self, attempts: int) -> int:
+        return settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+
+    def _dead_letter(self, item: dict, error: Exception):
+        item["last_error"] = str(error)[:500]
+        logger.error(f"Email to {item['email_to']} dropped after {item.get('attempts', 0)} attempts: {error}")
+        self.redis.rpush(DEAD_KEY, json.dumps(item, ensure_ascii=False, default=str))
+
+    def _schedule_retry(self, item: dict, error: Exception):
+        item["attempts"] = item.get("attempts", 0) + 1
+        item["last_error"] = str(error)[:500]
+        if item["attempts"] >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            self._dead_letter(item, error)
+            return
+        due = time.time() + self._retry_delay(item["attempts"])
+        self.redis.zadd(RETRY_KEY, {json.dumps(item, ensure_ascii=False, default=str): due})
+        logger.warning(f"Email to {item['email_to']} failed (attempt {item['attempts']}), retry in {self._retry_delay(item['attempts'])}s: {error}")
+
+    def promote_due_retries(self) -> int:
+        """Переносит письма, у которых наступило время повтора, обратно в очередь."""
+        due = self.redis.zrangebyscore(RETRY_KEY, 0, time.time())
+        moved = 0
+        for raw in due:
+            # zrem защищает от двойного переноса несколькими воркерами
+            if self.redis.zrem(RETRY_KEY, raw):
+                self.redis.rpush(OUTBOX_KEY, raw)
+                moved += 1
+        return moved
+
+    def requeue_processing(self) -> int:
+        """Возвращает в начало очереди письма, оставшиеся в обработке после падения воркера."""
+        moved = 0
+        # Справа налево: письма встают в начало очереди в прежнем порядке
+        while self.redis.lmove(PROCESSING_KEY, OUTBOX_KEY, "RIGHT", "LEFT") is not None:
+            moved += 1
+        if moved:
+            logger.warning(f"Email outbox: {moved} unfinished emails requeued")
+        return moved
+
+    def recover(self) -> int:
+        """Возврат незавершённых писем при старте воркера, если сейчас никто не разбирает очередь."""
+        lock = self._drain_lock()
+        if lock is None:
+            return 0
+        try:
+            return self.requeue_processing()
+        finally:
+            self._release(lock)
+
+    def _drain_lock(self):
+        """Блокировка разбора с токеном владельца или None, если её держит другой воркер."""
+        lock = self.redis.lock(DRAIN_LOCK_KEY, timeout=DRAIN_LOCK_SECONDS)
+        return lock if lock.acquire(blocking=False) else None
+
+    @staticmethod
+    def _release(lock):
+        try:
+            lock.release()
+        except LockError:
+            # Блокировка истекла и, возможно, уже чужая: её не трогаем
+            logger.warning("Email outbox: drain lock expired before release")
+
+    # ---------- Лимит отправки ----------
+
+    def _acquire_send_slot(self, provider: str) -> bool:
+        """Фиксированное окно в минуту на провайдера. False — лимит исчерпан."""
+        limit = settings.EMAIL_RATE_LIMIT_PER_MINUTE
+        if not limit:
+            return True
+        window = int(time.time() // 60)
+        key = f"{RATE_KEY_PREFIX}:{provider}:{window}"
+        count = self.redis.incr(key)
+        if count == 1:
+            self.redis.expire(key, 120)
+        return count <= limit
+
+    # ---------- Разбор очереди ----------
+
+    def _process(self, session: SMTPSession, item: dict) -> str:
+        """Отправляет одно письмо. Возвращает счётчик: sent, retried или dead."""
+        try:
+            msg = build_email_message(
+                item["email_to"], item.get("subject", ""), item.get("body", ""),
+                item.get("template_name"), item.get("environment"),
+            )
+        except Exception as e:
+            # Ошибку шаблона или данных письма повтор не исправит
+            self._dead_letter(item, e)
+            return "dead"
+        try:
+            session.send(msg)
+            return "sent"
+        except (smtplib.SMTPException, OSError) as e:
+            if _is_permanent(e):
+                self._dead_letter(item, e)
+                return "dead"
+            # Сессию после ошибки не переиспользуем
+            session.close()
+            self._schedule_retry(item, e)
+            return "retried"
+        except Exception as e:
+            self._schedule_retry(item, e)
+            return "retried"
+
+    def drain(self, batch_size: Optional[int] = None, session: Optional[SMTPSession] = None) -> dict:
+        """
+        Отправляет до `batch_size` писем через одну SMTP-сессию.
+        Возвращает счётчики {"sent", "retried", "dead", "deferred"}.
+        """
+        batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        stats = {"sent": 0, "retried": 0, "dead": 0, "deferred": 0}
+
+        # Один разборщик за раз: иначе два воркера упрутся в общий лимит провайдера
+        lock = self._drain_lock()
+        if lock is None:
+            return stats
+        renewed = time.monotonic()
+
+        own_session = session is None
+        session = session or SMTPSession()
+        try:
+            # Под блокировкой всё, что лежит в processing, — наследство упавшего разборщика
+            self.requeue_processing()
+            self.promote_due_retries()
+            for _ in range(batch_size):
+                if time.monotonic() - renewed > DRAIN_LOCK_SECONDS - DRAIN_LOCK_MARGIN_SECONDS:
+                    try:
+                        lock.reacquire()
+                    except LockError:
+                        # Блокировку уже мог взять другой воркер: остальное — его
+                        logger.warning("Email outbox: drain lock lost, batch stopped")
+                        break
+                    renewed = time.monotonic()
+                raw = self.redis.lmove(OUTBOX_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+                if raw is None:
+                    break
+                if not self._acquire_send_slot(session.provider):
+                    # Лимит исчерпан — возвращаем письмо в начало очереди
+                    self.redis.lmove(PROCESSING_KEY, OUTBOX_KEY, "RIGHT", "LEFT")
+                    stats["deferred"] += 1
+                    break
+
+                stats[self._process(session, json.loads(raw))] += 1
+                self.redis.lrem(PROCESSING_KEY, 1, raw)
+        finally:
+            if own_session:
+                session.close()
+            self._release(lock)
+
+        if stats["sent"] or stats["retried"] or stats["dead"]:
+            logger.info(f"Email outbox drained: {stats}")
+        return stats
+
+    def size(self) -> dict:
+        return {
+            "pending": self.redis.llen(OUTBOX_KEY),
+            "processing": self.redis.llen(PROCESSING_KEY),
+            "retry": self.redis.zcard(RETRY_KEY),
+            "dead": self.redis.llen(DEAD_KEY),
+        }
+
+
+email_outbox = EmailOutbox()
+
+
+def enqueue_email(email_to: str, subject: str = "", body: str = "", template_name: str = None, environment: dict = None) -> str:
+    """Поставить письмо в очередь на отправку."""
+    return email_outbox.enqueue(email_to, subject, body, template_name, environment)
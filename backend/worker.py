@@ -1,6 +1,7 @@
+from celery.signals import worker_ready
 from backend.core.celery_app import celery_app
 from backend.core.logger import setup_logging
-from backend.utils.email import send_email_sync
+from backend.utils.email_outbox import email_outbox
 import asyncio
 from backend.db.session import AsyncSessionLocal
 from backend.services.order import order_service
@@ -14,7 +15,20 @@ def test_celery(word: str) -> str:
 
 @celery_app.task
 def send_email(email_to: str, subject: str = "", body: str = "", template_name: str = None, environment: dict = None):
-    send_email_sync(email_to, subject, body, template_name, environment)
+    # Письмо уходит в outbox; отправкой занимается drain_email_outbox
+    email_outbox.enqueue(email_to, subject, body, template_name, environment)
+
+
+@celery_app.task
+def drain_email_outbox():
+    """Разбирает очередь писем пачкой через одно SMTP-соединение."""
+    return email_outbox.drain()
+
+
+@worker_ready.connect
+def requeue_unsent_email(**kwargs):
+    """Письма, которые упавший воркер не успел отправить, возвращаются в очередь."""
+    email_outbox.recover()
 
 @celery_app.task
 def check_expired_orders():
@@ -0,0 +1,15 @@
+"""
+In-process benchmark suite for hot endpoints.
+
+Unlike scripts/load_test.py and scripts/stress_test.py (which hit a live
+server), the apps run in-process through httpx's ASGI transport against a
+throwaway database (SQLite by default, or local Postgres) with in-memory
+stand-ins for Redis, the payment provider and the LLM. The dataset is seeded
+deterministically, so numbers are comparable between commits.
+
+    python -m benchmarks run --output bench.json
+    python -m benchmarks run --baseline bench-main.json
+    python -m benchmarks compare bench-main.json bench.json
+
+See doc/USER_BACKEND/BENCHMARKS.md.
+"""
@@ -0,0 +1,189 @@
+"""
+CLI:
+
+    python -m benchmarks run [--scenarios a,b] [--iterations N] [--concurrency N]
+                             [--database-url URL] [--llm-latency-ms MS]
+                             [--output FILE] [--baseline FILE] [--threshold 0.15]
+    python -m benchmarks compare BASELINE CURRENT [--threshold 0.15]
+    python -m benchmarks chat-pipeline [--conversations N] [--turns N] [--llm-latency-ms MS]
+                                       [--tokens-per-second N] [--error-rate R] [--output FILE]
+    python -m benchmarks mock-llm [--port 8090] [--latency-ms MS] [--tokens-per-second N]
+
+Exit code 1 when a comparison finds regressions.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+
+from benchmarks.runner import RunConfig, build_report, compare, format_comparison, format_results
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def _run(args) -> dict:
+    from benchmarks.dataset import seed
+    from benchmarks.environment import bench_environment, create_engine, reset_schema
+    from benchmarks.runner import run_scenario
+    from benchmarks.scenarios import SCENARIOS
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Available: {', '.join(SCENARIOS)}")
+
+    config = RunConfig(iterations=args.iterations, warmup=args.warmup, concurrency=args.concurrency)
+    with tempfile.TemporaryDirectory(prefix="localtea-bench-") as workdir:
+        engine = create_engine(args.database_url, workdir)
+        try:
+            await reset_schema(engine)
+            async with bench_environment(engine, llm_latency_ms=args.llm_latency_ms) as env:
+                dataset = await seed(env["session_factory"], seed_value=args.seed)
+                results = {}
+                for name in names:
+                    scenario = SCENARIOS[name]
+                    print(f"→ {name} ({scenario.description})", file=sys.stderr)
+                    results[name] = await run_scenario(scenario, env["apps"][scenario.app], dataset, config)
+        finally:
+            await engine.dispose()
+
+    database = engine.url.get_backend_name()
+    return build_report(results, config, database, args.llm_latency_ms)
+
+
+def _add_llm_arguments(parser, latency_flag: str):
+    parser.add_argument(latency_flag, dest="llm_latency_ms", type=float, default=0.0,
+                        help="Time to the first token / the response")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Generation speed (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Answer length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of failed requests (0.02 = 2%%)")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed requests")
+
+
+def _mock_config(args):
+    from benchmarks.mock_openai import MockLLMConfig
+
+    return MockLLMConfig(
+        latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+async def _run_pipeline(args) -> dict:
+    from ai_assistant.services import SettingsService
+    from benchmarks.dataset import seed
+    from benchmarks.environment import bench_environment, create_engine, reset_schema
+    from benchmarks.mock_openai import MockLLMServer
+    from benchmarks.pipeline import PipelineConfig, run_pipeline
+    from benchmarks.runner import RunConfig
+
+    config = PipelineConfig(conversations=args.conversations, turns=args.turns, warmup=args.warmup)
+    with tempfile.TemporaryDirectory(prefix="localtea-bench-") as workdir, \
+            MockLLMServer(_mock_config(args)) as server:
+        engine = create_engine(args.database_url, workdir)
+        try:
+            await reset_schema(engine)
+            async with bench_environment(engine, fake_llm=False) as env:
+                await seed(env["session_factory"], seed_value=args.seed)
+                async with env["session_factory"]() as db:
+                    await SettingsService.set_bulk(db, {"openai_base_url": server.base_url})
+                result = await run_pipeline(env["session_factory"], config)
+        finally:
+            await engine.dispose()
+        result["mock_llm"] = server.stats.as_dict()
+
+    run_config = RunConfig(iterations=config.turns, warmup=config.warmup, concurrency=config.conversations)
+    report = build_report({"chat_pipeline": result}, run_config, engine.url.get_backend_name(), args.llm_latency_ms)
+    report["meta"]["mock_llm"] = vars(_mock_config(args))
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="LocalTea in-process benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run scenarios and print/save JSON results")
+    run.add_argument("--scenarios", help="Comma-separated scenario names (default: all)")
+    run.add_argument("--iterations", type=int, default=200)
+    run.add_argument("--warmup", type=int, default=20)
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--database-url", help="Async SQLAlchemy URL of a *throwaway* DB (default: temporary SQLite)")
+    run.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM response time")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--output", help="Write JSON results to this file")
+    run.add_argument("--baseline", help="Compare against this JSON results file")
+    run.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown (0.15 = 15%%)")
+
+    cmp_ = sub.add_parser("compare", help="Compare two JSON results files")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.15)
+
+    pipeline = sub.add_parser("chat-pipeline", help="ChatService.send_message end to end against the mock LLM")
+    pipeline.add_argument("--conversations", type=int, default=32, help="Concurrent conversations")
+    pipeline.add_argument("--turns", type=int, default=320, help="Measured turns in total")
+    pipeline.add_argument("--warmup", type=int, default=1, help="Untimed turns per conversation")
+    pipeline.add_argument("--database-url", help="Async SQLAlchemy URL of a *throwaway* DB (default: temporary SQLite)")
+    _add_llm_arguments(pipeline, "--llm-latency-ms")
+    pipeline.add_argument("--seed", type=int, default=42)
+    pipeline.add_argument("--output", help="Write JSON results to this file")
+    pipeline.add_argument("--baseline", help="Compare against this JSON results file")
+    pipeline.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown (0.15 = 15%%)")
+
+    mock = sub.add_parser("mock-llm", help="Serve the mock OpenAI-compatible API")
+    mock.add_argument("--host", default="127.0.0.1")
+    mock.add_argument("--port", type=int, default=8090)
+    _add_llm_arguments(mock, "--latency-ms")
+    mock.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        comparison = compare(_load(args.baseline), _load(args.current), args.threshold)
+        print(format_comparison(comparison))
+        return 1 if comparison["regressions"] else 0
+
+    if args.command == "mock-llm":
+        from benchmarks.mock_openai import serve
+
+        serve(_mock_config(args), args.host, args.port)
+        return 0
+
+    # App request logging would dominate the output (and the timings)
+    logging.disable(logging.INFO)
+    if args.command == "chat-pipeline":
+        from benchmarks.pipeline import format_pipeline
+
+        report = asyncio.run(_run_pipeline(args))
+        print(format_pipeline(report["scenarios"]["chat_pipeline"]), file=sys.stderr)
+    else:
+        report = asyncio.run(_run(args))
+        print(format_results(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        comparison = compare(_load(args.baseline), report, args.threshold)
+        report["comparison"] = comparison
+        print(format_comparison(comparison), file=sys.stderr)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        return 1 if comparison["regressions"] else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Deterministic benchmark dataset: same seed → same rows, ids and texts.
+"""
+import random
+from dataclasses import dataclass, field
+
+from ai_assistant.models.assistant import AIRAGDocument
+from ai_assistant.services import SettingsService
+from backend.models.catalog import Category, Product, ProductImage, SKU
+
+TEA_TYPES = ["пуэр", "улун", "зелёный", "белый", "красный", "жёлтый"]
+REGIONS = ["Юньнань", "Фуцзянь", "Аньхой", "Чжэцзян", "Гуандун", "Сычуань"]
+WEIGHTS = [25, 50, 100, 357]
+
+CHAT_QUESTIONS = [
+    "Как заваривать шу пуэр?",
+    "Чем улун отличается от зелёного чая?",
+    "Какая температура воды нужна для белого чая?",
+    "Посоветуйте чай к десерту",
+    "Сколько раз можно проливать да хун пао?",
+]
+
+
+@dataclass
+class DatasetSize:
+    categories: int = 6
+    products_per_category: int = 40
+    skus_per_product: int = 3
+    rag_documents: int = 60
+
+
+@dataclass
+class Dataset:
+    """Ids the scenarios pick from."""
+    product_slugs: list[str] = field(default_factory=list)
+    product_ids: list[int] = field(default_factory=list)
+    sku_ids: list[int] = field(default_factory=list)
+    category_ids: list[int] = field(default_factory=list)
+
+
+async def seed(session_factory, size: DatasetSize = DatasetSize(), seed_value: int = 42) -> Dataset:
+    rng = random.Random(seed_value)
+    dataset = Dataset()
+
+    async with session_factory() as db:
+        for c in range(size.categories):
+            tea_type = TEA_TYPES[c % len(TEA_TYPES)]
+            category = Category(name=f"Чай {tea_type}", slug=f"bench-category-{c}", description=f"Категория {tea_type}")
+            db.add(category)
+            await db.flush()
+            dataset.category_ids.append(category.id)
+
+            for p in range(size.products_per_category):
+                region = rng.choice(REGIONS)
+                product = Product(
+                    title=f"{tea_type.capitalize()} {region} №{p}",
+                    slug=f"bench-{c}-{p}",
+                    tea_type=tea_type,
+                    description=f"{tea_type} из провинции {region}. " * rng.randint(3, 12),
+                    category_id=category.id,
+                    is_active=True,
+                )
+                db.add(product)
+                await db.flush()
+                dataset.product_slugs.append(product.slug)
+                dataset.product_ids.append(product.id)
+
+                db.add(ProductImage(product_id=product.id, url=f"/uploads/bench/{product.slug}.webp", is_main=True))
+                for s in range(size.skus_per_product):
+                    sku = SKU(
+                        product_id=product.id,
+                        sku_code=f"B-{c}-{p}-{s}",
+                        weight=WEIGHTS[s % len(WEIGHTS)],
+                        price_cents=rng.randint(300, 9000) * 10,
+                        # Checkout reserves stock on every iteration
+                        quantity=10 ** 7,
+                        is_active=True,
+                        sort_order=s,
+                    )
+                    db.add(sku)
+                    await db.flush()
+                    dataset.sku_ids.append(sku.id)
+
+        for d in range(size.rag_documents):
+            tea_type = TEA_TYPES[d % len(TEA_TYPES)]
+            db.add(AIRAGDocument(
+                title=f"Как заваривать {tea_type} ({d})",
+                content=f"{tea_type} заваривают водой {rng.randint(70, 100)}°C, время {rng.randint(10, 60)} секунд. " * 8,
+                category="brewing",
+                keywords=f"{tea_type},заваривание,температура",
+                is_active=True,
+            ))
+        await db.commit()
+
+        await SettingsService.ensure_defaults(db)
+        # Rate limits and Telegram would turn the chat benchmark into a 429/network benchmark
+        await SettingsService.set_bulk(db, {
+            "assistant_enabled": "true",
+            "rate_limit_per_minute": "0",
+            "rate_limit_per_hour": "0",
+            "telegram_enabled": "false",
+            "openai_base_url": "http://llm.invalid/v1",
+            "openai_api_key": "bench",
+        })
+
+    return dataset
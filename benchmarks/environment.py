@@ -0,0 +1,366 @@
+"""
+Isolated runtime for benchmarks: database engine, dependency overrides and
+stand-ins for external services (Redis, YooKassa, LLM).
+"""
+import asyncio
+import fnmatch
+import time
+import uuid
+from contextlib import ExitStack, asynccontextmanager
+from typing import AsyncIterator, Optional
+from unittest.mock import patch
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db.base import Base
+from backend.db.session import get_db
+
+# Registers the AI assistant tables in Base.metadata
+import ai_assistant.models.assistant  # noqa: F401
+
+
+class FakeAsyncRedis:
+    """In-memory subset of the redis.asyncio API used by backend.core.cache."""
+
+    def __init__(self):
+        self.values: dict[str, object] = {}  # str, dict for hashes and sorted sets, list for lists
+        self.expires: dict[str, float] = {}
+        self.subscribers: dict[str, set] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    async def get(self, key):
+        return self.values.get(key) if self._alive(key) else None
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self.values[key] = str(value)
+        if ex:
+            self.expires[key] = time.monotonic() + ex
+        return True
+
+    async def setex(self, key, seconds, value):
+        return await self.set(key, value, ex=seconds)
+
+    async def incrby(self, key, amount=1):
+        value = int(self.values.get(key, 0) if self._alive(key) else 0) + amount
+        self.values[key] = str(value)
+        return value
+
+    async def incr(self, key):
+        return await self.incrby(key, 1)
+
+    async def decr(self, key):
+        return await self.incrby(key, -1)
+
+    async def exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.values.pop(key, None) is not None:
+                removed += 1
+            self.expires.pop(key, None)
+        return removed
+
+    async def expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    async def mget(self, *keys):
+        return [await self.get(key) for key in keys]
+
+    def _hash(self, key) -> dict:
+        if not self._alive(key):
+            self.values[key] = {}
+        return self.values[key]
+
+    async def hset(self, key, field, value):
+        new = field not in self._hash(key)
+        self._hash(key)[field] = str(value)
+        return int(new)
+
+    async def hgetall(self, key):
+        return dict(self.values[key]) if self._alive(key) else {}
+
+    async def hlen(self, key):
+        return len(self.values[key]) if self._alive(key) else 0
+
+    async def hdel(self, key, *fields):
+        if not self._alive(key):
+            return 0
+        return sum(self.values[key].pop(field, None) is not None for field in fields)
+
+    def _typed(self, key, factory):
+        if not self._alive(key):
+            self.values[key] = factory()
+        return self.values[key]
+
+    async def rpush(self, key, *values):
+        items = self._typed(key, list)
+        items.extend(str(v) for v in values)
+        return len(items)
+
+    async def lpop(self, key, count=None):
+        if not self._alive(key):
+            return None
+        items = self.values[key]
+        popped = [items.pop(0) for _ in range(min(count or 1, len(items)))]
+        if not items:
+            await self.delete(key)
+        if count is None:
+            return popped[0] if popped else None
+        return popped or None
+
+    async def llen(self, key):
+        return len(self.values[key]) if self._alive(key) else 0
+
+    async def lmove(self, source, destination, src="LEFT", dest="RIGHT"):
+        if not self._alive(source):
+            return None
+        items = self.values[source]
+        value = items.pop(0 if src == "LEFT" else -1)
+        if not items:
+            await self.delete(source)
+        target = self._typed(destination, list)
+        target.insert(0, value) if dest == "LEFT" else target.append(value)
+        return value
+
+    async def lrem(self, key, count, value):
+        if not self._alive(key):
+            return 0
+        items = self.values[key]
+        removed = 0
+        while value in items and (not count or removed < abs(count)):
+            items.remove(value)
+            removed += 1
+        if not items:
+            await self.delete(key)
+        return removed
+
+    async def sadd(self, key, *members):
+        members_set = self._typed(key, set)
+        added = sum(str(m) not in members_set for m in members)
+        members_set.update(str(m) for m in members)
+        return added
+
+    async def smembers(self, key):
+        return set(self.values[key]) if self._alive(key) else set()
+
+    async def srem(self, key, *members):
+        if not self._alive(key):
+            return 0
+        removed = {str(m) for m in members} & self.values[key]
+        self.values[key] -= removed
+        return len(removed)
+
+    async def zadd(self, key, mapping):
+        scores = self._typed(key, dict)
+        added = sum(member not in scores for member in mapping)
+        scores.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    async def zrangebyscore(self, key, lo, hi):
+        if not self._alive(key):
+            return []
+        return [m for m, score in sorted(self.values[key].items(), key=lambda x: x[1]) if lo <= score <= hi]
+
+    async def zrem(self, key, *members):
+        if not self._alive(key):
+            return 0
+        return sum(self.values[key].pop(m, None) is not None for m in members)
+
+    async def publish(self, channel, message):
+        subscribers = self.subscribers.get(channel, ())
+        for pubsub in subscribers:
+            pubsub.queue.put_nowait({"type": "message", "channel": channel, "data": str(message)})
+        return len(subscribers)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    def lock(self, name, timeout=None, sleep=0.1, blocking_timeout=None):
+        return FakeLock(self, name, timeout, sleep, blocking_timeout)
+
+    async def keys(self, pattern="*"):
+        return [key for key in list(self.values) if self._alive(key) and fnmatch.fnmatch(key, pattern)]
+
+    async def close(self):
+        pass
+
+
+class FakeLock:
+    """redis.asyncio.lock.Lock on top of FakeAsyncRedis (set NX + token check)."""
+
+    def __init__(self, redis: FakeAsyncRedis, name, timeout=None, sleep=0.1, blocking_timeout=None):
+        self.redis = redis
+        self.name = name
+        self.timeout = timeout
+        self.sleep = sleep
+        self.blocking_timeout = blocking_timeout
+        self.token = uuid.uuid4().hex
+
+    async def acquire(self, blocking=True) -> bool:
+        deadline = None if self.blocking_timeout is None else time.monotonic() + self.blocking_timeout
+        while not await self.redis.set(self.name, self.token, ex=self.timeout, nx=True):
+            if not blocking or deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.sleep)
+        return True
+
+    async def reacquire(self):
+        if await self.redis.get(self.name) != self.token:
+            raise RuntimeError(f"Lock {self.name} is no longer owned")
+        await self.redis.expire(self.name, self.timeout)
+
+    async def release(self):
+        if await self.redis.get(self.name) == self.token:
+            await self.redis.delete(self.name)
+
+
+class FakePubSub:
+    def __init__(self, redis: FakeAsyncRedis):
+        self.redis = redis
+        self.channels: set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.redis.subscribers.setdefault(channel, set()).add(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        for channel in self.channels:
+            self.redis.subscribers.get(channel, set()).discard(self)
+        self.channels.clear()
+
+
+class FakeLLM:
+    """Replaces OpenAIClient.chat_completion(_stream): fixed answer after a configurable delay."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def chat_completion(self, messages, base_url, api_key, model="", temperature=0.7, max_tokens=1024):
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        question = messages[-1]["content"] if messages else ""
+        answer = f"Пуэр лучше заваривать водой 95°C. Вы спросили: {question[:80]}"
+        return answer, len(answer) // 4 + sum(len(m.get("content", "")) for m in messages) // 4
+
+    async def chat_completion_stream(self, messages, base_url, api_key, model="", temperature=0.7, max_tokens=1024):
+        answer, tokens = await self.chat_completion(messages, base_url, api_key, model, temperature, max_tokens)
+        for start in range(0, len(answer), 8):
+            yield answer[start:start + 8], None
+        yield "", tokens
+
+
+class FakePaymentProvider:
+    """Replaces YookassaPaymentService.create_payment."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create_payment(self, order, description: str):
+        self.calls += 1
+        return {
+            "payment_id": f"bench-{order.id}",
+            "payment_url": f"https://pay.example/bench-{order.id}",
+            "status": "pending",
+        }
+
+
+def _sqlite_functions(dbapi_connection, connection_record):
+    # CHECK constraints on cart rows use the Postgres-only num_nonnulls()
+    dbapi_connection.create_function("num_nonnulls", -1, lambda *args: sum(a is not None for a in args))
+
+
+def create_engine(database_url: Optional[str], workdir: str) -> AsyncEngine:
+    """SQLite file in `workdir` unless an explicit (Postgres) URL is given."""
+    if not database_url:
+        database_url = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    if database_url.startswith("sqlite"):
+        engine = create_async_engine(database_url, connect_args={"timeout": 30})
+        event.listen(engine.sync_engine, "connect", _sqlite_functions)
+        return engine
+    return create_async_engine(database_url, pool_size=20, max_overflow=10)
+
+
+async def reset_schema(engine: AsyncEngine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@asynccontextmanager
+async def bench_environment(
+    engine: AsyncEngine, llm_latency_ms: float = 0.0, fake_llm: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Point both apps at `engine` and swap external services for in-memory fakes.
+    Yields the fakes and the session factory.
+
+    fake_llm=False keeps the real OpenAIClient (pointed at the mock server by
+    the chat pipeline benchmark).
+    """
+    from backend.main import app as backend_app
+    from ai_assistant.main import app as assistant_app
+    from backend.core.limiter import limiter
+    from ai_assistant.services import OpenAIClient
+    from backend.services.payment.yookassa import YookassaPaymentService
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    fakes = {
+        "redis": FakeAsyncRedis(),
+        "llm": FakeLLM(latency_ms=llm_latency_ms),
+        "payment": FakePaymentProvider(),
+        "session_factory": session_factory,
+        "apps": {"backend": backend_app, "ai_assistant": assistant_app},
+    }
+
+    limiter_enabled = limiter.enabled
+    limiter.enabled = False
+    with ExitStack() as stack:
+        stack.enter_context(patch("backend.core.cache.redis_client", fakes["redis"]))
+        # Background tasks (summaries, notification dispatcher) open their own sessions
+        stack.enter_context(patch("backend.db.session.AsyncSessionLocal", session_factory))
+        if fake_llm:
+            stack.enter_context(patch.object(OpenAIClient, "chat_completion", fakes["llm"].chat_completion))
+            stack.enter_context(patch.object(OpenAIClient, "chat_completion_stream", fakes["llm"].chat_completion_stream))
+        stack.enter_context(patch.object(YookassaPaymentService, "create_payment", fakes["payment"].create_payment))
+        for app in (backend_app, assistant_app):
+            app.dependency_overrides[get_db] = override_get_db
+        try:
+            yield fakes
+        finally:
+            for app in (backend_app, assistant_app):
+                app.dependency_overrides.pop(get_db, None)
+            limiter.enabled = limiter_enabled
@@ -0,0 +1,213 @@
+"""
+Local stand-in for an OpenAI-compatible API (`POST /v1/chat/completions`),
+so the assistant can be load-tested without paying for tokens.
+
+Both plain and streaming (`stream: true`, SSE) responses are supported, with
+the same shapes OpenAIClient parses. Response time is modelled as a fixed
+latency before the first token plus generation at `tokens_per_second`;
+a share of requests can fail with a chosen status (500, 429 with
+Retry-After, ...).
+
+In-process (chat_pipeline benchmark) the server runs in its own thread, so
+the app's event loop load doesn't delay the "model". Standalone, for load
+tests of a running assistant (scripts/load_test.py):
+
+    python -m benchmarks mock-llm --port 8090 --latency-ms 400 --tokens-per-second 60
+
+and set `openai_base_url` to http://127.0.0.1:8090/v1 in the assistant settings.
+"""
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = (
+    "Пуэр лучше заваривать водой 95°C, первый пролив слить. Шэн пуэр раскрывается "
+    "за 5–7 проливов по 10–20 секунд, шу пуэр можно настаивать дольше. "
+    "Храните чай в сухом месте без посторонних запахов."
+).split()
+
+
+@dataclass
+class MockLLMConfig:
+    latency_ms: float = 0.0  # Before the first token (streaming) or the response
+    tokens_per_second: float = 0.0  # Generation speed, 0 = instant
+    completion_tokens: int = 60  # Answer length, capped by the request's max_tokens
+    error_rate: float = 0.0  # Share of requests answered with error_status
+    error_status: int = 500
+    retry_after: int = 1  # Retry-After of 429 responses
+    seed: int = 42
+
+
+class MockLLMStats:
+    def __init__(self):
+        self.requests = 0
+        self.streams = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+
+
+def _answer(count: int) -> list[str]:
+    """`count` tokens, one word each, with the separating space in front."""
+    return [(" " if i else "") + ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(count)]
+
+
+def create_app(config: MockLLMConfig, stats: Optional[MockLLMStats] = None) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI API", docs_url=None, redoc_url=None, openapi_url=None)
+    app.state.config = config
+    app.state.stats = stats if stats is not None else MockLLMStats()
+    rng = random.Random(config.seed)
+
+    async def chat_completions(request: Request):
+        stats: MockLLMStats = app.state.stats
+        body = await request.json()
+        stats.requests += 1
+
+        if config.error_rate and rng.random() < config.error_rate:
+            stats.errors += 1
+            headers = {"Retry-After": str(config.retry_after)} if config.error_status == 429 else None
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error", "code": config.error_status}},
+                status_code=config.error_status,
+                headers=headers,
+            )
+
+        messages = body.get("messages") or []
+        model = body.get("model") or "mock"
+        prompt_tokens = _prompt_tokens(messages)
+        tokens = _answer(max(1, min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += len(tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.latency_ms / 1000 + (
+                len(tokens) / config.tokens_per_second if config.tokens_per_second else 0
+            ))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        stats.streams += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def event(choices: list, **extra) -> str:
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                "model": model, "choices": choices, **extra,
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(config.latency_ms / 1000)
+            yield event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for token in tokens:
+                if config.tokens_per_second:
+                    await asyncio.sleep(1 / config.tokens_per_second)
+                yield event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield event([], usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # With and without the /v1 prefix: openai_base_url may be set either way
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+    return app
+
+
+class MockLLMServer:
+    """
+    Runs the mock API with uvicorn in a background thread:
+
+        with MockLLMServer(MockLLMConfig(latency_ms=300)) as server:
+            ...  # openai_base_url = server.base_url
+    """
+
+    def __init__(self, config: MockLLMConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.stats = MockLLMStats()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self):
+        import uvicorn
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        config = uvicorn.Config(
+            create_app(self.config, self.stats), log_level="warning", access_log=False,
+            backlog=2048, timeout_keep_alive=30,
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._server.serve(sockets=[sock])), name="mock-llm", daemon=True,
+        )
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Mock LLM server failed to start")
+            time.sleep(0.01)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self._server = self._thread = None
+
+    def __enter__(self) -> "MockLLMServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve(config: MockLLMConfig, host: str, port: int):
+    """Run the mock API in the foreground (`python -m benchmarks mock-llm`)."""
+    import uvicorn
+
+    uvicorn.run(create_app(config), host=host, port=port, log_level="info", access_log=False)
@@ -0,0 +1,151 @@
+"""
+Chat pipeline benchmark: ChatService.send_message end to end against the
+mock OpenAI server (benchmarks/mock_openai.py), many conversations at once.
+
+Unlike the chat_message scenario, the model is reached over real HTTP by
+OpenAIClient, so the report separates the time spent waiting for the model
+from everything around it (settings, RAG, history, filters, DB writes,
+locks):
+
+- latency: p50/p95/p99 of whole turns;
+- model_*: time inside OpenAIClient.chat_completion;
+- overhead_*: turn latency minus model time, overhead_share = its part of
+  the total turn time;
+- queries_per_turn / db_ms_per_turn: SQL executed by the turn (query_profiler).
+
+    python -m benchmarks chat-pipeline --conversations 64 --turns 640 --llm-latency-ms 300
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from unittest.mock import patch
+
+from benchmarks.dataset import CHAT_QUESTIONS
+from benchmarks.runner import percentile, summarize
+
+_model_time: ContextVar[Optional[list]] = ContextVar("bench_model_time", default=None)
+
+
+@dataclass
+class PipelineConfig:
+    conversations: int = 32  # Concurrent conversations, one turn at a time each
+    turns: int = 320  # Measured turns in total
+    warmup: int = 1  # Untimed turns per conversation (the first question, often cached)
+
+
+@contextmanager
+def timed_model_calls() -> Iterator[None]:
+    """Add the duration of OpenAIClient.chat_completion calls to the current turn."""
+    from ai_assistant.services import OpenAIClient
+
+    original = OpenAIClient.chat_completion
+
+    async def chat_completion(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            spent = _model_time.get()
+            if spent is not None:
+                spent.append((time.perf_counter() - started) * 1000)
+
+    with patch.object(OpenAIClient, "chat_completion", staticmethod(chat_completion)):
+        yield
+
+
+async def _turn(session_factory, conversation_id: int, question: str) -> dict:
+    from ai_assistant.services import OPENAI_ERROR_REPLY, ChatService
+    from backend.core.query_profiler import install_query_profiler, profile_queries
+
+    install_query_profiler()
+    spent: list = []
+    token = _model_time.set(spent)
+    try:
+        with profile_queries() as profile:
+            started = time.perf_counter()
+            async with session_factory() as db:
+                _, reply = await ChatService.send_message(db, conversation_id, question)
+            latency_ms = (time.perf_counter() - started) * 1000
+            # Read now: a background summary refresh may add to both later
+            queries, db_ms, model_ms = profile.count, profile.total_ms, sum(spent)
+    finally:
+        _model_time.reset(token)
+    return {
+        "latency_ms": latency_ms,
+        "model_ms": model_ms,
+        "model_calls": len(spent),
+        "queries": queries,
+        "db_ms": db_ms,
+        "failed": reply is None or reply.content == OPENAI_ERROR_REPLY,
+    }
+
+
+async def run_pipeline(session_factory, config: PipelineConfig) -> dict:
+    from ai_assistant.services import ChatService
+
+    conversation_ids = []
+    async with session_factory() as db:
+        for index in range(config.conversations):
+            conv = await ChatService.get_or_create_conversation(db, session_id=f"bench-pipeline-{index}")
+            conversation_ids.append(conv.id)
+        await db.commit()
+
+    def question(index: int, i: int) -> str:
+        return f"{CHAT_QUESTIONS[(index + i) % len(CHAT_QUESTIONS)]} ({i})"
+
+    async def warm(index: int, conversation_id: int):
+        for i in range(config.warmup):
+            await _turn(session_factory, conversation_id, question(index, i))
+
+    await asyncio.gather(*(warm(index, cid) for index, cid in enumerate(conversation_ids)))
+
+    turns: list[dict] = []
+
+    async def worker(index: int, conversation_id: int):
+        for i in range(config.warmup + index, config.warmup + config.turns, config.conversations):
+            turns.append(await _turn(session_factory, conversation_id, question(index, i)))
+
+    with timed_model_calls():
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index, cid) for index, cid in enumerate(conversation_ids)))
+        elapsed = time.perf_counter() - started
+
+    return summarize_turns(turns, elapsed)
+
+
+def summarize_turns(turns: list[dict], elapsed_s: float) -> dict:
+    failed = sum(t["failed"] for t in turns)
+    result = summarize([t["latency_ms"] for t in turns], failed, elapsed_s)
+    model = sorted(t["model_ms"] for t in turns)
+    overhead = sorted(max(t["latency_ms"] - t["model_ms"], 0.0) for t in turns)
+    total_latency = sum(t["latency_ms"] for t in turns)
+    count = len(turns) or 1
+    result.update({
+        "model_calls": sum(t["model_calls"] for t in turns),
+        "model_p50_ms": round(percentile(model, 50), 3),
+        "model_p95_ms": round(percentile(model, 95), 3),
+        "overhead_p50_ms": round(percentile(overhead, 50), 3),
+        "overhead_p95_ms": round(percentile(overhead, 95), 3),
+        "overhead_share": round(sum(overhead) / total_latency, 3) if total_latency else 0.0,
+        "queries_per_turn": round(sum(t["queries"] for t in turns) / count, 2),
+        "queries_per_turn_max": max((t["queries"] for t in turns), default=0),
+        "db_ms_per_turn": round(sum(t["db_ms"] for t in turns) / count, 3),
+        "app": "ai_assistant",
+    })
+    return result
+
+
+def format_pipeline(result: dict) -> str:
+    return "\n".join([
+        f"turns {result['requests']}, failed {result['errors']}, {result['rps']:.1f} turns/s, "
+        f"{result['model_calls']} model calls",
+        f"latency   p50 {result['p50_ms']:>9.2f}  p95 {result['p95_ms']:>9.2f}  p99 {result['p99_ms']:>9.2f} ms",
+        f"model     p50 {result['model_p50_ms']:>9.2f}  p95 {result['model_p95_ms']:>9.2f} ms",
+        f"overhead  p50 {result['overhead_p50_ms']:>9.2f}  p95 {result['overhead_p95_ms']:>9.2f} ms"
+        f"  ({result['overhead_share'] * 100:.1f}% of turn time)",
+        f"SQL per turn {result['queries_per_turn']} (max {result['queries_per_turn_max']}), "
+        f"{result['db_ms_per_turn']:.2f} ms",
+    ])
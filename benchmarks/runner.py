@@ -0,0 +1,210 @@
+"""
+Scenario runner, latency statistics and baseline comparison.
+"""
+import asyncio
+import platform
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+from benchmarks.dataset import Dataset
+from benchmarks.scenarios import Scenario, VirtualUser
+
+# Metrics compared against the baseline; True = higher is better
+COMPARED_METRICS = {
+    "rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+@dataclass
+class RunConfig:
+    iterations: int = 200
+    warmup: int = 20
+    concurrency: int = 8
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Linear interpolation between closest ranks (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies_ms: list[float], errors: int, elapsed_s: float) -> dict:
+    values = sorted(latencies_ms)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "elapsed_s": round(elapsed_s, 3),
+        "rps": round(len(values) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def _make_users(count: int, scenario: Scenario) -> list[VirtualUser]:
+    users = []
+    for index in range(count):
+        session_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"localtea-bench/{scenario.name}/{index}"))
+        users.append(VirtualUser(
+            index=index,
+            session_id=session_id,
+            headers={
+                "X-Session-ID": session_id,
+                # Likes are keyed by IP + User-Agent fingerprint
+                "User-Agent": f"localtea-bench/{scenario.name}/{index}",
+            },
+        ))
+    return users
+
+
+async def run_scenario(scenario: Scenario, app, dataset: Dataset, config: RunConfig) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        users = _make_users(config.concurrency, scenario)
+        latencies: list[float] = []
+        errors = 0
+        error_samples: list[str] = []
+
+        async def one(user: VirtualUser, i: int, record: bool):
+            nonlocal errors
+            if scenario.prepare is not None:
+                await scenario.prepare(client, user, dataset, i)
+            started = time.perf_counter()
+            response = await scenario.request(client, user, dataset, i)
+            duration_ms = (time.perf_counter() - started) * 1000
+            if not record:
+                return
+            latencies.append(duration_ms)
+            if response.status_code >= 400:
+                errors += 1
+                if len(error_samples) < 3:
+                    error_samples.append(f"{response.status_code}: {response.text[:200]}")
+
+        async def worker(user: VirtualUser, iterations: range, record: bool):
+            for i in iterations:
+                await one(user, i, record)
+
+        def split(total: int) -> list[range]:
+            # Iterations numbered globally so the dataset spread doesn't depend on concurrency
+            return [range(w, total, config.concurrency) for w in range(config.concurrency)]
+
+        await asyncio.gather(*(worker(u, r, False) for u, r in zip(users, split(config.warmup))))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(u, r, True) for u, r in zip(users, split(config.iterations))))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, errors, elapsed)
+    result["app"] = scenario.app
+    if error_samples:
+        result["error_samples"] = error_samples
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def build_report(results: dict, config: RunConfig, database: str, llm_latency_ms: float) -> dict:
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database,
+            "iterations": config.iterations,
+            "warmup": config.warmup,
+            "concurrency": config.concurrency,
+            "llm_latency_ms": llm_latency_ms,
+        },
+        "scenarios": results,
+    }
+
+
+# ---------- Comparison ----------
+
+def compare(baseline: dict, current: dict, threshold: float = 0.15) -> dict:
+    """
+    Relative change per scenario and metric. A metric regresses when it is
+    worse than the baseline by more than `threshold` (0.15 = 15%).
+    """
+    rows = []
+    regressions = []
+    base_scenarios = baseline.get("scenarios", {})
+    for name, cur in current.get("scenarios", {}).items():
+        base = base_scenarios.get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), cur.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            row = {
+                "scenario": name,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change_pct": round(change * 100, 1),
+                "regression": worse > threshold,
+            }
+            rows.append(row)
+            if row["regression"]:
+                regressions.append(row)
+        if cur.get("errors") and not base.get("errors"):
+            regressions.append({"scenario": name, "metric": "errors", "baseline": 0, "current": cur["errors"],
+                                "change_pct": None, "regression": True})
+    return {"threshold_pct": threshold * 100, "rows": rows, "regressions": regressions}
+
+
+def format_comparison(comparison: dict) -> str:
+    lines = [f"{'scenario':<18} {'metric':<8} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for row in comparison["rows"]:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['scenario']:<18} {row['metric']:<8} {row['baseline']:>10} {row['current']:>10} "
+            f"{row['change_pct']:>+7.1f}%{flag}"
+        )
+    for row in comparison["regressions"]:
+        if row["metric"] == "errors":
+            lines.append(f"{row['scenario']:<18} errors: {row['current']} (baseline had none)  REGRESSION")
+    verdict = (
+        f"{len(comparison['regressions'])} regression(s) over {comparison['threshold_pct']:.0f}%"
+        if comparison["regressions"] else "no regressions"
+    )
+    lines.append(verdict)
+    return "\n".join(lines)
+
+
+def format_results(report: dict) -> str:
+    lines = [f"{'scenario':<18} {'req':>5} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, r in report["scenarios"].items():
+        lines.append(
+            f"{name:<18} {r['requests']:>5} {r['errors']:>4} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,146 @@
+"""
+Benchmark scenarios. Each scenario is one timed request; `prepare` runs
+before it untimed (e.g. filling the cart before checkout).
+
+Every virtual user (worker) has its own anonymous session (X-Session-ID) and
+its own User-Agent, so carts, likes and conversations don't collide.
+"""
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.dataset import CHAT_QUESTIONS, Dataset
+
+
+@dataclass
+class VirtualUser:
+    index: int
+    session_id: str
+    headers: dict
+    state: dict = field(default_factory=dict)
+
+
+RequestFn = Callable[[httpx.AsyncClient, VirtualUser, Dataset, int], Awaitable[httpx.Response]]
+PrepareFn = Callable[[httpx.AsyncClient, VirtualUser, Dataset, int], Awaitable[None]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    app: str  # "backend" | "ai_assistant"
+    request: RequestFn
+    prepare: Optional[PrepareFn] = None
+    description: str = ""
+
+
+def _pick(items: list, user: VirtualUser, i: int):
+    # Deterministic spread over the dataset, different per worker
+    return items[(user.index * 7919 + i * 31) % len(items)]
+
+
+# ---------- Catalog ----------
+
+async def catalog_list(client, user, data, i):
+    return await client.get("/api/v1/catalog/products", params={"page": i % 5 + 1, "limit": 20}, headers=user.headers)
+
+
+async def catalog_category_filter(client, user, data, i):
+    category_id = _pick(data.category_ids, user, i)
+    return await client.get("/api/v1/catalog/products", params={"category_id": category_id}, headers=user.headers)
+
+
+async def product_detail(client, user, data, i):
+    slug = _pick(data.product_slugs, user, i)
+    return await client.get(f"/api/v1/catalog/products/{slug}", headers=user.headers)
+
+
+# ---------- Cart ----------
+
+async def cart_add_item(client, user, data, i):
+    sku_id = _pick(data.sku_ids, user, i)
+    return await client.post("/api/v1/cart/items", json={"sku_id": sku_id, "quantity": 1}, headers=user.headers)
+
+
+async def cart_get(client, user, data, i):
+    return await client.get("/api/v1/cart", headers=user.headers)
+
+
+async def _fill_cart(client, user, data, i):
+    for offset in range(3):
+        sku_id = _pick(data.sku_ids, user, i + offset)
+        response = await client.post("/api/v1/cart/items", json={"sku_id": sku_id, "quantity": 1}, headers=user.headers)
+        response.raise_for_status()
+
+
+async def checkout(client, user, data, i):
+    return await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "delivery_method": "pickup",
+            "payment_method": "card",
+            "contact_info": {
+                "firstname": "Bench",
+                "lastname": "User",
+                "email": f"bench{user.index}@example.com",
+                "phone": "+79990000000",
+            },
+        },
+        headers=user.headers,
+    )
+
+
+# ---------- Interactions ----------
+
+async def like_toggle(client, user, data, i):
+    product_id = _pick(data.product_ids, user, i)
+    return await client.post("/api/v1/interactions/likes", json={"product_id": product_id}, headers=user.headers)
+
+
+# ---------- AI chat ----------
+
+async def _ensure_conversation(client, user, data, i):
+    if "conversation_id" in user.state:
+        return
+    response = await client.post(
+        "/api/v1/chat/conversations", json={"message": CHAT_QUESTIONS[0]}, headers=user.headers,
+    )
+    response.raise_for_status()
+    user.state["conversation_id"] = response.json()["id"]
+
+
+async def chat_message(client, user, data, i):
+    conversation_id = user.state["conversation_id"]
+    question = CHAT_QUESTIONS[(user.index + i) % len(CHAT_QUESTIONS)]
+    return await client.post(
+        f"/api/v1/chat/conversations/{conversation_id}/messages",
+        json={"content": question},
+        headers=user.headers,
+    )
+
+
+async def chat_message_stream(client, user, data, i):
+    conversation_id = user.state["conversation_id"]
+    question = CHAT_QUESTIONS[(user.index + i) % len(CHAT_QUESTIONS)]
+    return await client.post(
+        f"/api/v1/chat/conversations/{conversation_id}/messages/stream",
+        json={"content": question},
+        headers=user.headers,
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    s.name: s for s in [
+        Scenario("catalog_list", "backend", catalog_list, description="GET /catalog/products, paginated"),
+        Scenario("catalog_category", "backend", catalog_category_filter, description="GET /catalog/products?category_id="),
+        Scenario("product_detail", "backend", product_detail, description="GET /catalog/products/{slug}"),
+        Scenario("cart_add_item", "backend", cart_add_item, description="POST /cart/items"),
+        Scenario("cart_get", "backend", cart_get, description="GET /cart (cart filled by cart_add_item)"),
+        Scenario("checkout", "backend", checkout, prepare=_fill_cart, description="POST /orders/checkout with 3 items"),
+        Scenario("like_toggle", "backend", like_toggle, description="POST /interactions/likes"),
+        Scenario("chat_message", "ai_assistant", chat_message, prepare=_ensure_conversation,
+                 description="POST /chat/conversations/{id}/messages, mocked LLM"),
+        Scenario("chat_message_stream", "ai_assistant", chat_message_stream, prepare=_ensure_conversation,
+                 description="POST /chat/conversations/{id}/messages/stream (whole SSE body), mocked LLM"),
+    ]
+}
@@ -12,7 +12,23 @@ import os
 from datetime import datetime
 import base64
 
+from backend.core.loop_monitor import loop_monitor, router as loop_monitor_router
+from backend.core.metrics import MetricsMiddleware, router as metrics_router, track_provider
+
 app = FastAPI(title="Honeypot Service", docs_url=None, redoc_url=None)
+app.include_router(loop_monitor_router)
+app.include_router(metrics_router)
+app.add_middleware(MetricsMiddleware, app_name="honeypot")
+
+
+@app.on_event("startup")
+async def startup():
+    loop_monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await loop_monitor.stop()
 
 # CORS для фронтенда
 app.add_middleware(
@@ -55,8 +71,9 @@ class HoneypotReport(BaseModel):
 def get_ip_info(ip: str) -> dict:
     """Получаем информацию об IP"""
     try:
-        with httpx.Client(timeout=5) as client:
+        with httpx.Client(timeout=5) as client, track_provider("ip-api", "lookup") as call:
             response = client.get(f"http://ip-api.com/json/{ip}?lang=ru")
+            call.status(response.status_code)
             if response.status_code == 200:
                 return response.json()
     except:
@@ -76,28 +93,32 @@ async def send_telegram_message(text: str, photo_base64: Optional[str] = None):
                 # Отправляем фото с подписью
                 photo_bytes = base64.b64decode(photo_base64.split(",")[-1])
                 
-                response = await client.post(
-                    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendPhoto",
-                    data={
-                        "chat_id": TELEGRAM_CHAT_ID,
-                        "caption": text[:1024],  # Лимит подписи
-                        "parse_mode": "HTML",
-                    },
-                    files={"photo": ("intruder.jpg", photo_bytes, "image/jpeg")},
-                    timeout=30
-                )
+                with track_provider("telegram", "sendPhoto") as call:
+                    response = await client.post(
+                        f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendPhoto",
+                        data={
+                            "chat_id": TELEGRAM_CHAT_ID,
+                            "caption": text[:1024],  # Лимит подписи
+                            "parse_mode": "HTML",
+                        },
+                        files={"photo": ("intruder.jpg", photo_bytes, "image/jpeg")},
+                        timeout=30
+                    )
+                    call.status(response.status_code)
             else:
                 # Просто текст
-                response = await client.post(
-                    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                    json={
-                        "chat_id": TELEGRAM_CHAT_ID,
-                        "text": text,
-                        "parse_mode": "HTML",
-                        "disable_web_page_preview": True,
-                    },
-                    timeout=10
-                )
+                with track_provider("telegram", "sendMessage") as call:
+                    response = await client.post(
+                        f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
+                        json={
+                            "chat_id": TELEGRAM_CHAT_ID,
+                            "text": text,
+                            "parse_mode": "HTML",
+                            "disable_web_page_preview": True,
+                        },
+                        timeout=10
+                    )
+                    call.status(response.status_code)
             
             return response.status_code == 200
         except Exception as e:
@@ -112,15 +133,17 @@ async def send_location(latitude: float, longitude: float):
     
     async with httpx.AsyncClient() as client:
         try:
-            response = await client.post(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendLocation",
-                json={
-                    "chat_id": TELEGRAM_CHAT_ID,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                },
-                timeout=10
-            )
+            with track_provider("telegram", "sendLocation") as call:
+                response = await client.post(
+                    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendLocation",
+                    json={
+                        "chat_id": TELEGRAM_CHAT_ID,
+                        "latitude": latitude,
+                        "longitude": longitude,
+                    },
+                    timeout=10
+                )
+                call.status(response.status_code)
             return response.status_code == 200
         except:
             return False
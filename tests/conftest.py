@@ -161,3 +161,77 @@ def mock_redis(monkeypatch):
     monkeypatch.setattr("backend.core.cache.redis_client", mock_client)
     return mock_client
 
+
+# --- SQL query budgets (N+1 guard) ---
+from backend.core.query_profiler import install_query_profiler, profile_queries
+
+install_query_profiler()
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    """
+    @pytest.mark.query_budget(max_queries, max_repeats=None) — counts only the
+    queries of the test body (fixtures are excluded).
+    """
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        return (yield)
+
+    max_queries = marker.args[0] if marker.args else marker.kwargs.get("max_queries")
+    max_repeats = marker.kwargs.get("max_repeats")
+    with profile_queries(capture_all=True) as profile:
+        result = yield
+
+    if max_queries is not None and profile.count > max_queries:
+        raise AssertionError(
+            f"Query budget exceeded: {profile.count} > {max_queries}\n"
+            + "\n".join(f"  {n}x {shape}" for shape, n in profile.shapes.most_common(10))
+        )
+    if max_repeats is not None:
+        repeated = profile.repeated(max_repeats + 1)
+        if repeated:
+            raise AssertionError(
+                f"Possible N+1: statement repeated more than {max_repeats} times\n"
+                + "\n".join(f"  {n}x {shape}" for shape, n in repeated)
+            )
+    return result
+
+
+@pytest.fixture
+def query_counter():
+    """Context manager counting queries of a block: `with query_counter() as q: ...; assert q.count <= 3`."""
+    return lambda: profile_queries(capture_all=True)
+
+
+# --- SQLite and in-memory Redis (tests that don't need Postgres) ---
+from benchmarks.environment import FakeAsyncRedis, bench_environment, create_engine as create_sqlite_engine, reset_schema
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """In-memory Redis (lists, locks, pub/sub) installed as backend.core.cache.redis_client."""
+    redis = FakeAsyncRedis()
+    monkeypatch.setattr("backend.core.cache.redis_client", redis)
+    return redis
+
+
+@pytest_asyncio.fixture
+async def sqlite_engine(tmp_path):
+    """Full schema on a SQLite file in the test's tmp_path."""
+    engine = create_sqlite_engine(None, str(tmp_path))
+    await reset_schema(engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(sqlite_engine, fake_redis):
+    return sessionmaker(sqlite_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def bench_env(sqlite_engine):
+    """Both apps pointed at `sqlite_engine` with external services faked; yields the fakes."""
+    async with bench_environment(sqlite_engine) as fakes:
+        yield fakes
@@ -0,0 +1,35 @@
+import pytest
+
+from ai_assistant import answer_cache
+
+CONFIG = {"model": "gpt-4o-mini", "temperature": 0.7, "system_prompt": "Ты чайный консультант"}
+
+
+async def key(question, config=CONFIG, rag_version="v1", similarity=0.0):
+    return await answer_cache.make_key(question, config, rag_version, ttl=60, similarity=similarity)
+
+
+@pytest.mark.asyncio
+async def test_exact_hits_ignore_case_and_punctuation(fake_redis):
+    first = await key("Сколько идёт доставка?")
+    assert await answer_cache.lookup(first) is None
+    await answer_cache.store(first, "2–3 дня")
+
+    assert await answer_cache.lookup(await key("  сколько ИДЕТ доставка ")) == "2–3 дня"
+    # Different context or settings: separate entries
+    assert await answer_cache.lookup(await key("Сколько идёт доставка?", rag_version="v2")) is None
+    assert await answer_cache.lookup(await key("Сколько идёт доставка?", {**CONFIG, "temperature": 0.2})) is None
+    assert await answer_cache.make_key("?!", CONFIG, "v1", ttl=60) is None
+
+    await answer_cache.invalidate()
+    assert await answer_cache.lookup(await key("Сколько идёт доставка?")) is None
+    assert await answer_cache.counters() == (1, 4)
+
+
+@pytest.mark.asyncio
+async def test_near_duplicates_need_opt_in(fake_redis):
+    await answer_cache.store(await key("какая температура воды для пуэра"), "95°C")
+
+    assert await answer_cache.lookup(await key("какая температура воды для пуэра нужна")) is None
+    assert await answer_cache.lookup(await key("какая температура воды для пуэра нужна", similarity=0.8)) == "95°C"
+    assert await answer_cache.lookup(await key("как оплатить заказ", similarity=0.8)) is None
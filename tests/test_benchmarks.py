@@ -0,0 +1,76 @@
+import httpx
+import pytest
+
+from ai_assistant.services import OpenAIClient
+from benchmarks.mock_openai import MockLLMConfig, MockLLMServer
+from benchmarks.pipeline import summarize_turns
+from benchmarks.runner import compare, percentile, summarize
+
+
+def test_percentile_interpolates():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.5
+    assert percentile(values, 99) == 99.01
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_counts_errors_and_throughput():
+    result = summarize([10.0, 20.0, 30.0, 40.0], errors=1, elapsed_s=2.0)
+    assert result["requests"] == 4
+    assert result["errors"] == 1
+    assert result["rps"] == 2.0
+    assert result["p50_ms"] == 25.0
+
+
+def test_compare_flags_regressions():
+    baseline = {"scenarios": {
+        "catalog_list": {"rps": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "errors": 0},
+        "checkout": {"rps": 10, "p50_ms": 100, "p95_ms": 200, "p99_ms": 300, "errors": 0},
+    }}
+    current = {"scenarios": {
+        # Faster: not a regression
+        "catalog_list": {"rps": 130, "p50_ms": 8, "p95_ms": 15, "p99_ms": 25, "errors": 0},
+        # p95 +50%, and new errors
+        "checkout": {"rps": 10, "p50_ms": 105, "p95_ms": 300, "p99_ms": 310, "errors": 2},
+    }}
+
+    result = compare(baseline, current, threshold=0.15)
+    flagged = {(r["scenario"], r["metric"]) for r in result["regressions"]}
+    assert flagged == {("checkout", "p95_ms"), ("checkout", "errors")}
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_serves_openai_client():
+    with MockLLMServer(MockLLMConfig(completion_tokens=5)) as server:
+        messages = [{"role": "user", "content": "Как заваривать пуэр?"}]
+        text, tokens = await OpenAIClient.chat_completion(messages, server.base_url, "key", max_tokens=3)
+        assert len(text.split()) == 3
+        assert tokens > 3
+
+        chunks = [c async for c in OpenAIClient.chat_completion_stream(messages, server.base_url, "key")]
+        assert "".join(delta for delta, _ in chunks).split() == "Пуэр лучше заваривать водой 95°C,".split()
+        assert chunks[-1][1] > 5
+        assert server.stats.requests == 2 and server.stats.streams == 1
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_injects_errors():
+    with MockLLMServer(MockLLMConfig(error_rate=1.0, error_status=429, retry_after=3)) as server:
+        with pytest.raises(httpx.HTTPStatusError) as error:
+            await OpenAIClient.chat_completion([{"role": "user", "content": "?"}], server.base_url, "key")
+    assert error.value.response.status_code == 429
+    assert error.value.response.headers["Retry-After"] == "3"
+    assert server.stats.errors == 1
+
+
+def test_pipeline_separates_model_time_from_overhead():
+    turns = [
+        {"latency_ms": 110.0, "model_ms": 100.0, "model_calls": 1, "queries": 10, "db_ms": 4.0, "failed": False},
+        {"latency_ms": 130.0, "model_ms": 100.0, "model_calls": 1, "queries": 12, "db_ms": 6.0, "failed": True},
+    ]
+    result = summarize_turns(turns, elapsed_s=1.0)
+    assert result["errors"] == 1
+    assert result["overhead_p50_ms"] == 20.0
+    assert result["overhead_share"] == round(40 / 240, 3)
+    assert result["queries_per_turn"] == 11
+    assert result["queries_per_turn_max"] == 12
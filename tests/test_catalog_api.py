@@ -34,6 +34,7 @@ async def catalog_data(db_session: AsyncSession):
     return {"category": category, "product": product, "sku": sku}
 
 @pytest.mark.asyncio
+@pytest.mark.query_budget(2)
 async def test_get_categories(client, catalog_data):
     response = await client.get("/api/v1/catalog/categories")
     assert response.status_code == 200
@@ -64,6 +65,7 @@ async def test_get_product_detail_not_found(client):
     assert response.status_code == 404
 
 @pytest.mark.asyncio
+@pytest.mark.query_budget(2)
 async def test_get_sku_detail(client, catalog_data):
     sku_id = catalog_data["sku"].id
     response = await client.get(f"/api/v1/catalog/skus/{sku_id}")
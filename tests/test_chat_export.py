@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ai_assistant import chat_export, message_archive
+from ai_assistant.models.assistant import AIConversation, AIConversationStatus, AIMessage, AIMessageRole
+
+
+async def _conversation(db, status, days_ago, messages) -> int:
+    created_at = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    closed_at = created_at if status == AIConversationStatus.CLOSED else None
+    conv = AIConversation(session_id="anon", status=status, created_at=created_at, closed_at=closed_at)
+    db.add(conv)
+    await db.flush()
+    for i in range(messages):
+        db.add(AIMessage(
+            conversation_id=conv.id,
+            role=AIMessageRole.USER if i % 2 == 0 else AIMessageRole.ASSISTANT,
+            content=f"Сообщение {i}, \"в кавычках\"",
+            created_at=created_at + timedelta(minutes=i),
+        ))
+    await db.commit()
+    return conv.id
+
+
+async def _collect(chunks) -> list[str]:
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_messages_export_includes_archive_and_filters(session_factory, monkeypatch):
+    monkeypatch.setattr(chat_export, "FLUSH_ROWS", 2)
+    async with session_factory() as db:
+        archived = await _conversation(db, AIConversationStatus.CLOSED, days_ago=200, messages=3)
+        active = await _conversation(db, AIConversationStatus.ACTIVE, days_ago=1, messages=5)
+        await message_archive.archive_conversations(db, datetime.now(timezone.utc) - timedelta(days=180))
+
+    async with session_factory() as db:
+        chunks = await _collect(chat_export.encode(
+            chat_export.message_rows(db), chat_export.MESSAGE_FIELDS, "jsonl",
+        ))
+        assert len(chunks) == 4  # Sent in FLUSH_ROWS pieces, not as one body
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        assert [r["conversation_id"] for r in rows] == [archived] * 3 + [active] * 5
+        assert rows[0]["role"] == "user" and rows[0]["content"] == "Сообщение 0, \"в кавычках\""
+
+        since = datetime.now(timezone.utc) - timedelta(days=30)
+        rows = [r async for r in chat_export.message_rows(db, date_from=since)]
+        assert {r["conversation_id"] for r in rows} == {active}
+        rows = [r async for r in chat_export.message_rows(db, status=AIConversationStatus.CLOSED)]
+        assert {r["conversation_id"] for r in rows} == {archived}
+        rows = [r async for r in chat_export.message_rows(db, date_to=since)]
+        assert [r["content"][:11] for r in rows] == ["Сообщение 0", "Сообщение 1", "Сообщение 2"]
+
+
+@pytest.mark.asyncio
+async def test_conversations_export_csv(session_factory):
+    async with session_factory() as db:
+        await _conversation(db, AIConversationStatus.CLOSED, days_ago=40, messages=0)
+        active = await _conversation(db, AIConversationStatus.ACTIVE, days_ago=1, messages=0)
+
+    async with session_factory() as db:
+        body = "".join(await _collect(chat_export.encode(
+            chat_export.conversation_rows(db, status=AIConversationStatus.ACTIVE),
+            chat_export.CONVERSATION_FIELDS, "csv",
+        )))
+    assert body.startswith("\ufeff")
+    rows = list(csv.DictReader(io.StringIO(body[1:])))
+    assert [(r["id"], r["status"], r["user_email"]) for r in rows] == [(str(active), "active", "")]
@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import pytest
+
+from ai_assistant import conversation_events
+from ai_assistant.models.assistant import AIConversation, AIConversationStatus, AIMessage, AIMessageRole
+
+
+@pytest.mark.asyncio
+async def test_published_updates_reach_subscribers(monkeypatch, fake_redis):
+    monkeypatch.setattr(conversation_events, "KEEPALIVE_SECONDS", 0.05)
+
+    updates = conversation_events.subscribe(7)
+    assert await updates.__anext__() is None  # Subscribed
+    assert await updates.__anext__() is None  # Keep-alive while idle
+
+    conv = AIConversation(id=7, status=AIConversationStatus.MANAGER_CONNECTED)
+    msg = AIMessage(id=42, conversation_id=7, role=AIMessageRole.MANAGER, content="Добрый день")
+    await conversation_events.publish(None, conv, msg)
+    await fake_redis.publish(conversation_events.channel(8), json.dumps({"status": "closed"}))
+
+    update = await asyncio.wait_for(updates.__anext__(), 1)
+    assert update == {
+        "status": "manager_connected",
+        "manager_name": None,
+        "manager_avatar_url": None,
+        "messages": [{"id": 42, "role": "manager", "content": "Добрый день", "created_at": None}],
+    }
+
+    await updates.aclose()
+    assert not fake_redis.subscribers[conversation_events.channel(7)]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from ai_assistant import conversation_lock
+
+
+@pytest.mark.asyncio
+async def test_generation_lock_serializes_turns(monkeypatch, fake_redis):
+    monkeypatch.setattr(conversation_lock, "POLL_SECONDS", 0.001)
+    running = 0
+    overlaps = []
+
+    async def turn(conversation_id):
+        nonlocal running
+        async with conversation_lock.generation_lock(conversation_id) as acquired:
+            assert acquired
+            running += 1
+            overlaps.append(running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(turn(1) for _ in range(4)))
+    assert overlaps == [1, 1, 1, 1]
+
+    overlaps.clear()
+    await asyncio.gather(turn(1), turn(2))
+    assert 2 in overlaps  # Different conversations don't wait for each other
+
+
+@pytest.mark.asyncio
+async def test_resubmission_attaches_to_first_request(monkeypatch, fake_redis):
+    monkeypatch.setattr(conversation_lock, "POLL_SECONDS", 0.001)
+
+    first = conversation_lock.Submission(5, "Сколько стоит доставка?")
+    assert await first.claim()
+    resubmitted = conversation_lock.Submission(5, "Сколько стоит доставка? ")
+    assert not await resubmitted.claim()
+    assert await conversation_lock.Submission(6, "Сколько стоит доставка?").claim()
+
+    waiting = asyncio.create_task(resubmitted.wait())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    await first.complete(10, 11)
+    assert await waiting == (10, 11)
+
+    failed = conversation_lock.Submission(5, "Другой вопрос")
+    assert await failed.claim()
+    waiting = asyncio.create_task(conversation_lock.Submission(5, "Другой вопрос").wait())
+    await failed.abandon()
+    assert await waiting is None
+
+
+@pytest.mark.asyncio
+async def test_queued_messages_get_the_reply_that_covered_them(fake_redis):
+    await conversation_lock.record_turn(3, answered_up_to=3, reply_id=7)  # Turn for #3 only
+    await conversation_lock.record_turn(3, answered_up_to=6, reply_id=8)  # #4..#6 coalesced
+
+    assert await conversation_lock.answered_up_to(3) == 6
+    assert await conversation_lock.reply_for(3, 3) == 7
+    assert await conversation_lock.reply_for(3, 4) == 8
+    assert await conversation_lock.reply_for(3, 6) == 8
+    assert await conversation_lock.reply_for(3, 9) is None
@@ -0,0 +1,75 @@
+import pytest
+
+from ai_assistant.models.assistant import AIConversation, AIMessage, AIMessageRole
+from ai_assistant.services import ChatService
+from backend.models.user import User
+
+
+@pytest.mark.asyncio
+async def test_last_message_is_kept_on_the_conversation(session_factory):
+    async with session_factory() as db:
+        conv = AIConversation(session_id="anon")
+        db.add(conv)
+        await db.flush()
+        db.add(AIMessage(conversation_id=conv.id, role=AIMessageRole.USER, content="Как заваривать улун?"))
+        db.add(AIMessage(conversation_id=conv.id, role=AIMessageRole.ASSISTANT, content="Улун — " + "чай " * 100))
+        await db.commit()
+        conv_id = conv.id
+
+    async with session_factory() as db:
+        # A message added without the conversation loaded in the session
+        db.add(AIMessage(conversation_id=conv_id, role=AIMessageRole.MANAGER, content="Менеджер на связи"))
+        await db.commit()
+        conv = await db.get(AIConversation, conv_id)
+        assert conv.last_message_preview == "Менеджер на связи"
+        assert conv.last_message_at is not None
+
+    async with session_factory() as db:
+        db.add(AIMessage(conversation_id=conv_id, role=AIMessageRole.ASSISTANT, content="Улун — " + "чай " * 100))
+        await db.commit()
+        conv = await db.get(AIConversation, conv_id)
+        assert len(conv.last_message_preview) == 200
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_is_two_queries(session_factory, query_counter):
+    async with session_factory() as db:
+        users = [User(username=f"user{i}", email=f"user{i}@tea.example", hashed_password="x") for i in range(3)]
+        db.add_all(users)
+        await db.flush()
+        for i in range(30):
+            conv = AIConversation(user_id=users[i % 3].id if i % 2 else None, session_id=f"s{i}", title=f"Вопрос {i}")
+            db.add(conv)
+            await db.flush()
+            db.add(AIMessage(conversation_id=conv.id, role=AIMessageRole.USER, content=f"Сообщение {i}"))
+        await db.commit()
+
+    async with session_factory() as db:
+        with query_counter() as queries:
+            rows, total = await ChatService.get_conversations(db, limit=200)
+        assert queries.count == 2
+        assert total == 30
+        by_title = {conv.title: (conv.last_message_preview, email) for conv, email, _ in rows}
+        assert by_title["Вопрос 1"] == ("Сообщение 1", "user1@tea.example")
+        assert by_title["Вопрос 2"] == ("Сообщение 2", None)
+
+        rows, total = await ChatService.get_conversations(db, search="user2@tea")
+        assert total == 5 and {conv.user_id for conv, _, _ in rows} == {users[2].id}
+        rows, total = await ChatService.get_conversations(db, search="прос 1")
+        assert total == 11  # "Вопрос 1", "Вопрос 10".."Вопрос 19"
+
+
+@pytest.mark.asyncio
+async def test_broad_user_search_is_not_capped(session_factory, query_counter):
+    async with session_factory() as db:
+        users = [User(username=f"buyer{i}", email=f"buyer{i}@gmail.example", hashed_password="x") for i in range(600)]
+        db.add_all(users)
+        await db.flush()
+        db.add_all(AIConversation(user_id=user.id, session_id=f"s{user.id}") for user in users)
+        await db.commit()
+
+    async with session_factory() as db:
+        with query_counter() as queries:
+            rows, total = await ChatService.get_conversations(db, search="gmail", limit=1000)
+        assert queries.count == 2
+        assert total == len(rows) == 600
@@ -0,0 +1,55 @@
+import pytest
+
+from ai_assistant import conversation_summary
+from ai_assistant.models.assistant import AIConversation, AIMessage, AIMessageRole
+from ai_assistant.services import OpenAIClient
+
+
+def _message(id, role, words):
+    return AIMessage(id=id, role=role, content=" ".join(["чай"] * words))
+
+
+def test_fit_keeps_newest_messages_within_budget():
+    messages = [_message(i, AIMessageRole.USER if i % 2 else AIMessageRole.ASSISTANT, 30) for i in range(1, 7)]
+    per_message = conversation_summary.message_tokens(messages[0])
+
+    left_out, kept = conversation_summary.fit(messages, per_message * 2 + 1)
+    assert [m.id for m in left_out] == [1, 2, 3, 4]
+    assert [m.id for m in kept] == [5, 6]
+
+    # Pending user messages stay even over budget
+    left_out, kept = conversation_summary.fit(messages, per_message, keep_last=3)
+    assert [m.id for m in kept] == [4, 5, 6]
+
+
+@pytest.mark.asyncio
+async def test_refresh_folds_old_messages_into_summary(monkeypatch, session_factory):
+    monkeypatch.setattr("backend.db.session.AsyncSessionLocal", session_factory)
+    prompts = []
+
+    async def chat_completion(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return "Клиент выбирает шэн пуэр до 2000 ₽.", 50
+
+    monkeypatch.setattr(OpenAIClient, "chat_completion", chat_completion)
+
+    async with session_factory() as db:
+        conv = AIConversation(total_tokens_used=100)
+        db.add(conv)
+        await db.flush()
+        for i in range(10):
+            role = AIMessageRole.USER if i % 2 == 0 else AIMessageRole.ASSISTANT
+            db.add(AIMessage(conversation_id=conv.id, role=role, content=f"Сообщение {i} " + "чай " * 40))
+        await db.commit()
+
+    llm = conversation_summary.SummaryModel(base_url="", api_key="", model="m")
+    budget = 4 * conversation_summary.message_tokens(AIMessage(content="Сообщение 9 " + "чай " * 40)) + 1
+    await conversation_summary.refresh(conv.id, budget=budget, max_messages=20, llm=llm)
+
+    async with session_factory() as db:
+        conv = await db.get(AIConversation, conv.id)
+        assert conv.summary == "Клиент выбирает шэн пуэр до 2000 ₽."
+        assert conv.total_tokens_used == 150
+        # Half of the budget holds the last 2 messages
+        assert conv.summary_until_id == 8
+    assert "Сообщение 0" in prompts[0] and "Сообщение 7" in prompts[0] and "Сообщение 8" not in prompts[0]
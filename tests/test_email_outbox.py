@@ -0,0 +1,240 @@
+import json
+import smtplib
+import time
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis.exceptions import LockNotOwnedError
+
+from backend.core.config import settings
+from backend.utils.email import get_template_env, render_email_template
+from backend.utils import email_outbox
+from backend.utils.email_outbox import DEAD_KEY, DRAIN_LOCK_KEY, EmailOutbox, OUTBOX_KEY, RETRY_KEY
+
+
+class FakeRedis:
+    """Minimal in-memory subset of the sync Redis API used by EmailOutbox."""
+
+    def __init__(self):
+        self.lists = {}
+        self.zsets = {}
+        self.values = {}
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def lpop(self, key):
+        items = self.lists.get(key) or []
+        return items.pop(0) if items else None
+
+    def lmove(self, src, dest, wherefrom, whereto):
+        items = self.lists.get(src) or []
+        if not items:
+            return None
+        value = items.pop(0 if wherefrom == "LEFT" else -1)
+        target = self.lists.setdefault(dest, [])
+        target.insert(0, value) if whereto == "LEFT" else target.append(value)
+        return value
+
+    def lrem(self, key, count, value):
+        items = self.lists.get(key) or []
+        if value in items:
+            items.remove(value)
+            return 1
+        return 0
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrangebyscore(self, key, lo, hi):
+        return [m for m, s in sorted(self.zsets.get(key, {}).items(), key=lambda x: x[1]) if lo <= s <= hi]
+
+    def zrem(self, key, member):
+        return 1 if self.zsets.get(key, {}).pop(member, None) is not None else 0
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    def expire(self, key, seconds):
+        pass
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def lock(self, name, timeout=None):
+        return FakeLock(self, name)
+
+
+class FakeLock:
+    """redis.lock.Lock subset: the key holds the owner's token."""
+
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+        self.token = uuid.uuid4().hex
+
+    def acquire(self, blocking=True):
+        return bool(self.redis.set(self.name, self.token, nx=True))
+
+    def reacquire(self):
+        if self.redis.values.get(self.name) != self.token:
+            raise LockNotOwnedError("not owned")
+
+    def release(self):
+        if self.redis.values.get(self.name) != self.token:
+            raise LockNotOwnedError("not owned")
+        self.redis.delete(self.name)
+
+
+@pytest.fixture
+def outbox():
+    return EmailOutbox(redis_client=FakeRedis())
+
+
+def test_template_environment_is_shared():
+    assert get_template_env() is get_template_env()
+    html = render_email_template("password_changed.html", "Тема", {"username": "u", "changed_at": "now"})
+    assert "u" in html
+
+
+def test_drain_reuses_single_smtp_session(outbox):
+    for i in range(3):
+        outbox.enqueue(f"user{i}@example.com", subject="Hi", body="<p>Hello</p>")
+
+    with patch("backend.utils.email.smtplib.SMTP_SSL") as smtp_cls:
+        stats = outbox.drain()
+
+    assert stats["sent"] == 3
+    assert smtp_cls.call_count == 1
+    server = smtp_cls.return_value
+    assert server.login.call_count == 1
+    assert server.sendmail.call_count == 3
+    assert outbox.size()["pending"] == 0
+
+
+def test_failed_send_is_retried_with_backoff(outbox, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+    outbox.enqueue("user@example.com", subject="Hi", body="x")
+
+    server = MagicMock()
+    server.sendmail.side_effect = smtplib.SMTPDataError(451, b"try later")
+    with patch("backend.utils.email.smtplib.SMTP_SSL", return_value=server):
+        stats = outbox.drain()
+        assert stats["retried"] == 1
+        assert outbox.size() == {"pending": 0, "processing": 0, "retry": 1, "dead": 0}
+
+        # Not due yet: nothing is promoted
+        assert outbox.promote_due_retries() == 0
+
+        # Make it due and fail again -> dead letter
+        for member in list(outbox.redis.zsets[RETRY_KEY]):
+            outbox.redis.zsets[RETRY_KEY][member] = time.time() - 1
+        outbox.drain()
+
+    assert outbox.size() == {"pending": 0, "processing": 0, "retry": 0, "dead": 1}
+
+
+def test_rate_limit_defers_remaining_messages(outbox, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_RATE_LIMIT_PER_MINUTE", 2)
+    for i in range(4):
+        outbox.enqueue(f"user{i}@example.com", subject="Hi", body="x")
+
+    with patch("backend.utils.email.smtplib.SMTP_SSL"):
+        stats = outbox.drain()
+
+    assert stats["sent"] == 2
+    assert stats["deferred"] == 1
+    assert outbox.redis.llen(OUTBOX_KEY) == 2
+
+
+def test_emails_in_flight_survive_a_worker_crash(outbox):
+    for i in range(3):
+        outbox.enqueue(f"user{i}@example.com", subject="Hi", body="x")
+
+    server = MagicMock()
+    server.sendmail.side_effect = [None, SystemExit("worker killed")]
+    with patch("backend.utils.email.smtplib.SMTP_SSL", return_value=server):
+        with pytest.raises(SystemExit):
+            outbox.drain()
+    assert outbox.size()["processing"] == 1
+
+    # The next drain (or a restarted worker) puts it back in front of the queue
+    assert outbox.recover() == 1
+    assert outbox.size() == {"pending": 2, "processing": 0, "retry": 0, "dead": 0}
+    with patch("backend.utils.email.smtplib.SMTP_SSL") as smtp_cls:
+        assert outbox.drain()["sent"] == 2
+    assert [call.args[1] for call in smtp_cls.return_value.sendmail.call_args_list] == [
+        "user1@example.com", "user2@example.com",
+    ]
+
+
+def test_permanent_failures_go_straight_to_dead_letter(outbox):
+    outbox.enqueue("user@example.com", subject="Hi", template_name="no_such_template.html")
+    outbox.enqueue("nobody@example.com", subject="Hi", body="x")
+
+    server = MagicMock()
+    server.sendmail.side_effect = smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"no such user")})
+    with patch("backend.utils.email.smtplib.SMTP_SSL", return_value=server):
+        stats = outbox.drain()
+
+    assert (stats["dead"], stats["retried"]) == (2, 0)
+    assert outbox.size() == {"pending": 0, "processing": 0, "retry": 0, "dead": 2}
+    assert all(json.loads(raw)["attempts"] == 0 for raw in outbox.redis.lists[DEAD_KEY])
+
+
+def test_drain_stops_when_its_lock_expires(outbox, monkeypatch):
+    for i in range(3):
+        outbox.enqueue(f"user{i}@example.com", subject="Hi", body="x")
+    clock = [1000.0]
+    monkeypatch.setattr(email_outbox.time, "monotonic", lambda: clock[0])
+
+    def slow_send(*args):
+        # The send outlives the lock, and another worker takes it over
+        clock[0] += email_outbox.DRAIN_LOCK_SECONDS + 1
+        outbox.redis.delete(DRAIN_LOCK_KEY)
+        outbox.redis.set(DRAIN_LOCK_KEY, "other-worker", nx=True)
+
+    server = MagicMock()
+    server.sendmail.side_effect = slow_send
+    with patch("backend.utils.email.smtplib.SMTP_SSL", return_value=server):
+        stats = outbox.drain()
+
+    assert stats["sent"] == 1  # Nothing more is taken without the lock
+    assert outbox.size() == {"pending": 2, "processing": 0, "retry": 0, "dead": 0}
+    assert outbox.redis.values[DRAIN_LOCK_KEY] == "other-worker"  # Not released by the first worker
+    assert outbox.recover() == 0
+
+
+def test_long_drain_renews_its_lock(outbox, monkeypatch):
+    for i in range(8):
+        outbox.enqueue(f"user{i}@example.com", subject="Hi", body="x")
+    clock = [1000.0]
+    monkeypatch.setattr(email_outbox.time, "monotonic", lambda: clock[0])
+
+    def slow_send(*args):
+        clock[0] += 50
+
+    server = MagicMock()
+    server.sendmail.side_effect = slow_send
+    with patch("backend.utils.email.smtplib.SMTP_SSL", return_value=server), \
+            patch.object(FakeLock, "reacquire", autospec=True, side_effect=FakeLock.reacquire) as reacquire:
+        assert outbox.drain()["sent"] == 8
+    assert reacquire.call_count == 1  # Once, with a send's margin left on the lock
+    assert DRAIN_LOCK_KEY not in outbox.redis.values
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.core.loop_monitor import LagHistogram, LoopLagMonitor
+
+
+def blocking_helper(seconds: float):
+    time.sleep(seconds)
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = LagHistogram(buckets=(10, 100))
+    for value in (1, 50, 500):
+        hist.observe(value)
+
+    snap = hist.snapshot()
+    assert [b["count"] for b in snap["buckets"]] == [1, 2, 3]
+    assert snap["count"] == 3
+    assert snap["max_ms"] == 500
+
+
+@pytest.mark.asyncio
+async def test_monitor_captures_blocking_call_site():
+    monitor = LoopLagMonitor(interval_ms=10, threshold_ms=50)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_helper(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    snap = monitor.snapshot()
+    assert snap["lag_ms"]["max_ms"] >= 250
+    top = snap["top_blocking_call_sites"]
+    assert top, "stall was not attributed to a call site"
+    assert "blocking_helper" in top[0]["call_site"]
+    assert top[0]["total_blocked_ms"] >= 250
+
+
+@pytest.mark.asyncio
+async def test_disabled_monitor_does_not_start():
+    monitor = LoopLagMonitor(enabled=False)
+    monitor.start()
+    assert monitor.snapshot()["running"] is False
+    await monitor.stop()
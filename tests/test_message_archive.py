@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from ai_assistant import message_archive
+from ai_assistant.models.assistant import (
+    AIConversation,
+    AIConversationArchive,
+    AIConversationStatus,
+    AIMessage,
+    AIMessageRole,
+)
+
+
+async def _conversation(db, status, closed_days_ago=None, messages=3) -> int:
+    closed_at = datetime.now(timezone.utc) - timedelta(days=closed_days_ago) if closed_days_ago is not None else None
+    conv = AIConversation(session_id="anon", status=status, closed_at=closed_at)
+    db.add(conv)
+    await db.flush()
+    for i in range(messages):
+        db.add(AIMessage(
+            conversation_id=conv.id,
+            role=AIMessageRole.USER if i % 2 == 0 else AIMessageRole.ASSISTANT,
+            content=f"Сообщение {i}",
+            was_filtered=i == 0,
+            original_content="исходный текст" if i == 0 else None,
+        ))
+    await db.commit()
+    return conv.id
+
+
+@pytest.mark.asyncio
+async def test_old_closed_conversations_are_archived(session_factory):
+    async with session_factory() as db:
+        old_closed = await _conversation(db, AIConversationStatus.CLOSED, closed_days_ago=200)
+        recent_closed = await _conversation(db, AIConversationStatus.CLOSED, closed_days_ago=10)
+        active = await _conversation(db, AIConversationStatus.ACTIVE)
+        updated_at = (await db.get(AIConversation, old_closed)).updated_at
+
+    async with session_factory() as db:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=180)
+        assert await message_archive.archive_conversations(db, cutoff) == 1
+        assert await message_archive.archive_conversations(db, cutoff) == 0
+
+    async with session_factory() as db:
+        live = dict((await db.execute(
+            select(AIMessage.conversation_id, func.count()).group_by(AIMessage.conversation_id)
+        )).all())
+        assert live == {recent_closed: 3, active: 3}
+        archive = await db.get(AIConversationArchive, old_closed)
+        assert archive.message_count == 3
+        assert len(archive.messages) < archive.size_bytes
+
+        conv = await db.get(AIConversation, old_closed)
+        assert conv.archived_at is not None
+        assert conv.updated_at == updated_at
+
+        # Readers see the archived messages, then those written after archival
+        db.add(AIMessage(conversation_id=old_closed, role=AIMessageRole.MANAGER, content="Мы снова на связи"))
+        await db.commit()
+        messages = await message_archive.conversation_messages(db, conv)
+        assert [m.content for m in messages] == ["Сообщение 0", "Сообщение 1", "Сообщение 2", "Мы снова на связи"]
+        assert messages[0].role == AIMessageRole.USER
+        assert messages[0].original_content == "исходный текст"
+        assert isinstance(messages[0].created_at, datetime)
+
+        since = await message_archive.conversation_messages(db, conv, since_id=messages[1].id)
+        assert [m.content for m in since] == ["Сообщение 2", "Мы снова на связи"]
+
+
+def test_partition_ddl_covers_one_utc_month():
+    assert message_archive.partition_ddl(date(2026, 12, 15)) == (
+        "CREATE TABLE IF NOT EXISTS ai_message_p202612 PARTITION OF ai_message "
+        "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')"
+    )
@@ -0,0 +1,138 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.core import metrics
+from backend.core.metrics import (
+    DB_POOL_CHECKOUT,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUESTS,
+    PROVIDER_LATENCY,
+    REDIS_LATENCY,
+    MetricsMiddleware,
+    MetricsRegistry,
+    instrument_db_pool,
+    instrument_redis,
+    track_provider,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    hist = registry.histogram("demo_seconds", "Demo.", ("kind",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        hist.observe(value, kind="a")
+
+    text_out = registry.render()
+    assert '# TYPE demo_seconds histogram' in text_out
+    assert 'demo_seconds_bucket{kind="a",le="0.1"} 1' in text_out
+    assert 'demo_seconds_bucket{kind="a",le="1"} 2' in text_out
+    assert 'demo_seconds_bucket{kind="a",le="+Inf"} 3' in text_out
+    assert 'demo_seconds_count{kind="a"} 3' in text_out
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_by_route_template(monkeypatch):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, app_name="test_app")
+    app.include_router(metrics.router)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    monkeypatch.setenv("METRICS_EXPOSE", "true")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for item_id in (1, 2, 3):
+            assert (await client.get(f"/items/{item_id}")).status_code == 200
+        assert (await client.get("/no/such/path")).status_code == 404
+        response = await client.get("/metrics")
+
+    assert HTTP_REQUESTS.value(app="test_app", method="GET", route="/items/{item_id}", status=200) == 3
+    assert HTTP_REQUESTS.value(app="test_app", method="GET", route=metrics.UNMATCHED_ROUTE, status=404) == 1
+    assert HTTP_IN_FLIGHT.value(app="test_app") == 0
+    # Scraped while the /metrics request itself was in flight
+    assert 'http_requests_in_flight{app="test_app"} 1' in response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/items/{item_id}"' in response.text
+    assert "/items/1" not in response.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_hidden_by_default(monkeypatch):
+    app = FastAPI()
+    app.include_router(metrics.router)
+    monkeypatch.delenv("METRICS_EXPOSE", raising=False)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/metrics")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_db_pool_checkout_is_timed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    instrument_db_pool(engine, name="test_pool")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await engine.dispose()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+    assert DB_POOL_CHECKOUT.count(pool="test_pool") == 2
+    assert 'db_pool_connections{pool="test_pool",state="size"}' in metrics.registry.render()
+
+
+@pytest.mark.asyncio
+async def test_redis_and_provider_latency():
+    class FakeAsyncRedis:
+        async def execute_command(self, *args, **options):
+            return "PONG"
+
+    client = instrument_redis(FakeAsyncRedis(), "test_redis")
+    assert await client.execute_command("PING") == "PONG"
+    assert REDIS_LATENCY.count(client="test_redis", command="PING") == 1
+
+    with pytest.raises(RuntimeError):
+        with track_provider("test_provider", "call"):
+            raise RuntimeError("boom")
+    assert PROVIDER_LATENCY.count(provider="test_provider", operation="call", outcome="error") == 1
+
+
+def test_provider_block_reports_http_status():
+    with track_provider("test_status_provider", "call") as call:
+        call.status(503)
+    with track_provider("test_status_provider", "call") as call:
+        call.status(201)
+    with track_provider("test_status_provider", "call"):
+        pass
+
+    assert PROVIDER_LATENCY.count(provider="test_status_provider", operation="call", outcome="5xx") == 1
+    assert PROVIDER_LATENCY.count(provider="test_status_provider", operation="call", outcome="ok") == 2
+
+
+def test_multiprocess_dir_sums_workers(tmp_path, monkeypatch):
+    def worker(pid: int) -> MetricsRegistry:
+        registry = MetricsRegistry(str(tmp_path))
+        registry.counter("demo_total", "Demo.", ("kind",)).inc(pid % 100, kind="a")
+        registry.gauge("demo_in_flight", "Demo.").set(1)
+        registry.histogram("demo_seconds", "Demo.", buckets=(1,)).observe(0.5)
+        monkeypatch.setattr(metrics.os, "getpid", lambda: pid)
+        registry.flush()
+        return registry
+
+    worker(101)
+    worker(102)
+    scraped = worker(103)
+    # 101 has exited: its counters stay in the total, its gauge does not
+    monkeypatch.setattr(metrics, "_process_alive", lambda pid: pid != 101)
+
+    text_out = scraped.render()
+    assert "demo_total{kind=\"a\"} 6" in text_out
+    assert "demo_in_flight 2" in text_out
+    assert 'demo_seconds_bucket{le="1"} 3' in text_out
+    assert "demo_seconds_count 3" in text_out
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["101.json", "102.json", "103.json"]
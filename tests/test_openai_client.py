@@ -0,0 +1,73 @@
+import functools
+import json
+
+import httpx
+import pytest
+
+from ai_assistant.services import OpenAIClient
+from backend.core.metrics import PROVIDER_LATENCY
+
+MESSAGES = [{"role": "user", "content": "Как заварить улун?"}]
+
+
+def _mock_openai(monkeypatch, handler) -> list[httpx.Request]:
+    """Send the client's requests to `handler` through an httpx.MockTransport."""
+    requests = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return handler(request)
+
+    monkeypatch.setattr(
+        httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(record)),
+    )
+    return requests
+
+
+@pytest.mark.asyncio
+async def test_chat_completion(monkeypatch):
+    requests = _mock_openai(monkeypatch, lambda request: httpx.Response(200, json={
+        "choices": [{"message": {"content": "Водой 90°C"}}],
+        "usage": {"total_tokens": 12},
+    }))
+    before = PROVIDER_LATENCY.count(provider="openai", operation="chat_completion", outcome="ok")
+
+    reply = await OpenAIClient.chat_completion(MESSAGES, "https://llm.test/v1/", "sk-test", model="test-model")
+
+    assert reply == ("Водой 90°C", 12)
+    assert str(requests[0].url) == "https://llm.test/v1/chat/completions"
+    assert requests[0].headers["Authorization"] == "Bearer sk-test"
+    assert json.loads(requests[0].content)["messages"] == MESSAGES
+    assert PROVIDER_LATENCY.count(provider="openai", operation="chat_completion", outcome="ok") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_error_is_raised_and_counted(monkeypatch):
+    _mock_openai(monkeypatch, lambda request: httpx.Response(500, json={"error": {"message": "boom"}}))
+    before = PROVIDER_LATENCY.count(provider="openai", operation="chat_completion", outcome="error")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await OpenAIClient.chat_completion(MESSAGES, "https://llm.test/v1", "sk-test")
+
+    assert PROVIDER_LATENCY.count(provider="openai", operation="chat_completion", outcome="error") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_stream(monkeypatch):
+    chunks = [
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "Водой "}}]},
+        {"choices": [{"delta": {"content": "90°C"}}]},
+        {"choices": [], "usage": {"total_tokens": 7}},
+    ]
+    body = "".join(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+    requests = _mock_openai(monkeypatch, lambda request: httpx.Response(
+        200, text=body, headers={"Content-Type": "text/event-stream"},
+    ))
+    before = PROVIDER_LATENCY.count(provider="openai", operation="chat_completion_stream", outcome="ok")
+
+    events = [e async for e in OpenAIClient.chat_completion_stream(MESSAGES, "https://llm.test/v1", "sk-test")]
+
+    assert events == [("Водой ", None), ("90°C", None), ("", 7)]
+    assert json.loads(requests[0].content)["stream"] is True
+    assert PROVIDER_LATENCY.count(provider="openai", operation="chat_completion_stream", outcome="ok") == before + 1
@@ -0,0 +1,67 @@
+from ai_assistant.models.assistant import AIBannedPhrase
+from ai_assistant.phrase_filter import CompiledPhrases, KeywordMatcher
+from ai_assistant.settings_cache import SettingsSnapshot
+
+
+def phrase(text, action="block", replacement=None, apply_to_input=True, apply_to_output=True):
+    return AIBannedPhrase(
+        phrase=text, action=action, replacement=replacement,
+        apply_to_input=apply_to_input, apply_to_output=apply_to_output,
+    )
+
+
+PHRASES = CompiledPhrases([
+    phrase("казино"),
+    phrase("дурак", action="replace", replacement="[скрыто]"),
+    phrase("конкурент", action="replace"),
+    phrase("конкурента", action="replace", replacement="другого магазина"),
+    phrase("скидка 90%", apply_to_input=False),
+])
+
+
+def test_input_block_wins_over_replacements():
+    assert PHRASES.check_input("Дурак, где КАЗИНО?") == (True, "Дурак, где КАЗИНО?")
+
+
+def test_input_replacements_are_case_insensitive_and_longest_first():
+    blocked, text = PHRASES.check_input("ДУРАК спросил про конкурента и конкурент ответил")
+    assert not blocked
+    assert text == "[скрыто] спросил про другого магазина и *** ответил"
+    assert PHRASES.check_input("скидка 90% есть?") == (False, "скидка 90% есть?")
+
+
+def test_output_filter_replaces_every_output_phrase():
+    assert PHRASES.filter_output("Обычный ответ") == (False, "Обычный ответ", None)
+    assert PHRASES.filter_output("Скидка 90% в казино") == (True, "*** в ***", "Скидка 90% в казино")
+    assert CompiledPhrases([]).check_input("что угодно") == (False, "что угодно")
+
+
+def test_output_stream_matches_filter_output_for_any_split():
+    text = "Спросите конкурента: скидка 90% в КАЗИНО — шутка, дурак!"
+    expected = PHRASES.filter_output(text)[1]
+    for size in (1, 2, 3, 7, len(text)):
+        stream = PHRASES.output_stream()
+        sent = "".join(stream.feed(text[i:i + size]) for i in range(0, len(text), size)) + stream.finish()
+        assert sent == stream.filtered == expected
+        assert stream.was_filtered and stream.original == text
+
+    # Nothing is held back without output phrases
+    stream = CompiledPhrases([phrase("казино", apply_to_output=False)]).output_stream()
+    assert stream.feed("каз") == "каз"
+    assert stream.finish() == "" and not stream.was_filtered
+
+
+def test_keyword_matcher_finds_any_keyword_as_substring():
+    matcher = KeywordMatcher(["менеджер", "живой человек", "Operator", ""])
+    assert matcher.search("Позовите МЕНЕДЖЕРА, пожалуйста") == "МЕНЕДЖЕР"
+    assert matcher.search("нужен живой человек") == "живой человек"
+    assert matcher.search("call an operator") == "operator"
+    assert matcher.search("Как заваривать улун?") is None
+    assert KeywordMatcher([]).search("менеджер") is None
+
+
+def test_manager_keywords_are_compiled_once_per_snapshot():
+    snapshot = SettingsSnapshot(raw={}, typed={"manager_keywords": ["менеджер"]})
+    assert snapshot.manager_keywords is snapshot.manager_keywords
+    assert snapshot.manager_keywords.search("где менеджер?") == "менеджер"
+    assert SettingsSnapshot(raw={}, typed={}).manager_keywords.search("менеджер") is None
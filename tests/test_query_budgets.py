@@ -0,0 +1,125 @@
+"""
+Query budgets of the endpoints that used to issue one query per row
+(moderation comments, product stock, AI admin conversations, checkout).
+The data has several rows per list, so a per-row query shows up as a
+statement repeated more than `max_repeats` times.
+"""
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from admin_backend.api.v1 import inventory, moderation
+from admin_backend.core.deps import get_current_admin
+from ai_assistant.api.admin import router as assistant_admin_router
+from ai_assistant.models.assistant import AIConversation, AIMessage, AIMessageRole
+from backend.db.session import get_db
+from backend.models.catalog import Category, Product, SKU
+from backend.models.interactions import Comment, Report
+from backend.models.inventory import ProductStock
+from backend.models.user import User
+
+ROWS = 6
+
+
+@pytest.fixture
+async def env(bench_env):
+    async with bench_env["session_factory"]() as db:
+        admin = User(email="admin@example.com", username="admin", hashed_password="x", is_superuser=True)
+        users = [User(email=f"user{i}@example.com", username=f"user{i}", hashed_password="x") for i in range(ROWS)]
+        db.add_all([admin, *users])
+        await db.flush()
+
+        categories = [Category(name=f"Чай {i}", slug=f"tea-{i}") for i in range(ROWS)]
+        db.add_all(categories)
+        await db.flush()
+        skus = []
+        for i, category in enumerate(categories):
+            product = Product(title=f"Улун {i}", slug=f"oolong-{i}", category_id=category.id)
+            db.add(product)
+            await db.flush()
+            sku = SKU(product_id=product.id, sku_code=f"OOL-{i}", weight=100, price_cents=1000, quantity=50)
+            db.add(sku)
+            await db.flush()
+            db.add(ProductStock(sku_id=sku.id, quantity=0, reserved=0, min_quantity=60 if i % 2 else 0))
+            skus.append(sku)
+
+            comment = Comment(user_id=users[i].id, product_id=product.id, content=f"Отзыв {i}")
+            db.add(comment)
+            await db.flush()
+            db.add_all(Report(comment_id=comment.id, user_id=users[j].id, reason="spam") for j in range(i))
+
+            conv = AIConversation(user_id=users[i].id, session_id=f"s{i}", title=f"Диалог {i}")
+            db.add(conv)
+            await db.flush()
+            db.add_all(
+                AIMessage(conversation_id=conv.id, role=AIMessageRole.USER, content=f"Вопрос {j}")
+                for j in range(3)
+            )
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(moderation.router, prefix="/api/v1/moderation")
+    app.include_router(inventory.router, prefix="/api/v1/inventory")
+    app.include_router(assistant_admin_router, prefix="/api/v1/admin/assistant")
+
+    async def override_get_db():
+        async with bench_env["session_factory"]() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_admin] = lambda: admin
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as admin_client, \
+            AsyncClient(transport=ASGITransport(app=bench_env["apps"]["backend"]), base_url="http://test") as client:
+        headers = {"X-Session-ID": "budget-session"}
+        for sku in skus:
+            response = await client.post("/api/v1/cart/items", json={"sku_id": sku.id, "quantity": 1}, headers=headers)
+            assert response.status_code == 200
+        yield {"admin_client": admin_client, "client": client, "headers": headers}
+
+
+@pytest.mark.asyncio
+@pytest.mark.query_budget(4, max_repeats=1)
+async def test_moderation_comments(env):
+    response = await env["admin_client"].get("/api/v1/moderation/comments")
+    assert response.status_code == 200
+    assert sorted(c["reports_count"] for c in response.json()["items"]) == list(range(ROWS))
+
+
+@pytest.mark.asyncio
+@pytest.mark.query_budget(4, max_repeats=1)
+async def test_product_stock(env):
+    response = await env["admin_client"].get("/api/v1/inventory/products")
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == ROWS
+    assert {i["category_name"] for i in items} == {f"Чай {i}" for i in range(ROWS)}
+    assert sum(i["is_low_stock"] for i in items) == ROWS // 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.query_budget(3, max_repeats=1)
+async def test_assistant_admin_conversations(env):
+    response = await env["admin_client"].get("/api/v1/admin/assistant/conversations")
+    assert response.status_code == 200
+    assert {c["user_email"] for c in response.json()["items"]} == {f"user{i}@example.com" for i in range(ROWS)}
+
+
+@pytest.mark.asyncio
+# SQLite inserts the order items one by one (insertmanyvalues cannot keep the
+# RETURNING order there; Postgres sends one batch), so repeats allow ROWS and
+# the total catches a per-SKU UPDATE of SKU or ProductStock.
+@pytest.mark.query_budget(20 + ROWS, max_repeats=ROWS)
+async def test_checkout(env):
+    response = await env["client"].post(
+        "/api/v1/orders/checkout",
+        json={
+            "delivery_method": "pickup",
+            "payment_method": "card",
+            "contact_info": {
+                "firstname": "Test", "lastname": "User", "email": "buyer@example.com", "phone": "+79990000000",
+            },
+        },
+        headers=env["headers"],
+    )
+    assert response.status_code == 200, response.text
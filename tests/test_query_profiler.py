@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.core.query_profiler import profile_queries, statement_shape
+
+
+def test_statement_shape_strips_parameters():
+    a = statement_shape("SELECT * FROM sku WHERE sku.id = $1 AND title = 'x'")
+    b = statement_shape("SELECT *\n  FROM sku WHERE sku.id = $2 AND title = 'other'")
+    assert a == b
+    assert statement_shape("SELECT 1 WHERE id IN ($1, $2, $3)") == statement_shape("SELECT 1 WHERE id IN ($1)")
+
+
+@pytest.mark.asyncio
+async def test_profile_detects_repeated_statements():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        with profile_queries() as profile:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1 AS one"))
+                for i in range(5):
+                    await conn.execute(text("SELECT :value"), {"value": i})
+    finally:
+        await engine.dispose()
+
+    assert profile.count == 6
+    assert profile.total_ms > 0
+    assert profile.repeated(threshold=3) == [("SELECT ?", 5)]
+
+
+@pytest.mark.asyncio
+async def test_nested_profiles_both_record(query_counter):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        with query_counter() as outer:
+            with profile_queries() as inner:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+    assert inner.count == 1
+    assert outer.count == 1
@@ -0,0 +1,214 @@
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from ai_assistant.models.assistant import AIRAGChunk, AIRAGDocument
+from ai_assistant.rag_chunks import chunk_text, estimate_tokens, write_chunks
+from ai_assistant.rag_index import BM25Index, IndexedChunk, RAGIndexSync, hybrid_search, stem_ru, tokenize
+from ai_assistant.rag_vectors import VectorIndex
+from ai_assistant.services import RAGService
+from backend.models.user import User
+
+
+def make_doc(doc_id, title, content, keywords=None, document_id=None, position=0):
+    return IndexedChunk(
+        id=doc_id, document_id=document_id or doc_id, position=position, title=title, content=content,
+        token_count=estimate_tokens(content), keywords=keywords,
+    )
+
+
+def test_russian_word_forms_share_a_stem():
+    assert stem_ru("заваривать") == stem_ru("заваривают")
+    assert stem_ru("чай") == stem_ru("чая") == stem_ru("чаю")
+    assert stem_ru("температура") == stem_ru("температурой")
+    assert tokenize("Как заваривать зелёный чай?") == ["заварива", "зелен", "ча"]
+
+
+def test_bm25_ranks_title_match_first():
+    index = BM25Index()
+    index.rebuild([
+        make_doc(1, "Хранение чая", "Храните чай в сухом месте, вдали от запахов."),
+        make_doc(2, "Заваривание пуэра", "Пуэр промывают и заваривают кипятком 95-100°C."),
+        make_doc(3, "Виды чая", "Чёрный, зелёный, белый, улун и пуэр.", keywords="пуэр, улун"),
+    ])
+
+    results = index.search("как заварить пуэр")
+    assert [doc.id for _, doc in results][:2] == [2, 3]
+    assert index.search("кофе") == []
+
+
+def test_incremental_updates():
+    index = BM25Index()
+    index.rebuild([make_doc(1, "Улун", "Улун — частично ферментированный чай")])
+    index.add(make_doc(2, "Белый чай", "Бай Му Дань"))
+    assert [doc.id for _, doc in index.search("бай му дань")] == [2]
+
+    index.add(make_doc(2, "Белый чай", "Серебряные иглы"))
+    assert index.search("бай му дань") == []
+
+    index.remove(1)
+    assert index.search("улун") == []
+    assert len(index) == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_rebuilds_only_when_table_changes(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rag.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: User.metadata.create_all(
+            c, tables=[User.__table__, AIRAGDocument.__table__, AIRAGChunk.__table__],
+        ))
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    sync = RAGIndexSync(BM25Index(), refresh_seconds=1)
+    async with session_factory() as db:
+        db.add(AIRAGDocument(title="Пуэр", content="Шу пуэр заваривают кипятком", is_active=True))
+        db.add(AIRAGDocument(title="Черновик", content="Пуэр", is_active=False))
+        await db.commit()
+
+        # Documents without chunks are chunked on load
+        await sync.load(db)
+        assert len(sync.index) == 1
+        assert await db.scalar(select(func.count(AIRAGChunk.id))) == 2
+        assert await sync.refresh(db) is False
+
+        doc = AIRAGDocument(title="Улун", content="Тегуаньинь", is_active=True)
+        db.add(doc)
+        await db.flush()
+        await write_chunks(db, doc)
+        await db.commit()
+        await sync.document_saved(db, doc)
+        assert [d.title for _, d in sync.index.search("тегуаньинь")] == ["Улун"]
+
+        doc.content = "Дахунпао"
+        await write_chunks(db, doc)
+        await db.commit()
+        await sync.document_saved(db, doc)
+        assert sync.index.search("тегуаньинь") == []
+        assert len(sync.index) == 2
+        # Already applied incrementally: no rebuild needed
+        assert await sync.refresh(db) is False
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_of_another_worker_is_not_swallowed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rag.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: User.metadata.create_all(
+            c, tables=[User.__table__, AIRAGDocument.__table__, AIRAGChunk.__table__],
+        ))
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    first, second = RAGIndexSync(BM25Index()), RAGIndexSync(BM25Index())
+
+    async def save(sync, title, content):
+        async with session_factory() as db:
+            doc = AIRAGDocument(title=title, content=content, is_active=True)
+            db.add(doc)
+            await db.flush()
+            await write_chunks(db, doc)
+            await db.commit()
+            await sync.document_saved(db, doc)
+
+    async with session_factory() as db:
+        await first.load(db)
+        await second.load(db)
+
+    await save(first, "Пуэр", "Шу пуэр заваривают кипятком")
+    await save(second, "Улун", "Тегуаньинь")
+    assert second.stale and not first.stale
+
+    async with session_factory() as db:
+        assert await second.refresh(db) is True
+        assert await first.refresh(db) is True  # The second write is news to the first worker too
+        assert await second.refresh(db) is False
+    for sync in (first, second):
+        assert [d.title for _, d in sync.index.search("пуэр")] == ["Пуэр"]
+        assert [d.title for _, d in sync.index.search("тегуаньинь")] == ["Улун"]
+    assert first.version == second.version
+
+    await engine.dispose()
+
+
+def test_vector_index_matches_word_forms_bm25_misses():
+    docs = [
+        make_doc(1, "Хранение чая", "Храните чай в сухом месте, вдали от запахов."),
+        make_doc(2, "Шу пуэр", "Промывают и заваривают кипятком по 10 секунд.", keywords="пуэр"),
+        make_doc(3, "Доставка", "Почтой России 5-10 дней, СДЭК 2-4 дня."),
+    ]
+    bm25, vectors = BM25Index(), VectorIndex(dim=1024)
+    bm25.rebuild(docs)
+    vectors.rebuild(docs)
+
+    # "заварка" and "заваривают" stem differently, but share character n-grams
+    assert bm25.search("заварка") == []
+    assert [doc.id for _, doc in vectors.search("заварка")] == [2]
+    assert [doc.id for _, doc in hybrid_search(bm25, vectors, "заварка")] == [2]
+    assert vectors.search("погода в москве") == []
+
+    vectors.remove(2)
+    assert vectors.search("заварка") == []
+    assert len(vectors) == 2
+
+
+def test_vector_index_memmap(tmp_path):
+    vectors = VectorIndex(dim=1024, path=str(tmp_path / "rag.npy"))
+    vectors.rebuild([make_doc(1, "Улун", "Тегуаньинь — светлый улун"), make_doc(2, "Пуэр", "Шу пуэр")])
+
+    assert (tmp_path / "rag.npy").exists()
+    assert [doc.id for _, doc in vectors.search("тегуаньинь")] == [1]
+
+    # Incremental batches are written back to the shared file
+    vectors.add_many([make_doc(3, "Белый чай", "Бай Му Дань"), make_doc(4, "Красный чай", "Дянь Хун")])
+    vectors.remove_many([1])
+    assert isinstance(vectors._matrix, np.memmap)
+    assert np.load(tmp_path / "rag.npy").shape == (3, 1024)
+    assert vectors.search("тегуаньинь") == []
+    assert [doc.id for _, doc in vectors.search("бай му дань")] == [3]
+    assert [doc.id for _, doc in vectors.search("шу пуэр")] == [2]
+
+
+def test_vector_index_grows_in_place():
+    vectors = VectorIndex(dim=256)
+    vectors.rebuild([])
+    for i in range(1, 101):
+        vectors.add(make_doc(i, f"Чай {i}", f"Сорт номер {i}"))
+    assert len(vectors._matrix) == 128  # Doubled, not copied per document
+    vectors.remove_many(range(1, 51))
+    vectors.add(make_doc(100, "Пуэр", "Шу пуэр"))  # Replaces the row of the same id
+
+    assert len(vectors) == 50
+    assert [doc.id for _, doc in vectors.search("шу пуэр")] == [100]
+    fresh = VectorIndex(dim=256)
+    fresh.rebuild(vectors.documents.values())
+    assert np.allclose(vectors._df, fresh._df)
+
+
+def test_chunks_overlap_and_respect_token_limit():
+    sentences = [f"Предложение номер {i} про заваривание чая." for i in range(40)]
+    chunks = chunk_text(" ".join(sentences), max_tokens=60, overlap_tokens=20)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 60 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert current.startswith(last_sentence)
+    assert chunk_text("Короткий текст.") == ["Короткий текст."]
+
+
+def test_context_stops_at_token_budget():
+    chunks = [
+        make_doc(1, "Пуэр", "а" * 300, document_id=10, position=1),
+        make_doc(2, "Улун", "б" * 300, document_id=20),
+        make_doc(3, "Пуэр", "в" * 300, document_id=10, position=0),
+    ]
+    selected = RAGService.select_chunks(chunks, token_budget=220)
+    assert [c.id for c in selected] == [1, 2]
+
+    context = RAGService.format_context(RAGService.select_chunks(chunks, token_budget=1000))
+    # Chunks of one document are grouped under one title, in document order
+    assert context.count("### Пуэр") == 1
+    assert context.index("в" * 300) < context.index("а" * 300) < context.index("### Улун")
@@ -0,0 +1,107 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from ai_assistant.models.assistant import AIRAGChunk, AIRAGDocument
+from ai_assistant.rag_index import BM25Index, RAGIndexSync
+from ai_assistant.rag_ingest import ingest, read_jsonl, read_markdown
+from backend.models.user import User
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rag.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: User.metadata.create_all(
+            c, tables=[User.__table__, AIRAGDocument.__table__, AIRAGChunk.__table__],
+        ))
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+def jsonl(*documents) -> list[str]:
+    return [json.dumps(d, ensure_ascii=False) + "\n" for d in documents]
+
+
+ARTICLES = [
+    {"title": f"Статья {i}", "content": f"Улун номер {i} заваривают водой 90°C.", "keywords": ["улун", str(i)]}
+    for i in range(1200)
+]
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_is_batched_and_incremental(session_factory, query_counter):
+    sync = RAGIndexSync(BM25Index())
+    async with session_factory() as db:
+        await sync.load(db)
+        with query_counter() as queries:
+            report = await ingest(db, read_jsonl(jsonl(*ARTICLES), "kb.jsonl"), batch_size=500, index_sync=sync)
+        assert (report.created, report.updated, report.invalid) == (1200, 0, 0)
+        assert queries.count < 30  # A few statements per batch of 500, not per document
+        assert await db.scalar(select(func.count(AIRAGChunk.id))) == report.chunks == 1200
+        assert len(sync.index) == 1200
+        assert await sync.refresh(db) is False
+
+        # Second run: a repeated title, a new article, existing content under a new title, invalid lines
+        repeated = dict(ARTICLES[5], content="Тегуаньинь заваривают водой 85°C.")
+        report = await ingest(db, read_jsonl(jsonl(
+            *ARTICLES[:10], repeated,
+            {"title": "Новая", "content": "Пуэр промывают кипятком."},
+            {"title": "Копия", "content": "Улун  номер 7 заваривают водой 90°C."},
+            {"title": "", "content": "без названия"},
+        ) + ["не json\n"], "kb.jsonl"), index_sync=sync)
+        assert (report.created, report.updated, report.unchanged) == (1, 0, 10)
+        assert report.duplicates == 2  # "Статья 5" twice and "Копия"
+        assert report.invalid == 2 and report.errors[1].startswith("kb.jsonl:15")
+
+        doc = await db.scalar(select(AIRAGDocument).where(AIRAGDocument.title == "Статья 5"))
+        assert doc.content.startswith("Улун")  # The first record of a title wins
+        assert [d.title for _, d in sync.index.search("пуэр промывают")] == ["Новая"]
+
+
+@pytest.mark.asyncio
+async def test_changed_document_is_reindexed(session_factory):
+    sync = RAGIndexSync(BM25Index())
+    async with session_factory() as db:
+        await sync.load(db)
+        await ingest(db, read_jsonl(jsonl({"title": "Улун", "content": "Тегуаньинь"})), index_sync=sync)
+        report = await ingest(db, read_jsonl(jsonl({"title": "Улун", "content": "Дахунпао"})), index_sync=sync)
+        assert report.updated == 1
+        assert sync.index.search("тегуаньинь") == []
+        assert [d.title for _, d in sync.index.search("дахунпао")] == ["Улун"]
+
+        report = await ingest(
+            db, read_jsonl(jsonl({"title": "Улун", "content": "Шэн"})), update_existing=False, index_sync=sync,
+        )
+        assert report.unchanged == 1
+        assert await db.scalar(select(AIRAGDocument.content)) == "Дахунпао"
+
+
+@pytest.mark.asyncio
+async def test_decode_error_keeps_written_batches(session_factory):
+    # Well past the reader's 8 KB chunks, so the bad byte is met mid-file
+    body = "".join(jsonl(*ARTICLES[:300])).encode("utf-8") + b'{"title": "\xff"}\n'
+    async with session_factory() as db:
+        report = await ingest(db, read_jsonl(io.TextIOWrapper(io.BytesIO(body), encoding="utf-8")), batch_size=50)
+        assert report.created == await db.scalar(select(func.count(AIRAGDocument.id)))
+        assert 0 < report.created < 300
+        assert report.errors == [f"Not UTF-8 after {report.created} documents, the rest of the file was not imported"]
+
+        with pytest.raises(UnicodeDecodeError):
+            await ingest(db, read_jsonl(io.TextIOWrapper(io.BytesIO(b"\xff\xfe"), encoding="utf-8")))
+
+
+def test_markdown_front_matter_and_heading():
+    name, fields = read_markdown(
+        "---\ncategory: brewing\nkeywords: улун, гайвань\n---\n# Заваривание улуна\n\nВода 85–95°C.\n",
+        "kb/oolong.md",
+    )
+    assert fields == {
+        "category": "brewing", "keywords": "улун, гайвань", "title": "Заваривание улуна",
+        "content": "Вода 85–95°C.", "source": "kb/oolong.md",
+    }
+    assert read_markdown("Просто текст", "kb/note.md")[1]["title"] == "note"
@@ -0,0 +1,33 @@
+import pytest
+
+from ai_assistant import rate_limit
+
+
+class RecordingRedis:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        self.calls.append((numkeys, keys_and_args))
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_hit_checks_enabled_windows_in_one_call(monkeypatch):
+    redis = RecordingRedis(result=2)
+    monkeypatch.setattr("backend.core.cache.redis_client", redis)
+
+    assert await rate_limit.hit("user:5", {"minute": 5, "hour": 60}) == "hour"
+    numkeys, keys_and_args = redis.calls[0]
+    assert numkeys == 2
+    assert keys_and_args[:2] == ("ai_assistant:rate:{user:5}:minute", "ai_assistant:rate:{user:5}:hour")
+    assert keys_and_args[4:] == (60_000, 5, 3_600_000, 60)
+
+    redis.result = 0
+    assert await rate_limit.hit("session:abc", {"minute": 0, "hour": 60}) is None
+    assert redis.calls[1][0] == 1 and redis.calls[1][1][0] == "ai_assistant:rate:{session:abc}:hour"
+
+    # No limits: Redis isn't touched
+    assert await rate_limit.hit("user:5", {"minute": 0, "hour": 0}) is None
+    assert len(redis.calls) == 2
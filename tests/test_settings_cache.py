@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from ai_assistant.models.assistant import AIAssistantSettings
+from ai_assistant.services import DEFAULT_SETTINGS
+from ai_assistant.settings_cache import SettingsCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+@pytest.fixture
+async def settings_db(tmp_path, monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr("backend.core.cache.redis_client", redis)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'settings.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: AIAssistantSettings.__table__.create(c))
+    queries = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        db.add(AIAssistantSettings(key="max_tokens", value="512", value_type="int", group="model"))
+        db.add(AIAssistantSettings(key="temperature", value="hot", value_type="float", group="model"))
+        await db.commit()
+        yield db, redis, queries
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_serves_typed_values_without_queries(settings_db):
+    db, _, queries = settings_db
+    cache = SettingsCache(DEFAULT_SETTINGS)
+
+    await cache.get_snapshot(db)
+    queries.clear()
+    snapshot = await cache.get_snapshot(db)
+
+    assert snapshot.get_typed("max_tokens") == 512
+    assert snapshot.get_typed("assistant_enabled") is True  # Default, no row
+    assert snapshot.get_typed("temperature") == 0.7  # Unparsable value falls back to default
+    assert snapshot.get("openai_model") == "gpt-4o-mini"
+    assert queries == []
+
+
+@pytest.mark.asyncio
+async def test_version_bump_invalidates_other_processes(settings_db):
+    db, redis, _ = settings_db
+    writer, reader = SettingsCache(DEFAULT_SETTINGS), SettingsCache(DEFAULT_SETTINGS)
+    reader._listening = True  # As if subscribed: no max-age expiry
+    assert (await reader.get_snapshot(db)).get_typed("max_tokens") == 512
+
+    await db.execute(update(AIAssistantSettings).where(AIAssistantSettings.key == "max_tokens").values(value="2048"))
+    await db.commit()
+    assert (await reader.get_snapshot(db)).get_typed("max_tokens") == 512
+
+    await writer.bump()
+    channel, version = redis.published[-1]
+    assert channel == reader.channel == "ai_assistant:settings"
+    reader._on_message(str(version))
+    assert (await reader.get_snapshot(db)).get_typed("max_tokens") == 2048
+
+    # Stale or repeated announcements don't force reloads
+    snapshot = await reader.get_snapshot(db)
+    reader._on_message(str(version))
+    assert await reader.get_snapshot(db) is snapshot
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from ai_assistant.models.assistant import (
+    AIConversation,
+    AIConversationStatus,
+    AIMessage,
+    AIMessageRole,
+    AIStatsDaily,
+)
+from ai_assistant import message_archive, stats_rollup
+from ai_assistant.services import ChatService
+from backend.models.user import User
+
+
+@pytest.mark.asyncio
+async def test_stats_follow_messages_and_status_changes(session_factory):
+    async with session_factory() as db:
+        user = User(username="tea", email="tea@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        convs = [
+            await ChatService.get_or_create_conversation(db, user_id=user.id),
+            await ChatService.get_or_create_conversation(db, user_id=user.id),
+            await ChatService.get_or_create_conversation(db, session_id="anon"),
+        ]
+        for conv in convs:
+            db.add(AIMessage(conversation_id=conv.id, role=AIMessageRole.USER, content="Привет"))
+            db.add(AIMessage(
+                conversation_id=conv.id, role=AIMessageRole.ASSISTANT, content="Здравствуйте",
+                response_time_ms=100 * conv.id, was_filtered=conv.id == 1, tokens_used=25,
+            ))
+        await stats_rollup.record(db, convs[0].id, tokens_used=20)  # As a summary refresh does
+        await db.commit()
+
+        convs[0].status = AIConversationStatus.MANAGER_REQUESTED
+        await db.commit()
+        convs[0].status = AIConversationStatus.MANAGER_CONNECTED
+        convs[0].manager_id = user.id
+        convs[1].status = AIConversationStatus.CLOSED
+        await db.commit()
+
+    async with session_factory() as db:
+        stats = await ChatService.get_stats(db)
+        assert stats.total_conversations == stats.conversations_today == 3
+        assert stats.active_conversations == 1
+        assert stats.closed_conversations == 1
+        assert stats.manager_escalations == stats.escalations_today == 1  # Requested → connected is one
+        assert stats.total_messages == stats.messages_today == 6
+        assert stats.filtered_messages == 1
+        assert stats.avg_response_time_ms == 200.0
+        assert stats.total_tokens_used == 95
+        assert stats.unique_users == 1
+
+        # Spread over shards, summed on read
+        assert await db.scalar(select(func.count()).select_from(AIStatsDaily)) == 3
+
+        today = await db.scalar(select(AIStatsDaily.day))
+        [day] = await ChatService.get_daily_stats(db, today, today)
+        assert (day.conversations, day.messages, day.tokens_used) == (3, 6, 95)
+
+
+@pytest.mark.asyncio
+async def test_deleted_and_archived_rows_leave_the_counters(session_factory):
+    async with session_factory() as db:
+        user = User(username="tea", email="tea@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        first = await ChatService.get_or_create_conversation(db, user_id=user.id)
+        second = await ChatService.get_or_create_conversation(db, user_id=user.id)
+        archived = await ChatService.get_or_create_conversation(db, session_id="anon")
+        for conv in (first, second, archived):
+            db.add(AIMessage(conversation_id=conv.id, role=AIMessageRole.USER, content="Привет"))
+            db.add(AIMessage(
+                conversation_id=conv.id, role=AIMessageRole.ASSISTANT, content="Здравствуйте",
+                response_time_ms=100, was_filtered=conv is first, tokens_used=10,
+            ))
+            conv.total_tokens_used = 10
+        first.status = AIConversationStatus.MANAGER_REQUESTED
+        archived.status = AIConversationStatus.CLOSED
+        archived.closed_at = datetime.now(timezone.utc) - timedelta(days=1)
+        await db.commit()
+
+    async with session_factory() as db:
+        stats = await ChatService.get_stats(db)
+        assert (stats.unique_users, stats.new_users_today) == (1, 1)
+        assert (stats.total_messages, stats.manager_escalations) == (6, 1)
+
+        await db.delete(await db.get(AIConversation, first.id))
+        await db.commit()
+        stats = await ChatService.get_stats(db)
+        assert (stats.total_conversations, stats.active_conversations, stats.manager_escalations) == (2, 1, 0)
+        assert (stats.total_messages, stats.filtered_messages, stats.total_tokens_used) == (4, 0, 20)
+        assert stats.unique_users == 1  # Still has the second conversation
+
+        await db.delete(await db.get(AIConversation, second.id))
+        await db.commit()
+        assert (await ChatService.get_stats(db)).unique_users == 0
+
+        assert await message_archive.archive_conversations(db, datetime.now(timezone.utc)) == 1
+        stats = await ChatService.get_stats(db)
+        assert (stats.total_conversations, stats.closed_conversations) == (1, 1)
+        assert (stats.total_messages, stats.avg_response_time_ms, stats.total_tokens_used) == (0, None, 10)
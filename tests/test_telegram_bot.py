@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from ai_assistant.api.telegram import router
+from ai_assistant.services import SettingsService, TelegramBot, telegram_bot
+from ai_assistant.settings_cache import SettingsSnapshot
+from backend.db.session import get_db
+
+
+def _update(update_id, chat_id, text):
+    return {"update_id": update_id, "message": {"chat": {"id": chat_id}, "text": text}}
+
+
+@pytest.mark.asyncio
+async def test_one_leader_at_a_time(fake_redis):
+    first, second = TelegramBot(), TelegramBot()
+
+    assert await first._lead()
+    assert not await second._lead()
+    assert await first._lead()  # Renewal
+
+    await first.stop()
+    assert await second._lead()
+
+
+@pytest.mark.asyncio
+async def test_updates_run_once_and_in_order_per_chat(monkeypatch, fake_redis):
+    bot = TelegramBot()
+    handled = []
+
+    async def handle(update, bot_token):
+        chat_id = update["message"]["chat"]["id"]
+        if update["update_id"] == 1:
+            await asyncio.sleep(0.02)  # A slow update doesn't hold up other chats
+        handled.append((chat_id, update["message"]["text"]))
+
+    monkeypatch.setattr(bot, "_handle_update", handle)
+    for update in (_update(1, 10, "a"), _update(2, 10, "b"), _update(3, 20, "c"), _update(1, 10, "a")):
+        await bot.dispatch(update, "token")
+    await asyncio.gather(*bot._updates)
+
+    assert handled == [(20, "c"), (10, "a"), (10, "b")]
+
+
+@pytest.mark.asyncio
+async def test_failed_update_is_handled_on_redelivery(monkeypatch, fake_redis):
+    bot = TelegramBot()
+    attempts = []
+
+    async def handle(update, bot_token):
+        attempts.append(update["update_id"])
+        if len(attempts) == 1:
+            raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(bot, "_handle_update", handle)
+    for _ in range(3):
+        await bot.dispatch(_update(5, 10, "a"), "token")
+        await asyncio.gather(*bot._updates)
+
+    assert attempts == [5, 5]  # Retried after the failure, then deduplicated
+
+
+@pytest.mark.asyncio
+async def test_webhook_checks_secret_token(monkeypatch, fake_redis):
+    snapshot = SettingsSnapshot(
+        raw={"telegram_bot_token": "123:abc"},
+        typed={"telegram_enabled": True, "telegram_bot_token": "123:abc"},
+    )
+
+    async def get_snapshot(db):
+        return snapshot
+
+    dispatched = []
+
+    async def dispatch(update, bot_token):
+        dispatched.append((update["update_id"], bot_token))
+
+    monkeypatch.setattr(SettingsService, "snapshot", get_snapshot)
+    monkeypatch.setattr(telegram_bot, "dispatch", dispatch)
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1/telegram")
+    app.dependency_overrides[get_db] = lambda: None
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        body = _update(7, 10, "/chats")
+        response = await client.post("/api/v1/telegram/webhook", json=body)
+        assert response.status_code == 403
+        response = await client.post(
+            "/api/v1/telegram/webhook", json=body,
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        )
+        assert response.status_code == 403
+        response = await client.post(
+            "/api/v1/telegram/webhook", json=body,
+            headers={"X-Telegram-Bot-Api-Secret-Token": TelegramBot.webhook_secret("123:abc")},
+        )
+        assert response.status_code == 200
+
+    assert dispatched == [(7, "123:abc")]
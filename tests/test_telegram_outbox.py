@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ai_assistant import telegram_outbox as outbox_module
+from ai_assistant.services import SettingsService, TelegramService
+from ai_assistant.settings_cache import SettingsSnapshot
+from ai_assistant.telegram_outbox import OUTBOX_KEY, SCHEDULED_KEY, TelegramOutbox
+
+
+@pytest.mark.asyncio
+async def test_message_burst_is_sent_as_one_digest(monkeypatch, fake_redis):
+    monkeypatch.setattr(outbox_module, "DIGEST_SECONDS", 0)
+    rendered = []
+
+    async def new_message_messages(db, conv_id, user_name, messages):
+        rendered.append((conv_id, user_name, messages))
+        return [("100", " / ".join(messages))]
+
+    monkeypatch.setattr(TelegramService, "new_message_messages", new_message_messages)
+    outbox = TelegramOutbox()
+    for text in ("Здравствуйте", "Где мой заказ?", "Номер 1234"):
+        await outbox.enqueue_message(5, "Анна", text)
+    await outbox.enqueue_message(6, "Гость", "Есть ли шэн пуэр?")
+
+    jobs = [job for _, job in await outbox._take(10)]
+    assert sorted(job["conv_id"] for job in jobs) == [5, 6]
+    for job in jobs:
+        await outbox._render(None, job)
+    assert sorted(rendered) == [
+        (5, "Анна", ["Здравствуйте", "Где мой заказ?", "Номер 1234"]),
+        (6, "Гость", ["Есть ли шэн пуэр?"]),
+    ]
+
+    # The next message starts a new burst
+    await outbox.enqueue_message(5, "Анна", "Спасибо")
+    assert await fake_redis.zrangebyscore(SCHEDULED_KEY, 0, float("inf")) == [json.dumps({"kind": "digest", "conv_id": 5})]
+
+
+@pytest.mark.asyncio
+async def test_delivery_honors_retry_after_and_reschedules_failures(monkeypatch, fake_redis):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(outbox_module.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(outbox_module, "CHAT_PER_SECOND", 10)
+    responses = [
+        httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 7}}),
+        httpx.Response(200, json={"ok": True, "result": {"message_id": 1}}),
+        httpx.Response(502, text="Bad Gateway"),
+    ]
+    outbox = TelegramOutbox()
+    outbox._bot_token = "token"
+    outbox._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+
+    await outbox._deliver({"kind": "send", "chat_id": "100", "text": "Новый диалог"})
+    assert 7 in sleeps
+    assert not await fake_redis.zrangebyscore(SCHEDULED_KEY, 0, float("inf"))
+
+    await outbox._deliver({"kind": "send", "chat_id": "100", "text": "Новый диалог"})
+    [retry] = await fake_redis.zrangebyscore(SCHEDULED_KEY, 0, float("inf"))
+    assert json.loads(retry)["attempts"] == 1
+    await outbox._client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_lost_digest_job_does_not_silence_the_conversation(fake_redis):
+    outbox = TelegramOutbox()
+    await outbox.enqueue_message(5, "Анна", "Здравствуйте")
+    await outbox.enqueue_message(5, "Анна", "Где мой заказ?")
+    assert len(await fake_redis.zrangebyscore(SCHEDULED_KEY, 0, float("inf"))) == 1  # One digest per burst
+
+    # The digest job is lost (a dispatcher died with it) and the marker runs out
+    await fake_redis.delete(SCHEDULED_KEY, outbox_module._digest_marker_key(5))
+    await outbox.enqueue_message(5, "Анна", "Алло?")
+    [digest] = await fake_redis.zrangebyscore(SCHEDULED_KEY, 0, float("inf"))
+    assert json.loads(digest) == {"kind": "digest", "conv_id": 5}
+
+
+@pytest.mark.asyncio
+async def test_events_of_a_dead_dispatcher_are_requeued(monkeypatch, fake_redis):
+    snapshot = SettingsSnapshot(
+        raw={"telegram_bot_token": "123:abc"},
+        typed={"telegram_enabled": True, "telegram_bot_token": "123:abc"},
+    )
+
+    async def get_snapshot(db):
+        return snapshot
+
+    async def new_conversation_messages(db, conv_id, user_name, message):
+        return [("100", f"#{conv_id}"), ("200", f"#{conv_id}")]
+
+    monkeypatch.setattr(SettingsService, "snapshot", get_snapshot)
+    monkeypatch.setattr(TelegramService, "new_conversation_messages", new_conversation_messages)
+    sent = []
+
+    async def deliver(send):
+        sent.append((send["chat_id"], send["text"]))
+
+    crashed, survivor = TelegramOutbox(), TelegramOutbox()
+    for conv_id in (1, 2):
+        await crashed.enqueue("new_conversation", conv_id, "Анна", "Привет")
+    await crashed._heartbeat()
+
+    async def stuck(send):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(crashed, "_deliver", stuck)
+    assert await crashed.dispatch(None) == 2
+    assert await fake_redis.llen(OUTBOX_KEY) == 0
+
+    # SIGKILL: the workers are gone and the liveness key runs out
+    for worker in crashed._workers:
+        worker.cancel()
+    await asyncio.gather(*crashed._workers, return_exceptions=True)
+    await fake_redis.delete(outbox_module._alive_key(crashed._id))
+
+    monkeypatch.setattr(survivor, "_deliver", deliver)
+    await survivor._heartbeat()
+    assert await fake_redis.llen(OUTBOX_KEY) == 2
+    assert await survivor.dispatch(None) == 2
+    while survivor._in_flight:
+        await asyncio.sleep(0.01)
+    assert sorted(sent) == [("100", "#1"), ("100", "#2"), ("200", "#1"), ("200", "#2")]
+    # Acknowledged once all messages of an event are handled
+    assert await fake_redis.llen(outbox_module._processing_key(survivor._id)) == 0
+    for worker in survivor._workers:
+        worker.cancel()
+    await asyncio.gather(*survivor._workers, return_exceptions=True)
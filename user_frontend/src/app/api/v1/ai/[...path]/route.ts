@@ -19,7 +19,7 @@ async function proxyRequest(
   if (authorization) headers['Authorization'] = authorization;
   if (sessionId) headers['X-Session-ID'] = sessionId;
 
-  const fetchOptions: RequestInit = { method, headers };
+  const fetchOptions: RequestInit = { method, headers, signal: request.signal };
 
   if (method !== 'GET' && method !== 'HEAD') {
     headers['Content-Type'] = 'application/json';
@@ -32,6 +32,18 @@ async function proxyRequest(
   try {
     const response = await fetch(url, fetchOptions);
     const contentType = response.headers.get('content-type');
+
+    // Server-Sent Events (streamed replies, conversation updates): pass through unbuffered
+    if (contentType?.includes('text/event-stream') && response.body) {
+      return new Response(response.body, {
+        status: response.status,
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache',
+          'X-Accel-Buffering': 'no',
+        },
+      });
+    }
     
     let data;
     if (contentType?.includes('application/json')) {
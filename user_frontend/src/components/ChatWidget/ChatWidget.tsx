@@ -53,7 +53,14 @@ export function ChatWidget() {
   const [managerAvatarUrl, setManagerAvatarUrl] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLTextAreaElement>(null);
-  const pollingRef = useRef<NodeJS.Timeout | null>(null);
+  // Highest message id received from the server (optimistic messages use temporary ids)
+  const lastIdRef = useRef(0);
+
+  const trackIds = (list: Message[]) => {
+    for (const m of list) {
+      if (m.id > lastIdRef.current) lastIdRef.current = m.id;
+    }
+  };
 
   // Get session ID
   const getSessionId = useCallback(() => {
@@ -129,34 +136,85 @@ export function ChatWidget() {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
-  // Poll for new messages (for manager mode and to detect closure)
+  // Push updates (manager replies, status changes) over SSE.
+  // If the stream is unavailable, fetch only new messages (since_id) and retry.
+  const isClosed = status === 'closed';
   useEffect(() => {
-    if (isOpen && conversationId && status !== 'closed') {
-      // Poll when in manager modes, or even in active mode (to detect status changes)
-      const shouldPoll = status === 'manager_connected' || status === 'manager_requested' || status === 'active';
-      if (shouldPoll) {
-        pollingRef.current = setInterval(async () => {
-          try {
-            const res = await fetch(`${AI_API_BASE}/chat/conversations/${conversationId}/messages`, {
-              headers: getHeaders(),
-            });
-            if (res.ok) {
-              const data = await res.json();
-              setMessages(data.messages);
-              if (data.status !== status) {
-                setStatus(data.status);
-              }
-              if (data.manager_name) setManagerName(data.manager_name);
-              if (data.manager_avatar_url) setManagerAvatarUrl(data.manager_avatar_url);
-            }
-          } catch {}
-        }, 3000);
+    if (!isOpen || !conversationId || isClosed) return;
+    const controller = new AbortController();
+    let stopped = false;
+
+    const applyStatus = (data: any) => {
+      if (data.status) setStatus(data.status);
+      if (data.manager_name) setManagerName(data.manager_name);
+      if (data.manager_avatar_url) setManagerAvatarUrl(data.manager_avatar_url);
+    };
+
+    const applyMessages = (incoming: Message[]) => {
+      if (!incoming.length) return;
+      trackIds(incoming);
+      setMessages(prev => [...prev, ...incoming.filter(m => !prev.some(p => p.id === m.id))]);
+    };
+
+    const listen = async () => {
+      const res = await fetch(
+        `${AI_API_BASE}/chat/conversations/${conversationId}/events?since_id=${lastIdRef.current}`,
+        { headers: getHeaders(), signal: controller.signal },
+      );
+      if (!res.ok || !res.body) throw new Error(`Events unavailable: ${res.status}`);
+      const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+          const block = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          let event = 'message';
+          let data = '';
+          for (const line of block.split('\n')) {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+          }
+          if (!data) continue;  // keep-alive
+          const payload = JSON.parse(data);
+          if (event === 'status') applyStatus(payload);
+          else if (event === 'message') applyMessages([payload]);
+        }
       }
-    }
+    };
+
+    const fetchNew = async () => {
+      const res = await fetch(
+        `${AI_API_BASE}/chat/conversations/${conversationId}/messages?since_id=${lastIdRef.current}`,
+        { headers: getHeaders(), signal: controller.signal },
+      );
+      if (res.ok) {
+        const data = await res.json();
+        applyStatus(data);
+        applyMessages(data.messages);
+      }
+    };
+
+    (async () => {
+      while (!stopped) {
+        try {
+          await listen();
+        } catch {
+          if (stopped) return;
+          try { await fetchNew(); } catch {}
+        }
+        if (!stopped) await new Promise(resolve => setTimeout(resolve, 3000));
+      }
+    })();
+
     return () => {
-      if (pollingRef.current) clearInterval(pollingRef.current);
+      stopped = true;
+      controller.abort();
     };
-  }, [isOpen, conversationId, status, getHeaders]);
+  }, [isOpen, conversationId, isClosed, getHeaders]);
 
   const loadConversation = async (convId: number) => {
     try {
@@ -166,6 +224,7 @@ export function ChatWidget() {
       if (res.ok) {
         const data = await res.json();
         setMessages(data.messages || []);
+        trackIds(data.messages || []);
         setStatus(data.status);
         if (data.manager_name) setManagerName(data.manager_name);
         if (data.manager_avatar_url) setManagerAvatarUrl(data.manager_avatar_url);
@@ -207,6 +266,7 @@ export function ChatWidget() {
         setConversationId(data.id);
         localStorage.setItem('localtea_conv_id', String(data.id));
         setMessages(data.messages || []);
+        trackIds(data.messages || []);
         setStatus(data.status);
       } else {
         // Add optimistic user message
@@ -242,6 +302,7 @@ export function ChatWidget() {
           throw new Error('Failed to send message');
         }
         const aiMsg = await res.json();
+        trackIds([aiMsg]);
 
         // Replace temp msg with actual + AI response
         setMessages(prev => {
@@ -288,6 +349,7 @@ export function ChatWidget() {
   const startNewConversation = () => {
     setConversationId(null);
     setMessages([]);
+    lastIdRef.current = 0;
     setStatus('active');
     setManagerName(null);
     setManagerAvatarUrl(null);